@@ -30,3 +30,101 @@ else:
 # تنظیمات زبان و کدگذاری
 ENCODING = 'utf-8'
 RTL = True  # راست به چپ بودن متون
+
+# تنظیمات مغایرت‌گیری
+# حداکثر اختلاف روز مجاز بین تاریخ بانک و تاریخ حسابداری برای هر نوع تراکنش
+# مقدار صفر یعنی فقط رکوردهای همان تاریخ بررسی می‌شوند
+RECONCILIATION_DATE_TOLERANCE_DAYS = {
+    'Pos': 0,
+    'Received_Transfer': 0,
+    'Paid_Transfer': 0,
+    'Received_Check': 0,
+    'Paid_Check': 0,
+    'Shaparak': 0,
+}
+
+# تعرفه‌های کارمزد انتقال وجه (ریال) برای تطبیق خودکار کارمزد در انتقال‌های پرداختی
+# در صورت نبود تطبیق دقیق، مبلغ بانک منهای هر تعرفه در ایندکس مبالغ حسابداری
+# جستجو شده و در صورت یافتن، کارمزد به صورت خودکار جدا می‌شود
+# (دیکشنری خالی یعنی غیرفعال بودن این حالت)
+TRANSFER_FEE_TIERS = {
+    'Paya': [1200, 2400, 3600],
+    'Satna': [20000, 50000],
+}
+
+# تنظیمات مغایرت‌یابی هوشمند (AI)
+# حداکثر تعداد درخواست‌های هم‌زمان به webhook
+AI_MAX_CONCURRENCY = 4
+# حداکثر نرخ درخواست به webhook (درخواست در ثانیه) و ظرفیت انفجاری سطل توکن
+AI_REQUESTS_PER_SECOND = 2.0
+AI_RATE_LIMIT_BURST = 4
+# حداکثر تعداد رکورد در هر درخواست دسته‌ای به webhook
+# (در صورت عدم پشتیبانی webhook از قالب دسته‌ای، ارسال به صورت خودکار تکی می‌شود)
+AI_BATCH_SIZE = 10
+# مدت اعتبار پاسخ‌های ذخیره شده AI (ساعت)؛ صفر یعنی غیرفعال بودن کش
+AI_CACHE_TTL_HOURS = 24
+# بازه تاریخ (±روز) جستجوی کاندیداهای حسابداری برای AI و حداکثر تعداد کاندیدای ارسالی
+AI_CANDIDATE_WINDOW_DAYS = 15
+AI_CANDIDATE_TOP_K = 20
+# موتور پیش‌فرض مغایرت‌یابی هوشمند: 'webhook' (n8n) یا 'local' (مدل محلی آموزش دیده روی نتایج گذشته)
+AI_MATCHER_BACKEND = 'webhook'
+# قطع‌کننده مدار: تعداد خطای متوالی برای باز شدن مدار و مدت باز ماندن آن (ثانیه)
+AI_CIRCUIT_FAILURE_THRESHOLD = 5
+AI_CIRCUIT_RESET_SECONDS = 30
+# تأخیر نمایی تلاش مجدد (ثانیه) با jitter تصادفی
+AI_BACKOFF_BASE_SECONDS = 0.5
+AI_BACKOFF_MAX_SECONDS = 8
+
+# تنظیمات صفحه‌بندی کوئری‌ها (keyset)
+# تعداد رکورد هر صفحه و حداکثر تعداد صفحات نگهداری شده در حافظه برای هر جدول
+DB_PAGE_SIZE = 500
+DB_PAGE_CACHE_SIZE = 8
+
+# تنظیمات گزارش‌گیری
+# فاصله بررسی صف نتایج گزارش در رابط کاربری (میلی‌ثانیه)
+REPORT_POLL_INTERVAL_MS = 50
+
+# تنظیمات نمایش پیشرفت مغایرت‌گیری
+# فاصله بررسی کانال پیشرفت نخ‌های کاری در رابط کاربری (میلی‌ثانیه؛ 50 یعنی حدود 20 بار در ثانیه)
+PROGRESS_POLL_INTERVAL_MS = 50
+# حداکثر تعداد خطوط لاگ اضافه شده به کادر لاگ در هر بررسی
+PROGRESS_LOG_LINES_PER_TICK = 500
+
+# تنظیمات مغایرت‌یابی دستی
+# تأخیر اجرای جستجوی آزاد پس از آخرین تایپ کاربر (میلی‌ثانیه)
+MANUAL_SEARCH_DEBOUNCE_MS = 300
+# حداکثر تعداد نتایج جستجوی آزاد
+MANUAL_SEARCH_RESULT_LIMIT = 500
+# تعداد ردیف‌های بعدی بانک که کاندیداهای حسابداری آن‌ها از قبل در پس‌زمینه خوانده می‌شوند
+CANDIDATE_PREFETCH_COUNT = 5
+# حداکثر تعداد لیست‌های کاندیدای نگهداری شده در حافظه (LRU)
+CANDIDATE_CACHE_SIZE = 200
+
+# تنظیمات زمان راه‌اندازی
+# بودجه زمان import ماژول main در بنچمارک utils/startup_benchmark.py (میلی‌ثانیه)
+STARTUP_IMPORT_BUDGET_MS = 1500
+# درصد مجاز افزایش زمان import نسبت به خط مبنای ذخیره شده
+STARTUP_REGRESSION_TOLERANCE_PERCENT = 20
+
+# تنظیمات خروجی اکسل
+# تعداد رکوردهای خوانده شده از cursor در هر دسته هنگام صدور
+EXPORT_FETCH_SIZE = 2000
+# تعداد ردیف‌های ابتدای هر شیت که عرض ستون‌ها بر اساس آن‌ها تعیین می‌شود
+EXPORT_WIDTH_SAMPLE_ROWS = 200
+
+# تنظیمات خروجی PDF
+# ارتفاع ردیف‌های جدول (پوینت)؛ تعداد ردیف هر صفحه از روی آن محاسبه می‌شود
+PDF_TABLE_ROW_HEIGHT = 18
+# حداکثر تعداد متن‌های شکل‌دهی شده فارسی (reshape و bidi) نگهداری شده در حافظه
+PDF_SHAPED_TEXT_CACHE_SIZE = 10000
+
+# تنظیمات لاگ
+# حداکثر حجم هر فایل لاگ (بایت) و تعداد فایل‌های قدیمی نگهداری شده پس از چرخش
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+# حداکثر تعداد پیام INFO/DEBUG هر محل فراخوانی در ثانیه برای هر لاگر؛ صفر یعنی بدون محدودیت
+# (هشدارها و خطاها هیچ‌گاه محدود نمی‌شوند)
+LOG_RATE_LIMIT_PER_SECOND = 20
+# فاصله افزودن دسته‌ای لاگ‌ها به کادر لاگ رابط کاربری (میلی‌ثانیه) و حداکثر خطوط نگهداری شده در آن
+LOG_UI_FLUSH_INTERVAL_MS = 100
+LOG_UI_MAX_LINES = 5000
@@ -0,0 +1,268 @@
+# file: database/Helper/pagination.py
+
+import re
+from collections import OrderedDict
+from config.settings import DB_PAGE_SIZE, DB_PAGE_CACHE_SIZE
+from database.init_db import create_connection
+from utils.logger_config import setup_logger
+
+# راه‌اندازی لاگر
+logger = setup_logger('database.Helper.pagination')
+
+_IDENTIFIER_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)?$')
+
+
+class KeysetQuery:
+    """
+    کوئری صفحه‌بندی شده به روش keyset روی (کلید مرتب‌سازی، شناسه)
+
+    به جای OFFSET، هر صفحه از بعد از آخرین (کلید مرتب‌سازی، شناسه) صفحه قبل
+    خوانده می‌شود؛ بنابراین هزینه خواندن هر صفحه مستقل از موقعیت آن است.
+    """
+
+    def __init__(self, select_clause, from_clause, where_clause='1=1', params=(),
+                 sort_column='id', id_column='id', descending=False, column_prefix=None,
+                 sort_columns=None):
+        """
+        Args:
+            select_clause: ستون‌های خروجی (مثلاً "bt.*, b.bank_name")
+            from_clause: جدول‌ها و join ها
+            where_clause: شرط‌های فیلتر با پارامترهای ?
+            params: مقادیر پارامترهای where_clause
+            sort_column: ستون مرتب‌سازی
+            id_column: ستون شناسه یکتا (برای شکستن تساوی کلید مرتب‌سازی)
+            descending: مرتب‌سازی نزولی
+            column_prefix: پیشوند جدول برای نام فیلدهای بدون پیشوند در with_sort
+            sort_columns: نگاشت نام فیلد خروجی به ستون کوئری برای with_sort
+        """
+        for column in (sort_column, id_column):
+            if not _IDENTIFIER_PATTERN.match(column):
+                raise ValueError(f"نام ستون نامعتبر: {column}")
+        self.select_clause = select_clause
+        self.from_clause = from_clause
+        self.where_clause = where_clause
+        self.params = list(params)
+        self.sort_column = sort_column
+        self.id_column = id_column
+        self.descending = descending
+        self.column_prefix = column_prefix
+        self.sort_columns = sort_columns or {}
+
+    @property
+    def _sort_expression(self):
+        # مقادیر NULL به عنوان رشته خالی مرتب می‌شوند تا مقایسه keyset آن‌ها را از دست ندهد
+        if self.sort_column == self.id_column:
+            return self.id_column
+        return f"IFNULL({self.sort_column}, '')"
+
+    def column_for(self, field):
+        """ستون کوئری متناظر با نام فیلد خروجی (برای مرتب‌سازی و فیلتر)"""
+        column = self.sort_columns.get(field)
+        if column is None:
+            column = f"{self.column_prefix}.{field}" if self.column_prefix and '.' not in field else field
+        if not _IDENTIFIER_PATTERN.match(column):
+            raise ValueError(f"نام ستون نامعتبر: {column}")
+        return column
+
+    def _copy(self, where_clause=None, params=None, sort_column=None, descending=None):
+        return KeysetQuery(
+            self.select_clause, self.from_clause,
+            self.where_clause if where_clause is None else where_clause,
+            self.params if params is None else params,
+            sort_column=self.sort_column if sort_column is None else sort_column,
+            id_column=self.id_column,
+            descending=self.descending if descending is None else descending,
+            column_prefix=self.column_prefix, sort_columns=self.sort_columns
+        )
+
+    def with_sort(self, field, descending=False):
+        """کوئری مشابه با مرتب‌سازی بر اساس فیلد دیگر"""
+        return self._copy(sort_column=self.column_for(field), descending=descending)
+
+    def with_conditions(self, conditions, params=()):
+        """کوئری مشابه با شرط‌های اضافه (AND) و پارامترهای آن‌ها"""
+        if not conditions:
+            return self
+        where_clause = " AND ".join([f"({self.where_clause})"] + list(conditions))
+        return self._copy(where_clause=where_clause, params=self.params + list(params))
+
+    def _execute(self, conn, query, params):
+        own_connection = conn is None
+        if own_connection:
+            conn = create_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return cursor.fetchall()
+        finally:
+            if own_connection:
+                conn.close()
+
+    def count(self, conn=None):
+        """تعداد کل رکوردها (کوئری جداگانه بدون خواندن ستون‌ها)"""
+        rows = self._execute(conn, f"SELECT COUNT(*) FROM {self.from_clause} WHERE {self.where_clause}", self.params)
+        return rows[0][0]
+
+    def fetch_page(self, after=None, page_size=DB_PAGE_SIZE, conn=None):
+        """
+        دریافت یک صفحه
+
+        Args:
+            after: (کلید مرتب‌سازی، شناسه) آخرین رکورد صفحه قبل یا None برای صفحه اول
+            page_size: تعداد رکورد صفحه
+
+        Returns:
+            tuple: (لیست رکوردها به صورت دیکشنری، کلید after صفحه بعد یا None)
+        """
+        sort_expression = self._sort_expression
+        order = 'DESC' if self.descending else 'ASC'
+        query = (
+            f"SELECT {self.select_clause}, {sort_expression} AS _sort_key, {self.id_column} AS _row_id "
+            f"FROM {self.from_clause} WHERE ({self.where_clause})"
+        )
+        params = list(self.params)
+        if after is not None:
+            operator = '<' if self.descending else '>'
+            if sort_expression == self.id_column:
+                query += f" AND {self.id_column} {operator} ?"
+                params.append(after[1])
+            else:
+                query += f" AND ({sort_expression}, {self.id_column}) {operator} (?, ?)"
+                params.extend(after)
+        query += f" ORDER BY {sort_expression} {order}, {self.id_column} {order} LIMIT ?"
+        params.append(page_size)
+
+        records = []
+        next_after = None
+        for row in self._execute(conn, query, params):
+            record = dict(row)
+            next_after = (record.pop('_sort_key'), record.pop('_row_id'))
+            records.append(record)
+        if len(records) < page_size:
+            next_after = None
+        return records, next_after
+
+    def page_boundaries(self, page_size=DB_PAGE_SIZE, conn=None):
+        """
+        کلید after شروع هر صفحه (اولین عنصر None برای صفحه اول)
+
+        فقط کلید مرتب‌سازی و شناسه آخرین رکورد هر صفحه خوانده می‌شود تا دسترسی
+        مستقیم به هر صفحه بدون خواندن صفحات قبل ممکن باشد.
+        """
+        sort_expression = self._sort_expression
+        order = 'DESC' if self.descending else 'ASC'
+        query = f"""
+            SELECT _sort_key, _row_id FROM (
+                SELECT {sort_expression} AS _sort_key, {self.id_column} AS _row_id,
+                       ROW_NUMBER() OVER (ORDER BY {sort_expression} {order}, {self.id_column} {order}) AS _row_number
+                FROM {self.from_clause} WHERE ({self.where_clause})
+            ) WHERE _row_number % ? = 0
+            ORDER BY _row_number
+        """
+        rows = self._execute(conn, query, self.params + [page_size])
+        return [None] + [(row[0], row[1]) for row in rows]
+
+    def stream(self, chunk_size=DB_PAGE_SIZE, conn=None):
+        """
+        پیمایش تمام رکوردها با یک کوئری و خواندن دسته‌ای از cursor (fetchmany)
+
+        برخلاف iterate برای هر صفحه کوئری جدیدی اجرا نمی‌شود؛ مناسب صدور کامل
+        نتایج که باید تا پایان و با حافظه ثابت خوانده شوند.
+        """
+        order = 'DESC' if self.descending else 'ASC'
+        query = (
+            f"SELECT {self.select_clause} FROM {self.from_clause} WHERE ({self.where_clause}) "
+            f"ORDER BY {self._sort_expression} {order}, {self.id_column} {order}"
+        )
+        own_connection = conn is None
+        if own_connection:
+            conn = create_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, self.params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(row)
+        finally:
+            if own_connection:
+                conn.close()
+
+    def iterate(self, page_size=DB_PAGE_SIZE):
+        """پیمایش تمام رکوردها صفحه به صفحه با حافظه ثابت"""
+        after = None
+        while True:
+            records, after = self.fetch_page(after, page_size)
+            yield from records
+            if after is None:
+                break
+
+
+class PagedResultSet:
+    """
+    دنباله فقط‌خواندنی رکوردهای یک KeysetQuery با بارگذاری صفحات در صورت نیاز
+
+    فقط تعداد محدودی صفحه (LRU) در حافظه نگهداری می‌شود؛ مناسب جدول‌های مجازی که
+    رکوردها را با اندیس می‌خوانند.
+    """
+
+    def __init__(self, query, page_size=DB_PAGE_SIZE, cache_size=DB_PAGE_CACHE_SIZE, conn=None):
+        """
+        Args:
+            query: نمونه KeysetQuery
+            page_size: تعداد رکورد هر صفحه
+            cache_size: حداکثر تعداد صفحات نگهداری شده در حافظه
+            conn: اتصال اختیاری برای شمارش و ساخت ایندکس صفحات (نگهداری نمی‌شود)
+        """
+        self.query = query
+        self.page_size = page_size
+        self.cache_size = cache_size
+        self.total = query.count(conn)
+        self.boundaries = query.page_boundaries(page_size, conn) if self.total else [None]
+        self._pages = OrderedDict()
+
+    def __len__(self):
+        return self.total
+
+    def __bool__(self):
+        return self.total > 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.total))]
+        if index < 0:
+            index += self.total
+        if not 0 <= index < self.total:
+            raise IndexError("اندیس خارج از محدوده")
+        page = self._get_page(index // self.page_size)
+        offset = index % self.page_size
+        if offset >= len(page):
+            # داده‌ها پس از ساخت ایندکس صفحات تغییر کرده‌اند
+            raise IndexError("رکورد در صفحه یافت نشد")
+        return page[offset]
+
+    def __iter__(self):
+        # پیمایش کامل از کش صفحات عبور نمی‌کند تا حافظه ثابت بماند
+        return self.query.iterate(self.page_size)
+
+    def prefetch(self, page_number=0, conn=None):
+        """خواندن یک صفحه و قرار دادن آن در کش (مثلاً صفحه اول در نخ پس‌زمینه)"""
+        if self.total:
+            self._get_page(page_number, conn)
+
+    def _get_page(self, page_number, conn=None):
+        page = self._pages.get(page_number)
+        if page is not None:
+            self._pages.move_to_end(page_number)
+            return page
+        page, _ = self.query.fetch_page(self.boundaries[page_number], self.page_size, conn)
+        self._pages[page_number] = page
+        while len(self._pages) > self.cache_size:
+            self._pages.popitem(last=False)
+        return page
+
+    def sorted_by(self, field, descending=False):
+        """مجموعه نتایج جدید با مرتب‌سازی بر اساس یک فیلد"""
+        return PagedResultSet(self.query.with_sort(field, descending), self.page_size, self.cache_size)
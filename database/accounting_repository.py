@@ -501,6 +501,49 @@ def get_accounting_by_amount_and_types(amount, transaction_types):
         if conn:
             conn.close()
 
+def get_accounting_candidates_in_window(bank_id, amount, transaction_types, start_date=None, end_date=None, date_field='due_date'):
+    """
+    دریافت کاندیداهای حسابداری مغایرت‌نشده یک بانک با مبلغ مشخص در بازه تاریخ
+    
+    Args:
+        bank_id: شناسه بانک
+        amount: مبلغ
+        transaction_types: لیست انواع تراکنش
+        start_date: ابتدای بازه تاریخ (اختیاری)
+        end_date: انتهای بازه تاریخ (اختیاری)
+        date_field: فیلد تاریخ (due_date یا collection_date)
+    """
+    if date_field not in ('due_date', 'collection_date'):
+        raise ValueError(f"فیلد تاریخ نامعتبر: {date_field}")
+    conn = None
+    try:
+        conn = create_connection()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        placeholders = ','.join('?' * len(transaction_types))
+        query = f"""
+            SELECT * FROM AccountingTransactions
+            WHERE bank_id = ?
+            AND is_reconciled = 0
+            AND transaction_amount = ?
+            AND transaction_type IN ({placeholders})
+        """
+        params = [bank_id, amount] + list(transaction_types)
+        if start_date and end_date:
+            query += f" AND {date_field} BETWEEN ? AND ?"
+            params += [start_date, end_date]
+        cursor.execute(query, params)
+        result = [dict(row) for row in cursor.fetchall()]
+        logger.info(f"تعداد {len(result)} تراکنش حسابداری برای مبلغ {amount} در بازه {start_date} تا {end_date} یافت شد")
+        return result
+    except Exception as e:
+        logger.error(f"خطا در دریافت کاندیداهای حسابداری: {str(e)}")
+        raise
+    finally:
+        if conn:
+            conn.close()
+
 def get_unreconciled_by_type(transaction_type):
     """دریافت تراکنش‌های حسابداری مغایرت‌نشده بر اساس نوع"""
     conn = None
@@ -0,0 +1,98 @@
+import json
+import time
+from database.init_db import create_connection
+from utils.logger_config import setup_logger
+
+# راه‌اندازی لاگر
+logger = setup_logger('database.ai_response_cache_repository')
+
+def get_cached_ai_response(fingerprint, ttl_seconds):
+    """
+    دریافت پاسخ ذخیره شده AI در صورت معتبر بودن
+    
+    Args:
+        fingerprint: اثر انگشت درخواست
+        ttl_seconds: حداکثر عمر مجاز پاسخ (ثانیه)
+        
+    Returns:
+        dict یا None: پاسخ ذخیره شده
+    """
+    conn = None
+    try:
+        conn = create_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT response FROM AIResponseCache
+            WHERE fingerprint = ? AND created_at >= ?
+        """, (fingerprint, time.time() - ttl_seconds))
+        row = cursor.fetchone()
+        return json.loads(row['response']) if row else None
+    except Exception as e:
+        logger.error(f"خطا در دریافت پاسخ ذخیره شده AI: {str(e)}")
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+def save_ai_response(fingerprint, record_key, response):
+    """
+    ذخیره پاسخ AI برای یک درخواست
+    
+    ورودی‌های قبلی همان رکورد با اثر انگشت متفاوت (یعنی مجموعه کاندیدای
+    تغییر یافته) حذف می‌شوند.
+    
+    Args:
+        fingerprint: اثر انگشت درخواست
+        record_key: کلید رکورد (نوع تراکنش و شناسه)
+        response: پاسخ AI
+    """
+    conn = None
+    try:
+        conn = create_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            DELETE FROM AIResponseCache
+            WHERE record_key = ? AND fingerprint != ?
+        """, (record_key, fingerprint))
+        cursor.execute("""
+            INSERT OR REPLACE INTO AIResponseCache (fingerprint, record_key, response, created_at)
+            VALUES (?, ?, ?, ?)
+        """, (fingerprint, record_key, json.dumps(response, ensure_ascii=False), time.time()))
+        conn.commit()
+    except Exception as e:
+        logger.error(f"خطا در ذخیره پاسخ AI: {str(e)}")
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+def delete_expired_ai_responses(ttl_seconds):
+    """
+    حذف پاسخ‌های منقضی شده AI
+    
+    Args:
+        ttl_seconds: حداکثر عمر مجاز پاسخ (ثانیه)
+        
+    Returns:
+        تعداد رکوردهای حذف شده
+    """
+    conn = None
+    try:
+        conn = create_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM AIResponseCache WHERE created_at < ?", (time.time() - ttl_seconds,))
+        deleted_count = cursor.rowcount
+        conn.commit()
+        if deleted_count:
+            logger.info(f"تعداد {deleted_count} پاسخ منقضی شده AI حذف شد")
+        return deleted_count
+    except Exception as e:
+        logger.error(f"خطا در حذف پاسخ‌های منقضی شده AI: {str(e)}")
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if conn:
+            conn.close()
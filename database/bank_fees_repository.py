@@ -1,87 +1,74 @@
 import sqlite3
 from database.init_db import create_connection
+from utils.constants import BANK_FEE_KEYWORDS
+from utils.keyword_matcher import KeywordMatcher
 from utils.logger_config import setup_logger
 
 # راه‌اندازی لاگر
 logger = setup_logger('database.bank_fees_repository')
 
-def identify_bank_fees(bank_id):
+# ماشین تطبیق کلمات کلیدی کارمزد یک بار ساخته می‌شود
+_fee_keyword_matcher = KeywordMatcher(BANK_FEE_KEYWORDS)
+
+# انواع تراکنش کارمزد که در شیت کارمزدهای خروجی اکسل جمع زده می‌شوند
+EXPORT_FEE_TRANSACTION_TYPES = ('bank_fee', 'BANK_FEES')
+
+def is_bank_fee_transaction(description, amount):
     """
-    شناسایی تراکنش‌های کارمزد بانکی براساس توضیحات تراکنش
+    تشخیص کارمزد بودن یک تراکنش بانکی
+    
+    تراکنشی کارمزد است که توضیحات آن شامل یکی از کلمات کلیدی کارمزد باشد
+    یا مقدار آن منفی باشد.
     
     Args:
-        bank_id: شناسه بانک
+        description: توضیحات تراکنش
+        amount: مبلغ تراکنش
         
     Returns:
-        تعداد رکوردهای به‌روزرسانی شده
+        int: 1 برای کارمزد و 0 در غیر این صورت
     """
-    conn = None
     try:
-        conn = create_connection()
-        cursor = conn.cursor()
-        
-        # کلمات کلیدی برای شناسایی کارمزدهای بانکی در توضیحات تراکنش
-        fee_keywords = [
-            '%کارمزد%', '%کارمزد انتقال%', '%کارمزد خدمات%', '%کارمزد پایا%', '%کارمزد ساتنا%',
-            '%کارمزد کارت%', '%کارمزد برداشت%', '%کارمزد تراکنش%', '%کارمزد سرویس%',
-            '%هزینه خدمات%', '%هزینه تراکنش%', '%هزینه کارمزد%', '%هزینه سرویس%',
-            '%fee%', '%service fee%', '%transaction fee%', '%bank fee%'
-        ]
-        
-        # ساخت شرط SQL برای جستجوی کلمات کلیدی
-        like_conditions = ' OR '.join([f"description LIKE '{keyword}'" for keyword in fee_keywords])
-        
-        # به‌روزرسانی نوع تراکنش برای تراکنش‌های کارمزد
-        update_query = f"""
-            UPDATE BankTransactions 
-            SET transaction_type = 'BANK_FEE' 
-            WHERE bank_id = ? AND ({like_conditions}) AND (transaction_type IS NULL OR transaction_type != 'BANK_FEE')
-        """
-        
-        cursor.execute(update_query, (bank_id,))
-        rows_updated = cursor.rowcount
-        
-        conn.commit()
-        logger.info(f"تعداد {rows_updated} تراکنش کارمزد برای بانک با شناسه {bank_id} شناسایی شد.")
-        return rows_updated
-        
-    except sqlite3.Error as e:
-        logger.error(f"خطا در شناسایی کارمزدهای بانکی: {str(e)}")
-        if conn:
-            conn.rollback()
-        raise
-    finally:
-        if conn:
-            conn.close()
+        if amount is not None and float(amount) < 0:
+            return 1
+    except (TypeError, ValueError):
+        pass
+    return 1 if _fee_keyword_matcher.contains_any(description) else 0
 
-def identify_bank_fees_by_amount(bank_id):
+def identify_bank_fees(bank_id):
     """
-    شناسایی تراکنش‌های کارمزد بانکی براساس مقدار منفی
+    طبقه‌بندی تراکنش‌هایی که هنوز پرچم کارمزد ندارند
+    
+    تراکنش‌های جدید هنگام ورود طبقه‌بندی می‌شوند؛ این تابع فقط رکوردهای
+    قدیمی یا ثبت شده از مسیرهای دیگر (is_bank_fee = NULL) را پردازش می‌کند.
     
     Args:
         bank_id: شناسه بانک
         
     Returns:
-        تعداد رکوردهای به‌روزرسانی شده
+        تعداد رکوردهای شناسایی شده به عنوان کارمزد
     """
     conn = None
     try:
         conn = create_connection()
         cursor = conn.cursor()
         
-        # به‌روزرسانی نوع تراکنش برای تراکنش‌های با مقدار منفی به عنوان کارمزد
-        update_query = """
-            UPDATE BankTransactions 
-            SET transaction_type = 'BANK_FEE' 
-            WHERE bank_id = ? AND amount < 0 AND (transaction_type IS NULL OR transaction_type != 'BANK_FEE')
-        """
+        cursor.execute("""
+            SELECT id, description, amount
+            FROM BankTransactions
+            WHERE bank_id = ? AND is_bank_fee IS NULL
+        """, (bank_id,))
+        flags = [
+            (is_bank_fee_transaction(row['description'], row['amount']), row['id'])
+            for row in cursor.fetchall()
+        ]
         
-        cursor.execute(update_query, (bank_id,))
-        rows_updated = cursor.rowcount
+        if flags:
+            cursor.executemany("UPDATE BankTransactions SET is_bank_fee = ? WHERE id = ?", flags)
         
         conn.commit()
-        logger.info(f"تعداد {rows_updated} تراکنش کارمزد با مقدار منفی برای بانک با شناسه {bank_id} شناسایی شد.")
-        return rows_updated
+        fees_count = sum(flag for flag, _ in flags)
+        logger.info(f"تعداد {len(flags)} تراکنش طبقه‌بندی و {fees_count} کارمزد برای بانک با شناسه {bank_id} شناسایی شد.")
+        return fees_count
         
     except sqlite3.Error as e:
         logger.error(f"خطا در شناسایی کارمزدهای بانکی: {str(e)}")
@@ -104,11 +91,8 @@ def collect_bank_fees(bank_id):
     """
     conn = None
     try:
-        # ابتدا تراکنش‌های کارمزد را شناسایی می‌کنیم (با استفاده از کلمات کلیدی و مقدار منفی)
-        identified_fees_keywords = identify_bank_fees(bank_id)
-        identified_fees_amount = identify_bank_fees_by_amount(bank_id)
-        
-        logger.info(f"مجموعاً {identified_fees_keywords + identified_fees_amount} تراکنش کارمزد شناسایی شد.")
+        # طبقه‌بندی رکوردهایی که هنگام ورود پرچم کارمزد نگرفته‌اند
+        identify_bank_fees(bank_id)
         
         conn = create_connection()
         cursor = conn.cursor()
@@ -123,15 +107,15 @@ def collect_bank_fees(bank_id):
                 COUNT(*) as transaction_count,
                 'کارمزدهای تجمیع شده' as description
             FROM BankTransactions 
-            WHERE bank_id = ? AND transaction_type = 'BANK_FEE' AND is_reconciled = 0
+            WHERE bank_id = ? AND is_bank_fee = 1 AND is_reconciled = 0
             GROUP BY transaction_date
         """, (bank_id,))
         
-        # علامت‌گذاری کارمزدهای پردازش شده به عنوان مغایرت‌گیری شده
+        # علامت‌گذاری کارمزدهای پردازش شده به عنوان جمع‌آوری و مغایرت‌گیری شده
         cursor.execute("""
             UPDATE BankTransactions 
-            SET is_reconciled = 1 
-            WHERE bank_id = ? AND transaction_type = 'BANK_FEE' AND is_reconciled = 0
+            SET transaction_type = 'BANK_FEE', is_reconciled = 1 
+            WHERE bank_id = ? AND is_bank_fee = 1 AND is_reconciled = 0
         """, (bank_id,))
         
         # تعداد رکوردهای ایجاد شده
@@ -191,4 +175,40 @@ def get_bank_fees(bank_id=None):
         raise
     finally:
         if conn:
-            conn.close()
\ No newline at end of file
+            conn.close()
+
+def get_daily_fee_totals():
+    """
+    جمع روزانه کارمزدهای ثبت شده در تراکنش‌های بانکی به تفکیک بانک
+
+    گروه‌بندی و جمع در دیتابیس انجام می‌شود؛ خروجی به ترتیب تاریخ است.
+
+    Returns:
+        لیست دیکشنری‌های (fee_date، bank_name، total_amount، transaction_count)
+    """
+    conn = None
+    try:
+        conn = create_connection()
+        cursor = conn.cursor()
+        placeholders = ','.join('?' * len(EXPORT_FEE_TRANSACTION_TYPES))
+        cursor.execute(f"""
+            SELECT
+                substr(bt.transaction_date, 1, 10) AS fee_date,
+                b.bank_name,
+                SUM(bt.amount) AS total_amount,
+                COUNT(bt.amount) AS transaction_count
+            FROM BankTransactions bt
+            JOIN Banks b ON bt.bank_id = b.id
+            WHERE bt.transaction_type IN ({placeholders})
+              AND bt.transaction_date IS NOT NULL AND bt.transaction_date != ''
+            GROUP BY fee_date, bt.bank_id
+            ORDER BY fee_date, b.bank_name
+        """, EXPORT_FEE_TRANSACTION_TYPES)
+        return [dict(row) for row in cursor.fetchall()]
+
+    except sqlite3.Error as e:
+        logger.error(f"خطا در دریافت جمع روزانه کارمزدها: {str(e)}")
+        raise
+    finally:
+        if conn:
+            conn.close()
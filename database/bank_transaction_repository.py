@@ -1,5 +1,7 @@
 import sqlite3
 from config.settings import DB_PATH
+from database.bank_fees_repository import is_bank_fee_transaction
+from database.Helper.pagination import KeysetQuery
 from utils.logger_config import setup_logger
 
 # راه‌اندازی لاگر
@@ -15,8 +17,9 @@ def create_bank_transaction(data):
             INSERT INTO BankTransactions (
                 bank_id, transaction_date, transaction_time, amount, description, 
                 reference_number, extracted_terminal_id, extracted_tracking_number, 
-                transaction_type, source_card_number, depositor_name, is_reconciled
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                transaction_type, source_card_number, depositor_name, is_reconciled,
+                is_bank_fee
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             data.get('bank_id'),
             data.get('transaction_date'),
@@ -29,7 +32,9 @@ def create_bank_transaction(data):
             data.get('transaction_type'),
             data.get('source_card_number', ''),
             data.get('depositor_name'),
-            data.get('is_reconciled', 0)
+            data.get('is_reconciled', 0),
+            # طبقه‌بندی کارمزد یک بار در زمان ورود انجام می‌شود
+            is_bank_fee_transaction(data.get('description'), data.get('amount'))
         ))
         conn.commit()
         logger.info(f"تراکنش جدید با شماره مرجع {data.get('reference_number')} ثبت شد")
@@ -130,6 +135,24 @@ def get_unreconciled_transactions_by_bank(bank_id):
         if conn:
             conn.close()
 
+def get_unreconciled_transactions_query(bank_id, exclude_transaction_type=None):
+    """
+    کوئری صفحه‌بندی شده (keyset) تراکنش‌های تطبیق نشده بانک
+
+    Args:
+        bank_id: شناسه بانک
+        exclude_transaction_type: نوع تراکنشی که نباید در نتایج باشد (مثلاً کارمزد)
+
+    Returns:
+        KeysetQuery: برای شمارش با count و خواندن صفحات با fetch_page یا PagedResultSet
+    """
+    conditions = "bank_id = ? AND is_reconciled = 0"
+    params = [bank_id]
+    if exclude_transaction_type is not None:
+        conditions += " AND IFNULL(transaction_type, '') != ?"
+        params.append(exclude_transaction_type)
+    return KeysetQuery("*", "BankTransactions", conditions, params)
+
 def update_bank_transaction_reconciliation_status(transaction_id, status_or_data):
     """به‌روزرسانی وضعیت تطبیق تراکنش یا به‌روزرسانی کامل تراکنش"""
     conn = None
@@ -265,6 +288,38 @@ def get_unreconciled_by_type(transaction_type):
         if conn:
             conn.close()
 
+def get_unreconciled_ids_by_bank_and_types(bank_id, transaction_types):
+    """
+    دریافت شناسه و نوع تراکنش‌های بانک مغایرت‌نشده یک بانک برای چند نوع تراکنش
+
+    Args:
+        bank_id: شناسه بانک
+        transaction_types: لیست انواع تراکنش
+
+    Returns:
+        list: دیکشنری‌های دارای id و transaction_type (به ترتیب شناسه)
+    """
+    conn = None
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        placeholders = ','.join('?' * len(transaction_types))
+        cursor.execute(f"""
+            SELECT id, transaction_type FROM BankTransactions
+            WHERE bank_id = ? AND is_reconciled = 0 AND transaction_type IN ({placeholders})
+            ORDER BY id
+        """, [bank_id] + list(transaction_types))
+        result = [dict(row) for row in cursor.fetchall()]
+        logger.info(f"تعداد {len(result)} تراکنش مغایرت‌نشده از انواع {', '.join(transaction_types)} برای بانک {bank_id} یافت شد")
+        return result
+    except Exception as e:
+        logger.error(f"خطا در دریافت تراکنش‌های مغایرت‌نشده بانک {bank_id}: {str(e)}")
+        raise
+    finally:
+        if conn:
+            conn.close()
+
 def get_unreconciled_by_amount_and_type(amount, transaction_type):
     """دریافت تراکنش‌های بانک بر اساس مبلغ و نوع"""
     conn = None
@@ -18,6 +18,85 @@ def create_connection():
         logger.error(f"خطا در اتصال به دیتابیس: {str(e)}")
         raise
 
+def ensure_column(cursor, table_name, column_name, column_definition):
+    """افزودن ستون به جدول موجود در صورت عدم وجود (مهاجرت دیتابیس‌های قدیمی)"""
+    cursor.execute(f"PRAGMA table_info({table_name})")
+    existing_columns = [row[1] for row in cursor.fetchall()]
+    if column_name not in existing_columns:
+        cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_definition}")
+        logger.info(f"ستون {column_name} به جدول {table_name} اضافه شد")
+
+# جدول‌های دارای شمارنده در جدول Stats: ستون مبلغ و ستون نوع تراکنش (None یعنی بدون نوع)
+STATS_SOURCES = {
+    'BankTransactions': ('amount', 'transaction_type'),
+    'AccountingTransactions': ('transaction_amount', 'transaction_type'),
+    'PosTransactions': ('transaction_amount', None)
+}
+
+def _stats_delta_sql(table_name, row, sign):
+    """دستورات افزودن (sign='+') یا کسر (sign='-') یک رکورد NEW/OLD از شمارنده‌های Stats"""
+    amount_column, type_column = STATS_SOURCES[table_name]
+    type_value = f"IFNULL({row}.{type_column}, '')" if type_column else "''"
+    amount = f"IFNULL({row}.{amount_column}, 0)"
+    reconciled = f"({row}.is_reconciled = 1)"
+    return f"""
+            INSERT OR IGNORE INTO Stats (table_name, bank_id, transaction_type)
+            VALUES ('{table_name}', {row}.bank_id, {type_value});
+            UPDATE Stats SET
+                total_count = total_count {sign} 1,
+                reconciled_count = reconciled_count {sign} (CASE WHEN {reconciled} THEN 1 ELSE 0 END),
+                total_amount = total_amount {sign} {amount},
+                reconciled_amount = reconciled_amount {sign} (CASE WHEN {reconciled} THEN {amount} ELSE 0 END)
+            WHERE table_name = '{table_name}' AND bank_id = {row}.bank_id AND transaction_type = {type_value};"""
+
+def create_stats_triggers(cursor):
+    """ایجاد تریگرهای به‌روزرسانی جدول Stats با هر درج، ویرایش و حذف رکورد"""
+    for table_name, (amount_column, type_column) in STATS_SOURCES.items():
+        watched_columns = ', '.join(c for c in ('bank_id', 'is_reconciled', amount_column, type_column) if c)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_stats_{table_name}_insert
+            AFTER INSERT ON {table_name}
+            BEGIN{_stats_delta_sql(table_name, 'NEW', '+')}
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_stats_{table_name}_delete
+            AFTER DELETE ON {table_name}
+            BEGIN{_stats_delta_sql(table_name, 'OLD', '-')}
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_stats_{table_name}_update
+            AFTER UPDATE OF {watched_columns} ON {table_name}
+            BEGIN{_stats_delta_sql(table_name, 'OLD', '-')}{_stats_delta_sql(table_name, 'NEW', '+')}
+            END
+        """)
+
+def stats_aggregate_query(table_name):
+    """کوئری محاسبه مستقیم شمارنده‌های Stats یک جدول (برای بازسازی و بررسی)"""
+    amount_column, type_column = STATS_SOURCES[table_name]
+    type_value = f"IFNULL({type_column}, '')" if type_column else "''"
+    return f"""
+        SELECT '{table_name}' AS table_name, bank_id, {type_value} AS transaction_type,
+               COUNT(*) AS total_count,
+               SUM(CASE WHEN is_reconciled = 1 THEN 1 ELSE 0 END) AS reconciled_count,
+               SUM(IFNULL({amount_column}, 0)) AS total_amount,
+               SUM(CASE WHEN is_reconciled = 1 THEN IFNULL({amount_column}, 0) ELSE 0 END) AS reconciled_amount
+        FROM {table_name}
+        GROUP BY bank_id, {type_value}
+    """
+
+def rebuild_stats_table(cursor):
+    """بازسازی کامل جدول Stats از روی جدول‌های تراکنش"""
+    cursor.execute("DELETE FROM Stats")
+    for table_name in STATS_SOURCES:
+        cursor.execute(f"""
+            INSERT INTO Stats (table_name, bank_id, transaction_type, total_count,
+                               reconciled_count, total_amount, reconciled_amount)
+            {stats_aggregate_query(table_name)}
+        """)
+    logger.info("جدول Stats بازسازی شد")
+
 def init_db():
     """راه‌اندازی اولیه دیتابیس و ایجاد جداول"""
     conn = None
@@ -59,9 +138,26 @@ def init_db():
                 source_card_number TEXT,
                 depositor_name TEXT NULL,
                 is_reconciled BOOLEAN DEFAULT 0,
+                is_bank_fee BOOLEAN NULL,
                 FOREIGN KEY (bank_id) REFERENCES Banks(id)
             )
         """)
+        # افزودن ستون پرچم کارمزد به دیتابیس‌های قدیمی (مقدار NULL یعنی هنوز طبقه‌بندی نشده)
+        ensure_column(cursor, 'BankTransactions', 'is_bank_fee', 'BOOLEAN NULL')
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_bank_transactions_fee
+            ON BankTransactions (bank_id, is_bank_fee, is_reconciled)
+        """)
+        # ایندکس صفحه‌بندی keyset رکوردهای تطبیق نشده (شناسه به صورت ضمنی در ایندکس است)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_bank_transactions_unreconciled
+            ON BankTransactions (bank_id, is_reconciled)
+        """)
+        # ایندکس فیلتر بازه تاریخ گزارش‌ها
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_bank_transactions_date
+            ON BankTransactions (bank_id, transaction_date)
+        """)
         # جدول ترمینال‌ها
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS Terminals (
@@ -85,6 +181,11 @@ def init_db():
                 FOREIGN KEY (bank_id) REFERENCES Banks(id)
             )
         """)
+        # ایندکس فیلتر بازه تاریخ گزارش‌ها
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_pos_transactions_date
+            ON PosTransactions (bank_id, transaction_date)
+        """)
         # جدول تراکنش‌های حسابداری
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS AccountingTransactions (
@@ -103,6 +204,11 @@ def init_db():
                 FOREIGN KEY (bank_id) REFERENCES Banks(id)
             )
         """)
+        # ایندکس جستجوی کاندیداهای حسابداری بر اساس بانک، مبلغ و تاریخ
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_accounting_candidates
+            ON AccountingTransactions (bank_id, is_reconciled, transaction_amount, due_date)
+        """)
         # Reconciliation Results table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS ReconciliationResults (
@@ -132,6 +238,76 @@ def init_db():
                 FOREIGN KEY (bank_id) REFERENCES Banks(id)
             )
         """)
+
+        # جدول کارهای مغایرت‌یابی هوشمند (قابل توقف و ادامه)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS SmartReconciliationJobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                bank_id INTEGER NOT NULL,
+                backend TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'running',
+                -- status: running, paused, cancelled, completed, failed
+                total_items INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (bank_id) REFERENCES Banks(id)
+            )
+        """)
+        # وضعیت هر رکورد در کار مغایرت‌یابی هوشمند
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS SmartReconciliationJobItems (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                record_type TEXT NOT NULL,
+                record_id INTEGER NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                -- state: pending, sent, matched, error (و needs_review / no_match برای نتایج بدون تطبیق)
+                matched_id INTEGER NULL,
+                confidence FLOAT NULL,
+                reason TEXT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (job_id) REFERENCES SmartReconciliationJobs(id)
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_smart_job_items_state
+            ON SmartReconciliationJobItems (job_id, state, position)
+        """)
+
+        # جدول کش پاسخ‌های AI (کلید: اثر انگشت درخواست شامل رکورد و کاندیداها)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS AIResponseCache (
+                fingerprint TEXT PRIMARY KEY,
+                record_key TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_ai_response_cache_record
+            ON AIResponseCache (record_key)
+        """)
+
+        # شمارنده‌های آماری به ازای جدول، بانک و نوع تراکنش (به‌روزرسانی توسط تریگرها)
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Stats'")
+        stats_table_exists = cursor.fetchone() is not None
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS Stats (
+                table_name TEXT NOT NULL,
+                bank_id INTEGER NOT NULL,
+                transaction_type TEXT NOT NULL DEFAULT '',
+                total_count INTEGER NOT NULL DEFAULT 0,
+                reconciled_count INTEGER NOT NULL DEFAULT 0,
+                total_amount REAL NOT NULL DEFAULT 0,
+                reconciled_amount REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (table_name, bank_id, transaction_type)
+            )
+        """)
+        create_stats_triggers(cursor)
+        if not stats_table_exists:
+            # مقداردهی اولیه شمارنده‌ها برای دیتابیس‌های موجود
+            rebuild_stats_table(cursor)
         conn.commit()
     except Exception as e:
         logger.error(f"خطا در ایجاد جداول دیتابیس: {str(e)}")
@@ -0,0 +1,89 @@
+from database.init_db import create_connection
+from utils.logger_config import setup_logger
+
+# راه‌اندازی لاگر
+logger = setup_logger('database.reconciliation.reconciliation_batch_repository')
+
+
+def save_reconciliation_batch(fee_splits, results):
+    """
+    ثبت یکجای نتایج یک دور مغایرت‌گیری در یک تراکنش دیتابیس
+
+    ابتدا کارمزدها از رکوردهای بانک جدا می‌شوند (به‌روزرسانی مبلغ اصلی و
+    ایجاد رکورد کارمزد)، سپس نتایج مغایرت‌گیری و وضعیت تطبیق رکوردها ثبت
+    می‌شوند. در صورت بروز خطا هیچ‌یک از تغییرات اعمال نمی‌شود.
+
+    Args:
+        fee_splits: لیست دیکشنری‌ها با کلیدهای bank_record، principal_amount،
+            fee_amount و description
+        results: لیست دیکشنری‌ها با کلیدهای bank_record_id، acc_id، pos_id،
+            description، type_matched و status (1 موفق / 0 ناموفق)
+
+    Returns:
+        list: شناسه رکوردهای کارمزد ایجاد شده
+    """
+    conn = None
+    try:
+        conn = create_connection()
+        cursor = conn.cursor()
+        fee_record_ids = []
+
+        for split in fee_splits:
+            bank_record = split['bank_record']
+            cursor.execute("""
+                UPDATE BankTransactions
+                SET amount = ?
+                WHERE id = ?
+            """, (split['principal_amount'], bank_record['id']))
+
+            cursor.execute("""
+                INSERT INTO BankTransactions (
+                    bank_id, transaction_date, transaction_time, amount, description,
+                    reference_number, extracted_terminal_id, extracted_tracking_number,
+                    transaction_type, source_card_number, depositor_name, is_reconciled
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                bank_record.get('bank_id'),
+                bank_record.get('transaction_date'),
+                bank_record.get('transaction_time'),
+                split['fee_amount'],
+                split['description'],
+                bank_record.get('reference_number'),
+                bank_record.get('extracted_terminal_id'),
+                bank_record.get('extracted_tracking_number'),
+                'bank_fee',
+                bank_record.get('source_card_number', ''),
+                bank_record.get('depositor_name'),
+                0
+            ))
+            fee_record_ids.append(cursor.lastrowid)
+
+        cursor.executemany("""
+            INSERT INTO ReconciliationResults (
+                pos_id, acc_id, bank_record_id, description, type_matched
+            ) VALUES (?, ?, ?, ?, ?)
+        """, [
+            (r.get('pos_id'), r.get('acc_id'), r.get('bank_record_id'), r.get('description'), r.get('type_matched'))
+            for r in results
+        ])
+
+        for table, key in (
+            ('BankTransactions', 'bank_record_id'),
+            ('AccountingTransactions', 'acc_id'),
+            ('PosTransactions', 'pos_id'),
+        ):
+            rows = [(int(bool(r.get('status'))), r[key]) for r in results if r.get(key)]
+            if rows:
+                cursor.executemany(f"UPDATE {table} SET is_reconciled = ? WHERE id = ?", rows)
+
+        conn.commit()
+        logger.info(f"ثبت یکجای مغایرت‌گیری: {len(results)} نتیجه و {len(fee_splits)} کارمزد ثبت شد")
+        return fee_record_ids
+    except Exception as e:
+        logger.error(f"خطا در ثبت یکجای نتایج مغایرت‌گیری: {str(e)}")
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if conn:
+            conn.close()
@@ -1,7 +1,15 @@
 # file: database/reconciliation_results_repository.py
 
 import sqlite3
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime
 from .init_db import create_connection
+from config.settings import DB_PAGE_SIZE
+from database.Helper.pagination import KeysetQuery
+from utils.logger_config import setup_logger
+
+logger = setup_logger('database.reconciliation_results_repository')
 
 def create_reconciliation_result(pos_id, acc_id, bank_record_id, description, type_matched):
     """
@@ -53,6 +61,39 @@ def get_all_reconciliation_results():
             conn.close()
     return []
 
+def get_reconciliation_results_query():
+    """
+    Builds a keyset-paginated query over all reconciliation results, ordered by ID.
+
+    Returns:
+        KeysetQuery: Use count() for the total and fetch_page() / PagedResultSet
+        to read the results page by page.
+    """
+    return KeysetQuery("*", "ReconciliationResults")
+
+def count_reconciliation_results():
+    """
+    Counts all reconciliation results without loading them.
+
+    Returns:
+        int: The number of reconciliation results.
+    """
+    return get_reconciliation_results_query().count()
+
+def get_reconciliation_results_page(after=None, page_size=DB_PAGE_SIZE):
+    """
+    Fetches one page of reconciliation results after the given keyset cursor.
+
+    Args:
+        after (tuple, optional): The cursor returned for the previous page, or None
+            for the first page.
+        page_size (int): The maximum number of results in the page.
+
+    Returns:
+        tuple: (list of result dictionaries, cursor for the next page or None).
+    """
+    return get_reconciliation_results_query().fetch_page(after, page_size)
+
 def get_reconciliation_results_by_bank_id(bank_id):
     """
     Fetches reconciliation results based on the bank ID.
@@ -143,4 +184,138 @@ def get_reconciliation_results():
             return []
         finally:
             conn.close()
-    return []
\ No newline at end of file
+    return []
+
+
+def _day_number(value):
+    """Day ordinal of a 'YYYY-MM-DD...' date string, or None if it cannot be parsed."""
+    try:
+        return datetime.strptime(str(value)[:10], '%Y-%m-%d').toordinal()
+    except (TypeError, ValueError):
+        return None
+
+
+def _nearest_by_date(group, matched, limit):
+    """
+    Up to `limit` rows of a (bank, amount) group nearest to the matched record's due date.
+
+    Args:
+        group (tuple): (sorted day numbers of the dated rows, dated rows followed by undated rows)
+            of one (bank_id, amount) key.
+        matched (dict): The matched accounting record (excluded from the result).
+        limit (int): Maximum number of rows.
+    """
+    days, rows = group
+    target = _day_number(matched['due_date'])
+    if target is None:
+        return [row for row in rows if row['id'] != matched['id']][:limit]
+
+    # Expand outwards from the insertion point, always taking the closer side
+    negatives = []
+    right = bisect_left(days, target)
+    left = right - 1
+    while len(negatives) < limit and (left >= 0 or right < len(days)):
+        if right >= len(days) or (left >= 0 and target - days[left] <= days[right] - target):
+            row = rows[left]
+            left -= 1
+        else:
+            row = rows[right]
+            right += 1
+        if row['id'] != matched['id']:
+            negatives.append(row)
+    # Rows without a parsable date come after every dated row
+    for row in rows[len(days):]:
+        if len(negatives) >= limit:
+            break
+        if row['id'] != matched['id']:
+            negatives.append(row)
+    return negatives
+
+
+def get_reconciliation_training_pairs(negatives_per_match=5):
+    """
+    Fetches matched pairs from past reconciliation results for training the local matcher.
+
+    Each pair joins a reconciliation result with its POS or bank record and the matched
+    accounting record. Hard negatives are other accounting records of the same bank with
+    the same amount, nearest to the matched record's due date. All candidate negatives
+    are loaded with a single query and grouped by (bank_id, amount) in memory.
+
+    Args:
+        negatives_per_match (int): Maximum number of hard negatives per pair.
+
+    Returns:
+        list: Dictionaries with keys record, transaction_type, matched and negatives.
+    """
+    conn = create_connection()
+    if conn:
+        try:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id, pos_id, acc_id, bank_record_id, type_matched
+                FROM ReconciliationResults
+                WHERE acc_id IS NOT NULL AND (pos_id IS NOT NULL OR bank_record_id IS NOT NULL)
+            """)
+            results = [dict(row) for row in cursor.fetchall()]
+
+            def load_by_ids(table, column):
+                cursor.execute(f"""
+                    SELECT * FROM {table}
+                    WHERE id IN (SELECT {column} FROM ReconciliationResults WHERE {column} IS NOT NULL)
+                """)
+                return {row['id']: dict(row) for row in cursor.fetchall()}
+
+            pos_records = load_by_ids('PosTransactions', 'pos_id')
+            bank_records = load_by_ids('BankTransactions', 'bank_record_id')
+            accounting_records = load_by_ids('AccountingTransactions', 'acc_id')
+
+            # Every accounting record sharing (bank_id, amount) with a matched record
+            cursor.execute("""
+                SELECT a.* FROM AccountingTransactions a
+                JOIN (
+                    SELECT DISTINCT m.bank_id, m.transaction_amount
+                    FROM ReconciliationResults r
+                    JOIN AccountingTransactions m ON m.id = r.acc_id
+                ) k ON a.bank_id = k.bank_id AND a.transaction_amount = k.transaction_amount
+            """)
+            grouped = defaultdict(list)
+            for row in cursor.fetchall():
+                row = dict(row)
+                grouped[(row['bank_id'], row['transaction_amount'])].append((_day_number(row['due_date']), row['id'], row))
+            groups = {}
+            for key, entries in grouped.items():
+                # Rows without a parsable date sort last, like an unknown distance
+                entries.sort(key=lambda entry: (entry[0] is None, entry[0] or 0, entry[1]))
+                dated = [entry for entry in entries if entry[0] is not None]
+                groups[key] = (
+                    [entry[0] for entry in dated],
+                    [entry[2] for entry in dated] + [entry[2] for entry in entries[len(dated):]]
+                )
+
+            pairs = []
+            for result in results:
+                matched = accounting_records.get(result['acc_id'])
+                if result['pos_id'] is not None:
+                    record = pos_records.get(result['pos_id'])
+                    transaction_type = 'POS'
+                else:
+                    record = bank_records.get(result['bank_record_id'])
+                    transaction_type = result['type_matched'] or (record or {}).get('transaction_type') or ''
+                if not record or not matched:
+                    continue
+
+                group = groups.get((matched['bank_id'], matched['transaction_amount']), ([], []))
+                pairs.append({
+                    "record": record,
+                    "transaction_type": transaction_type,
+                    "matched": matched,
+                    "negatives": _nearest_by_date(group, matched, negatives_per_match)
+                })
+            return pairs
+        except sqlite3.Error as e:
+            logger.error(f"Error fetching reconciliation training pairs: {e}")
+            return []
+        finally:
+            conn.close()
+    return []
@@ -21,11 +21,13 @@ from .transaction_search import (
     get_transactions_by_date_amount_type,
     get_transactions_by_date_type,
     get_transactions_by_amount_tracking,
+    get_unreconciled_transactions_by_types,
     get_transactions_by_due_date_and_bank,
     get_transactions_by_collection_date_and_bank,
     get_accounting_transactions_for_pos,
     search_transactions_by_customer_name,
-    search_transactions_by_description
+    search_transactions_by_description,
+    search_unreconciled_transactions_by_text
 )
 
 from .transaction_type_mapper import TransactionTypeMapper
@@ -48,11 +50,13 @@ __all__ = [
     'get_transactions_by_date_amount_type', 
     'get_transactions_by_date_type',
     'get_transactions_by_amount_tracking',
+    'get_unreconciled_transactions_by_types',
     'get_transactions_by_due_date_and_bank',
     'get_transactions_by_collection_date_and_bank',
     'get_accounting_transactions_for_pos',
     'search_transactions_by_customer_name',
     'search_transactions_by_description',
+    'search_unreconciled_transactions_by_text',
     
     # Transaction Type Mapper
     'TransactionTypeMapper'
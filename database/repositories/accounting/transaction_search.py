@@ -312,6 +312,48 @@ def get_transactions_by_amount_tracking(bank_id, amount, tracking_number, transa
             conn.close()
 
 
+def get_unreconciled_transactions_by_types(bank_id, transaction_types):
+    """دریافت یکجای تراکنش‌های مغایرت‌گیری نشده یک بانک برای چند نوع تراکنش
+    
+    این تابع برای ساخت ایندکس درون‌حافظه‌ای کاندیداها در ابتدای هر دور
+    مغایرت‌گیری استفاده می‌شود تا برای هر رکورد بانک کوئری جداگانه اجرا نشود.
+    
+    Args:
+        bank_id: شناسه بانک
+        transaction_types: لیست انواع تراکنش (دقیقاً همان مقادیر ذخیره شده در جدول)
+        
+    Returns:
+        لیستی از دیکشنری‌های تراکنش‌های حسابداری
+    """
+    conn = None
+    try:
+        types = [t for t in dict.fromkeys(transaction_types) if t]
+        if not types:
+            return []
+        
+        conn = create_connection()
+        cursor = conn.cursor()
+        
+        placeholders = ', '.join('?' for _ in types)
+        query = f"""
+            SELECT * FROM AccountingTransactions 
+            WHERE bank_id = ? 
+            AND transaction_type IN ({placeholders})
+            AND is_reconciled = 0
+        """
+        cursor.execute(query, [bank_id] + types)
+        columns = [description[0] for description in cursor.description]
+        result = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        logger.info(f"تعداد {len(result)} تراکنش مغایرت‌گیری نشده از انواع {types} برای بانک {bank_id} بارگذاری شد")
+        return result
+    except Exception as e:
+        logger.error(f"خطا در دریافت تراکنش‌های مغایرت‌گیری نشده بر اساس نوع: {str(e)}")
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+
 def get_transactions_by_due_date_and_bank(bank_id, start_date, end_date):
     """دریافت تراکنش‌ها بر اساس تاریخ سررسید"""
     conn = None
@@ -448,3 +490,67 @@ def search_transactions_by_description(bank_id, description, transaction_type=No
     finally:
         if conn:
             conn.close()
+
+
+def search_unreconciled_transactions_by_text(text, bank_id=None, limit=None, cancel_event=None):
+    """
+    جستجوی متنی آزاد در تراکنش‌های حسابداری مغایرت‌گیری نشده
+    
+    متن در شماره تراکنش، توضیحات و نام مشتری جستجو می‌شود و اگر عدد باشد با
+    مبلغ تراکنش نیز مقایسه می‌شود.
+    
+    Args:
+        text: متن جستجو
+        bank_id: شناسه بانک (اختیاری)
+        limit: حداکثر تعداد نتایج (اختیاری)
+        cancel_event: threading.Event که با فعال شدن آن کوئری در حال اجرا قطع می‌شود
+    """
+    conn = None
+    try:
+        conn = create_connection()
+        if cancel_event is not None:
+            # بازگشت مقدار غیر صفر از progress handler اجرای کوئری را متوقف می‌کند
+            conn.set_progress_handler(lambda: 1 if cancel_event.is_set() else 0, 1000)
+        cursor = conn.cursor()
+        
+        # نویسه‌های % و _ متن کاربر به صورت متن ساده جستجو می‌شوند
+        escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        pattern = f"%{escaped}%"
+        text_conditions = [
+            "transaction_number LIKE ? ESCAPE '\\'",
+            "description LIKE ? ESCAPE '\\'",
+            "customer_name LIKE ? ESCAPE '\\'"
+        ]
+        params = [pattern, pattern, pattern]
+        
+        amount_text = text.replace(',', '')
+        try:
+            amount = float(amount_text)
+            text_conditions.append("transaction_amount = ?")
+            params.append(amount)
+        except ValueError:
+            pass
+        
+        query = f"SELECT * FROM AccountingTransactions WHERE is_reconciled = 0 AND ({' OR '.join(text_conditions)})"
+        if bank_id is not None:
+            query += " AND bank_id = ?"
+            params.append(bank_id)
+        query += " ORDER BY due_date DESC, id DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        
+        cursor.execute(query, params)
+        columns = [description[0] for description in cursor.description]
+        result = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        logger.info(f"جستجوی آزاد '{text}': تعداد {len(result)} تراکنش یافت شد")
+        return result
+    except Exception as e:
+        if cancel_event is not None and cancel_event.is_set():
+            logger.info(f"جستجوی آزاد '{text}' لغو شد")
+            return []
+        logger.error(f"خطا در جستجوی آزاد تراکنش‌ها: {str(e)}")
+        raise
+    finally:
+        if conn:
+            conn.close()
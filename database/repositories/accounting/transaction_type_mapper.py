@@ -54,18 +54,17 @@ class TransactionTypeMapper:
         return transaction_type, new_type
     
     @classmethod
-    def create_type_condition_sql(cls, transaction_type, param_placeholder="?"):
+    def get_possible_types(cls, transaction_type):
         """
-        ایجاد شرط SQL برای جستجوی بر اساس نوع تراکنش
+        دریافت تمام حالات ممکن ذخیره یک نوع تراکنش در جدول حسابداری
         
         پشتیبانی از هر دو فرمت space و underscore
         
         Args:
             transaction_type: نوع تراکنش
-            param_placeholder: placeholder برای پارامتر SQL (معمولاً "?")
             
         Returns:
-            tuple: (شرط SQL, لیست پارامترها)
+            list: لیست انواع معادل (بدون تکرار)
         """
         # دریافت نوع جدید اگر وجود دارد
         original_type, new_type = cls.get_both_types(transaction_type)
@@ -91,7 +90,23 @@ class TransactionTypeMapper:
                 possible_types.append(type_with_underscore)
         
         # حذف تکراری‌ها و خالی‌ها
-        possible_types = list(set([t for t in possible_types if t]))
+        return list(set([t for t in possible_types if t]))
+    
+    @classmethod
+    def create_type_condition_sql(cls, transaction_type, param_placeholder="?"):
+        """
+        ایجاد شرط SQL برای جستجوی بر اساس نوع تراکنش
+        
+        پشتیبانی از هر دو فرمت space و underscore
+        
+        Args:
+            transaction_type: نوع تراکنش
+            param_placeholder: placeholder برای پارامتر SQL (معمولاً "?")
+            
+        Returns:
+            tuple: (شرط SQL, لیست پارامترها)
+        """
+        possible_types = cls.get_possible_types(transaction_type)
         
         if len(possible_types) == 1:
             sql_condition = f"transaction_type = {param_placeholder}"
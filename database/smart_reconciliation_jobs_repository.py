@@ -0,0 +1,244 @@
+from database.init_db import create_connection
+from utils.logger_config import setup_logger
+
+# راه‌اندازی لاگر
+logger = setup_logger('database.smart_reconciliation_jobs_repository')
+
+# وضعیت‌های کار که قابل ادامه هستند (running یعنی برنامه در حین اجرا بسته شده است)
+RESUMABLE_JOB_STATUSES = ('running', 'paused', 'failed')
+
+# وضعیت‌های رکوردی که هنوز نتیجه نهایی ندارند
+UNFINISHED_ITEM_STATES = ('pending', 'sent')
+
+def create_smart_job(bank_id, backend, items):
+    """
+    ایجاد کار مغایرت‌یابی هوشمند با رکوردهای آن
+
+    Args:
+        bank_id: شناسه بانک
+        backend: موتور تطبیق (webhook یا local)
+        items: لیست (نوع رکورد، شناسه رکورد) به ترتیب پردازش
+
+    Returns:
+        شناسه کار ایجاد شده
+    """
+    conn = None
+    try:
+        conn = create_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO SmartReconciliationJobs (bank_id, backend, status, total_items)
+            VALUES (?, ?, 'running', ?)
+        """, (bank_id, backend, len(items)))
+        job_id = cursor.lastrowid
+        cursor.executemany("""
+            INSERT INTO SmartReconciliationJobItems (job_id, position, record_type, record_id)
+            VALUES (?, ?, ?, ?)
+        """, [(job_id, position, record_type, record_id) for position, (record_type, record_id) in enumerate(items)])
+        conn.commit()
+        logger.info(f"کار مغایرت‌یابی هوشمند {job_id} با {len(items)} رکورد ایجاد شد")
+        return job_id
+    except Exception as e:
+        logger.error(f"خطا در ایجاد کار مغایرت‌یابی هوشمند: {str(e)}")
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+def get_smart_job(job_id):
+    """دریافت اطلاعات یک کار مغایرت‌یابی هوشمند"""
+    conn = None
+    try:
+        conn = create_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM SmartReconciliationJobs WHERE id = ?", (job_id,))
+        row = cursor.fetchone()
+        return dict(row) if row else None
+    except Exception as e:
+        logger.error(f"خطا در دریافت کار مغایرت‌یابی هوشمند {job_id}: {str(e)}")
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+def get_resumable_smart_jobs(bank_id=None):
+    """
+    دریافت کارهای ناتمام قابل ادامه (جدیدترین ابتدا)
+
+    Args:
+        bank_id: شناسه بانک (اختیاری)
+    """
+    conn = None
+    try:
+        conn = create_connection()
+        cursor = conn.cursor()
+        placeholders = ','.join('?' * len(RESUMABLE_JOB_STATUSES))
+        query = f"SELECT * FROM SmartReconciliationJobs WHERE status IN ({placeholders})"
+        params = list(RESUMABLE_JOB_STATUSES)
+        if bank_id is not None:
+            query += " AND bank_id = ?"
+            params.append(bank_id)
+        query += " ORDER BY id DESC"
+        cursor.execute(query, params)
+        return [dict(row) for row in cursor.fetchall()]
+    except Exception as e:
+        logger.error(f"خطا در دریافت کارهای ناتمام مغایرت‌یابی هوشمند: {str(e)}")
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+def update_smart_job_status(job_id, status):
+    """به‌روزرسانی وضعیت کار"""
+    conn = None
+    try:
+        conn = create_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE SmartReconciliationJobs
+            SET status = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (status, job_id))
+        conn.commit()
+        logger.info(f"وضعیت کار مغایرت‌یابی هوشمند {job_id}: {status}")
+    except Exception as e:
+        logger.error(f"خطا در به‌روزرسانی وضعیت کار {job_id}: {str(e)}")
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+def get_unfinished_smart_job_items(job_id):
+    """
+    دریافت رکوردهای بدون نتیجه نهایی یک کار به ترتیب پردازش
+
+    رکوردهای در وضعیت sent (ارسال شده ولی بدون نتیجه ثبت شده، مثلاً به علت
+    بسته شدن برنامه) به pending برگردانده می‌شوند.
+    """
+    conn = None
+    try:
+        conn = create_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE SmartReconciliationJobItems
+            SET state = 'pending', updated_at = CURRENT_TIMESTAMP
+            WHERE job_id = ? AND state = 'sent'
+        """, (job_id,))
+        cursor.execute("""
+            SELECT * FROM SmartReconciliationJobItems
+            WHERE job_id = ? AND state = 'pending'
+            ORDER BY position
+        """, (job_id,))
+        items = [dict(row) for row in cursor.fetchall()]
+        conn.commit()
+        return items
+    except Exception as e:
+        logger.error(f"خطا در دریافت رکوردهای ناتمام کار {job_id}: {str(e)}")
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+def get_smart_job_item_results(job_id):
+    """دریافت رکوردهای دارای نتیجه نهایی یک کار به ترتیب پردازش"""
+    conn = None
+    try:
+        conn = create_connection()
+        cursor = conn.cursor()
+        placeholders = ','.join('?' * len(UNFINISHED_ITEM_STATES))
+        cursor.execute(f"""
+            SELECT * FROM SmartReconciliationJobItems
+            WHERE job_id = ? AND state NOT IN ({placeholders})
+            ORDER BY position
+        """, [job_id] + list(UNFINISHED_ITEM_STATES))
+        return [dict(row) for row in cursor.fetchall()]
+    except Exception as e:
+        logger.error(f"خطا در دریافت نتایج کار {job_id}: {str(e)}")
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+def mark_smart_job_items_sent(item_ids):
+    """علامت‌گذاری رکوردها به عنوان ارسال شده"""
+    if not item_ids:
+        return
+    conn = None
+    try:
+        conn = create_connection()
+        cursor = conn.cursor()
+        cursor.executemany("""
+            UPDATE SmartReconciliationJobItems
+            SET state = 'sent', updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND state = 'pending'
+        """, [(item_id,) for item_id in item_ids])
+        conn.commit()
+    except Exception as e:
+        logger.error(f"خطا در علامت‌گذاری رکوردهای ارسال شده: {str(e)}")
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+def save_smart_job_item_result(item_id, state, matched_id=None, confidence=None, reason=None):
+    """ثبت نتیجه نهایی یک رکورد کار"""
+    conn = None
+    try:
+        conn = create_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE SmartReconciliationJobItems
+            SET state = ?, matched_id = ?, confidence = ?, reason = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (state, matched_id, confidence, reason, item_id))
+        conn.commit()
+    except Exception as e:
+        logger.error(f"خطا در ثبت نتیجه رکورد {item_id}: {str(e)}")
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+def get_smart_job_source_records(items):
+    """
+    دریافت رکوردهای POS و بانک متناظر با رکوردهای کار
+
+    Returns:
+        dict: (نوع رکورد، شناسه) -> دیکشنری رکورد؛ نوع 'POS' از جدول PosTransactions
+        و سایر انواع از جدول BankTransactions خوانده می‌شوند
+    """
+    conn = None
+    try:
+        conn = create_connection()
+        cursor = conn.cursor()
+        records = {}
+        pos_ids = [item['record_id'] for item in items if item['record_type'] == 'POS']
+        bank_items = [item for item in items if item['record_type'] != 'POS']
+        for table, ids, types in (
+            ('PosTransactions', pos_ids, ['POS']),
+            ('BankTransactions', [item['record_id'] for item in bank_items], sorted({item['record_type'] for item in bank_items})),
+        ):
+            # خواندن در دسته‌های کوچک‌تر از محدودیت تعداد پارامترهای SQLite
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                cursor.execute(f"SELECT * FROM {table} WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+                for row in cursor.fetchall():
+                    for record_type in types:
+                        records[(record_type, row['id'])] = dict(row)
+        return records
+    except Exception as e:
+        logger.error(f"خطا در دریافت رکوردهای کار مغایرت‌یابی هوشمند: {str(e)}")
+        raise
+    finally:
+        if conn:
+            conn.close()
@@ -0,0 +1,153 @@
+import argparse
+from database.init_db import create_connection, rebuild_stats_table, stats_aggregate_query, STATS_SOURCES
+from utils.logger_config import setup_logger
+
+# راه‌اندازی لاگر
+logger = setup_logger('database.stats_repository')
+
+def get_stats_by_bank(table_name):
+    """
+    دریافت شمارنده‌های یک جدول به ازای هر بانک از جدول Stats
+
+    Args:
+        table_name: نام جدول (BankTransactions، AccountingTransactions یا PosTransactions)
+
+    Returns:
+        list: دیکشنری‌های bank_id، bank_name، total_records، reconciled_records،
+        total_amount و reconciled_amount برای تمام بانک‌ها
+    """
+    if table_name not in STATS_SOURCES:
+        raise ValueError(f"جدول {table_name} شمارنده آماری ندارد")
+    conn = None
+    try:
+        conn = create_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT b.id AS bank_id, b.bank_name,
+                   IFNULL(SUM(s.total_count), 0) AS total_records,
+                   IFNULL(SUM(s.reconciled_count), 0) AS reconciled_records,
+                   IFNULL(SUM(s.total_amount), 0) AS total_amount,
+                   IFNULL(SUM(s.reconciled_amount), 0) AS reconciled_amount
+            FROM Banks b
+            LEFT JOIN Stats s ON s.bank_id = b.id AND s.table_name = ?
+            GROUP BY b.id, b.bank_name
+            ORDER BY b.id
+        """, (table_name,))
+        return [dict(row) for row in cursor.fetchall()]
+    except Exception as e:
+        logger.error(f"خطا در دریافت آمار جدول {table_name}: {str(e)}")
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+def get_bank_stats_summary(bank_id):
+    """
+    دریافت شمارنده‌های تمام جدول‌ها برای یک بانک
+
+    Returns:
+        dict: نام جدول -> دیکشنری total_records، reconciled_records، total_amount و reconciled_amount
+    """
+    conn = None
+    try:
+        conn = create_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT table_name,
+                   SUM(total_count) AS total_records,
+                   SUM(reconciled_count) AS reconciled_records,
+                   SUM(total_amount) AS total_amount,
+                   SUM(reconciled_amount) AS reconciled_amount
+            FROM Stats
+            WHERE bank_id = ?
+            GROUP BY table_name
+        """, (bank_id,))
+        summary = {
+            table_name: {'total_records': 0, 'reconciled_records': 0, 'total_amount': 0, 'reconciled_amount': 0}
+            for table_name in STATS_SOURCES
+        }
+        for row in cursor.fetchall():
+            summary[row['table_name']] = {key: row[key] for key in summary[row['table_name']]}
+        return summary
+    except Exception as e:
+        logger.error(f"خطا در دریافت آمار بانک {bank_id}: {str(e)}")
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+def rebuild_stats():
+    """بازسازی کامل جدول Stats از روی جدول‌های تراکنش"""
+    conn = None
+    try:
+        conn = create_connection()
+        cursor = conn.cursor()
+        rebuild_stats_table(cursor)
+        conn.commit()
+    except Exception as e:
+        logger.error(f"خطا در بازسازی جدول Stats: {str(e)}")
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+def verify_stats():
+    """
+    مقایسه جدول Stats با شمارش مستقیم جدول‌های تراکنش
+
+    Returns:
+        list: مغایرت‌ها به صورت (جدول، بانک، نوع تراکنش، مقدار ذخیره شده، مقدار محاسبه شده)؛
+        لیست خالی یعنی شمارنده‌ها صحیح هستند
+    """
+    conn = None
+    try:
+        conn = create_connection()
+        cursor = conn.cursor()
+        columns = ('total_count', 'reconciled_count', 'total_amount', 'reconciled_amount')
+        empty = (0, 0, 0, 0)
+
+        cursor.execute("SELECT * FROM Stats")
+        stored = {
+            (row['table_name'], row['bank_id'], row['transaction_type']): tuple(row[c] for c in columns)
+            for row in cursor.fetchall()
+        }
+        expected = {}
+        for table_name in STATS_SOURCES:
+            cursor.execute(stats_aggregate_query(table_name))
+            for row in cursor.fetchall():
+                expected[(row['table_name'], row['bank_id'], row['transaction_type'])] = tuple(row[c] for c in columns)
+
+        mismatches = []
+        for key in sorted(set(stored) | set(expected), key=str):
+            stored_values = stored.get(key, empty)
+            expected_values = expected.get(key, empty)
+            # مبالغ اعشاری با تلورانس مقایسه می‌شوند
+            if any(abs((a or 0) - (b or 0)) > 0.01 for a, b in zip(stored_values, expected_values)):
+                mismatches.append(key + (stored_values, expected_values))
+        if mismatches:
+            logger.warning(f"تعداد {len(mismatches)} مغایرت در جدول Stats یافت شد")
+        else:
+            logger.info("جدول Stats با جدول‌های تراکنش مطابقت دارد")
+        return mismatches
+    except Exception as e:
+        logger.error(f"خطا در بررسی جدول Stats: {str(e)}")
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+if __name__ == '__main__':
+    # python -m database.stats_repository --verify [--rebuild]
+    parser = argparse.ArgumentParser(description="بررسی و بازسازی شمارنده‌های جدول Stats")
+    parser.add_argument('--verify', action='store_true', help="مقایسه شمارنده‌ها با شمارش مستقیم")
+    parser.add_argument('--rebuild', action='store_true', help="بازسازی کامل شمارنده‌ها")
+    args = parser.parse_args()
+
+    if args.verify or not args.rebuild:
+        for table_name, bank_id, transaction_type, stored_values, expected_values in verify_stats():
+            print(f"{table_name} bank={bank_id} type={transaction_type!r}: stored={stored_values} expected={expected_values}")
+    if args.rebuild:
+        rebuild_stats()
+        print("Stats rebuilt")
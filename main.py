@@ -10,14 +10,7 @@ from config.settings import (
     BUTTON_FONT_SIZE, RTL, ENCODING
 )
 from database.init_db import init_db
-from ui.bank_tab import BankTab
-from ui.data_entry_tab import DataEntryTab
-from ui.reconciliation_tab import ReconciliationTab
-from ui.manual_reconciliation_tab import ManualReconciliationTab
-from ui.dashboard_tab import DashboardTab
-from ui.report_tab import ReportTab
-from ui.bank_fees_tab import BankFeesTab
-from ui.smart_reconciliation_tab import SmartReconciliationTab
+from ui.components.common.lazy_tab import LazyTab, bind_lazy_tabs
 from utils.logger_config import setup_logger
 
 # تنظیم کدگذاری کنسول برای نمایش درست متون فارسی
@@ -90,91 +83,27 @@ def main():
         notebook = ttk.Notebook(app)
         notebook.pack(fill="both", expand=True)
         
-        # تنظیم تب داشبورد به عنوان تب پیش‌فرض
+        # ماژول هر تب و ویجت‌های آن در اولین انتخاب تب import و ساخته می‌شوند
+        bind_lazy_tabs(notebook)
+        dashboard_tab = LazyTab(notebook, 'ui.dashboard_tab', 'DashboardTab', "داشبورد", logger)
+        data_entry_tab = LazyTab(notebook, 'ui.data_entry_tab', 'DataEntryTab', "ورود اطلاعات", logger)
+        # لیست بانک‌های تب ورود اطلاعات فقط در صورت ساخته شدن آن به‌روز می‌شود
+        LazyTab(
+            notebook, 'ui.bank_tab', 'BankTab', "مدیریت بانک‌ها", logger,
+            on_bank_change_callback=lambda: data_entry_tab.call_if_built('load_banks_to_combobox')
+        )
+        LazyTab(notebook, 'ui.reconciliation_tab', 'ReconciliationTab', "مغایرت‌گیری", logger)
+        LazyTab(notebook, 'ui.manual_reconciliation_tab', 'ManualReconciliationTab', "مغایرت‌یابی دستی", logger)
+        LazyTab(notebook, 'ui.smart_reconciliation_tab', 'SmartReconciliationTab', "مغایرت‌یابی هوشمند", logger)
+        LazyTab(notebook, 'ui.report_tab', 'ReportTab', "گزارش‌گیری", logger)
+        LazyTab(notebook, 'ui.bank_fees_tab', 'BankFeesTab', "جمع آوری کارمزد", logger)
+
+        # تنظیم تب داشبورد به عنوان تب پیش‌فرض و ساخت آن پس از نمایش پنجره
         def select_dashboard_tab():
             notebook.select(0)  # انتخاب اولین تب (داشبورد) به عنوان تب پیش‌فرض
+            dashboard_tab.build()
         app.after(100, select_dashboard_tab)  # اجرای تابع پس از بارگذاری کامل رابط کاربری
 
-        try:
-            # افزودن تب داشبورد (اولین تب)
-            logger.info("در حال بارگذاری تب داشبورد...")
-            dashboard_tab = DashboardTab(notebook)
-            notebook.add(dashboard_tab, text="داشبورد")
-            logger.info("تب داشبورد با موفقیت بارگذاری شد")
-        except Exception as e:
-            logger.error(f"خطا در بارگذاری تب داشبورد: {str(e)}")
-            raise
-
-        try:
-            # افزودن تب ورود اطلاعات
-            logger.info("در حال بارگذاری تب ورود اطلاعات...")
-            data_entry_tab = DataEntryTab(notebook)
-            notebook.add(data_entry_tab, text="ورود اطلاعات")
-            logger.info("تب ورود اطلاعات با موفقیت بارگذاری شد")
-        except Exception as e:
-            logger.error(f"خطا در بارگذاری تب ورود اطلاعات: {str(e)}")
-            raise
-
-        try:
-            # افزودن تب مدیریت بانک‌ها
-            logger.info("در حال بارگذاری تب مدیریت بانک‌ها...")
-            bank_tab = BankTab(notebook, on_bank_change_callback=data_entry_tab.load_banks_to_combobox)
-            notebook.add(bank_tab, text="مدیریت بانک‌ها")
-            logger.info("تب مدیریت بانک‌ها با موفقیت بارگذاری شد")
-        except Exception as e:
-            logger.error(f"خطا در بارگذاری تب مدیریت بانک‌ها: {str(e)}")
-            raise
-            
-        try:
-            # افزودن تب مغایرت‌گیری
-            logger.info("در حال بارگذاری تب مغایرت‌گیری...")
-            reconciliation_tab = ReconciliationTab(notebook)
-            notebook.add(reconciliation_tab, text="مغایرت‌گیری")
-            logger.info("تب مغایرت‌گیری با موفقیت بارگذاری شد")
-        except Exception as e:
-            logger.error(f"خطا در بارگذاری تب مغایرت‌گیری: {str(e)}")
-            raise
-            
-        try:
-            # افزودن تب مغایرت‌یابی دستی
-            logger.info("در حال بارگذاری تب مغایرت‌یابی دستی...")
-            manual_reconciliation_tab = ManualReconciliationTab(notebook)
-            notebook.add(manual_reconciliation_tab, text="مغایرت‌یابی دستی")
-            logger.info("تب مغایرت‌یابی دستی با موفقیت بارگذاری شد")
-        except Exception as e:
-            logger.error(f"خطا در بارگذاری تب مغایرت‌یابی دستی: {str(e)}")
-            raise
-            
-        try:
-            # افزودن تب مغایرت‌یابی هوشمند
-            logger.info("در حال بارگذاری تب مغایرت‌یابی هوشمند...")
-            smart_reconciliation_tab = SmartReconciliationTab(notebook)
-            notebook.add(smart_reconciliation_tab, text="مغایرت‌یابی هوشمند")
-            logger.info("تب مغایرت‌یابی هوشمند با موفقیت بارگذاری شد")
-        except Exception as e:
-            logger.error(f"خطا در بارگذاری تب مغایرت‌یابی هوشمند: {str(e)}")
-            raise
-            
-        try:
-            # افزودن تب گزارش‌گیری
-            logger.info("در حال بارگذاری تب گزارش‌گیری...")
-            report_tab = ReportTab(notebook)
-            notebook.add(report_tab, text="گزارش‌گیری")
-            logger.info("تب گزارش‌گیری با موفقیت بارگذاری شد")
-        except Exception as e:
-            logger.error(f"خطا در بارگذاری تب گزارش‌گیری: {str(e)}")
-            raise
-            
-        try:
-            # افزودن تب جمع‌آوری کارمزد
-            logger.info("در حال بارگذاری تب جمع‌آوری کارمزد...")
-            bank_fees_tab = BankFeesTab(notebook)
-            notebook.add(bank_fees_tab, text="جمع آوری کارمزد")
-            logger.info("تب جمع‌آوری کارمزد با موفقیت بارگذاری شد")
-        except Exception as e:
-            logger.error(f"خطا در بارگذاری تب جمع‌آوری کارمزد: {str(e)}")
-            raise
-
         logger.info("رابط کاربری با موفقیت راه‌اندازی شد")
         
         # شروع حلقه اصلی برنامه
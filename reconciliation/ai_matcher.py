@@ -1,59 +1,227 @@
-import requests
+import hashlib
 import json
 import time
-from typing import Dict, List, Optional, Tuple
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
+from config.settings import (
+    AI_MAX_CONCURRENCY, AI_REQUESTS_PER_SECOND, AI_RATE_LIMIT_BURST, AI_BATCH_SIZE, AI_CACHE_TTL_HOURS,
+    AI_CANDIDATE_WINDOW_DAYS, AI_CANDIDATE_TOP_K, AI_MATCHER_BACKEND,
+    AI_CIRCUIT_FAILURE_THRESHOLD, AI_CIRCUIT_RESET_SECONDS, AI_BACKOFF_BASE_SECONDS, AI_BACKOFF_MAX_SECONDS
+)
 from utils.logger_config import setup_logger
+from utils.rate_limiter import TokenBucket
+from utils.circuit_breaker import CircuitBreaker, backoff_delay
+from utils.latency_histogram import LatencyHistogram
+from utils.compare_tracking_numbers import compare_tracking_numbers
+from reconciliation.candidate_index import date_to_ordinal, normalize_amount, shift_date
 from utils.ai_request_formatter import (
     format_pos_request,
     format_bank_transfer_request,
-    format_check_request
+    format_check_request,
+    format_batch_request
 )
-from database.accounting_repository import get_accounting_by_amount_and_types, update_reconciliation_status as update_accounting_status
+from database.accounting_repository import get_accounting_candidates_in_window, update_reconciliation_status as update_accounting_status
 from database.pos_transactions_repository import update_reconciliation_status as update_pos_status
 from database.bank_transaction_repository import update_bank_transaction_reconciliation_status
 from database.reconciliation_results_repository import create_reconciliation_result
+from database.ai_response_cache_repository import (
+    get_cached_ai_response,
+    save_ai_response,
+    delete_expired_ai_responses
+)
 
 logger = setup_logger('reconciliation.ai_matcher')
 
+# انواع حسابداری قابل تطبیق برای هر نوع تراکنش
+AI_ACCOUNTING_TYPES = {
+    'POS': ['Pos', 'Pos / Received Transfer'],
+    'Received_Transfer': ['Received_Transfer', 'Pos / Received Transfer'],
+    'Paid_Transfer': ['Paid_Transfer', 'Pos / Paid Transfer'],
+    'Received_Check': ['Received_Check'],
+    'Paid_Check': ['Paid_Check'],
+}
+
+# حداقل اطمینان برای ذخیره خودکار نتیجه AI
+AUTO_MATCH_CONFIDENCE = 0.8
+
+# خطاهای ارسال send_to_ai که با تلاش دوباره پس از رفع قطعی سرویس برطرف می‌شوند
+TRANSIENT_AI_ERRORS = ('Circuit open', 'Timeout', 'Request failed', 'Maximum retries exceeded', 'Missing from batch response')
+
+
+def is_transient_ai_error(ai_response: Dict) -> bool:
+    """آیا خطای پاسخ AI موقت است (قطعی، timeout، HTTP 429 یا 5xx)؟"""
+    error = str(ai_response.get('error') or '')
+    if error in TRANSIENT_AI_ERRORS:
+        return True
+    if error.startswith('HTTP '):
+        try:
+            status_code = int(error[5:])
+        except ValueError:
+            return False
+        return status_code == 429 or status_code >= 500
+    return False
+
+def get_candidate_date_field(transaction_type: str) -> str:
+    """فیلد تاریخ حسابداری قابل مقایسه: تاریخ وصول برای چک‌ها و سررسید برای سایر انواع"""
+    return 'collection_date' if 'Check' in transaction_type else 'due_date'
+
+def get_record_tracking_number(record: Dict, transaction_type: str) -> str:
+    """شماره پیگیری رکورد POS یا بانک"""
+    if transaction_type == 'POS':
+        return str(record.get('tracking_number') or '')
+    return str(record.get('extracted_tracking_number') or '')
+
+def rank_candidates(record: Dict, transaction_type: str, candidates: List[Dict], top_k: int = None) -> List[Dict]:
+    """
+    مرتب‌سازی کاندیداها بر اساس احتمال تطبیق و برش به top_k مورد
+
+    اولویت: تطبیق شماره پیگیری، وجود چهار رقم آخر کارت در توضیحات و سپس
+    کمترین فاصله تاریخ.
+    """
+    record_tracking = get_record_tracking_number(record, transaction_type)
+    card_number = str(record.get('card_number') or record.get('source_card_number') or '')
+    card_suffix = card_number[-4:] if len(card_number) >= 4 else ''
+    record_ordinal = date_to_ordinal(record.get('transaction_date'))
+    date_field = get_candidate_date_field(transaction_type)
+
+    def rank_key(candidate):
+        transaction_number = str(candidate.get('transaction_number') or '')
+        tracking_match = bool(record_tracking and transaction_number and compare_tracking_numbers(record_tracking, transaction_number))
+        card_match = bool(card_suffix and card_suffix in str(candidate.get('description') or ''))
+        candidate_ordinal = date_to_ordinal(candidate.get(date_field))
+        if record_ordinal is None or candidate_ordinal is None:
+            date_distance = float('inf')
+        else:
+            date_distance = abs(candidate_ordinal - record_ordinal)
+        return (not tracking_match, not card_match, date_distance, candidate.get('id') or 0)
+
+    ranked = sorted(candidates, key=rank_key)
+    return ranked[:top_k] if top_k else ranked
+
+def get_request_fingerprint(ai_request: Dict) -> str:
+    """
+    اثر انگشت پایدار یک درخواست AI
+
+    شامل نوع تراکنش، فیلدهای رکورد و شناسه و مبلغ کاندیداها (مرتب بر اساس
+    شناسه) است؛ بنابراین با تغییر مجموعه کاندیداها اثر انگشت نیز تغییر می‌کند.
+    """
+    candidates = sorted(
+        (str(candidate.get('id')), candidate.get('transaction_amount'))
+        for candidate in ai_request.get('accounting_candidates', [])
+    )
+    fingerprint_source = {
+        "transaction_type": ai_request.get('transaction_type'),
+        "record": ai_request.get('pos_record') or ai_request.get('bank_record'),
+        "candidates": candidates
+    }
+    serialized = json.dumps(fingerprint_source, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
 class AIMatcher:
-    def __init__(self, n8n_webhook_url: str = None):
+    def __init__(self, n8n_webhook_url: str = None, max_concurrency: int = None, requests_per_second: float = None, batch_size: int = None, backend: str = None):
         self.n8n_webhook_url = n8n_webhook_url or "http://localhost:5678/webhook/reconcile"
         self.timeout = 30
         self.retry_count = 3
-        self.rate_limit_delay = 0.5
+        self.max_concurrency = max(1, int(max_concurrency or AI_MAX_CONCURRENCY))
+        self.batch_size = max(1, int(batch_size or AI_BATCH_SIZE))
+        # آمار آخرین اجرای process_concurrently
+        self.last_run_stats = {"resolved_locally": 0, "cached": 0, "sent_to_ai": 0}
+        self.cache_ttl_seconds = max(0, float(AI_CACHE_TTL_HOURS or 0)) * 3600
+        self.candidate_window_days = max(0, int(AI_CANDIDATE_WINDOW_DAYS or 0))
+        self.candidate_top_k = max(0, int(AI_CANDIDATE_TOP_K or 0))
+        self.rate_limiter = TokenBucket(
+            requests_per_second if requests_per_second is not None else AI_REQUESTS_PER_SECOND,
+            AI_RATE_LIMIT_BURST
+        )
+        self.circuit_breaker = CircuitBreaker(AI_CIRCUIT_FAILURE_THRESHOLD, AI_CIRCUIT_RESET_SECONDS)
+        self.backoff_base = AI_BACKOFF_BASE_SECONDS
+        self.backoff_max = AI_BACKOFF_MAX_SECONDS
+        self.latency_histogram = LatencyHistogram()
+        # نشست HTTP با اتصال‌های keep-alive که بین تمام درخواست‌ها و نخ‌ها مشترک است
+        # (requests فقط هنگام ساخت matcher بارگذاری می‌شود، نه هنگام import ماژول)
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'Content-Type': 'application/json'})
+        # موتور تطبیق: 'webhook' (n8n) یا 'local' (مدل محلی آموزش دیده)
+        self.backend = 'webhook'
+        self.local_matcher = None
+        self.set_backend(backend or AI_MATCHER_BACKEND)
+
+    def set_backend(self, backend: str):
+        """
+        تنظیم موتور تطبیق
+
+        مدل محلی در اولین استفاده بارگذاری (یا در نبود فایل مدل، آموزش) می‌شود؛
+        این کار ممکن است طولانی باشد، بنابراین رابط کاربری local_matcher را پیش
+        از فراخوانی این متد در نخ پس‌زمینه می‌سازد.
+        """
+        if backend not in ('webhook', 'local'):
+            raise ValueError(f"موتور تطبیق نامعتبر: {backend}")
+        if backend == 'local' and self.local_matcher is None:
+            from reconciliation.local_matcher import LocalMatcher
+            self.local_matcher = LocalMatcher()
+        self.backend = backend
+        logger.info(f"موتور تطبیق تنظیم شد: {backend}")
 
     def send_to_ai(self, data: Dict) -> Dict:
-        """ارسال داده به n8n workflow و دریافت نتیجه"""
+        """
+        ارسال داده به n8n workflow و دریافت نتیجه
+
+        در صورت باز بودن مدار بلافاصله خطا برگردانده می‌شود؛ تلاش‌های مجدد با
+        تأخیر نمایی و jitter انجام و تأخیر هر فراخوانی در هیستوگرام ثبت می‌شود.
+        """
+        import requests
+        last_error = {
+            "error": "Maximum retries exceeded",
+            "matched": False,
+            "confidence": 0
+        }
         for attempt in range(self.retry_count):
+            if not self.circuit_breaker.allow_request():
+                logger.warning("مدار AI باز است؛ درخواست بدون ارسال رد شد")
+                return {
+                    "error": "Circuit open",
+                    "detail": "سرویس AI در دسترس نیست؛ ارسال درخواست موقتاً متوقف شده است",
+                    "matched": False,
+                    "confidence": 0
+                }
+
+            self.rate_limiter.acquire()
+            started_at = time.monotonic()
             try:
-                response = requests.post(
+                response = self.session.post(
                     self.n8n_webhook_url,
                     json=data,
-                    headers={'Content-Type': 'application/json'},
                     timeout=self.timeout
                 )
+                self.latency_histogram.record(time.monotonic() - started_at)
 
                 if response.status_code == 200:
-                    logger.info(f"پاسخ موفق از AI برای تراکنش {data.get('pos_record', data.get('bank_record', {})).get('id')}")
-                    return response.json()
-                else:
-                    logger.warning(f"پاسخ ناموفق از AI: HTTP {response.status_code}")
-                    if attempt < self.retry_count - 1:
-                        time.sleep(self.timeout / self.retry_count)
-                        continue
-                    return {
-                        "error": f"HTTP {response.status_code}",
-                        "detail": response.text,
-                        "matched": False,
-                        "confidence": 0
-                    }
+                    result = response.json()
+                    self.circuit_breaker.record_success()
+                    if data.get('batch'):
+                        logger.info(f"پاسخ موفق از AI برای دسته {len(data.get('records', []))} رکوردی")
+                    else:
+                        logger.info(f"پاسخ موفق از AI برای تراکنش {data.get('pos_record', data.get('bank_record', {})).get('id')}")
+                    return result
+
+                logger.warning(f"پاسخ ناموفق از AI: HTTP {response.status_code}")
+                last_error = {
+                    "error": f"HTTP {response.status_code}",
+                    "detail": response.text,
+                    "matched": False,
+                    "confidence": 0
+                }
 
             except requests.exceptions.Timeout:
+                self.latency_histogram.record(time.monotonic() - started_at)
                 logger.warning(f"Timeout در تلاش {attempt + 1}/{self.retry_count}")
-                if attempt < self.retry_count - 1:
-                    time.sleep(self.timeout / self.retry_count)
-                    continue
-                return {
+                last_error = {
                     "error": "Timeout",
                     "detail": "AI طول‌کشید و پاسخ نداد",
                     "matched": False,
@@ -61,192 +229,436 @@ class AIMatcher:
                 }
 
             except Exception as e:
+                self.latency_histogram.record(time.monotonic() - started_at)
                 logger.error(f"خطا در ارتباط با AI: {str(e)}")
-                if attempt < self.retry_count - 1:
-                    time.sleep(1)
-                    continue
-                return {
+                last_error = {
                     "error": "Request failed",
                     "detail": str(e),
                     "matched": False,
                     "confidence": 0
                 }
 
-        return {
-            "error": "Maximum retries exceeded",
-            "matched": False,
-            "confidence": 0
-        }
+            self.circuit_breaker.record_failure()
+            if attempt < self.retry_count - 1 and not self.circuit_breaker.is_open():
+                time.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_max))
 
-    def process_pos_transaction(self, pos_record: Dict) -> Tuple[bool, Dict]:
-        """پردازش تراکنش POS"""
-        try:
-            amount = pos_record.get('transaction_amount')
-            accounting_candidates = get_accounting_by_amount_and_types(
-                amount,
-                ['Pos', 'Pos / Received Transfer']
-            )
+        return last_error
 
-            if not accounting_candidates:
-                logger.info(f"هیچ گزینه تطبیق برای POS {pos_record.get('id')} یافت نشد")
-                return False, {
-                    "type": "POS",
-                    "source_id": pos_record.get('id'),
-                    "matched_id": None,
-                    "confidence": 0,
-                    "status": "no_match",
-                    "reason": "هیچ تراکنش حسابداری هم‌مبلغ یافت نشد"
-                }
+    def send_batch_to_ai(self, record_requests: List[Dict]) -> List[Dict]:
+        """
+        ارسال چند درخواست در یک فراخوانی webhook و تفکیک پاسخ‌ها
 
-            ai_request = format_pos_request(pos_record, accounting_candidates)
-            ai_response = self.send_to_ai(ai_request)
+        خطای یک رکورد فقط همان رکورد را ناموفق می‌کند. اگر webhook از قالب
+        دسته‌ای پشتیبانی نکند (پاسخ بدون لیست results)، ارسال دسته‌ای غیرفعال
+        شده و درخواست‌ها به صورت تکی ارسال می‌شوند.
 
-            time.sleep(self.rate_limit_delay)
+        Args:
+            record_requests: لیست درخواست‌های تکی
 
-            if ai_response.get('error'):
-                logger.error(f"خطا در پاسخ AI: {ai_response.get('error')}")
-                return False, {
-                    "type": "POS",
-                    "source_id": pos_record.get('id'),
-                    "matched_id": None,
-                    "confidence": 0,
-                    "status": "error",
-                    "reason": f"خطا از AI: {ai_response.get('detail', 'نامشخص')}"
+        Returns:
+            List[Dict]: پاسخ هر درخواست به همان ترتیب ورودی
+        """
+        if len(record_requests) == 1:
+            return [self.send_to_ai(record_requests[0])]
+
+        batch_request = format_batch_request(record_requests)
+        batch_response = self.send_to_ai(batch_request)
+
+        if batch_response.get('error'):
+            # خطای انتقال کل دسته برای تک‌تک رکوردها گزارش می‌شود
+            return [dict(batch_response) for _ in record_requests]
+
+        results = batch_response.get('results')
+        if not isinstance(results, list):
+            logger.warning("webhook از درخواست دسته‌ای پشتیبانی نمی‌کند؛ ارسال به صورت تکی ادامه می‌یابد")
+            self.batch_size = 1
+            return [self.send_to_ai(record_request) for record_request in record_requests]
+
+        responses_by_id = {
+            str(item.get('request_id')): item
+            for item in results
+            if isinstance(item, dict)
+        }
+        responses = []
+        for record_data in batch_request['records']:
+            response = responses_by_id.get(record_data['request_id'])
+            if response is None:
+                response = {
+                    "error": "Missing from batch response",
+                    "detail": "پاسخی برای این رکورد در نتیجه دسته‌ای وجود ندارد",
+                    "matched": False,
+                    "confidence": 0
                 }
+            responses.append(response)
+        return responses
 
-            if ai_response.get('matched') and ai_response.get('confidence', 0) >= 0.8:
-                matched_id = ai_response.get('matched_accounting_id')
-                update_pos_status(pos_record.get('id'), True)
-                update_accounting_status(matched_id, True)
-                create_reconciliation_result(
-                    pos_id=pos_record.get('id'),
-                    acc_id=matched_id,
-                    bank_record_id=None,
-                    description=ai_response.get('reason', ''),
-                    type_matched='POS'
-                )
-                logger.info(f"POS {pos_record.get('id')} با دقت {ai_response.get('confidence')} ذخیره شد")
-                return True, {
-                    "type": "POS",
-                    "source_id": pos_record.get('id'),
-                    "matched_id": matched_id,
-                    "confidence": ai_response.get('confidence'),
-                    "status": "auto_matched",
-                    "reason": ai_response.get('reason', '')
+    def find_local_match(self, record: Dict, transaction_type: str, candidates: List[Dict]) -> Tuple[Optional[Dict], str]:
+        """
+        تطبیق قطعی بدون AI
+
+        اگر شماره پیگیری فقط با یک کاندیدا تطبیق داشته باشد یا تنها کاندیدای
+        هم‌مبلغ در همان تاریخ باشد، همان کاندیدا انتخاب می‌شود؛ در غیر این صورت
+        رکورد مبهم است و باید به AI ارسال شود.
+
+        Returns:
+            Tuple[Optional[Dict], str]: کاندیدای انتخاب شده (یا None) و دلیل
+        """
+        record_tracking = get_record_tracking_number(record, transaction_type)
+        if record_tracking:
+            tracking_matches = [
+                candidate for candidate in candidates
+                if candidate.get('transaction_number')
+                and compare_tracking_numbers(record_tracking, str(candidate.get('transaction_number')))
+            ]
+            if len(tracking_matches) == 1:
+                return tracking_matches[0], "تطبیق قطعی: مبلغ و شماره پیگیری یکسان"
+
+        date_field = get_candidate_date_field(transaction_type)
+        record_date = str(record.get('transaction_date') or '')[:10]
+        if len(candidates) == 1 and record_date and str(candidates[0].get(date_field) or '')[:10] == record_date:
+            return candidates[0], "تطبیق قطعی: تنها کاندیدای هم‌مبلغ و هم‌تاریخ"
+
+        return None, ""
+
+    def get_candidates(self, record: Dict, transaction_type: str) -> List[Dict]:
+        """
+        دریافت کاندیداهای حسابداری هم‌مبلغ همان بانک در بازه ±candidate_window_days روز
+
+        کاندیداها به صورت محلی رتبه‌بندی و به candidate_top_k مورد محدود می‌شوند.
+        """
+        if transaction_type == 'POS':
+            amount = normalize_amount(record.get('transaction_amount'))
+        else:
+            amount = normalize_amount(record.get('amount'))
+        record_date = record.get('transaction_date')
+        candidates = get_accounting_candidates_in_window(
+            record.get('bank_id'),
+            amount,
+            AI_ACCOUNTING_TYPES.get(transaction_type, []),
+            shift_date(record_date, -self.candidate_window_days),
+            shift_date(record_date, self.candidate_window_days),
+            get_candidate_date_field(transaction_type)
+        )
+        return rank_candidates(record, transaction_type, candidates, self.candidate_top_k)
+
+    def prepare_evaluation(self, record: Dict, transaction_type: str) -> Dict:
+        """
+        یافتن کاندیداها و ساخت درخواست AI برای یک تراکنش
+
+        Returns:
+            Dict: شامل record، transaction_type، candidates، request، response و error
+        """
+        evaluation = {
+            "record": record,
+            "transaction_type": transaction_type,
+            "candidates": [],
+            "request": None,
+            "response": None,
+            "resolved_locally": False,
+            "error": None
+        }
+        try:
+            evaluation["candidates"] = self.get_candidates(record, transaction_type)
+
+            if not evaluation["candidates"]:
+                return evaluation
+
+            # پیش‌پردازش قطعی: رکوردهای بدون ابهام بدون فراخوانی webhook تطبیق داده می‌شوند
+            local_match, reason = self.find_local_match(record, transaction_type, evaluation["candidates"])
+            if local_match is not None:
+                evaluation["resolved_locally"] = True
+                evaluation["response"] = {
+                    "matched": True,
+                    "confidence": 1.0,
+                    "matched_accounting_id": local_match.get('id'),
+                    "reason": reason
                 }
+                return evaluation
+
+            if transaction_type == 'POS':
+                evaluation["request"] = format_pos_request(record, evaluation["candidates"])
+            elif 'Check' in transaction_type:
+                evaluation["request"] = format_check_request(record, evaluation["candidates"], transaction_type)
             else:
-                logger.info(f"POS {pos_record.get('id')} نیاز به بررسی دستی دارد")
-                return False, {
-                    "type": "POS",
-                    "source_id": pos_record.get('id'),
-                    "matched_id": None,
-                    "confidence": ai_response.get('confidence', 0),
-                    "status": "needs_review",
-                    "reason": ai_response.get('reason', ''),
-                    "suggestions": ai_response.get('suggestions', [])
-                }
+                evaluation["request"] = format_bank_transfer_request(record, evaluation["candidates"], transaction_type)
+        except Exception as e:
+            logger.error(f"خطا در پردازش {transaction_type} {record.get('id')}: {str(e)}")
+            evaluation["error"] = str(e)
+        return evaluation
 
+    def get_cached_response(self, evaluation: Dict) -> Optional[Dict]:
+        """دریافت پاسخ ذخیره شده برای درخواست یک ارزیابی (در صورت فعال بودن کش)"""
+        if not self.cache_ttl_seconds:
+            return None
+        try:
+            evaluation["fingerprint"] = get_request_fingerprint(evaluation["request"])
+            return get_cached_ai_response(evaluation["fingerprint"], self.cache_ttl_seconds)
         except Exception as e:
-            logger.error(f"خطا در پردازش POS {pos_record.get('id')}: {str(e)}")
-            return False, {
-                "type": "POS",
-                "source_id": pos_record.get('id'),
-                "matched_id": None,
-                "confidence": 0,
-                "status": "error",
-                "reason": str(e)
-            }
+            logger.warning(f"خطا در خواندن کش AI: {str(e)}")
+            return None
 
-    def process_bank_transaction(self, bank_record: Dict, transaction_type: str) -> Tuple[bool, Dict]:
-        """پردازش تراکنش بانکی"""
+    def cache_response(self, evaluation: Dict):
+        """ذخیره پاسخ موفق AI برای استفاده در اجراهای بعدی"""
+        response = evaluation.get("response")
+        if not self.cache_ttl_seconds or not evaluation.get("fingerprint") or not response or response.get('error'):
+            return
         try:
-            amount = bank_record.get('amount')
-
-            if transaction_type == 'Received_Transfer':
-                accounting_types = ['Received_Transfer', 'Pos / Received Transfer']
-            elif transaction_type == 'Paid_Transfer':
-                accounting_types = ['Paid_Transfer', 'Pos / Paid Transfer']
-            elif transaction_type == 'Received_Check':
-                accounting_types = ['Received_Check']
-            elif transaction_type == 'Paid_Check':
-                accounting_types = ['Paid_Check']
-            else:
-                accounting_types = []
-
-            accounting_candidates = get_accounting_by_amount_and_types(amount, accounting_types)
-
-            if not accounting_candidates:
-                logger.info(f"هیچ گزینه تطبیق برای {transaction_type} {bank_record.get('id')} یافت نشد")
-                return False, {
-                    "type": transaction_type,
-                    "source_id": bank_record.get('id'),
-                    "matched_id": None,
-                    "confidence": 0,
-                    "status": "no_match",
-                    "reason": "هیچ تراکنش حسابداری هم‌مبلغ یافت نشد"
-                }
+            record_key = f"{evaluation['transaction_type']}:{evaluation['record'].get('id')}"
+            save_ai_response(evaluation["fingerprint"], record_key, response)
+        except Exception as e:
+            logger.warning(f"خطا در ذخیره کش AI: {str(e)}")
+
+    def evaluate_batch(self, tasks: List[Tuple[Dict, str]]) -> List[Dict]:
+        """
+        ارزیابی گروهی از تراکنش‌ها با یک درخواست دسته‌ای (یا مدل محلی)، بدون تغییر دیتابیس
+
+        این مرحله می‌تواند به صورت هم‌زمان در چند نخ اجرا شود؛ اعمال نتیجه
+        در دیتابیس با apply_evaluation و به ترتیب انجام می‌شود.
+
+        Args:
+            tasks: لیست (رکورد، نوع تراکنش)
 
-            if 'Check' in transaction_type:
-                ai_request = format_check_request(bank_record, accounting_candidates, transaction_type)
+        Returns:
+            List[Dict]: ارزیابی هر تراکنش به همان ترتیب ورودی
+        """
+        evaluations = [self.prepare_evaluation(record, transaction_type) for record, transaction_type in tasks]
+        if self.backend == 'local':
+            for evaluation in evaluations:
+                if evaluation["request"] is not None:
+                    evaluation["response"] = self.local_matcher.evaluate(
+                        evaluation["record"], evaluation["transaction_type"], evaluation["candidates"]
+                    )
+            return evaluations
+
+        to_send = []
+        for evaluation in evaluations:
+            if evaluation["request"] is None:
+                continue
+            cached_response = self.get_cached_response(evaluation)
+            if cached_response is not None:
+                evaluation["response"] = cached_response
+                evaluation["cached"] = True
             else:
-                ai_request = format_bank_transfer_request(bank_record, accounting_candidates, transaction_type)
+                to_send.append(evaluation)
+        if to_send:
+            try:
+                responses = self.send_batch_to_ai([evaluation["request"] for evaluation in to_send])
+                for evaluation, response in zip(to_send, responses):
+                    evaluation["response"] = response
+                    self.cache_response(evaluation)
+            except Exception as e:
+                logger.error(f"خطا در ارسال دسته‌ای به AI: {str(e)}")
+                for evaluation in to_send:
+                    evaluation["error"] = str(e)
+        return evaluations
+
+    def evaluate_transaction(self, record: Dict, transaction_type: str) -> Dict:
+        """یافتن کاندیداها و دریافت پاسخ AI برای یک تراکنش بدون تغییر دیتابیس"""
+        return self.evaluate_batch([(record, transaction_type)])[0]
+
+    def apply_evaluation(self, evaluation: Dict, claimed_ids: Optional[set] = None) -> Tuple[bool, Dict]:
+        """
+        اعمال نتیجه ارزیابی AI در دیتابیس
+
+        Args:
+            evaluation: خروجی evaluate_transaction
+            claimed_ids: شناسه‌های حسابداری تطبیق داده شده در همین اجرا (اختیاری)؛
+                تطبیق تکراری با یک سند حسابداری به بررسی دستی ارجاع می‌شود
+
+        Returns:
+            Tuple[bool, Dict]: وضعیت ذخیره و خلاصه نتیجه
+        """
+        record = evaluation["record"]
+        transaction_type = evaluation["transaction_type"]
+        source_id = record.get('id')
+        result = {
+            "type": transaction_type,
+            "source_id": source_id,
+            "matched_id": None,
+            "confidence": 0
+        }
+
+        try:
+            if evaluation.get("error"):
+                # خطای ارسال دسته؛ تلاش دوباره ممکن است موفق شود
+                result.update(status="error", reason=evaluation["error"], transient=True)
+                return False, result
 
-            ai_response = self.send_to_ai(ai_request)
-            time.sleep(self.rate_limit_delay)
+            if not evaluation["candidates"]:
+                logger.info(f"هیچ گزینه تطبیق برای {transaction_type} {source_id} یافت نشد")
+                result.update(status="no_match", reason="هیچ تراکنش حسابداری هم‌مبلغ یافت نشد")
+                return False, result
 
+            ai_response = evaluation["response"] or {}
             if ai_response.get('error'):
                 logger.error(f"خطا در پاسخ AI: {ai_response.get('error')}")
-                return False, {
-                    "type": transaction_type,
-                    "source_id": bank_record.get('id'),
-                    "matched_id": None,
-                    "confidence": 0,
-                    "status": "error",
-                    "reason": f"خطا از AI: {ai_response.get('detail', 'نامشخص')}"
-                }
+                result.update(
+                    status="error",
+                    reason=f"خطا از AI: {ai_response.get('detail', 'نامشخص')}",
+                    transient=is_transient_ai_error(ai_response)
+                )
+                return False, result
 
-            if ai_response.get('matched') and ai_response.get('confidence', 0) >= 0.8:
-                matched_id = ai_response.get('matched_accounting_id')
-                update_bank_transaction_reconciliation_status(bank_record.get('id'), True)
+            matched_id = ai_response.get('matched_accounting_id')
+            confidence = ai_response.get('confidence', 0)
+            already_claimed = claimed_ids is not None and matched_id in claimed_ids
+
+            if ai_response.get('matched') and confidence >= AUTO_MATCH_CONFIDENCE and not already_claimed:
+                if transaction_type == 'POS':
+                    update_pos_status(source_id, True)
+                else:
+                    update_bank_transaction_reconciliation_status(source_id, True)
                 update_accounting_status(matched_id, True)
                 create_reconciliation_result(
-                    pos_id=None,
+                    pos_id=source_id if transaction_type == 'POS' else None,
                     acc_id=matched_id,
-                    bank_record_id=bank_record.get('id'),
+                    bank_record_id=None if transaction_type == 'POS' else source_id,
                     description=ai_response.get('reason', ''),
                     type_matched=transaction_type
                 )
-                logger.info(f"{transaction_type} {bank_record.get('id')} با دقت {ai_response.get('confidence')} ذخیره شد")
-                return True, {
-                    "type": transaction_type,
-                    "source_id": bank_record.get('id'),
-                    "matched_id": matched_id,
-                    "confidence": ai_response.get('confidence'),
-                    "status": "auto_matched",
-                    "reason": ai_response.get('reason', '')
-                }
+                if claimed_ids is not None:
+                    claimed_ids.add(matched_id)
+                logger.info(f"{transaction_type} {source_id} با دقت {confidence} ذخیره شد")
+                result.update(
+                    matched_id=matched_id,
+                    confidence=confidence,
+                    status="auto_matched",
+                    reason=ai_response.get('reason', ''),
+                    resolved_locally=evaluation.get("resolved_locally", False)
+                )
+                return True, result
+
+            if already_claimed:
+                logger.warning(f"سند حسابداری {matched_id} پیش‌تر در همین اجرا تطبیق داده شده است؛ {transaction_type} {source_id} نیاز به بررسی دستی دارد")
             else:
-                logger.info(f"{transaction_type} {bank_record.get('id')} نیاز به بررسی دستی دارد")
-                return False, {
-                    "type": transaction_type,
-                    "source_id": bank_record.get('id'),
-                    "matched_id": None,
-                    "confidence": ai_response.get('confidence', 0),
-                    "status": "needs_review",
-                    "reason": ai_response.get('reason', ''),
-                    "suggestions": ai_response.get('suggestions', [])
-                }
+                logger.info(f"{transaction_type} {source_id} نیاز به بررسی دستی دارد")
+            result.update(
+                confidence=confidence,
+                status="needs_review",
+                reason=ai_response.get('reason', ''),
+                suggestions=ai_response.get('suggestions', [])
+            )
+            return False, result
 
         except Exception as e:
-            logger.error(f"خطا در پردازش {transaction_type} {bank_record.get('id')}: {str(e)}")
-            return False, {
-                "type": transaction_type,
-                "source_id": bank_record.get('id'),
-                "matched_id": None,
-                "confidence": 0,
-                "status": "error",
-                "reason": str(e)
-            }
+            logger.error(f"خطا در ثبت نتیجه {transaction_type} {source_id}: {str(e)}")
+            result.update(status="error", reason=str(e))
+            return False, result
+
+    def process_pos_transaction(self, pos_record: Dict) -> Tuple[bool, Dict]:
+        """پردازش تراکنش POS"""
+        return self.apply_evaluation(self.evaluate_transaction(pos_record, 'POS'))
+
+    def process_bank_transaction(self, bank_record: Dict, transaction_type: str) -> Tuple[bool, Dict]:
+        """پردازش تراکنش بانکی"""
+        return self.apply_evaluation(self.evaluate_transaction(bank_record, transaction_type))
+
+    def process_concurrently(
+        self,
+        tasks: List[Tuple[Dict, str]],
+        on_result: Optional[Callable[[int, bool, Dict], None]] = None,
+        should_continue: Optional[Callable[[], bool]] = None,
+        on_submit: Optional[Callable[[int, int], None]] = None
+    ) -> List[Dict]:
+        """
+        پردازش هم‌زمان تراکنش‌ها با اعمال ترتیبی نتایج
+
+        تراکنش‌ها در دسته‌های batch_size تایی ارسال می‌شوند و درخواست‌های AI
+        با حداکثر max_concurrency نخ و نرخ محدود شده انجام می‌شوند، اما نتایج
+        دقیقاً به ترتیب لیست ورودی در دیتابیس ثبت می‌شوند.
+
+        Args:
+            tasks: لیست (رکورد، نوع تراکنش)؛ نوع 'POS' برای رکوردهای POS
+            on_result: تابع فراخوانی پس از ثبت هر نتیجه با (اندیس، موفقیت، نتیجه)
+            should_continue: تابعی که با بازگرداندن False پردازش را متوقف می‌کند؛
+                بین رکوردهای یک دسته نیز بررسی می‌شود و نتایج باقی‌مانده اعمال نمی‌شوند
+            on_submit: تابع فراخوانی پیش از ارسال هر دسته با (اندیس شروع، تعداد)
+
+        Returns:
+            List[Dict]: نتایج به ترتیب ورودی
+        """
+        if self.cache_ttl_seconds:
+            try:
+                delete_expired_ai_responses(self.cache_ttl_seconds)
+            except Exception as e:
+                logger.warning(f"خطا در پاک‌سازی کش AI: {str(e)}")
+
+        self.latency_histogram.reset()
+        results = []
+        claimed_ids = set()
+        stats = {"resolved_locally": 0, "cached": 0, "sent_to_ai": 0}
+        self.last_run_stats = stats
+        pending = deque()
+        next_index = 0
+        # حداکثر تعداد دسته‌های در جریان (برای محدود ماندن حافظه و امکان توقف سریع)
+        max_in_flight = self.max_concurrency * 2
+
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='ai-matcher')
+        try:
+            def submit_next():
+                nonlocal next_index
+                if next_index < len(tasks):
+                    chunk = tasks[next_index:next_index + self.batch_size]
+                    if on_submit is not None:
+                        on_submit(next_index, len(chunk))
+                    pending.append((next_index, executor.submit(self.evaluate_batch, chunk)))
+                    next_index += len(chunk)
+
+            for _ in range(max_in_flight):
+                submit_next()
+
+            def keep_running():
+                return should_continue is None or should_continue()
+
+            stopped = False
+            while pending and not stopped:
+                start_index, future = pending[0]
+                # انتظار قابل قطع برای دسته جاری تا توقف در میانه دسته هم ممکن باشد
+                while not future.done() and keep_running():
+                    wait([future], timeout=0.2)
+                if not future.done():
+                    stopped = True
+                    break
+                pending.popleft()
+                evaluations = future.result()
+                for offset, evaluation in enumerate(evaluations):
+                    if not keep_running():
+                        stopped = True
+                        break
+                    if evaluation.get("resolved_locally"):
+                        stats["resolved_locally"] += 1
+                    elif evaluation.get("cached"):
+                        stats["cached"] += 1
+                    elif evaluation.get("request") is not None:
+                        stats["sent_to_ai"] += 1
+                    success, result = self.apply_evaluation(evaluation, claimed_ids)
+                    results.append(result)
+                    if on_result is not None:
+                        on_result(start_index + offset, success, result)
+                if not stopped:
+                    submit_next()
+
+            if stopped:
+                logger.info("پردازش هم‌زمان AI متوقف شد")
+        finally:
+            # در صورت توقف، منتظر پایان درخواست‌های در جریان نمی‌مانیم؛ نتایج آن‌ها اعمال نمی‌شود
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        logger.info(
+            f"پیش‌پردازش قطعی: {stats['resolved_locally']} رکورد بدون فراخوانی AI تطبیق داده شد، "
+            f"{stats['cached']} رکورد از کش پاسخ داده شد، {stats['sent_to_ai']} رکورد به AI ارسال شد"
+        )
+        latency = self.latency_histogram.summary()
+        if latency["count"]:
+            logger.info(
+                f"تأخیر فراخوانی‌های AI: {latency['count']} فراخوانی، میانگین {latency['mean']:.3f}s، "
+                f"p50≤{latency['p50']}s، p95≤{latency['p95']}s، p99≤{latency['p99']}s، بیشینه {latency['max']:.3f}s"
+            )
+        return results
+
+    def close(self):
+        """بستن نشست HTTP"""
+        self.session.close()
 
     def set_webhook_url(self, url: str):
         """تنظیم URL webhook n8n"""
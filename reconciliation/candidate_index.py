@@ -0,0 +1,167 @@
+"""
+ایندکس درون‌حافظه‌ای کاندیداهای حسابداری برای مغایرت‌گیری
+رکوردهای حسابداری یک بار در ابتدای هر دور بارگذاری شده و بر اساس
+(بانک، نوع تراکنش، مبلغ مطلق) گروه‌بندی می‌شوند. هر گروه بر اساس تاریخ
+مرتب است و جستجوی بازه ±N روز با bisect انجام می‌شود.
+
+تفاوت با جستجوی قبلی هر رکورد (get_transactions_by_date_amount_type):
+- مبالغ به صورت مطلق مقایسه می‌شوند؛ مبلغ منفی بانک با مبلغ مثبت حسابداری
+  همان نوع تطبیق می‌یابد (قبلاً مقایسه با علامت بود).
+- فقط رکوردهای مغایرت‌گیری نشده بارگذاری می‌شوند و رکوردهای تطبیق یافته در
+  همان دور حذف می‌شوند؛ بنابراین یک سند حسابداری دو بار تطبیق داده نمی‌شود
+  (قبلاً فیلتر is_reconciled وجود نداشت).
+"""
+import bisect
+from datetime import date, timedelta
+
+from config.settings import RECONCILIATION_DATE_TOLERANCE_DAYS
+from database.repositories.accounting import (
+    TransactionTypeMapper,
+    get_unreconciled_transactions_by_types
+)
+from utils.logger_config import setup_logger
+
+# راه‌اندازی لاگر
+logger = setup_logger('reconciliation.candidate_index')
+
+
+def get_date_tolerance(transaction_type):
+    """دریافت بازه تاریخ مجاز (به روز) برای یک نوع تراکنش از تنظیمات"""
+    return int(RECONCILIATION_DATE_TOLERANCE_DAYS.get(transaction_type, 0) or 0)
+
+
+def normalize_amount(amount):
+    """کلید مبلغ: مقدار مطلق گرد شده (مبالغ پرداختی در بانک منفی هستند)"""
+    try:
+        return round(abs(float(amount)), 2)
+    except (TypeError, ValueError):
+        return None
+
+
+def date_to_ordinal(date_str):
+    """تبدیل تاریخ YYYY-MM-DD به عدد ترتیبی روز؛ در صورت خطا None"""
+    if not date_str:
+        return None
+    try:
+        return date.fromisoformat(str(date_str)[:10]).toordinal()
+    except ValueError:
+        return None
+
+
+def shift_date(date_str, days):
+    """جابجایی یک تاریخ YYYY-MM-DD به اندازه تعداد روز مشخص"""
+    ordinal = date_to_ordinal(date_str)
+    if ordinal is None:
+        return None
+    return (date.fromordinal(ordinal) + timedelta(days=days)).isoformat()
+
+
+def resolve_type_group(transaction_types):
+    """
+    تبدیل نوع تراکنش به لیست انواع معادل
+
+    رشته از طریق TransactionTypeMapper گسترش داده می‌شود؛ لیست یا تاپل
+    بدون تغییر (و بدون مقادیر خالی) برگردانده می‌شود.
+    """
+    if isinstance(transaction_types, str):
+        return TransactionTypeMapper.get_possible_types(transaction_types)
+    return [t for t in dict.fromkeys(transaction_types) if t]
+
+
+class DateWindowIndex:
+    """ایندکس کاندیداهای حسابداری بر اساس (بانک، نوع، مبلغ) و تاریخ مرتب شده"""
+
+    def __init__(self, records, date_field='due_date'):
+        """
+        Args:
+            records: لیست دیکشنری‌های تراکنش حسابداری
+            date_field: فیلد تاریخ مورد استفاده (due_date یا collection_date)
+        """
+        self.date_field = date_field
+        self._buckets = {}
+        self._consumed = set()
+        self._size = 0
+
+        grouped = {}
+        for record in records:
+            ordinal = date_to_ordinal(record.get(date_field))
+            amount_key = normalize_amount(record.get('transaction_amount'))
+            if ordinal is None or amount_key is None:
+                continue
+            key = (record.get('bank_id'), record.get('transaction_type'), amount_key)
+            grouped.setdefault(key, []).append((ordinal, record.get('id'), record))
+
+        for key, items in grouped.items():
+            items.sort(key=lambda item: (item[0], item[1]))
+            self._buckets[key] = ([item[0] for item in items], [item[2] for item in items])
+            self._size += len(items)
+
+        logger.info(f"ایندکس کاندیداها با {self._size} رکورد در {len(self._buckets)} گروه ساخته شد (فیلد تاریخ: {date_field})")
+
+    @classmethod
+    def load(cls, bank_id, transaction_types, date_field='due_date'):
+        """بارگذاری رکوردهای مغایرت‌گیری نشده بانک از دیتابیس و ساخت ایندکس"""
+        types = []
+        for transaction_type in transaction_types:
+            types.extend(resolve_type_group(transaction_type) if isinstance(transaction_type, str) else transaction_type)
+        records = get_unreconciled_transactions_by_types(bank_id, types)
+        return cls(records, date_field=date_field)
+
+    def __len__(self):
+        return self._size - len(self._consumed)
+
+    def window(self, bank_id, transaction_types, amount, center_date, tolerance_days=0):
+        """
+        دریافت تمام کاندیداها در بازه ±tolerance_days روز از تاریخ مرکز
+
+        Returns:
+            list: رکوردها مرتب شده بر اساس فاصله تاریخ و سپس شناسه
+        """
+        center = date_to_ordinal(center_date)
+        amount_key = normalize_amount(amount)
+        if center is None or amount_key is None:
+            return []
+
+        tolerance_days = max(0, int(tolerance_days or 0))
+        found = []
+        for transaction_type in resolve_type_group(transaction_types):
+            bucket = self._buckets.get((bank_id, transaction_type, amount_key))
+            if not bucket:
+                continue
+            ordinals, records = bucket
+            start = bisect.bisect_left(ordinals, center - tolerance_days)
+            end = bisect.bisect_right(ordinals, center + tolerance_days)
+            for position in range(start, end):
+                record = records[position]
+                if record.get('id') not in self._consumed:
+                    found.append((abs(ordinals[position] - center), record.get('id'), record))
+
+        found.sort(key=lambda item: (item[0], item[1]))
+        return [item[2] for item in found]
+
+    def nearest(self, bank_id, transaction_types, amount, center_date, tolerance_days=0):
+        """
+        دریافت کاندیداهای نزدیک‌ترین تاریخ در بازه مجاز
+
+        ابتدا همان تاریخ بررسی می‌شود و فقط در صورت نبود کاندیدا بازه
+        روز به روز بزرگ‌تر می‌شود؛ بنابراین با بازه صفر رفتار دقیقاً مشابه
+        جستجوی تاریخ مساوی است.
+        """
+        center = date_to_ordinal(center_date)
+        candidates = self.window(bank_id, transaction_types, amount, center_date, tolerance_days)
+        if not candidates:
+            return []
+        best_distance = abs(date_to_ordinal(candidates[0].get(self.date_field)) - center)
+        return [
+            record for record in candidates
+            if abs(date_to_ordinal(record.get(self.date_field)) - center) == best_distance
+        ]
+
+    def discard(self, record_id):
+        """حذف یک رکورد از کاندیداها پس از مغایرت‌گیری"""
+        if record_id is not None:
+            self._consumed.add(record_id)
+
+    def is_discarded(self, record_id):
+        """آیا رکورد در همین دور تطبیق داده شده است (حتی اگر هنوز در دیتابیس ثبت نشده باشد)"""
+        return record_id in self._consumed
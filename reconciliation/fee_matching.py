@@ -0,0 +1,62 @@
+"""
+تطبیق خودکار با احتساب کارمزد انتقال
+برای انتقال‌هایی که مبلغ بانک شامل کارمزد است، مبلغ بانک منهای هر یک از
+تعرفه‌های تنظیم شده (پایا، ساتنا و ...) در ایندکس کاندیداها جستجو می‌شود.
+"""
+from config.settings import TRANSFER_FEE_TIERS
+from utils.logger_config import setup_logger
+
+# راه‌اندازی لاگر
+logger = setup_logger('reconciliation.fee_matching')
+
+
+def get_fee_tiers():
+    """لیست تعرفه‌های کارمزد به صورت (نام، مبلغ) مرتب شده از کمترین مبلغ"""
+    tiers = []
+    for tier_name, amounts in TRANSFER_FEE_TIERS.items():
+        for fee_amount in amounts:
+            if fee_amount and float(fee_amount) > 0:
+                tiers.append((tier_name, float(fee_amount)))
+    tiers.sort(key=lambda tier: tier[1])
+    return tiers
+
+
+def find_fee_adjusted_candidates(candidate_index, bank_id, transaction_types, bank_amount, center_date,
+                                 tolerance_days=0):
+    """
+    جستجوی کاندیداهای حسابداری با مبلغ بانک منهای تعرفه‌های کارمزد
+
+    تعرفه‌ها به ترتیب از کمترین مبلغ بررسی می‌شوند و اولین تعرفه‌ای که
+    کاندیدا داشته باشد برگردانده می‌شود.
+
+    Returns:
+        tuple: (نام تعرفه، مبلغ کارمزد، لیست کاندیداها) یا (None, 0, [])
+    """
+    try:
+        bank_abs_amount = abs(float(bank_amount))
+    except (TypeError, ValueError):
+        return None, 0, []
+
+    for tier_name, fee_amount in get_fee_tiers():
+        principal = bank_abs_amount - fee_amount
+        if principal <= 0:
+            break
+        candidates = candidate_index.nearest(bank_id, transaction_types, principal, center_date, tolerance_days)
+        if candidates:
+            logger.info(f"کاندیدای تطبیق با کارمزد {tier_name} ({fee_amount}) برای مبلغ {bank_amount} یافت شد: {len(candidates)} رکورد")
+            return tier_name, fee_amount, candidates
+
+    return None, 0, []
+
+
+def split_fee_amounts(bank_amount, fee_amount):
+    """
+    محاسبه مبلغ اصلی و مبلغ کارمزد با حفظ علامت مبلغ بانک
+
+    Returns:
+        tuple: (مبلغ اصلی، مبلغ کارمزد)
+    """
+    bank_amount = float(bank_amount)
+    sign = -1 if bank_amount < 0 else 1
+    principal = sign * (abs(bank_amount) - float(fee_amount))
+    return principal, sign * float(fee_amount)
@@ -2,15 +2,9 @@
 فایل مغایرت‌گیری چک‌های بانک کشاورزی
 شامل چک‌های دریافتی و پرداختی
 """
-import logging
-from datetime import datetime, timedelta
-from database.init_db import create_connection
-from database.accounting_repository import get_transactions_advanced_search
-from database.bank_transaction_repository import update_bank_transaction_reconciliation_status
-from database.repositories.accounting import (
-    get_transactions_by_date_amount_type,
-    get_transactions_by_date_less_than_amount_type
-)
+from database.repositories.accounting import get_unreconciled_transactions_by_types
+from reconciliation.candidate_index import DateWindowIndex, get_date_tolerance
+from reconciliation.save_reconciliation_result import ReconciliationBatch
 from utils.logger_config import setup_logger
 
 # راه‌اندازی لاگر
@@ -32,6 +26,10 @@ def reconcile_keshavarzi_checks(bank_transactions, ui_handler=None):
         if ui_handler:
             ui_handler.log_info(f"شروع مغایرت‌گیری {total_count} تراکنش چک کشاورزی")
         
+        # بارگذاری یکجای دفتر چک‌ها بر اساس تاریخ وصول و مبلغ
+        candidate_index = load_check_ledger(bank_transactions)
+        batch = ReconciliationBatch()
+        
         for i, bank_transaction in enumerate(bank_transactions):
             try:
                 # تعیین نوع چک (دریافتی یا پرداختی)
@@ -42,7 +40,7 @@ def reconcile_keshavarzi_checks(bank_transactions, ui_handler=None):
                     continue
                 
                 # مغایرت‌گیری بر اساس نوع
-                result = reconcile_single_check(bank_transaction, transaction_type)
+                result = reconcile_single_check(bank_transaction, transaction_type, candidate_index, batch)
                 
                 if result:
                     reconciled_count += 1
@@ -50,14 +48,25 @@ def reconcile_keshavarzi_checks(bank_transactions, ui_handler=None):
                 
                 # به‌روزرسانی پیشرفت
                 if ui_handler:
-                    progress = ((i + 1) / total_count) * 100
-                    ui_handler.update_detailed_progress(int(progress))
-                    ui_handler.update_detailed_status(f"مغایرت‌گیری چک {i + 1} از {total_count}")
+                    ui_handler.update_counter(i + 1, total_count, "مغایرت‌گیری چک {done} از {total}")
             
             except Exception as e:
                 logger.error(f"خطا در مغایرت‌گیری چک {bank_transaction.get('id')}: {str(e)}")
                 continue
         
+        # ثبت تمام نتایج چک‌ها در یک تراکنش دیتابیس
+        try:
+            batch.commit()
+        except Exception as e:
+            message = (
+                f"ثبت نتایج مغایرت‌گیری چک‌ها ناموفق بود و تراکنش دیتابیس بازگردانده شد؛ "
+                f"هیچ‌یک از {reconciled_count} تطبیق این دور ذخیره نشد: {str(e)}"
+            )
+            logger.error(message)
+            if ui_handler:
+                ui_handler.log_error(message)
+            return 0
+        
         logger.info(f"مغایرت‌گیری چک‌ها تکمیل شد. {reconciled_count} از {total_count} مغایرت‌گیری شدند")
         if ui_handler:
             ui_handler.log_info(f"مغایرت‌گیری چک‌ها تکمیل شد. {reconciled_count} از {total_count} مغایرت‌گیری شدند")
@@ -84,13 +93,42 @@ def reconcile_keshavarzi_checks(bank_transactions, ui_handler=None):
     
 #     return None
 
-def reconcile_single_check(bank_transaction, check_type):
+def normalize_check_serial(serial):
+    """
+    نرمال‌سازی شماره سریال چک حسابداری (حذف فاصله و پسوند .0 اعداد اکسل)
+    """
+    serial = str(serial or '').strip()
+    if serial.endswith('.0') and serial[:-2].isdigit():
+        serial = serial[:-2]
+    return serial
+
+def load_check_ledger(bank_transactions):
+    """
+    بارگذاری یکجای دفتر چک‌های حسابداری برای کل دور
+    
+    Returns:
+        DateWindowIndex: ایندکس تاریخ وصول و مبلغ دفتر چک‌ها
+    """
+    if not bank_transactions:
+        return DateWindowIndex([], date_field='collection_date')
+    
+    bank_id = bank_transactions[0].get('bank_id')
+    check_types = [t for t in {str(b.get('transaction_type') or '').strip() for b in bank_transactions} if t]
+    accounting_transactions = get_unreconciled_transactions_by_types(bank_id, check_types)
+    
+    candidate_index = DateWindowIndex(accounting_transactions, date_field='collection_date')
+    logger.info(f"دفتر چک‌ها بارگذاری شد: {len(accounting_transactions)} چک")
+    return candidate_index
+
+def reconcile_single_check(bank_transaction, check_type, candidate_index, batch):
     """
     مغایرت‌گیری یک چک منفرد
     
     Args:
         bank_transaction: تراکنش بانکی
         check_type: نوع چک (Received Check یا Paid Check)
+        candidate_index: ایندکس تاریخ وصول و مبلغ دفتر چک‌ها
+        batch: دسته ثبت یکجای نتایج
     
     Returns:
         bool: True اگر موفق باشد
@@ -100,26 +138,26 @@ def reconcile_single_check(bank_transaction, check_type):
         bank_amount = bank_transaction.get('amount')
         bank_date = bank_transaction.get('transaction_date')
         
-        # جستجوی تراکنش‌های حسابداری بر اساس collection_date و مبلغ
-        accounting_transactions = get_transactions_by_collection_date_and_amount(
-            bank_id, bank_date, bank_amount, check_type
+        # جستجوی تراکنش‌های حسابداری بر اساس collection_date و مبلغ در ایندکس
+        accounting_transactions = candidate_index.nearest(
+            bank_id, [check_type], bank_amount, bank_date, get_date_tolerance(check_type)
         )
         
         if not accounting_transactions:
             logger.warning(f"هیچ تراکنش حسابداری یافت نشد برای چک {bank_transaction.get('id')}")
             return False
         
-        # اگر فقط یک رکورد برگشت
-        if len(accounting_transactions) == 1:
-            # بررسی شماره پیگیری
-            if verify_tracking_number(bank_transaction, accounting_transactions[0]):
-                return perform_reconciliation(bank_transaction, accounting_transactions[0], None, check_type)
+        # انتخاب اولین کاندیدایی که شماره سریال آن در رکورد بانک وجود دارد
+        matched_transaction = find_matching_by_tracking_number(bank_transaction, accounting_transactions)
         
-        # اگر چند رکورد برگشت، جستجو بر اساس شماره پیگیری
-        else:
-            matched_transaction = find_matching_by_tracking_number(bank_transaction, accounting_transactions)
-            if matched_transaction:
-                return perform_reconciliation(bank_transaction, matched_transaction, None, check_type)
+        if matched_transaction:
+            batch.add_success(
+                bank_transaction.get('id'), matched_transaction.get('id'), None,
+                f"مغایرت‌گیری {check_type} - مبلغ: {bank_amount}", check_type
+            )
+            candidate_index.discard(matched_transaction.get('id'))
+            logger.info(f"مغایرت‌گیری موفق: Bank ID={bank_transaction.get('id')}, Acc ID={matched_transaction.get('id')}")
+            return True
         
         logger.warning(f"نتوانستیم تراکنش مناسب برای چک {bank_transaction.get('id')} پیدا کنیم")
         return False
@@ -128,47 +166,12 @@ def reconcile_single_check(bank_transaction, check_type):
         logger.error(f"خطا در مغایرت‌گیری چک منفرد: {str(e)}")
         return False
 
-def get_transactions_by_collection_date_and_amount(bank_id, collection_date, amount, transaction_type):
-    """
-    دریافت تراکنش‌های حسابداری بر اساس collection_date و مبلغ
-    """
-    conn = None
-    try:
-        conn = create_connection()
-        cursor = conn.cursor()
-        
-        # تبدیل مبلغ منفی به مثبت برای مقایسه (مبالغ پرداختی در بانک منفی هستند)
-        abs_amount = abs(float(amount))
-        
-        # برای نوع چک، از collection_date استفاده می‌کنیم
-        cursor.execute("""
-            SELECT * FROM AccountingTransactions 
-            WHERE bank_id = ? 
-            AND collection_date = ?
-            AND transaction_amount = ?
-            AND transaction_type = ?
-            AND is_reconciled = 0
-        """, (bank_id, collection_date, abs_amount, transaction_type))
-        
-        columns = [description[0] for description in cursor.description]
-        result = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        
-        logger.info(f"یافت شد {len(result)} تراکنش حسابداری برای collection_date={collection_date}, amount={amount}")
-        return result
-        
-    except Exception as e:
-        logger.error(f"خطا در جستجوی تراکنش‌های حسابداری: {str(e)}")
-        return []
-    finally:
-        if conn:
-            conn.close()
-
 def verify_tracking_number(bank_transaction, accounting_transaction):
     """
     بررسی تطابق شماره پیگیری
     """
     # شماره پیگیری در تراکنش حسابداری
-    acc_tracking = str(accounting_transaction.get('transaction_number', ''))
+    acc_tracking = normalize_check_serial(accounting_transaction.get('transaction_number', ''))
     
     # شماره‌های پیگیری در تراکنش بانک
     bank_extracted_tracking = str(bank_transaction.get('extracted_tracking_number', ''))
@@ -188,75 +191,12 @@ def verify_tracking_number(bank_transaction, accounting_transaction):
 def find_matching_by_tracking_number(bank_transaction, accounting_transactions):
     """
     پیدا کردن تراکنش حسابداری مناسب بر اساس شماره پیگیری
+    
+    کاندیداها قبلاً با مبلغ و تاریخ وصول به چند مورد محدود شده‌اند؛ بنابراین
+    سریال نرمال شده هر کاندیدا مستقیماً در فیلدهای بانک جستجو می‌شود.
     """
     for acc_transaction in accounting_transactions:
         if verify_tracking_number(bank_transaction, acc_transaction):
             return acc_transaction
     
     return None
-
-def perform_reconciliation(bank_transaction, accounting_transaction, pos_transaction, transaction_type):
-    """
-    انجام عملیات مغایرت‌گیری و ثبت نتیجه
-    """
-    try:
-        # به‌روزرسانی وضعیت تراکنش بانکی
-        bank_id = bank_transaction.get('id')
-        update_bank_transaction_reconciliation_status(bank_id, True)
-        
-        # به‌روزرسانی وضعیت تراکنش حسابداری
-        if accounting_transaction:
-            update_accounting_transaction_reconciliation_status(
-                accounting_transaction.get('id'), True
-            )
-        
-        # ثبت نتیجه مغایرت‌گیری
-        pos_id = pos_transaction.get('id') if pos_transaction else None
-        acc_id = accounting_transaction.get('id') if accounting_transaction else None
-        
-        description = f"مغایرت‌گیری {transaction_type} - مبلغ: {bank_transaction.get('amount')}"
-        
-        create_reconciliation_result(
-            pos_id=pos_id,
-            acc_id=acc_id,
-            bank_record_id=bank_id,
-            description=description,
-            type_matched=transaction_type
-        )
-        
-        logger.info(f"مغایرت‌گیری موفق: Bank ID={bank_id}, Acc ID={acc_id}")
-        return True
-        
-    except Exception as e:
-        logger.error(f"خطا در انجام مغایرت‌گیری: {str(e)}")
-        return False
-
-def update_accounting_transaction_reconciliation_status(transaction_id, status):
-    """
-    به‌روزرسانی وضعیت مغایرت‌گیری تراکنش حسابداری
-    """
-    conn = None
-    try:
-        conn = create_connection()
-        cursor = conn.cursor()
-        status_int = int(bool(status))
-        cursor.execute("""
-            UPDATE AccountingTransactions 
-            SET is_reconciled = ? 
-            WHERE id = ?
-        """, (status_int, transaction_id))
-        
-        if cursor.rowcount > 0:
-            conn.commit()
-            logger.info(f"وضعیت تطبیق تراکنش حسابداری {transaction_id} به {status_int} تغییر کرد")
-        else:
-            logger.warning(f"تراکنش حسابداری با شناسه {transaction_id} یافت نشد")
-            
-    except Exception as e:
-        logger.error(f"خطا در به‌روزرسانی وضعیت تطبیق تراکنش حسابداری: {str(e)}")
-        if conn:
-            conn.rollback()
-        raise
-    finally:
-        if conn:
-            conn.close()
@@ -13,11 +13,15 @@ from database.pos_transactions_repository import (
     update_reconciliation_status
 )
 from database.reconciliation_results_repository import create_reconciliation_result
+from reconciliation.candidate_index import DateWindowIndex, get_date_tolerance
 from utils.logger_config import setup_logger
 
 # راه‌اندازی لاگر
 logger = setup_logger('reconciliation.keshavarzi_pos')
 
+# انواع حسابداری قابل تطبیق با تراکنش‌های POS
+POS_ACCOUNTING_TYPES = ['Pos', 'Pos / Received Transfer']
+
 def reconcile_keshavarzi_pos(bank_transactions, ui_handler=None):
     """
     مغایرت‌گیری POS بانک کشاورزی با استفاده از جدول pos_transactions
@@ -34,10 +38,14 @@ def reconcile_keshavarzi_pos(bank_transactions, ui_handler=None):
         if ui_handler:
             ui_handler.log_info(f"شروع مغایرت‌گیری {total_count} تراکنش POS کشاورزی")
         
+        # بارگذاری یکجای کاندیداهای حسابداری POS برای کل دور
+        bank_id = bank_transactions[0].get('bank_id') if bank_transactions else None
+        candidate_index = DateWindowIndex.load(bank_id, [POS_ACCOUNTING_TYPES])
+        
         for i, bank_transaction in enumerate(bank_transactions):
             try:
                 # مغایرت‌گیری هر تراکنش POS
-                result = reconcile_single_pos(bank_transaction)
+                result = reconcile_single_pos(bank_transaction, candidate_index)
                 
                 if result:
                     reconciled_count += 1
@@ -45,9 +53,7 @@ def reconcile_keshavarzi_pos(bank_transactions, ui_handler=None):
                 
                 # به‌روزرسانی پیشرفت
                 if ui_handler:
-                    progress = ((i + 1) / total_count) * 100
-                    ui_handler.update_detailed_progress(int(progress))
-                    ui_handler.update_detailed_status(f"مغایرت‌گیری POS {i + 1} از {total_count}")
+                    ui_handler.update_counter(i + 1, total_count, "مغایرت‌گیری POS {done} از {total}")
             
             except Exception as e:
                 logger.error(f"خطا در مغایرت‌گیری POS {bank_transaction.get('id')}: {str(e)}")
@@ -65,12 +71,13 @@ def reconcile_keshavarzi_pos(bank_transactions, ui_handler=None):
             ui_handler.log_error(f"خطا در فرآیند مغایرت‌گیری POS‌ها: {str(e)}")
         return 0
 
-def reconcile_single_pos(bank_transaction):
+def reconcile_single_pos(bank_transaction, candidate_index):
     """
     مغایرت‌گیری یک تراکنش POS منفرد با الگوریتم پیچیده
     
     Args:
         bank_transaction: تراکنش بانکی POS
+        candidate_index: ایندکس کاندیداهای حسابداری دور جاری
     
     Returns:
         bool: True اگر موفق باشد
@@ -95,7 +102,7 @@ def reconcile_single_pos(bank_transaction):
         terminal_id = find_terminal_id_by_terminal_number(extracted_terminal_id)
         if not terminal_id:
             logger.warning(f"terminal_id یافت نشد برای terminal_number: {extracted_terminal_id}")
-            return apply_fallback_reconciliation_strategy(bank_transaction, extracted_terminal_id, pos_date)
+            return apply_fallback_reconciliation_strategy(bank_transaction, extracted_terminal_id, pos_date, candidate_index)
         
         logger.info(f"terminal_id یافت شد: {terminal_id} برای terminal_number: {extracted_terminal_id}")
         
@@ -114,12 +121,13 @@ def reconcile_single_pos(bank_transaction):
                     bank_transaction, accounting_match, None, 'Pos'
                 )
                 if result:
+                    candidate_index.discard(accounting_match.get('id'))
                     # مغایرت‌گیری تمام POS‌های مرتبط در آن روز
                     mark_related_pos_transactions_reconciled(terminal_id, pos_date)
                     return True
         
         # مرحله 5: اگر روش بالا کار نکرد، استراتژی جایگزین
-        return apply_fallback_reconciliation_strategy(bank_transaction, extracted_terminal_id, pos_date)
+        return apply_fallback_reconciliation_strategy(bank_transaction, extracted_terminal_id, pos_date, candidate_index)
         
     except Exception as e:
         logger.error(f"خطا در مغایرت‌گیری POS منفرد: {str(e)}")
@@ -232,7 +240,7 @@ def mark_related_pos_transactions_reconciled(terminal_id, pos_date):
         if conn:
             conn.close()
 
-def apply_fallback_reconciliation_strategy(bank_transaction, terminal_number, pos_date):
+def apply_fallback_reconciliation_strategy(bank_transaction, terminal_number, pos_date, candidate_index):
     """
     استراتژی جایگزین برای مغایرت‌گیری POS‌ها
     
@@ -252,7 +260,7 @@ def apply_fallback_reconciliation_strategy(bank_transaction, terminal_number, po
         
         # مغایرت‌گیری هر تراکنش POS با حسابداری
         for pos_transaction in pos_transactions:
-            result = reconcile_individual_pos_transaction(pos_transaction, bank_transaction.get('bank_id'))
+            result = reconcile_individual_pos_transaction(pos_transaction, bank_transaction.get('bank_id'), candidate_index)
             if result:
                 reconciled_pos_count += 1
         
@@ -297,7 +305,7 @@ def get_pos_transactions_by_terminal_and_date(terminal_number, date):
         if conn:
             conn.close()
 
-def reconcile_individual_pos_transaction(pos_transaction, bank_id):
+def reconcile_individual_pos_transaction(pos_transaction, bank_id, candidate_index):
     """
     مغایرت‌گیری یک تراکنش POS منفرد با حسابداری
     """
@@ -305,9 +313,9 @@ def reconcile_individual_pos_transaction(pos_transaction, bank_id):
         pos_amount = pos_transaction.get('transaction_amount')
         pos_date = pos_transaction.get('transaction_date')
         
-        # جستجوی تراکنش حسابداری بر اساس تاریخ و مبلغ (با مقایسه مطلق)
-        accounting_transactions = get_transactions_by_date_amount_type_pos_abs(
-            bank_id, pos_date, pos_amount, 'Pos'
+        # جستجوی تراکنش حسابداری بر اساس تاریخ و مبلغ (با مقایسه مطلق) در ایندکس
+        accounting_transactions = candidate_index.nearest(
+            bank_id, POS_ACCOUNTING_TYPES, pos_amount, pos_date, get_date_tolerance('Pos')
         )
         
         if not accounting_transactions:
@@ -316,21 +324,19 @@ def reconcile_individual_pos_transaction(pos_transaction, bank_id):
         
         # اگر فقط یک رکورد برگشت
         if len(accounting_transactions) == 1:
-            result = perform_reconciliation(
-                None, accounting_transactions[0], pos_transaction, 'Pos'
-            )
-            if result:
-                update_reconciliation_status(pos_transaction.get('id'), True)
-            return result
+            matched_accounting = accounting_transactions[0]
         
         # اگر چند رکورد برگشت، جستجوی پیشرفته
-        matched_accounting = find_best_accounting_match_for_pos(pos_transaction, accounting_transactions)
+        else:
+            matched_accounting = find_best_accounting_match_for_pos(pos_transaction, accounting_transactions)
+        
         if matched_accounting:
             result = perform_reconciliation(
                 None, matched_accounting, pos_transaction, 'Pos'
             )
             if result:
                 update_reconciliation_status(pos_transaction.get('id'), True)
+                candidate_index.discard(matched_accounting.get('id'))
             return result
         
         return False
@@ -396,48 +402,6 @@ def find_accounting_by_tracking_number_pos(pos_transaction, accounting_transacti
     
     return None
 
-def get_transactions_by_date_amount_type_pos_abs(bank_id, transaction_date, amount, transaction_type):
-    """
-    دریافت تراکنش‌های حسابداری با مقایسه مبلغ مطلق برای POS
-    (برای حل مشکل مبالغ منفی در بانک)
-    """
-    conn = None
-    try:
-        conn = create_connection()
-        cursor = conn.cursor()
-        
-        # تبدیل مبلغ منفی به مثبت برای مقایسه
-        abs_amount = abs(float(amount))
-        
-        # تعیین نوع سیستم جدید
-        new_system_type = ''
-        if transaction_type in ['Pos', 'Received Transfer']:
-            new_system_type = 'Pos / Received Transfer'
-        elif transaction_type == 'Paid Transfer':
-            new_system_type = 'Pos / Paid Transfer'
-        
-        cursor.execute("""
-            SELECT * FROM AccountingTransactions 
-            WHERE bank_id = ? 
-            AND due_date = ?
-            AND ABS(transaction_amount) = ?
-            AND (transaction_type = ? OR transaction_type = ?)
-            AND is_reconciled = 0
-        """, (bank_id, transaction_date, abs_amount, transaction_type, new_system_type))
-        
-        columns = [description[0] for description in cursor.description]
-        result = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        
-        logger.info(f"یافت شد {len(result)} تراکنش از نوع {transaction_type} با مبلغ مطلق {abs_amount} در تاریخ {transaction_date}")
-        return result
-        
-    except Exception as e:
-        logger.error(f"خطا در دریافت تراکنش‌ها با مبلغ مطلق: {str(e)}")
-        return []
-    finally:
-        if conn:
-            conn.close()
-
 def perform_reconciliation(bank_transaction, accounting_transaction, pos_transaction, transaction_type):
     """
     انجام عملیات مغایرت‌گیری و ثبت نتیجه
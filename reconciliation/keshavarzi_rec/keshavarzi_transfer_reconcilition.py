@@ -2,12 +2,12 @@
 فایل مغایرت‌گیری انتقال‌های بانک کشاورزی
 شامل انتقال‌های دریافتی و پرداختی
 """
-import logging
-from datetime import datetime, timedelta
-from database.init_db import create_connection
-from database.repositories.accounting import get_transactions_by_date_amount_type
-from database.bank_transaction_repository import update_bank_transaction_reconciliation_status
-from database.reconciliation_results_repository import create_reconciliation_result
+import re
+from database.repositories.accounting import get_unreconciled_transactions_by_types
+from reconciliation.candidate_index import DateWindowIndex, get_date_tolerance
+from reconciliation.fee_matching import find_fee_adjusted_candidates, split_fee_amounts
+from reconciliation.save_reconciliation_result import ReconciliationBatch
+from utils.constants import TransactionTypes
 from utils.logger_config import setup_logger
 
 # راه‌اندازی لاگر
@@ -29,6 +29,14 @@ def reconcile_keshavarzi_transfers(bank_transactions, ui_handler=None):
         if ui_handler:
             ui_handler.log_info(f"شروع مغایرت‌گیری {total_count} تراکنش انتقال کشاورزی")
         
+        # بارگذاری یکجای کاندیداهای حسابداری و ایندکس ارقام کارت برای کل دور
+        candidate_index, card_index = load_transfer_ledger(bank_transactions)
+        
+        # نتایج این دور در پایان به صورت یکجا ثبت می‌شوند؛ جداسازی کارمزدها در دسته
+        # جداگانه ثبت می‌شود تا خطای آن تطبیق‌های عادی را از بین نبرد
+        batch = ReconciliationBatch()
+        fee_batch = ReconciliationBatch()
+        
         for i, bank_transaction in enumerate(bank_transactions):
             try:
                 # تعیین نوع انتقال (دریافتی یا پرداختی)
@@ -39,7 +47,7 @@ def reconcile_keshavarzi_transfers(bank_transactions, ui_handler=None):
                     continue
                 
                 # مغایرت‌گیری بر اساس نوع
-                result = reconcile_single_transfer(bank_transaction, transaction_type)
+                result = reconcile_single_transfer(bank_transaction, transaction_type, candidate_index, batch, card_index, fee_batch)
                 
                 if result:
                     reconciled_count += 1
@@ -47,14 +55,31 @@ def reconcile_keshavarzi_transfers(bank_transactions, ui_handler=None):
                 
                 # به‌روزرسانی پیشرفت
                 if ui_handler:
-                    progress = ((i + 1) / total_count) * 100
-                    ui_handler.update_detailed_progress(int(progress))
-                    ui_handler.update_detailed_status(f"مغایرت‌گیری انتقال {i + 1} از {total_count}")
+                    ui_handler.update_counter(i + 1, total_count, "مغایرت‌گیری انتقال {done} از {total}")
             
             except Exception as e:
                 logger.error(f"خطا در مغایرت‌گیری انتقال {bank_transaction.get('id')}: {str(e)}")
                 continue
         
+        try:
+            fee_batch.commit()
+        except Exception as e:
+            logger.error(f"خطا در ثبت یکجای مغایرت‌گیری‌های همراه با کارمزد: {str(e)}")
+            reconciled_count -= len(fee_batch)
+        
+        # ثبت سایر نتایج انتقال‌ها در یک تراکنش دیتابیس
+        try:
+            batch.commit()
+        except Exception as e:
+            message = (
+                f"ثبت نتایج مغایرت‌گیری انتقال‌ها ناموفق بود و تراکنش دیتابیس بازگردانده شد؛ "
+                f"{len(batch)} تطبیق این دور ذخیره نشد: {str(e)}"
+            )
+            logger.error(message)
+            if ui_handler:
+                ui_handler.log_error(message)
+            reconciled_count -= len(batch)
+        
         logger.info(f"مغایرت‌گیری انتقال‌ها تکمیل شد. {reconciled_count} از {total_count} مغایرت‌گیری شدند")
         if ui_handler:
             ui_handler.log_info(f"مغایرت‌گیری انتقال‌ها تکمیل شد. {reconciled_count} از {total_count} مغایرت‌گیری شدند")
@@ -81,13 +106,70 @@ def reconcile_keshavarzi_transfers(bank_transactions, ui_handler=None):
     
 #     return None
 
-def reconcile_single_transfer(bank_transaction, transfer_type):
+def get_transfer_type_group(transfer_type):
+    """
+    انواع حسابداری معادل یک نوع انتقال بانکی (نوع اصلی و نوع سیستم جدید)
+    """
+    new_system_type = ''
+    if transfer_type in ['Pos', 'Received Transfer']:
+        new_system_type = 'Pos / Received Transfer'
+    elif transfer_type == 'Paid Transfer':
+        new_system_type = 'Pos / Paid Transfer'
+    return [t for t in (transfer_type, new_system_type) if t]
+
+def build_card_digit_index(accounting_transactions):
+    """
+    ساخت ایندکس ارقام کارت از توضیحات تراکنش‌های حسابداری
+    
+    برای هر دنباله عددی در توضیحات، تمام زیررشته‌های چهار رقمی (برای جستجوی
+    چهار رقم آخر کارت) و خود دنباله کامل (برای شماره کارت کامل) به شناسه
+    تراکنش نگاشت می‌شوند.
+    
+    Returns:
+        dict: رشته عددی -> مجموعه شناسه‌های تراکنش حسابداری
+    """
+    card_index = {}
+    for acc_transaction in accounting_transactions:
+        acc_id = acc_transaction.get('id')
+        for digits in re.findall(r'\d+', str(acc_transaction.get('description') or '')):
+            card_index.setdefault(digits, set()).add(acc_id)
+            for start in range(len(digits) - 3):
+                card_index.setdefault(digits[start:start + 4], set()).add(acc_id)
+    return card_index
+
+def load_transfer_ledger(bank_transactions):
+    """
+    بارگذاری یکجای کاندیداهای حسابداری برای تمام انواع انتقال موجود در لیست
+    
+    Returns:
+        tuple: (ایندکس تاریخ و مبلغ، ایندکس ارقام کارت)
+    """
+    if not bank_transactions:
+        return DateWindowIndex([]), {}
+    
+    bank_id = bank_transactions[0].get('bank_id')
+    accounting_types = []
+    for transfer_type in {str(t.get('transaction_type') or '').strip() for t in bank_transactions}:
+        if transfer_type:
+            accounting_types.extend(get_transfer_type_group(transfer_type))
+    accounting_transactions = get_unreconciled_transactions_by_types(bank_id, accounting_types)
+    
+    candidate_index = DateWindowIndex(accounting_transactions)
+    card_index = build_card_digit_index(accounting_transactions)
+    logger.info(f"کاندیداهای انتقال بارگذاری شد: {len(accounting_transactions)} رکورد، {len(card_index)} کلید ارقام کارت")
+    return candidate_index, card_index
+
+def reconcile_single_transfer(bank_transaction, transfer_type, candidate_index, batch, card_index=None, fee_batch=None):
     """
     مغایرت‌گیری یک انتقال منفرد
     
     Args:
         bank_transaction: تراکنش بانکی
         transfer_type: نوع انتقال (Received Transfer یا Paid Transfer)
+        candidate_index: ایندکس کاندیداهای حسابداری دور جاری
+        batch: دسته ثبت یکجای نتایج دور جاری
+        card_index: ایندکس ارقام کارت توضیحات حسابداری (اختیاری)
+        fee_batch: دسته ثبت تطبیق‌های همراه با کارمزد (پیش‌فرض همان batch)
     
     Returns:
         bool: True اگر موفق باشد
@@ -97,24 +179,36 @@ def reconcile_single_transfer(bank_transaction, transfer_type):
         bank_amount = bank_transaction.get('amount')
         bank_date = bank_transaction.get('transaction_date')
         
-        # جستجوی تراکنش‌های حسابداری بر اساس due_date و مبلغ
-        accounting_transactions = get_transactions_by_date_amount_type_abs(
-            bank_id, bank_date, bank_amount, transfer_type
+        # جستجوی تراکنش‌های حسابداری بر اساس due_date و مبلغ مطلق در ایندکس
+        accounting_transactions = candidate_index.nearest(
+            bank_id, get_transfer_type_group(transfer_type), bank_amount, bank_date,
+            get_date_tolerance(transfer_type)
         )
         
         if not accounting_transactions:
+            # انتقال‌های پرداختی: جستجوی مبلغ بانک منهای تعرفه‌های کارمزد
+            if transfer_type.replace(' ', '_') == TransactionTypes.PAID_TRANSFER:
+                if reconcile_transfer_with_fee_tiers(bank_transaction, transfer_type, candidate_index, fee_batch if fee_batch is not None else batch, card_index):
+                    return True
             logger.warning(f"هیچ تراکنش حسابداری یافت نشد برای انتقال {bank_transaction.get('id')}")
             return False
         
         # اگر فقط یک رکورد برگشت
         if len(accounting_transactions) == 1:
-            return perform_reconciliation(bank_transaction, accounting_transactions[0], None, transfer_type)
+            matched_transaction = accounting_transactions[0]
         
         # اگر چند رکورد برگشت، مراحل جستجوی پیشرفته
         else:
-            matched_transaction = find_best_match_for_transfer(bank_transaction, accounting_transactions)
-            if matched_transaction:
-                return perform_reconciliation(bank_transaction, matched_transaction, None, transfer_type)
+            matched_transaction = find_best_match_for_transfer(bank_transaction, accounting_transactions, card_index)
+        
+        if matched_transaction:
+            batch.add_success(
+                bank_transaction.get('id'), matched_transaction.get('id'), None,
+                f"مغایرت‌گیری {transfer_type} - مبلغ: {bank_amount}", transfer_type
+            )
+            candidate_index.discard(matched_transaction.get('id'))
+            logger.info(f"مغایرت‌گیری موفق: Bank ID={bank_transaction.get('id')}, Acc ID={matched_transaction.get('id')}")
+            return True
         
         logger.warning(f"نتوانستیم تراکنش مناسب برای انتقال {bank_transaction.get('id')} پیدا کنیم")
         return False
@@ -123,7 +217,45 @@ def reconcile_single_transfer(bank_transaction, transfer_type):
         logger.error(f"خطا در مغایرت‌گیری انتقال منفرد: {str(e)}")
         return False
 
-def find_best_match_for_transfer(bank_transaction, accounting_transactions):
+def reconcile_transfer_with_fee_tiers(bank_transaction, transfer_type, candidate_index, fee_batch, card_index=None):
+    """
+    مغایرت‌گیری انتقال با کسر تعرفه‌های کارمزد از مبلغ بانک
+    
+    در صورت یافتن تطبیق، جداسازی کارمزد و نتیجه مغایرت‌گیری در دسته
+    ثبت یکجا قرار می‌گیرند.
+    """
+    tier_name, fee_amount, candidates = find_fee_adjusted_candidates(
+        candidate_index, bank_transaction.get('bank_id'), get_transfer_type_group(transfer_type),
+        bank_transaction.get('amount'), bank_transaction.get('transaction_date'),
+        get_date_tolerance(transfer_type)
+    )
+    
+    if not candidates:
+        return False
+    
+    if len(candidates) == 1:
+        matched_transaction = candidates[0]
+    else:
+        matched_transaction = find_best_match_for_transfer(bank_transaction, candidates, card_index)
+    
+    if not matched_transaction:
+        return False
+    
+    principal_amount, fee_row_amount = split_fee_amounts(bank_transaction.get('amount'), fee_amount)
+    fee_batch.add_fee_split(
+        bank_transaction, principal_amount, fee_row_amount,
+        f"کارمزد {tier_name} برای رکورد {bank_transaction.get('id')}"
+    )
+    fee_batch.add_success(
+        bank_transaction.get('id'), matched_transaction.get('id'), None,
+        f"مغایرت‌گیری {transfer_type} با کارمزد {tier_name} - مبلغ: {principal_amount}، کارمزد: {fee_amount}",
+        transfer_type
+    )
+    candidate_index.discard(matched_transaction.get('id'))
+    logger.info(f"تطبیق انتقال {bank_transaction.get('id')} با کارمزد {tier_name} ({fee_amount}): Acc ID={matched_transaction.get('id')}")
+    return True
+
+def find_best_match_for_transfer(bank_transaction, accounting_transactions, card_index=None):
     """
     پیدا کردن بهترین تطبیق برای انتقال‌ها با روش‌های مختلف
     
@@ -138,7 +270,7 @@ def find_best_match_for_transfer(bank_transaction, accounting_transactions):
         return tracking_match
     
     # مرحله 2: جستجو بر اساس شماره کارت
-    card_match = find_matching_by_card_number(bank_transaction, accounting_transactions)
+    card_match = find_matching_by_card_number(bank_transaction, accounting_transactions, card_index)
     if card_match:
         logger.info("تطبیق بر اساس شماره کارت یافت شد")
         return card_match
@@ -169,18 +301,30 @@ def find_matching_by_tracking_number(bank_transaction, accounting_transactions):
     
     return None
 
-def find_matching_by_card_number(bank_transaction, accounting_transactions):
+def find_matching_by_card_number(bank_transaction, accounting_transactions, card_index=None):
     """
     جستجوی تطبیق بر اساس شماره کارت
     
     جستجوی source_card_number بانک در description حسابداری
     (معمولاً بعد از کلمه "ک" قرار می‌گیرد)
+    
+    با وجود ایندکس ارقام کارت، بررسی با جستجوی دیکشنری انجام می‌شود.
     """
-    source_card_number = str(bank_transaction.get('source_card_number', ''))
+    source_card_number = str(bank_transaction.get('source_card_number') or '')
     
     if not source_card_number:
         return None
     
+    if card_index is not None and source_card_number.isdigit() and len(source_card_number) >= 4:
+        # وجود چهار رقم آخر در توضیحات شرط لازم و کافی تطبیق است
+        # (شماره کامل موجود در توضیحات، چهار رقم آخر را نیز شامل می‌شود)
+        matched_ids = card_index.get(source_card_number[-4:], set())
+        for acc_transaction in accounting_transactions:
+            if acc_transaction.get('id') in matched_ids:
+                logger.info(f"تطبیق چهار رقم آخر کارت: {source_card_number[-4:]}")
+                return acc_transaction
+        return None
+    
     for acc_transaction in accounting_transactions:
         description = str(acc_transaction.get('description', ''))
         
@@ -198,110 +342,3 @@ def find_matching_by_card_number(bank_transaction, accounting_transactions):
                 return acc_transaction
     
     return None
-
-def get_transactions_by_date_amount_type_abs(bank_id, transaction_date, amount, transaction_type):
-    """
-    دریافت تراکنش‌های حسابداری با مقایسه مبلغ مطلق (برای حل مشکل مبالغ منفی بانک)
-    """
-    conn = None
-    try:
-        conn = create_connection()
-        cursor = conn.cursor()
-        
-        # تبدیل مبلغ منفی به مثبت برای مقایسه
-        abs_amount = abs(float(amount))
-        
-        # تعیین نوع سیستم جدید
-        new_system_type = ''
-        if transaction_type in ['Pos', 'Received Transfer']:
-            new_system_type = 'Pos / Received Transfer'
-        elif transaction_type == 'Paid Transfer':
-            new_system_type = 'Pos / Paid Transfer'
-        
-        cursor.execute("""
-            SELECT * FROM AccountingTransactions 
-            WHERE bank_id = ? 
-            AND due_date = ?
-            AND ABS(transaction_amount) = ?
-            AND (transaction_type = ? OR transaction_type = ?)
-            AND is_reconciled = 0
-        """, (bank_id, transaction_date, abs_amount, transaction_type, new_system_type))
-        
-        columns = [description[0] for description in cursor.description]
-        result = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        
-        logger.info(f"یافت شد {len(result)} تراکنش از نوع {transaction_type} با مبلغ مطلق {abs_amount} در تاریخ {transaction_date}")
-        return result
-        
-    except Exception as e:
-        logger.error(f"خطا در دریافت تراکنش‌ها با مبلغ مطلق: {str(e)}")
-        return []
-    finally:
-        if conn:
-            conn.close()
-
-def perform_reconciliation(bank_transaction, accounting_transaction, pos_transaction, transaction_type):
-    """
-    انجام عملیات مغایرت‌گیری و ثبت نتیجه
-    """
-    try:
-        # به‌روزرسانی وضعیت تراکنش بانکی
-        bank_id = bank_transaction.get('id')
-        update_bank_transaction_reconciliation_status(bank_id, True)
-        
-        # به‌روزرسانی وضعیت تراکنش حسابداری
-        if accounting_transaction:
-            update_accounting_transaction_reconciliation_status(
-                accounting_transaction.get('id'), True
-            )
-        
-        # ثبت نتیجه مغایرت‌گیری
-        pos_id = pos_transaction.get('id') if pos_transaction else None
-        acc_id = accounting_transaction.get('id') if accounting_transaction else None
-        
-        description = f"مغایرت‌گیری {transaction_type} - مبلغ: {bank_transaction.get('amount')}"
-        
-        create_reconciliation_result(
-            pos_id=pos_id,
-            acc_id=acc_id,
-            bank_record_id=bank_id,
-            description=description,
-            type_matched=transaction_type
-        )
-        
-        logger.info(f"مغایرت‌گیری موفق: Bank ID={bank_id}, Acc ID={acc_id}")
-        return True
-        
-    except Exception as e:
-        logger.error(f"خطا در انجام مغایرت‌گیری: {str(e)}")
-        return False
-
-def update_accounting_transaction_reconciliation_status(transaction_id, status):
-    """
-    به‌روزرسانی وضعیت مغایرت‌گیری تراکنش حسابداری
-    """
-    conn = None
-    try:
-        conn = create_connection()
-        cursor = conn.cursor()
-        status_int = int(bool(status))
-        cursor.execute("""
-            UPDATE AccountingTransactions 
-            SET is_reconciled = ? 
-            WHERE id = ?
-        """, (status_int, transaction_id))
-        
-        if cursor.rowcount > 0:
-            conn.commit()
-            logger.info(f"وضعیت تطبیق تراکنش حسابداری {transaction_id} به {status_int} تغییر کرد")
-        else:
-            logger.warning(f"تراکنش حسابداری با شناسه {transaction_id} یافت نشد")
-            
-    except Exception as e:
-        logger.error(f"خطا در به‌روزرسانی وضعیت تطبیق تراکنش حسابداری: {str(e)}")
-        if conn:
-            conn.rollback()
-        raise
-    finally:
-        if conn:
-            conn.close()
@@ -0,0 +1,267 @@
+"""
+مدل محلی امتیازدهی کاندیداها برای مغایرت‌یابی هوشمند
+یک رگرسیون لجستیک سبک روی نتایج مغایرت‌گیری گذشته آموزش داده می‌شود و
+کاندیداها را بدون نیاز به شبکه و به صورت برداری با NumPy امتیازدهی می‌کند.
+"""
+import json
+import os
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from config.settings import DATA_DIR
+from database.reconciliation_results_repository import get_reconciliation_training_pairs
+from reconciliation.ai_matcher import get_candidate_date_field, get_record_tracking_number
+from reconciliation.candidate_index import date_to_ordinal
+from utils.logger_config import setup_logger
+
+logger = setup_logger('reconciliation.local_matcher')
+
+# مسیر پیش‌فرض ذخیره مدل آموزش داده شده
+LOCAL_MODEL_PATH = os.path.join(DATA_DIR, 'local_matcher_model.json')
+
+FEATURE_NAMES = [
+    'amount_equal',
+    'amount_relative_diff',
+    'date_delta',
+    'same_date',
+    'tracking_suffix_length',
+    'card_digits_in_description',
+    'name_similarity'
+]
+
+# حداکثر فاصله تاریخ (روز) در نرمال‌سازی ویژگی فاصله تاریخ
+MAX_DATE_DELTA_DAYS = 60
+# حداقل اختلاف احتمال بهترین و دومین کاندیدا برای تطبیق خودکار
+LOCAL_MATCH_MARGIN = 0.2
+# حداقل تعداد تطبیق گذشته برای آموزش مدل
+MIN_TRAINING_MATCHES = 10
+
+
+def _record_amount(record: Dict, transaction_type: str) -> float:
+    amount = record.get('transaction_amount') if transaction_type == 'POS' else record.get('amount')
+    try:
+        return abs(float(amount))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _common_suffix_length(first: str, second: str) -> int:
+    length = 0
+    for first_char, second_char in zip(reversed(first), reversed(second)):
+        if first_char != second_char:
+            break
+        length += 1
+    return length
+
+
+def _name_tokens(text) -> set:
+    return {token for token in str(text or '').split() if len(token) > 1}
+
+
+def build_feature_matrix(record: Dict, transaction_type: str, candidates: List[Dict]) -> np.ndarray:
+    """
+    ساخت ماتریس ویژگی (تعداد کاندیدا × تعداد ویژگی) برای یک رکورد
+
+    Args:
+        record: رکورد POS یا بانک
+        transaction_type: 'POS' یا نوع تراکنش بانکی
+        candidates: لیست کاندیداهای حسابداری
+
+    Returns:
+        np.ndarray: ماتریس ویژگی‌ها
+    """
+    if not candidates:
+        return np.zeros((0, len(FEATURE_NAMES)))
+
+    record_amount = _record_amount(record, transaction_type)
+    candidate_amounts = np.array([abs(float(c.get('transaction_amount') or 0)) for c in candidates])
+    amount_diff = np.abs(candidate_amounts - record_amount)
+
+    date_field = get_candidate_date_field(transaction_type)
+    record_ordinal = date_to_ordinal(record.get('transaction_date'))
+    candidate_ordinals = np.array(
+        [date_to_ordinal(c.get(date_field)) or np.nan for c in candidates], dtype=float
+    )
+    if record_ordinal is None:
+        date_delta = np.full(len(candidates), np.nan)
+    else:
+        date_delta = np.abs(candidate_ordinals - record_ordinal)
+    date_delta = np.where(np.isnan(date_delta), MAX_DATE_DELTA_DAYS, date_delta)
+
+    record_tracking = ''.join(ch for ch in get_record_tracking_number(record, transaction_type) if ch.isdigit())
+    tracking_suffix = np.array([
+        _common_suffix_length(record_tracking, ''.join(ch for ch in str(c.get('transaction_number') or '') if ch.isdigit()))
+        for c in candidates
+    ], dtype=float)
+
+    card_number = str(record.get('card_number') or record.get('source_card_number') or '')
+    card_suffix = card_number[-4:] if len(card_number) >= 4 else ''
+    card_in_description = np.array([
+        1.0 if card_suffix and card_suffix in str(c.get('description') or '') else 0.0
+        for c in candidates
+    ])
+
+    record_names = _name_tokens(record.get('depositor_name'))
+    name_similarity = np.zeros(len(candidates))
+    if record_names:
+        for position, candidate in enumerate(candidates):
+            candidate_names = _name_tokens(candidate.get('customer_name')) | _name_tokens(candidate.get('description'))
+            if candidate_names:
+                name_similarity[position] = len(record_names & candidate_names) / len(record_names | candidate_names)
+
+    return np.column_stack([
+        (amount_diff < 0.5).astype(float),
+        np.minimum(amount_diff / max(record_amount, 1.0), 1.0),
+        np.minimum(date_delta, MAX_DATE_DELTA_DAYS) / MAX_DATE_DELTA_DAYS,
+        (date_delta == 0).astype(float),
+        np.minimum(tracking_suffix, 10) / 10,
+        card_in_description,
+        name_similarity
+    ])
+
+
+class LocalMatcherModel:
+    """رگرسیون لجستیک با نرمال‌سازی ویژگی‌ها"""
+
+    def __init__(self, weights=None, bias=0.0, mean=None, std=None):
+        feature_count = len(FEATURE_NAMES)
+        self.weights = np.asarray(weights if weights is not None else np.zeros(feature_count), dtype=float)
+        self.bias = float(bias)
+        self.mean = np.asarray(mean if mean is not None else np.zeros(feature_count), dtype=float)
+        self.std = np.asarray(std if std is not None else np.ones(feature_count), dtype=float)
+
+    def _normalize(self, features: np.ndarray) -> np.ndarray:
+        return (features - self.mean) / self.std
+
+    def fit(self, features: np.ndarray, labels: np.ndarray, epochs: int = 500, learning_rate: float = 0.5, l2: float = 1e-3):
+        """آموزش مدل با گرادیان کاهشی دسته‌ای"""
+        self.mean = features.mean(axis=0)
+        self.std = features.std(axis=0)
+        self.std[self.std == 0] = 1.0
+        normalized = self._normalize(features)
+        sample_count = len(labels)
+
+        for _ in range(epochs):
+            probabilities = 1.0 / (1.0 + np.exp(-(normalized @ self.weights + self.bias)))
+            error = probabilities - labels
+            self.weights -= learning_rate * (normalized.T @ error / sample_count + l2 * self.weights)
+            self.bias -= learning_rate * error.mean()
+        return self
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        """احتمال تطبیق هر سطر ماتریس ویژگی"""
+        if len(features) == 0:
+            return np.zeros(0)
+        return 1.0 / (1.0 + np.exp(-(self._normalize(features) @ self.weights + self.bias)))
+
+    def to_dict(self) -> Dict:
+        return {
+            "features": FEATURE_NAMES,
+            "weights": self.weights.tolist(),
+            "bias": self.bias,
+            "mean": self.mean.tolist(),
+            "std": self.std.tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'LocalMatcherModel':
+        if data.get("features") != FEATURE_NAMES:
+            raise ValueError("ویژگی‌های مدل ذخیره شده با نسخه فعلی سازگار نیست")
+        return cls(data["weights"], data["bias"], data["mean"], data["std"])
+
+    def save(self, path: str = LOCAL_MODEL_PATH):
+        with open(path, 'w', encoding='utf-8') as model_file:
+            json.dump(self.to_dict(), model_file, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path: str = LOCAL_MODEL_PATH) -> 'LocalMatcherModel':
+        with open(path, 'r', encoding='utf-8') as model_file:
+            return cls.from_dict(json.load(model_file))
+
+
+def build_training_set(pairs: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    ساخت داده آموزشی از جفت‌های تطبیق گذشته
+
+    نمونه مثبت: سند حسابداری تطبیق داده شده. نمونه‌های منفی: اسناد هم‌مبلغ
+    همان بانک و اسناد تطبیق داده شده رکوردهای هم‌تاریخ دیگر (منفی‌های درون دسته).
+    """
+    ordered_pairs = sorted(pairs, key=lambda p: (p["matched"].get('bank_id') or 0, str(p["matched"].get('due_date') or '')))
+    feature_blocks = []
+    label_blocks = []
+    for position, pair in enumerate(ordered_pairs):
+        negatives = list(pair["negatives"])
+        for neighbour in (position - 1, position + 1):
+            if 0 <= neighbour < len(ordered_pairs):
+                other = ordered_pairs[neighbour]["matched"]
+                if other.get('bank_id') == pair["matched"].get('bank_id') and other.get('id') != pair["matched"].get('id'):
+                    negatives.append(other)
+
+        candidates = [pair["matched"]] + negatives
+        feature_blocks.append(build_feature_matrix(pair["record"], pair["transaction_type"], candidates))
+        label_blocks.append(np.array([1.0] + [0.0] * len(negatives)))
+
+    if not feature_blocks:
+        return np.zeros((0, len(FEATURE_NAMES))), np.zeros(0)
+    return np.vstack(feature_blocks), np.concatenate(label_blocks)
+
+
+def train_local_model(model_path: str = LOCAL_MODEL_PATH) -> LocalMatcherModel:
+    """
+    آموزش مدل محلی از نتایج مغایرت‌گیری گذشته و ذخیره آن
+
+    Raises:
+        ValueError: در صورت کافی نبودن داده آموزشی
+    """
+    pairs = get_reconciliation_training_pairs()
+    if len(pairs) < MIN_TRAINING_MATCHES:
+        raise ValueError(f"داده آموزشی کافی نیست: {len(pairs)} تطبیق (حداقل {MIN_TRAINING_MATCHES})")
+
+    features, labels = build_training_set(pairs)
+    if labels.min() == labels.max():
+        raise ValueError("داده آموزشی فاقد نمونه منفی است")
+
+    model = LocalMatcherModel().fit(features, labels)
+    model.save(model_path)
+    logger.info(f"مدل محلی با {len(pairs)} تطبیق و {len(labels)} نمونه آموزش داده و ذخیره شد")
+    return model
+
+
+class LocalMatcher:
+    """جایگزین محلی webhook برای AIMatcher با خروجی هم‌قالب پاسخ AI"""
+
+    def __init__(self, model: Optional[LocalMatcherModel] = None, model_path: str = LOCAL_MODEL_PATH):
+        if model is not None:
+            self.model = model
+        elif os.path.exists(model_path):
+            self.model = LocalMatcherModel.load(model_path)
+            logger.info(f"مدل محلی از {model_path} بارگذاری شد")
+        else:
+            self.model = train_local_model(model_path)
+
+    def evaluate(self, record: Dict, transaction_type: str, candidates: List[Dict]) -> Dict:
+        """
+        امتیازدهی کاندیداهای یک رکورد
+
+        Returns:
+            Dict: پاسخ هم‌قالب webhook (matched، confidence، matched_accounting_id،
+            reason و suggestions)
+        """
+        probabilities = self.model.predict_proba(build_feature_matrix(record, transaction_type, candidates))
+        if len(probabilities) == 0:
+            return {"matched": False, "confidence": 0, "reason": "کاندیدایی وجود ندارد", "suggestions": []}
+
+        order = np.argsort(-probabilities)
+        best = order[0]
+        best_probability = float(probabilities[best])
+        runner_up = float(probabilities[order[1]]) if len(order) > 1 else 0.0
+        suggestions = [
+            {"accounting_id": candidates[index].get('id'), "confidence": round(float(probabilities[index]), 4)}
+            for index in order[:3]
+        ]
+        return {
+            "matched": best_probability - runner_up >= LOCAL_MATCH_MARGIN,
+            "confidence": round(best_probability, 4),
+            "matched_accounting_id": candidates[best].get('id'),
+            "reason": f"مدل محلی: احتمال {best_probability:.2f} (کاندیدای بعدی {runner_up:.2f})",
+            "suggestions": suggestions
+        }
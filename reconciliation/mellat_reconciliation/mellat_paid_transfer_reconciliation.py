@@ -11,14 +11,19 @@ from utils.constants import TransactionTypes
 
 from utils.compare_tracking_numbers import compare_tracking_numbers
 from database.repositories.accounting import (
-    get_transactions_by_date_amount_type,
     get_transactions_by_date_less_than_amount_type,
     get_transactions_by_date_type,
     get_transactions_by_amount_tracking,
     create_accounting_transaction,
     update_accounting_transaction_reconciliation_status
 )
-from reconciliation.save_reconciliation_result import success_reconciliation_result, fail_reconciliation_result
+from reconciliation.candidate_index import DateWindowIndex, get_date_tolerance
+from reconciliation.fee_matching import find_fee_adjusted_candidates, split_fee_amounts
+from reconciliation.save_reconciliation_result import (
+    ReconciliationBatch,
+    success_reconciliation_result,
+    fail_reconciliation_result
+)
 from utils.compare_tracking_numbers import compare_tracking_numbers
 
 logger = setup_logger('reconciliation.mellat_paid_transfer_reconciliation')
@@ -50,9 +55,24 @@ def _reconcile_in_thread(bank_transactions, ui_handler, manual_reconciliation_qu
     successful_reconciliations = 0
     failed_reconciliations = 0
     
+    # Load unreconciled accounting candidates once for the whole run
+    try:
+        bank_id = bank_transactions[0]['bank_id'] if bank_transactions else None
+        candidate_index = DateWindowIndex.load(bank_id, [TransactionTypes.PAID_TRANSFER])
+    except Exception as e:
+        logger.error(f"Failed to load accounting candidates for Paid_Transfer reconciliation: {e}", exc_info=True)
+        try:
+            ui_handler.update_status(f"مغایرت‌یابی انتقال پرداختی انجام نشد: خطا در بارگذاری اسناد حسابداری ({e})")
+        except Exception as ui_error:
+            logger.warning(f"UI update failed: {ui_error}")
+        return
+    
+    # Fee splits found through the fee tiers are written together at the end of the run
+    fee_batch = ReconciliationBatch()
+    
     for i, bank_record in enumerate(bank_transactions):
         try:
-            result = _reconcile_single_transfer(bank_record, ui_handler, manual_reconciliation_queue)
+            result = _reconcile_single_transfer(bank_record, ui_handler, manual_reconciliation_queue, candidate_index, fee_batch)
             if result:
                 successful_reconciliations += 1
             else:
@@ -61,35 +81,34 @@ def _reconcile_in_thread(bank_transactions, ui_handler, manual_reconciliation_qu
             logger.error(f"Error processing Paid Transfer transaction {bank_record.get('id', 'unknown')}: {e}")
             failed_reconciliations += 1
 
-        # Update progress with thread-safe UI updates
-        progress_percentage = (i + 1) / total_transactions * 100
+        # Publish the counter only; the UI renders the latest value at a fixed rate
         try:
-            # Use after_idle to ensure UI updates are thread-safe
-            if hasattr(ui_handler, 'parent'):
-                ui_handler.parent.after_idle(lambda p=progress_percentage: ui_handler.update_progress(p))
-                ui_handler.parent.after_idle(lambda i=i, t=total_transactions: ui_handler.update_detailed_status(f"مغایرت‌یابی {i + 1} از {t} تراکنش انتقال پرداختی انجام شد."))
-            else:
-                ui_handler.update_progress(progress_percentage)
-                ui_handler.update_detailed_status(f"مغایرت‌یابی {i + 1} از {total_transactions} تراکنش انتقال پرداختی انجام شد.")
+            ui_handler.update_counter(i + 1, total_transactions, "مغایرت‌یابی {done} از {total} تراکنش انتقال پرداختی انجام شد.", overall=True)
         except Exception as e:
             logger.warning(f"UI update failed: {e}")
 
+    try:
+        fee_batch.commit()
+    except Exception as e:
+        logger.error(f"Failed to commit fee-tier reconciliation batch: {e}", exc_info=True)
+        successful_reconciliations -= len(fee_batch)
+        failed_reconciliations += len(fee_batch)
+
     # Final status update
     final_message = f"مغایرت‌یابی انتقال پرداختی تکمیل شد. موفق: {successful_reconciliations}, ناموفق: {failed_reconciliations}"
     logger.info(final_message)
     
     try:
-        if hasattr(ui_handler, 'parent'):
-            ui_handler.parent.after_idle(lambda: ui_handler.update_status(final_message))
-        else:
-            ui_handler.update_status(final_message)
+        ui_handler.update_status(final_message)
     except Exception as e:
         logger.warning(f"Final UI update failed: {e}")
 
 
-def _reconcile_single_transfer(bank_record, ui_handler, manual_reconciliation_queue):
+def _reconcile_single_transfer(bank_record, ui_handler, manual_reconciliation_queue, candidate_index, fee_batch):
     """
     Reconciles a single Paid_Transfer transaction.
+    Exact candidates come from the in-memory date-window index of the current run;
+    fee-tier matches are queued on fee_batch.
     Returns True if reconciliation was successful, False otherwise.
     """
     try:
@@ -104,19 +123,28 @@ def _reconcile_single_transfer(bank_record, ui_handler, manual_reconciliation_qu
             bank_record.get('depositor_name').strip()):
             
             salary_result = _handle_salary_payment_reconciliation(
-                bank_record, ui_handler, manual_reconciliation_queue, bank_id, bank_date, bank_amount, transaction_type
+                bank_record, ui_handler, manual_reconciliation_queue, bank_id, bank_date, bank_amount, transaction_type,
+                candidate_index
             )
             if salary_result is not None:
                 return salary_result
         
         # ۱. ابتدا رکوردهای همسان در جدول حسابداری جستجو می‌شود
-        exact_matches = get_transactions_by_date_amount_type(bank_id, bank_date, bank_amount, transaction_type)
+        exact_matches = candidate_index.nearest(
+            bank_id, transaction_type, bank_amount, bank_date, get_date_tolerance(transaction_type)
+        )
         if len(exact_matches) == 1:
             # اگر یک رکورد با مبلغ دقیقاً یکسان پیدا شد، مغایرت‌گیری انجام می‌شود
             success_reconciliation_result(bank_record['id'], exact_matches[0]['id'], None, 'Exact match', transaction_type)
+            candidate_index.discard(exact_matches[0]['id'])
             logger.info(f"Reconciled Bank Transfer {bank_record['id']} with accounting doc {exact_matches[0]['id']}")
             return True
 
+        # ۱.۵. جستجوی مبلغ بانک منهای تعرفه‌های کارمزد (پایا، ساتنا و ...)؛
+        # چند رکورد هم‌مبلغ به مرحله شماره پیگیری یا مغایرت‌گیری دستی می‌روند
+        if not exact_matches and _reconcile_with_fee_tiers(bank_record, candidate_index, fee_batch, transaction_type):
+            return True
+
         # 2. اگر رکورد دقیقاً مشابه پیدا نشد، تمام رکوردهای حسابداری در تاریخ مورد نظر را بررسی می‌کنیم
         all_accounting_records = get_transactions_by_date_type(bank_id, bank_date, transaction_type)
         
@@ -127,6 +155,12 @@ def _reconcile_single_transfer(bank_record, ui_handler, manual_reconciliation_qu
                 all_accounting_records = get_transactions_by_amount_tracking(bank_id, bank_amount, bank_tracking_number, transaction_type)
                 logger.info(f"Searching by amount and tracking number due to no date matches. Found {len(all_accounting_records)} potential matches.")
         
+        # Fee-tier matches of this run are still pending in fee_batch and look unreconciled in the DB
+        all_accounting_records = [
+            acc_record for acc_record in (all_accounting_records or [])
+            if not candidate_index.is_discarded(acc_record['id'])
+        ]
+        
         if all_accounting_records and len(all_accounting_records) > 0:
             # بررسی شماره پیگیری
             bank_tracking_number = bank_record.get('extracted_tracking_number', '')
@@ -175,6 +209,7 @@ def _reconcile_single_transfer(bank_record, ui_handler, manual_reconciliation_qu
                         # تنظیم فیلد is_reconciled برای هر دو رکورد بانک و حسابداری
                         update_bank_transaction(bank_record['id'], {'is_reconciled': 1})
                         update_accounting_transaction_reconciliation_status(acc_record['id'], 1)
+                        candidate_index.discard(acc_record['id'])
                         
                         # ثبت نتیجه مغایرت‌گیری
                         success_reconciliation_result(bank_record['id'], acc_record['id'], None, 
@@ -186,7 +221,10 @@ def _reconcile_single_transfer(bank_record, ui_handler, manual_reconciliation_qu
         # روش قبلی برای مغایرت‌گیری با کارمزد ثابت حذف شد
 
         # 3. مغایرت‌گیری دستی
-        potential_matches = get_transactions_by_date_less_than_amount_type(bank_id, bank_date, bank_amount, transaction_type)
+        potential_matches = [
+            acc_record for acc_record in (get_transactions_by_date_less_than_amount_type(bank_id, bank_date, bank_amount, transaction_type) or [])
+            if not candidate_index.is_discarded(acc_record['id'])
+        ]
         
         # فقط در صورتی که رکورد حسابداری مغایرت‌یابی نشده وجود داشته باشد، دیالوگ را نمایش می‌دهیم
         if potential_matches and len(potential_matches) > 0:
@@ -241,6 +279,7 @@ def _reconcile_single_transfer(bank_record, ui_handler, manual_reconciliation_qu
             
             # ثبت نتیجه مغایرت‌گیری
             success_reconciliation_result(bank_record['id'], result['id'], None, notes, transaction_type)
+            candidate_index.discard(result['id'])
             logger.info(f"Manually reconciled Bank Transfer {bank_record['id']} with accounting doc {result['id']}")
             return True
         else:
@@ -254,8 +293,49 @@ def _reconcile_single_transfer(bank_record, ui_handler, manual_reconciliation_qu
         return False
 
 
+def _reconcile_with_fee_tiers(bank_record, candidate_index, fee_batch, transaction_type):
+    """
+    مغایرت‌گیری خودکار با احتساب تعرفه‌های کارمزد انتقال
+    
+    اگر با کسر یکی از تعرفه‌ها دقیقاً یک رکورد حسابداری (یا یک رکورد با
+    شماره پیگیری مطابق) یافت شود، جداسازی کارمزد و نتیجه مغایرت‌گیری در
+    دسته ثبت یکجا قرار می‌گیرند.
+    
+    Returns:
+        bool: True اگر تطبیق انجام شد
+    """
+    tier_name, fee_amount, candidates = find_fee_adjusted_candidates(
+        candidate_index, bank_record['bank_id'], transaction_type, bank_record['amount'],
+        bank_record['transaction_date'], get_date_tolerance(transaction_type)
+    )
+    
+    if len(candidates) > 1:
+        bank_tracking_number = bank_record.get('extracted_tracking_number') or ''
+        candidates = [
+            candidate for candidate in candidates
+            if compare_tracking_numbers(str(bank_tracking_number), str(candidate.get('transaction_number') or ''))
+        ]
+    
+    if len(candidates) != 1:
+        return False
+    
+    acc_record = candidates[0]
+    principal_amount, fee_row_amount = split_fee_amounts(bank_record['amount'], fee_amount)
+    fee_batch.add_fee_split(
+        bank_record, principal_amount, fee_row_amount,
+        f"کارمزد {tier_name} برای رکورد شماره {bank_record['id']} بانک - شماره پیگیری بانک: {bank_record.get('extracted_tracking_number', '')}"
+    )
+    fee_batch.add_success(
+        bank_record['id'], acc_record['id'], None,
+        f'Automatic {tier_name} fee reconciliation. Fee: {fee_amount}', transaction_type
+    )
+    candidate_index.discard(acc_record['id'])
+    logger.info(f"Reconciled Bank Transfer {bank_record['id']} with accounting doc {acc_record['id']} using {tier_name} fee {fee_amount}")
+    return True
+
+
 def _handle_salary_payment_reconciliation(bank_record, ui_handler, manual_reconciliation_queue, 
-                                        bank_id, bank_date, bank_amount, transaction_type):
+                                        bank_id, bank_date, bank_amount, transaction_type, candidate_index=None):
     """
     هندل مغایرت‌یابی مخصوص پرداخت حقوق بر اساس نام واریز کننده
     
@@ -304,7 +384,7 @@ def _handle_salary_payment_reconciliation(bank_record, ui_handler, manual_reconc
         # اگر یک رکورد پیدا شد، مستقیم مغایرت‌یابی کنیم
         if len(smaller_amount_matches) == 1:
             return _process_single_salary_match(
-                bank_record, smaller_amount_matches[0], bank_amount, transaction_type
+                bank_record, smaller_amount_matches[0], bank_amount, transaction_type, candidate_index
             )
         
         # اگر بیش از یک رکورد پیدا شد، بر اساس شماره پیگیری فیلتر کنیم
@@ -315,7 +395,7 @@ def _handle_salary_payment_reconciliation(bank_record, ui_handler, manual_reconc
             
             if len(tracking_matches) == 1:
                 return _process_single_salary_match(
-                    bank_record, tracking_matches[0], bank_amount, transaction_type
+                    bank_record, tracking_matches[0], bank_amount, transaction_type, candidate_index
                 )
             else:
                 logger.warning(f"بیش از یک رکورح مطابق پیدا شد: {len(tracking_matches)}")
@@ -401,7 +481,7 @@ def _compare_tracking_digits(bank_tracking, acc_tracking):
         return False
 
 
-def _process_single_salary_match(bank_record, accounting_record, bank_amount, transaction_type):
+def _process_single_salary_match(bank_record, accounting_record, bank_amount, transaction_type, candidate_index=None):
     """پردازش مغایرت‌یابی یک رکورد حقوق"""
     try:
         accounting_amount = float(accounting_record.get('transaction_amount', 0))
@@ -439,6 +519,8 @@ def _process_single_salary_match(bank_record, accounting_record, bank_amount, tr
         
         update_bank_transaction_reconciliation_status(bank_record['id'], 1)
         update_accounting_transaction_reconciliation_status(accounting_record['id'], 1)
+        if candidate_index is not None:
+            candidate_index.discard(accounting_record['id'])
         
         # ثبت نتیجه مغایرت‌یابی
         success_reconciliation_result(
@@ -6,7 +6,7 @@ from tkinter import messagebox
 from utils.logger_config import setup_logger
 from utils.helpers import get_pos_date_from_bank
 from utils.compare_tracking_numbers import compare_tracking_numbers
-from database.repositories.accounting import get_transactions_by_date_amount_type
+from reconciliation.candidate_index import DateWindowIndex, get_date_tolerance
 from reconciliation.save_reconciliation_result import success_reconciliation_result, fail_reconciliation_result
 
 logger = setup_logger('reconciliation.mellat_pos_reconciliation')
@@ -39,9 +39,21 @@ def _reconcile_in_thread(pos_transactions, ui_handler, manual_reconciliation_que
     successful_reconciliations = 0
     failed_reconciliations = 0
     
+    # Load unreconciled accounting candidates once for the whole run
+    try:
+        bank_id = pos_transactions[0]['bank_id'] if pos_transactions else None
+        candidate_index = DateWindowIndex.load(bank_id, ['Pos'])
+    except Exception as e:
+        logger.error(f"Failed to load accounting candidates for POS reconciliation: {e}", exc_info=True)
+        try:
+            ui_handler.update_status(f"مغایرت‌یابی POS انجام نشد: خطا در بارگذاری اسناد حسابداری ({e})")
+        except Exception as ui_error:
+            logger.warning(f"UI update failed: {ui_error}")
+        return
+    
     for i, tx in enumerate(pos_transactions):
         try:
-            result = _reconcile_single_pos(tx, ui_handler, manual_reconciliation_queue)
+            result = _reconcile_single_pos(tx, ui_handler, manual_reconciliation_queue, candidate_index)
             if result:
                 successful_reconciliations += 1
             else:
@@ -50,16 +62,9 @@ def _reconcile_in_thread(pos_transactions, ui_handler, manual_reconciliation_que
             logger.error(f"Error processing POS transaction {tx.get('id', 'unknown')}: {e}")
             failed_reconciliations += 1
 
-        # Update progress with thread-safe UI updates
-        progress_percentage = (i + 1) / total_transactions * 100
+        # Publish the counter only; the UI renders the latest value at a fixed rate
         try:
-            # Use after_idle to ensure UI updates are thread-safe
-            if hasattr(ui_handler, 'parent'):
-                ui_handler.parent.after_idle(lambda p=progress_percentage: ui_handler.update_progress(p))
-                ui_handler.parent.after_idle(lambda i=i, t=total_transactions: ui_handler.update_detailed_status(f"مغایرت‌یابی {i + 1} از {t} تراکنش POS انجام شد."))
-            else:
-                ui_handler.update_progress(progress_percentage)
-                ui_handler.update_detailed_status(f"مغایرت‌یابی {i + 1} از {total_transactions} تراکنش POS انجام شد.")
+            ui_handler.update_counter(i + 1, total_transactions, "مغایرت‌یابی {done} از {total} تراکنش POS انجام شد.", overall=True)
         except Exception as e:
             logger.warning(f"UI update failed: {e}")
 
@@ -68,17 +73,15 @@ def _reconcile_in_thread(pos_transactions, ui_handler, manual_reconciliation_que
     logger.info(final_message)
     
     try:
-        if hasattr(ui_handler, 'parent'):
-            ui_handler.parent.after_idle(lambda: ui_handler.update_status(final_message))
-        else:
-            ui_handler.update_status(final_message)
+        ui_handler.update_status(final_message)
     except Exception as e:
         logger.warning(f"Final UI update failed: {e}")
 
 
-def _reconcile_single_pos(bank_record, ui_handler, manual_reconciliation_queue):
+def _reconcile_single_pos(bank_record, ui_handler, manual_reconciliation_queue, candidate_index):
     """
     Reconciles a single POS transaction with a more optimized logic.
+    Candidates come from the in-memory date-window index of the current run.
     Returns True if reconciliation was successful, False otherwise.
     """
     try:
@@ -86,10 +89,11 @@ def _reconcile_single_pos(bank_record, ui_handler, manual_reconciliation_queue):
         bank_amount = bank_record['amount']
         bank_tracking_num = bank_record['extracted_tracking_number']
 
-        matches = get_transactions_by_date_amount_type(bank_record['bank_id'], bank_date, bank_amount, 'Pos')
+        matches = candidate_index.nearest(bank_record['bank_id'], 'Pos', bank_amount, bank_date, get_date_tolerance('Pos'))
 
         def handle_success(accounting_doc):
             success_reconciliation_result(bank_record['id'], accounting_doc['id'], None, 'Exact match', 'Pos')
+            candidate_index.discard(accounting_doc['id'])
             logger.info(f"Reconciled POS transaction {bank_record['id']} with accounting doc {accounting_doc['id']}")
             return True
 
@@ -10,7 +10,7 @@ from utils.logger_config import setup_logger
 from utils.constants import TransactionTypes
 
 from utils.compare_tracking_numbers import compare_tracking_numbers
-from database.repositories.accounting import get_transactions_by_date_amount_type
+from reconciliation.candidate_index import DateWindowIndex, get_date_tolerance
 from reconciliation.save_reconciliation_result import success_reconciliation_result, fail_reconciliation_result
 
 logger = setup_logger('reconciliation.mellat_received_transfer_reconciliation')
@@ -42,9 +42,21 @@ def _reconcile_in_thread(bank_transactions, ui_handler, manual_reconciliation_qu
     successful_reconciliations = 0
     failed_reconciliations = 0
     
+    # Load unreconciled accounting candidates once for the whole run
+    try:
+        bank_id = bank_transactions[0]['bank_id'] if bank_transactions else None
+        candidate_index = DateWindowIndex.load(bank_id, [TransactionTypes.RECEIVED_TRANSFER])
+    except Exception as e:
+        logger.error(f"Failed to load accounting candidates for Received_Transfer reconciliation: {e}", exc_info=True)
+        try:
+            ui_handler.update_status(f"مغایرت‌یابی انتقال دریافتی انجام نشد: خطا در بارگذاری اسناد حسابداری ({e})")
+        except Exception as ui_error:
+            logger.warning(f"UI update failed: {ui_error}")
+        return
+    
     for i, bank_record in enumerate(bank_transactions):
         try:
-            result = _reconcile_single_transfer(bank_record, ui_handler, manual_reconciliation_queue)
+            result = _reconcile_single_transfer(bank_record, ui_handler, manual_reconciliation_queue, candidate_index)
             if result:
                 successful_reconciliations += 1
             else:
@@ -53,16 +65,9 @@ def _reconcile_in_thread(bank_transactions, ui_handler, manual_reconciliation_qu
             logger.error(f"Error processing Received Transfer transaction {bank_record.get('id', 'unknown')}: {e}")
             failed_reconciliations += 1
 
-        # Update progress with thread-safe UI updates
-        progress_percentage = (i + 1) / total_transactions * 100
+        # Publish the counter only; the UI renders the latest value at a fixed rate
         try:
-            # Use after_idle to ensure UI updates are thread-safe
-            if hasattr(ui_handler, 'parent'):
-                ui_handler.parent.after_idle(lambda p=progress_percentage: ui_handler.update_progress(p))
-                ui_handler.parent.after_idle(lambda i=i, t=total_transactions: ui_handler.update_detailed_status(f"مغایرت‌یابی {i + 1} از {t} تراکنش انتقال دریافتی انجام شد."))
-            else:
-                ui_handler.update_progress(progress_percentage)
-                ui_handler.update_detailed_status(f"مغایرت‌یابی {i + 1} از {total_transactions} تراکنش انتقال دریافتی انجام شد.")
+            ui_handler.update_counter(i + 1, total_transactions, "مغایرت‌یابی {done} از {total} تراکنش انتقال دریافتی انجام شد.", overall=True)
         except Exception as e:
             logger.warning(f"UI update failed: {e}")
 
@@ -71,17 +76,15 @@ def _reconcile_in_thread(bank_transactions, ui_handler, manual_reconciliation_qu
     logger.info(final_message)
     
     try:
-        if hasattr(ui_handler, 'parent'):
-            ui_handler.parent.after_idle(lambda: ui_handler.update_status(final_message))
-        else:
-            ui_handler.update_status(final_message)
+        ui_handler.update_status(final_message)
     except Exception as e:
         logger.warning(f"Final UI update failed: {e}")
 
 
-def _reconcile_single_transfer(bank_record, ui_handler, manual_reconciliation_queue):
+def _reconcile_single_transfer(bank_record, ui_handler, manual_reconciliation_queue, candidate_index):
     """
     Reconciles a single Received_Transfer transaction.
+    Candidates come from the in-memory date-window index of the current run.
     Returns True if reconciliation was successful, False otherwise.
     """
     try:
@@ -90,11 +93,15 @@ def _reconcile_single_transfer(bank_record, ui_handler, manual_reconciliation_qu
         bank_tracking_num = bank_record['extracted_tracking_number']
 
         # Step 1: Get all potential matches based on date, amount, and type
-        matches = get_transactions_by_date_amount_type(bank_record['bank_id'], bank_date, bank_amount, TransactionTypes.RECEIVED_TRANSFER)
+        matches = candidate_index.nearest(
+            bank_record['bank_id'], TransactionTypes.RECEIVED_TRANSFER, bank_amount, bank_date,
+            get_date_tolerance(TransactionTypes.RECEIVED_TRANSFER)
+        )
 
         # Helper function for consistent success handling
         def handle_success(accounting_doc):
             success_reconciliation_result(bank_record['id'], accounting_doc['id'], None, 'Exact match', 'Received_Transfer')
+            candidate_index.discard(accounting_doc['id'])
             logger.info(f"Reconciled Bank Transfer {bank_record['id']} with accounting doc {accounting_doc['id']}")
             return True
 
@@ -7,10 +7,14 @@ from tkinter import messagebox
 from utils.logger_config import setup_logger
 from utils.compare_tracking_numbers import compare_tracking_numbers
 from database.init_db import create_connection
+from reconciliation.candidate_index import DateWindowIndex, get_date_tolerance
 from reconciliation.save_reconciliation_result import success_reconciliation_result, fail_reconciliation_result
 
 logger = setup_logger('reconciliation.mellat_shaparak_reconciliation')
 
+# انواع حسابداری قابل تطبیق با رکوردهای POS شاپرک
+SHAPARAK_ACCOUNTING_TYPES = ['Pos', 'Pos / Received Transfer', 'Received_Transfer']
+
 
 def reconcile_mellat_shaparak(shaparak_transactions, ui_handler, manual_reconciliation_queue):
     """
@@ -42,9 +46,21 @@ def _reconcile_in_thread(shaparak_transactions, ui_handler, manual_reconciliatio
     successful_reconciliations = 0
     failed_reconciliations = 0
     
+    # Load unreconciled accounting candidates once for the whole run
+    try:
+        bank_id = shaparak_transactions[0]['bank_id'] if shaparak_transactions else None
+        candidate_index = DateWindowIndex.load(bank_id, [SHAPARAK_ACCOUNTING_TYPES])
+    except Exception as e:
+        logger.error(f"Failed to load accounting candidates for Shaparak reconciliation: {e}", exc_info=True)
+        try:
+            ui_handler.update_status(f"مغایرت‌یابی شاپرک انجام نشد: خطا در بارگذاری اسناد حسابداری ({e})")
+        except Exception as ui_error:
+            logger.warning(f"UI update failed: {ui_error}")
+        return
+    
     for i, tx in enumerate(shaparak_transactions):
         try:
-            result = _reconcile_single_shaparak(tx, ui_handler, manual_reconciliation_queue)
+            result = _reconcile_single_shaparak(tx, ui_handler, manual_reconciliation_queue, candidate_index)
             if result:
                 successful_reconciliations += 1
             else:
@@ -53,16 +69,9 @@ def _reconcile_in_thread(shaparak_transactions, ui_handler, manual_reconciliatio
             logger.error(f"Error processing Shaparak transaction {tx.get('id', 'unknown')}: {e}")
             failed_reconciliations += 1
 
-        # Update progress with thread-safe UI updates
-        progress_percentage = (i + 1) / total_transactions * 100
+        # Publish the counter only; the UI renders the latest value at a fixed rate
         try:
-            # Use after_idle to ensure UI updates are thread-safe
-            if hasattr(ui_handler, 'parent'):
-                ui_handler.parent.after_idle(lambda p=progress_percentage: ui_handler.update_progress(p))
-                ui_handler.parent.after_idle(lambda i=i, t=total_transactions: ui_handler.update_detailed_status(f"مغایرت‌یابی {i + 1} از {t} تراکنش شاپرک انجام شد."))
-            else:
-                ui_handler.update_progress(progress_percentage)
-                ui_handler.update_detailed_status(f"مغایرت‌یابی {i + 1} از {total_transactions} تراکنش شاپرک انجام شد.")
+            ui_handler.update_counter(i + 1, total_transactions, "مغایرت‌یابی {done} از {total} تراکنش شاپرک انجام شد.", overall=True)
         except Exception as e:
             logger.warning(f"UI update failed: {e}")
 
@@ -71,15 +80,12 @@ def _reconcile_in_thread(shaparak_transactions, ui_handler, manual_reconciliatio
     logger.info(final_message)
     
     try:
-        if hasattr(ui_handler, 'parent'):
-            ui_handler.parent.after_idle(lambda: ui_handler.update_status(final_message))
-        else:
-            ui_handler.update_status(final_message)
+        ui_handler.update_status(final_message)
     except Exception as e:
         logger.warning(f"Final UI update failed: {e}")
 
 
-def _reconcile_single_shaparak(bank_record, ui_handler, manual_reconciliation_queue):
+def _reconcile_single_shaparak(bank_record, ui_handler, manual_reconciliation_queue, candidate_index):
     """
     مغایرت‌یابی یک تراکنش Shaparak با الگوریتم مشابه POS کشاورزی
     
@@ -122,8 +128,10 @@ def _reconcile_single_shaparak(bank_record, ui_handler, manual_reconciliation_qu
             pos_amount = pos_record.get('transaction_amount', 0)
             pos_tracking = pos_record.get('tracking_number', '')
             
-            # جستجوی رکورد حسابداری بر اساس مبلغ و تاریخ
-            accounting_matches = get_accounting_transactions_for_pos(bank_id, pos_date, pos_amount)
+            # جستجوی رکورد حسابداری بر اساس مبلغ و تاریخ در ایندکس کاندیداها
+            accounting_matches = candidate_index.nearest(
+                bank_id, SHAPARAK_ACCOUNTING_TYPES, pos_amount, pos_date, get_date_tolerance('Shaparak')
+            )
             
             if not accounting_matches:
                 logger.debug(f"رکورد حسابداری برای POS {pos_record['id']} یافت نشد")
@@ -149,6 +157,7 @@ def _reconcile_single_shaparak(bank_record, ui_handler, manual_reconciliation_qu
             if best_accounting_match:
                 # مغایرت‌یابی POS با حسابداری
                 if reconcile_pos_with_accounting(pos_record, best_accounting_match):
+                    candidate_index.discard(best_accounting_match['id'])
                     reconciled_pos_count += 1
                     reconciled_accounting_ids.append(best_accounting_match['id'])
                     logger.info(f"POS {pos_record['id']} با حسابداری {best_accounting_match['id']} مغایرت‌یابی شد")
@@ -242,48 +251,6 @@ def get_mellat_pos_transactions_by_date(pos_date, bank_id):
             conn.close()
 
 
-def get_accounting_transactions_for_pos(bank_id, transaction_date, amount):
-    """
-    جستجوی رکوردهای حسابداری برای POS
-    
-    Args:
-        bank_id: شناسه بانک
-        transaction_date: تاریخ تراکنش
-        amount: مبلغ تراکنش
-        
-    Returns:
-        list: لیست رکوردهای حسابداری مغایرت‌یابی نشده
-    """
-    conn = None
-    try:
-        conn = create_connection()
-        cursor = conn.cursor()
-        
-        # جستجوی رکوردهای حسابداری POS با مبلغ و تاریخ مطابق
-        cursor.execute("""
-            SELECT * FROM AccountingTransactions 
-            WHERE bank_id = ? 
-            AND due_date = ?
-            AND ABS(transaction_amount) = ?
-            AND (transaction_type = 'Pos' OR transaction_type = 'Pos / Received Transfer' 
-                 OR transaction_type = 'Received_Transfer')
-            AND is_reconciled = 0
-        """, (bank_id, transaction_date, abs(float(amount))))
-        
-        columns = [description[0] for description in cursor.description]
-        result = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        
-        logger.info(f"{len(result)} رکورد حسابداری POS یافت شد")
-        return result
-        
-    except Exception as e:
-        logger.error(f"خطا در جستجوی حسابداری POS: {str(e)}")
-        return []
-    finally:
-        if conn:
-            conn.close()
-
-
 def reconcile_pos_with_accounting(pos_record, accounting_record):
     """
     مغایرت‌یابی یک رکورد POS با رکورد حسابداری
@@ -2,6 +2,7 @@ from database.reconciliation_results_repository import create_reconciliation_res
 from database.pos_transactions_repository import update_reconciliation_status
 from database.repositories.accounting import update_accounting_transaction_reconciliation_status
 from database.bank_transaction_repository import update_bank_transaction_reconciliation_status
+from database.reconciliation.reconciliation_batch_repository import save_reconciliation_batch
 from utils.logger_config import setup_logger
 logger = setup_logger('save_reconciliation_result')
 
@@ -90,3 +91,73 @@ def fail_reconciliation_result(bank_record_id, acc_record_id, pos_record_id, des
         raise
 
 
+class ReconciliationBatch:
+    """
+    Collects reconciliation results and fee splits of a run and writes them
+    to the database in a single transaction.
+
+    Args:
+        flush_size: Optional number of queued results after which the batch
+            is committed automatically (None means commit only on demand).
+    """
+
+    def __init__(self, flush_size=None):
+        self.flush_size = flush_size
+        self.fee_splits = []
+        self.results = []
+
+    def __len__(self):
+        return len(self.results)
+
+    def add_success(self, bank_record_id, acc_record_id, pos_record_id, description, match_type):
+        """Queue a successful reconciliation result."""
+        self._add_result(bank_record_id, acc_record_id, pos_record_id, description, match_type, 1)
+
+    def add_failure(self, bank_record_id, acc_record_id, pos_record_id, description, match_type):
+        """Queue a failed reconciliation result."""
+        self._add_result(bank_record_id, acc_record_id, pos_record_id, description, match_type, 0)
+
+    def add_fee_split(self, bank_record, principal_amount, fee_amount, description):
+        """
+        Queue splitting a bank record into principal and a separate fee row.
+
+        Args:
+            bank_record: Bank transaction dict (the original row)
+            principal_amount: New amount of the bank row
+            fee_amount: Amount of the fee row to create
+            description: Description of the fee row
+        """
+        self.fee_splits.append({
+            'bank_record': dict(bank_record),
+            'principal_amount': principal_amount,
+            'fee_amount': fee_amount,
+            'description': description
+        })
+
+    def commit(self):
+        """
+        Write all queued operations in one transaction and clear the batch.
+
+        Returns:
+            int: Number of reconciliation results written
+        """
+        if not self.results and not self.fee_splits:
+            return 0
+        count = len(self.results)
+        save_reconciliation_batch(self.fee_splits, self.results)
+        logger.info(f"Committed reconciliation batch: {count} results, {len(self.fee_splits)} fee splits")
+        self.fee_splits = []
+        self.results = []
+        return count
+
+    def _add_result(self, bank_record_id, acc_record_id, pos_record_id, description, match_type, status):
+        self.results.append({
+            'bank_record_id': bank_record_id,
+            'acc_id': acc_record_id,
+            'pos_id': pos_record_id,
+            'description': description,
+            'type_matched': match_type,
+            'status': status
+        })
+        if self.flush_size and len(self.results) >= self.flush_size:
+            self.commit()
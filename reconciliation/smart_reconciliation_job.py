@@ -0,0 +1,186 @@
+"""
+کار مغایرت‌یابی هوشمند قابل توقف، ادامه و لغو
+وضعیت هر رکورد در دیتابیس نگهداری می‌شود تا پس از بسته شدن برنامه، کار بدون
+ارسال مجدد رکوردهای تمام شده ادامه یابد.
+"""
+import threading
+from typing import Callable, Dict, Optional
+from database.pos_transactions_repository import get_unreconciled_transactions_by_bank
+from database.bank_transaction_repository import get_unreconciled_ids_by_bank_and_types
+from database.smart_reconciliation_jobs_repository import (
+    create_smart_job,
+    get_smart_job,
+    update_smart_job_status,
+    get_unfinished_smart_job_items,
+    mark_smart_job_items_sent,
+    save_smart_job_item_result,
+    get_smart_job_source_records
+)
+from utils.logger_config import setup_logger
+
+logger = setup_logger('reconciliation.smart_reconciliation_job')
+
+# ترتیب پردازش انواع رکورد در هر کار
+SMART_RECORD_TYPES = ['POS', 'Received_Transfer', 'Paid_Transfer', 'Received_Check', 'Paid_Check']
+
+# تبدیل وضعیت نتیجه AIMatcher به وضعیت رکورد کار؛ خطاهای موقت AI (نتیجه دارای
+# transient) به جای وضعیت نهایی error به pending برمی‌گردند تا در ادامه کار ارسال شوند
+ITEM_STATE_BY_STATUS = {
+    'auto_matched': 'matched',
+    'needs_review': 'needs_review',
+    'no_match': 'no_match',
+    'error': 'error'
+}
+
+
+class SmartReconciliationJob:
+    """اجرای یک کار مغایرت‌یابی هوشمند در نخ پس‌زمینه"""
+
+    def __init__(self, job_id: int, ai_matcher, on_result: Optional[Callable[[int, int, bool, Dict], None]] = None):
+        """
+        Args:
+            job_id: شناسه کار
+            ai_matcher: نمونه AIMatcher
+            on_result: تابع فراخوانی پس از ثبت هر نتیجه با
+                (تعداد رکوردهای تمام شده، کل رکوردها، موفقیت، نتیجه)
+        """
+        self.job_id = job_id
+        self.ai_matcher = ai_matcher
+        self.on_result = on_result
+        self.status = None
+        self._pause_requested = threading.Event()
+        self._cancel_requested = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def create(cls, bank_id: int, ai_matcher, on_result=None) -> 'SmartReconciliationJob':
+        """ایجاد کار جدید از تمام رکوردهای مغایرت‌نشده بانک"""
+        items = [('POS', record['id']) for record in get_unreconciled_transactions_by_bank(bank_id)]
+        bank_ids_by_type = {record_type: [] for record_type in SMART_RECORD_TYPES[1:]}
+        for record in get_unreconciled_ids_by_bank_and_types(bank_id, SMART_RECORD_TYPES[1:]):
+            bank_ids_by_type[record['transaction_type']].append(record['id'])
+        for record_type in SMART_RECORD_TYPES[1:]:
+            items += [(record_type, record_id) for record_id in bank_ids_by_type[record_type]]
+        job_id = create_smart_job(bank_id, ai_matcher.backend, items)
+        return cls(job_id, ai_matcher, on_result)
+
+    @classmethod
+    def resume(cls, job_id: int, ai_matcher, on_result=None) -> 'SmartReconciliationJob':
+        """
+        ادامه یک کار ناتمام
+
+        نتایج قبلی کار با موتور ثبت شده در آن به دست آمده‌اند؛ ادامه با موتور
+        دیگر پذیرفته نمی‌شود.
+        """
+        job = get_smart_job(job_id)
+        if job is None:
+            raise ValueError(f"کار {job_id} یافت نشد")
+        if job['backend'] and job['backend'] != ai_matcher.backend:
+            raise ValueError(
+                f"کار {job_id} با موتور {job['backend']} ایجاد شده است؛ "
+                f"برای ادامه آن موتور {job['backend']} را انتخاب کنید"
+            )
+        return cls(job_id, ai_matcher, on_result)
+
+    def start(self):
+        """شروع اجرای کار در نخ پس‌زمینه"""
+        self._pause_requested.clear()
+        self._cancel_requested.clear()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def pause(self):
+        """توقف موقت؛ رکوردهای باقی‌مانده برای ادامه بعدی حفظ می‌شوند"""
+        self._pause_requested.set()
+
+    def cancel(self):
+        """لغو کار؛ رکوردهای باقی‌مانده پردازش نخواهند شد"""
+        self._cancel_requested.set()
+
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _should_continue(self) -> bool:
+        return not (self._pause_requested.is_set() or self._cancel_requested.is_set())
+
+    def run(self):
+        """اجرای رکوردهای ناتمام کار و ثبت وضعیت هر رکورد"""
+        try:
+            job = get_smart_job(self.job_id)
+            if job is None:
+                raise ValueError(f"کار {self.job_id} یافت نشد")
+            update_smart_job_status(self.job_id, 'running')
+
+            items = get_unfinished_smart_job_items(self.job_id)
+            total_items = job['total_items']
+            finished_count = total_items - len(items)
+            records = get_smart_job_source_records(items)
+
+            tasks = []
+            task_items = []
+            for item in items:
+                record = records.get((item['record_type'], item['record_id']))
+                if record is None:
+                    save_smart_job_item_result(item['id'], 'error', reason='رکورد یافت نشد')
+                    finished_count += 1
+                elif record.get('is_reconciled'):
+                    # رکورد پیش از ثبت وضعیت (یا خارج از این کار) مغایرت‌گیری شده است
+                    save_smart_job_item_result(item['id'], 'matched', reason='رکورد پیش‌تر مغایرت‌گیری شده است')
+                    finished_count += 1
+                else:
+                    tasks.append((record, item['record_type']))
+                    task_items.append(item)
+
+            logger.info(f"اجرای کار {self.job_id}: {len(tasks)} رکورد باقی‌مانده از {total_items}")
+
+            def on_submit(start_index, count):
+                mark_smart_job_items_sent([item['id'] for item in task_items[start_index:start_index + count]])
+
+            retry_count = 0
+
+            def on_result(index, success, result):
+                nonlocal finished_count, retry_count
+                if result.get('status') == 'error' and result.get('transient'):
+                    save_smart_job_item_result(task_items[index]['id'], 'pending', reason=result.get('reason'))
+                    retry_count += 1
+                    if self.ai_matcher.circuit_breaker.is_open() and not self._pause_requested.is_set():
+                        # ادامه ارسال تا بسته شدن مدار فقط رکوردهای باقی‌مانده را ناموفق می‌کند
+                        logger.warning(f"مدار AI باز شد؛ کار {self.job_id} متوقف شد و رکوردهای باقی‌مانده قابل ادامه هستند")
+                        self._pause_requested.set()
+                    if self.on_result is not None:
+                        self.on_result(finished_count, total_items, success, result)
+                    return
+                save_smart_job_item_result(
+                    task_items[index]['id'],
+                    ITEM_STATE_BY_STATUS.get(result.get('status'), 'error'),
+                    result.get('matched_id'),
+                    result.get('confidence'),
+                    result.get('reason')
+                )
+                finished_count += 1
+                if self.on_result is not None:
+                    self.on_result(finished_count, total_items, success, result)
+
+            self.ai_matcher.process_concurrently(
+                tasks,
+                on_result=on_result,
+                should_continue=self._should_continue,
+                on_submit=on_submit
+            )
+
+            if self._cancel_requested.is_set():
+                self.status = 'cancelled'
+            elif self._pause_requested.is_set() or retry_count:
+                # رکوردهای دارای خطای موقت در انتظار مانده‌اند؛ کار قابل ادامه است
+                self.status = 'paused'
+            else:
+                self.status = 'completed'
+            update_smart_job_status(self.job_id, self.status)
+
+        except Exception as e:
+            logger.error(f"خطا در اجرای کار مغایرت‌یابی هوشمند {self.job_id}: {str(e)}")
+            self.status = 'failed'
+            try:
+                update_smart_job_status(self.job_id, 'failed')
+            except Exception:
+                pass
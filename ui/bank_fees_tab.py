@@ -3,11 +3,6 @@ import logging
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from tkinter import StringVar, messagebox, filedialog
-import pandas as pd
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
 
 from database.banks_repository import get_all_banks
 from database.bank_fees_repository import collect_bank_fees, get_bank_fees
@@ -205,6 +200,7 @@ class BankFeesTab(ttk.Frame):
                 data.append(values)
                 
             # ایجاد دیتافریم و ذخیره به اکسل
+            import pandas as pd
             df = pd.DataFrame(data, columns=columns)
             df.to_excel(file_path, index=False)
             
@@ -239,6 +235,11 @@ class BankFeesTab(ttk.Frame):
                 data.append(values)
                 
             # ایجاد فایل PDF
+            from reportlab.lib.pagesizes import A4
+            from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
+            from reportlab.lib.styles import getSampleStyleSheet
+            from reportlab.lib import colors
+
             doc = SimpleDocTemplate(file_path, pagesize=A4)
             elements = []
             
@@ -6,11 +6,22 @@ UI Components Package
 - common: کامپوننت‌های مشترک
 - export: کامپوننت‌های خروجی
 - report: کامپوننت‌های گزارش‌گیری
+
+زیرپکیج‌ها هنگام اولین دسترسی بارگذاری می‌شوند تا import یک ماژول داخلی
+(مثلاً common.virtual_tree) کتابخانه‌های سنگین نمودار و خروجی را بارگذاری نکند.
 """
+import importlib
+
+# زیرپکیج‌هایی که نام‌های آن‌ها از طریق این پکیج نیز در دسترس است
+_EXPORTING_SUBPACKAGES = ('common', 'export', 'report')
+
 
-# ایمپورت‌های مهم برای دسترسی آسان
-from .common import *
-from .export import *
-from .report import *
+def __getattr__(name):
+    # دسترسی آسان به نام‌های زیرپکیج‌ها (مثلاً ui.components.TableView)
+    for subpackage in _EXPORTING_SUBPACKAGES:
+        module = importlib.import_module(f'{__name__}.{subpackage}')
+        if name in getattr(module, '__all__', ()):
+            return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 """UI components package for modular architecture"""
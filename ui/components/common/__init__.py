@@ -10,10 +10,14 @@ from .widgets import (
     save_file_dialog
 )
 from .table_view import TableView
+from .virtual_tree import VirtualTreeController, LazyRowSequence
+from .lazy_tab import LazyTab, bind_lazy_tabs
+from .progress_channel import ProgressChannel
+from .log_handler import BatchedTextHandler
 
 __all__ = [
     'PersianDatePicker', 'SearchBox', 'StatusBar', 'FilterPanel', 'LoadingDialog',
-    'TableView', 'show_confirmation_dialog', 'show_info_dialog', 'show_error_dialog', 
+    'TableView', 'VirtualTreeController', 'LazyRowSequence', 'LazyTab', 'bind_lazy_tabs', 'ProgressChannel', 'BatchedTextHandler', 'show_confirmation_dialog', 'show_info_dialog', 'show_error_dialog', 
     'show_warning_dialog', 'select_file_dialog', 'select_directory_dialog', 
     'save_file_dialog'
 ]
@@ -0,0 +1,80 @@
+"""
+Lazy Tab Module
+ساخت تب‌های نوت‌بوک در اولین انتخاب
+
+برای هر تب فقط یک فریم خالی به نوت‌بوک اضافه می‌شود. ماژول تب (به همراه
+کتابخانه‌های سنگین آن) و ویجت‌های آن زمانی import و ساخته می‌شوند که کاربر
+برای اولین بار آن تب را انتخاب کند؛ بنابراین پنجره اصلی بدون انتظار برای
+ساخت همه تب‌ها نمایش داده می‌شود.
+"""
+import time
+import logging
+import importlib
+from tkinter import ttk
+
+
+class LazyTab(ttk.Frame):
+    """فریم جانگهدار یک تب که محتوای واقعی آن در اولین انتخاب ساخته می‌شود"""
+
+    def __init__(self, notebook, module_name, class_name, title, logger=None, **tab_kwargs):
+        """
+        Args:
+            notebook: نوت‌بوک والد
+            module_name: مسیر ماژول تب (مثلاً 'ui.report_tab')
+            class_name: نام کلاس تب در ماژول
+            title: عنوان تب
+            logger: لاگر (اختیاری)
+            tab_kwargs: آرگومان‌های اضافه سازنده کلاس تب
+        """
+        super().__init__(notebook)
+        self.module_name = module_name
+        self.class_name = class_name
+        self.title = title
+        self.tab_kwargs = tab_kwargs
+        self.logger = logger or logging.getLogger(__name__)
+        self.tab = None
+        notebook.add(self, text=title)
+
+    @property
+    def is_built(self):
+        return self.tab is not None
+
+    def build(self):
+        """import ماژول و ساخت تب (فقط یک بار)؛ نمونه تب را برمی‌گرداند"""
+        if self.tab is not None:
+            return self.tab
+        self.logger.info(f"در حال بارگذاری تب {self.title}...")
+        started_at = time.perf_counter()
+        try:
+            tab_class = getattr(importlib.import_module(self.module_name), self.class_name)
+            self.tab = tab_class(self, **self.tab_kwargs)
+            self.tab.pack(fill="both", expand=True)
+        except Exception as e:
+            # تب ساخته نشده باقی می‌ماند تا با انتخاب مجدد دوباره تلاش شود
+            self.logger.error(f"خطا در بارگذاری تب {self.title}: {str(e)}")
+            self.tab = None
+            for widget in self.winfo_children():
+                widget.destroy()
+            raise
+        self.logger.info(f"تب {self.title} در {time.perf_counter() - started_at:.2f} ثانیه بارگذاری شد")
+        return self.tab
+
+    def call_if_built(self, method_name, *args, **kwargs):
+        """فراخوانی متدی از تب فقط در صورت ساخته شدن آن (تب ساخته نشده در زمان ساخت به‌روز خواهد بود)"""
+        if self.tab is not None:
+            return getattr(self.tab, method_name)(*args, **kwargs)
+        return None
+
+
+def bind_lazy_tabs(notebook):
+    """ساخت تب‌های LazyTab نوت‌بوک در اولین انتخاب هر کدام"""
+
+    def on_tab_changed(event):
+        selected = notebook.select()
+        if not selected:
+            return
+        tab = notebook.nametowidget(selected)
+        if isinstance(tab, LazyTab):
+            tab.build()
+
+    notebook.bind('<<NotebookTabChanged>>', on_tab_changed, add='+')
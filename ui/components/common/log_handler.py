@@ -0,0 +1,56 @@
+"""
+Log Handler Module
+نمایش لاگ‌ها در کادر متنی رابط کاربری به صورت دسته‌ای
+
+emit فقط متن فرمت شده را به صف اضافه می‌کند (از هر نخی قابل فراخوانی است) و
+نخ رابط کاربری با فاصله ثابت خطوط جمع شده را با یک insert به ویجت اضافه
+می‌کند؛ بنابراین ثبت لاگ در حلقه‌های پردازش باعث رسم مجدد ویجت برای هر پیام
+نمی‌شود. تعداد خطوط ویجت و صف به LOG_UI_MAX_LINES محدود است.
+"""
+import logging
+from collections import deque
+from tkinter import TclError
+from config.settings import LOG_UI_FLUSH_INTERVAL_MS, LOG_UI_MAX_LINES
+
+
+class BatchedTextHandler(logging.Handler):
+    """هندلر لاگ برای ویجت Text/ScrolledText با افزودن دسته‌ای خطوط"""
+
+    def __init__(self, text_widget, flush_interval_ms=LOG_UI_FLUSH_INTERVAL_MS, max_lines=LOG_UI_MAX_LINES):
+        """
+        Args:
+            text_widget: ویجت Text یا ScrolledText
+            flush_interval_ms: فاصله افزودن خطوط به ویجت (میلی‌ثانیه)
+            max_lines: حداکثر تعداد خطوط نگهداری شده در ویجت
+        """
+        super().__init__()
+        self.text_widget = text_widget
+        self.flush_interval_ms = flush_interval_ms
+        self.max_lines = max_lines
+        # در صورت عقب ماندن رابط کاربری، قدیمی‌ترین خطوط نمایش داده نشده کنار گذاشته می‌شوند
+        self._lines = deque(maxlen=max_lines)
+        self.text_widget.after(self.flush_interval_ms, self.flush_to_widget)
+
+    def emit(self, record):
+        try:
+            self._lines.append(self.format(record) + '\n')
+        except Exception:
+            self.handleError(record)
+
+    def flush_to_widget(self):
+        """افزودن خطوط جمع شده به ویجت (در نخ رابط کاربری)"""
+        lines = []
+        while self._lines:
+            lines.append(self._lines.popleft())
+        try:
+            if lines:
+                # ScrolledText در ttkbootstrap از state پشتیبانی نمی‌کند
+                self.text_widget.insert('end', ''.join(lines))
+                excess = int(self.text_widget.index('end-1c').split('.')[0]) - self.max_lines
+                if excess > 0:
+                    self.text_widget.delete('1.0', f'{excess + 1}.0')
+                self.text_widget.see('end')
+            self.text_widget.after(self.flush_interval_ms, self.flush_to_widget)
+        except TclError:
+            # ویجت از بین رفته است؛ هندلر دیگر پیامی نمایش نمی‌دهد
+            self.setLevel(logging.CRITICAL + 1)
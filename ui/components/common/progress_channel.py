@@ -0,0 +1,59 @@
+"""
+Progress Channel Module
+کانال تجمیع پیشرفت بین نخ‌های کاری و رابط کاربری
+
+نخ‌های کاری به جای زمان‌بندی یک callback در حلقه رویداد Tk برای هر رکورد،
+آخرین مقدار هر فیلد (وضعیت، درصد پیشرفت و ...) را در یک اسلات می‌نویسند و
+خطوط لاگ را به صف اضافه می‌کنند. نخ رابط کاربری با نرخ ثابت فقط آخرین مقادیر
+تغییر کرده و خطوط جمع شده از تیک قبل را برمی‌دارد؛ بنابراین تعداد به‌روزرسانی
+ویجت‌ها به تعداد رکوردها وابسته نیست.
+
+نوشتن در dict و deque در CPython زیر GIL اتمیک است و نیازی به قفل ندارد.
+"""
+from collections import deque
+
+_MISSING = object()
+
+
+class ProgressChannel:
+    """اسلات آخرین مقدار فیلدهای پیشرفت و صف خطوط لاگ"""
+
+    def __init__(self):
+        self._slot = {}
+        self._lines = deque()
+        self._rendered = {}
+
+    def publish(self, **fields):
+        """ثبت آخرین مقدار فیلدها (مقادیر قبلی نمایش داده نشده جایگزین می‌شوند)"""
+        self._slot.update(fields)
+
+    def append_line(self, line):
+        """افزودن یک خط لاگ برای نمایش در تیک بعدی"""
+        self._lines.append(line)
+
+    def drain(self, max_lines=None):
+        """
+        برداشتن تغییرات از آخرین فراخوانی (فقط از نخ رابط کاربری)
+
+        Args:
+            max_lines: حداکثر تعداد خطوط لاگ برداشته شده در این فراخوانی
+
+        Returns:
+            tuple: (دیکشنری فیلدهای تغییر کرده، لیست خطوط لاگ)
+        """
+        changes = {}
+        for name, value in self._slot.copy().items():
+            if self._rendered.get(name, _MISSING) != value:
+                changes[name] = value
+        self._rendered.update(changes)
+
+        lines = []
+        while self._lines and (max_lines is None or len(lines) < max_lines):
+            lines.append(self._lines.popleft())
+        return changes, lines
+
+    def reset(self):
+        """پاک کردن مقادیر و خطوط در انتظار (مثلاً در شروع اجرای جدید)"""
+        self._slot.clear()
+        self._lines.clear()
+        self._rendered.clear()
@@ -6,13 +6,15 @@ import tkinter as tk
 from tkinter import ttk
 import logging
 from functools import partial
+from .virtual_tree import VirtualTreeController
 
 
 class TableView(tk.Frame):
     """کلاس نمایش داده‌ها در قالب جدول"""
     
     def __init__(self, parent, columns=None, data=None, height=20, select_mode="browse", 
-                 on_row_select=None, on_header_click=None, **kwargs):
+                 on_row_select=None, on_header_click=None, virtual=False, overscan=20,
+                 row_key=None, formatter=None, sort_handler=None, **kwargs):
         """
         ایجاد جدول برای نمایش داده‌ها
         
@@ -24,16 +26,29 @@ class TableView(tk.Frame):
             select_mode: حالت انتخاب ("browse", "extended", "none")
             on_row_select: تابع callback برای رویداد انتخاب ردیف
             on_header_click: تابع callback برای رویداد کلیک روی هدر
+            virtual: حالت اسکرول مجازی برای داده‌های حجیم (فقط ردیف‌های قابل
+                مشاهده ساخته می‌شوند و کلیک روی هدر داده‌ها را مرتب می‌کند)
+            overscan: تعداد ردیف‌های اضافه بالا و پایین پنجره نمایش در حالت مجازی
+            row_key: تابع استخراج کلید یکتای ردیف (پیش‌فرض: فیلد id)
+            formatter: تابع تبدیل ردیف به مقادیر ستون‌ها (پیش‌فرض: مقدار فیلد هر ستون)
+            sort_handler: تابع مرتب‌سازی داده‌های صفحه‌بندی شده توسط والد (با ستون و
+                نزولی بودن)؛ در صورت عدم تعیین، جدول مجازی خود داده‌ها را مرتب می‌کند
         """
         super().__init__(parent, **kwargs)
         
         self.columns = columns or []
-        self.data = data or []
+        self.data = data if data is not None else []
         self.height = height
         self.select_mode = select_mode
         self.on_row_select = on_row_select
         self.on_header_click = on_header_click
         self.logger = logging.getLogger(__name__)
+        self.virtual = virtual
+        self.overscan = overscan
+        self.row_key = row_key
+        self.formatter = formatter or self._format_row
+        self.sort_handler = sort_handler
+        self.virtual_view = None
         
         self.tree = None
         self.scrollbar_y = None
@@ -85,6 +100,7 @@ class TableView(tk.Frame):
         # Setup striped rows
         self.tree.tag_configure('oddrow', background='#F9F9F9')
         self.tree.tag_configure('evenrow', background='white')
+        self.tree.tag_configure('highlight', background='#ffffcc')
         
         # Highlight selected row
         style = ttk.Style()
@@ -92,11 +108,21 @@ class TableView(tk.Frame):
                  foreground=[('selected', 'black')],
                  background=[('selected', '#c1e0ff')])
         
+        if self.virtual:
+            # اسکرول‌بار عمودی و رویداد انتخاب توسط کنترلر مجازی مدیریت می‌شوند
+            self.virtual_view = VirtualTreeController(
+                self.tree, self.scrollbar_y, self.formatter, key=self.row_key,
+                overscan=self.overscan, on_select=self._on_row_select
+            )
+        else:
+            self.tree.bind('<<TreeviewSelect>>', self._on_row_select)
+        
         # Load initial data
         self.load_data(self.data)
-        
-        # Event bindings
-        self.tree.bind('<<TreeviewSelect>>', self._on_row_select)
+    
+    def _format_row(self, item):
+        """مقادیر ستون‌های یک ردیف"""
+        return [item.get(col['id'], '') for col in self.columns]
     
     def load_data(self, data):
         """
@@ -105,6 +131,11 @@ class TableView(tk.Frame):
         Args:
             data: لیست داده‌ها
         """
+        if self.virtual_view is not None:
+            self.data = data if data is not None else []
+            self.virtual_view.set_records(self.data)
+            return
+        
         # Clear existing data
         self.clear()
         self.data = data
@@ -128,11 +159,19 @@ class TableView(tk.Frame):
     
     def clear(self):
         """پاک کردن تمام داده‌های جدول"""
+        if self.virtual_view is not None:
+            self.data = []
+            self.virtual_view.clear()
+            return
         for item in self.tree.get_children():
             self.tree.delete(item)
     
     def get_selected_row(self):
         """دریافت داده‌های ردیف انتخاب شده"""
+        if self.virtual_view is not None:
+            selected_rows = self.virtual_view.get_selected_records()
+            return selected_rows[0] if selected_rows else None
+        
         selected_items = self.tree.selection()
         if not selected_items:
             return None
@@ -145,6 +184,9 @@ class TableView(tk.Frame):
     
     def get_selected_rows(self):
         """دریافت تمام داده‌های ردیف‌های انتخاب شده"""
+        if self.virtual_view is not None:
+            return self.virtual_view.get_selected_records()
+        
         selected_items = self.tree.selection()
         if not selected_items:
             return []
@@ -159,6 +201,13 @@ class TableView(tk.Frame):
     
     def select_row(self, index):
         """انتخاب ردیف با ایندکس مشخص"""
+        if self.virtual_view is not None:
+            try:
+                self.virtual_view.select_index(index)
+            except (ValueError, TypeError) as e:
+                self.logger.debug(f"خطا در انتخاب ردیف: {str(e)}")
+            return
+        
         if not self.tree.get_children():
             return
         
@@ -181,6 +230,16 @@ class TableView(tk.Frame):
         except (ValueError, IndexError) as e:
             self.logger.debug(f"خطا در انتخاب ردیف: {str(e)}")
     
+    def select_record(self, key):
+        """انتخاب ردیف با کلید رکورد (شناسه) در حالت مجازی"""
+        if self.virtual_view is not None:
+            return self.virtual_view.select_key(key)
+        for i, item in enumerate(self.data):
+            if item.get('id') == key:
+                self.select_row(i)
+                return True
+        return False
+    
     def _on_row_select(self, event):
         """رویداد انتخاب ردیف"""
         if self.on_row_select:
@@ -196,10 +255,21 @@ class TableView(tk.Frame):
             self.sort_column = column
             self.sort_ascending = True
         
+        # در حالت مجازی داده‌ها همین‌جا (یا توسط sort_handler والد) مرتب می‌شوند
+        if self.virtual_view is not None:
+            if self.sort_handler is not None and hasattr(self.data, 'sorted_by'):
+                self.sort_handler(column, not self.sort_ascending)
+            else:
+                self.virtual_view.sort_by_field(column, reverse=not self.sort_ascending, on_sorted=self._on_virtual_sorted)
+        
         # Call callback if provided
         if self.on_header_click:
             self.on_header_click(column, self.sort_ascending)
     
+    def _on_virtual_sorted(self, records):
+        """جایگزینی داده‌ها با نتیجه مرتب‌سازی جدول مجازی"""
+        self.data = records
+
     def get_sort_info(self):
         """دریافت اطلاعات مرتب‌سازی فعلی"""
         return {
@@ -216,6 +286,10 @@ class TableView(tk.Frame):
             # Update data
             self.data[row_index] = data
             
+            if self.virtual_view is not None:
+                self.virtual_view.refresh()
+                return True
+            
             # Update treeview
             items = self.tree.get_children()
             if row_index < len(items):
@@ -250,6 +324,9 @@ class TableView(tk.Frame):
             if index is None or index >= len(self.data):
                 # Add to end
                 self.data.append(data)
+                if self.virtual_view is not None:
+                    self.virtual_view.refresh()
+                    return True
                 idx = len(self.data) - 1
                 tag = 'oddrow' if idx % 2 == 1 else 'evenrow'
                 self.tree.insert('', tk.END, values=row_values, tags=(tag,))
@@ -260,6 +337,10 @@ class TableView(tk.Frame):
                 
                 self.data.insert(index, data)
                 
+                if self.virtual_view is not None:
+                    self.virtual_view.refresh()
+                    return True
+                
                 # Clear and reload data to maintain striped pattern
                 self.load_data(self.data)
             
@@ -276,7 +357,12 @@ class TableView(tk.Frame):
         
         try:
             # Remove from data
-            self.data.pop(index)
+            removed = self.data.pop(index)
+            
+            if self.virtual_view is not None:
+                self.virtual_view.set_row_tags(self.virtual_view.key(removed), None)
+                self.virtual_view.refresh()
+                return True
             
             # Remove from treeview
             items = self.tree.get_children()
@@ -304,6 +390,9 @@ class TableView(tk.Frame):
     
     def get_visible_rows(self):
         """دریافت داده‌های ردیف‌های قابل مشاهده"""
+        if self.virtual_view is not None:
+            return self.virtual_view.get_visible_records()
+        
         try:
             # Get first and last visible items
             first_visible = self.tree.identify_row(0)
@@ -328,13 +417,17 @@ class TableView(tk.Frame):
             return False
         
         try:
+            if self.virtual_view is not None:
+                key = self.virtual_view.key(self.data[index])
+                self.virtual_view.set_row_tags(key, ('highlight',) if highlight else None)
+                return True
+            
             items = self.tree.get_children()
             if index < len(items):
                 item_id = items[index]
                 
                 if highlight:
                     self.tree.item(item_id, tags=('highlight',))
-                    self.tree.tag_configure('highlight', background='#ffffcc')
                 else:
                     tag = 'oddrow' if index % 2 == 1 else 'evenrow'
                     self.tree.item(item_id, tags=(tag,))
@@ -378,9 +471,12 @@ class TableView(tk.Frame):
     def auto_resize_columns(self):
         """تنظیم خودکار عرض ستون‌ها بر اساس محتوا"""
         try:
-            if not self.tree.get_children():
+            if not self.data:
                 return
             
+            # در حالت مجازی عرض از روی نمونه‌ای از ردیف‌ها محاسبه می‌شود
+            sample = self.data[:1000] if self.virtual_view is not None else self.data
+            
             for col in self.columns:
                 col_id = col['id']
                 # حداقل عرض برای نمایش عنوان ستون
@@ -388,7 +484,7 @@ class TableView(tk.Frame):
                 
                 # محاسبه عرض مورد نیاز برای داده‌ها
                 max_width = header_width
-                for item in self.data:
+                for item in sample:
                     if col_id in item:
                         cell_width = len(str(item[col_id])) * 8
                         max_width = max(max_width, cell_width)
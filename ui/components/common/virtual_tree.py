@@ -0,0 +1,385 @@
+"""
+Virtual Tree Module
+نمایش مجازی داده‌های حجیم در Treeview
+
+داده‌ها به صورت رکوردهای خام در یک لیست (یا هر دنباله دارای len و اندیس، مانند
+PagedResultSet) نگهداری می‌شوند و فقط ردیف‌های قابل مشاهده به همراه چند ردیف
+حاشیه (overscan) در Treeview ساخته می‌شوند. فرمت‌بندی هر ردیف (تبدیل تاریخ،
+جداکننده هزارگان و ...) نیز فقط هنگام نمایش انجام می‌شود.
+"""
+import queue
+import logging
+import threading
+from tkinter import ttk
+from config.settings import REPORT_POLL_INTERVAL_MS
+
+
+def default_row_key(record):
+    """کلید پیش‌فرض ردیف: شناسه رکورد"""
+    if isinstance(record, dict):
+        return record.get('id', id(record))
+    return record[0]
+
+
+def sort_value(value):
+    """کلید مرتب‌سازی مقاوم در برابر None و انواع مختلط (اعداد قبل از متن)"""
+    if value is None or value == '':
+        return (2, 0, '')
+    if isinstance(value, (int, float)):
+        return (0, value, '')
+    try:
+        return (0, float(str(value).replace(',', '')), '')
+    except ValueError:
+        return (1, 0, str(value))
+
+
+class LazyRowSequence:
+    """دنباله فقط‌خواندنی از ردیف‌های فرمت شده که هر ردیف را هنگام دسترسی می‌سازد"""
+
+    def __init__(self, records, formatter):
+        self.records = records
+        self.formatter = formatter
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.formatter(record) for record in self.records[index]]
+        return self.formatter(self.records[index])
+
+    def __iter__(self):
+        for record in self.records:
+            yield self.formatter(record)
+
+
+class VirtualTreeController:
+    """
+    کنترل اسکرول مجازی یک Treeview
+
+    اسکرول‌بار عمودی به جای Treeview به این کلاس متصل می‌شود و موقعیت آن بر
+    اساس کل رکوردها تنظیم می‌شود. انتخاب ردیف‌ها با کلید رکورد نگهداری می‌شود
+    تا با خارج شدن ردیف از پنجره نمایش از بین نرود.
+    """
+
+    def __init__(self, tree, scrollbar, formatter, key=None, overscan=20,
+                 stripe_tags=('evenrow', 'oddrow'), on_select=None):
+        """
+        Args:
+            tree: ویجت Treeview
+            scrollbar: اسکرول‌بار عمودی
+            formatter: تابع تبدیل رکورد به تاپل مقادیر ستون‌ها
+            key: تابع استخراج کلید یکتای رکورد (پیش‌فرض: شناسه)
+            overscan: تعداد ردیف‌های اضافه در بالا و پایین پنجره نمایش
+            stripe_tags: تگ‌های ردیف‌های زوج و فرد
+            on_select: تابع callback برای تغییر انتخاب توسط کاربر (با رویداد)
+        """
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.formatter = formatter
+        self.key = key or default_row_key
+        self.overscan = overscan
+        self.stripe_tags = stripe_tags
+        self.on_select = on_select
+        self.logger = logging.getLogger(__name__)
+
+        self.records = []
+        self.start = 0
+        self.end = 0
+        self.top = 0
+        self.selected_keys = []
+        self.selected_records = {}
+        self.row_tags = {}
+        self._iid_keys = {}
+        self._key_records = {}
+        self._key_iids = {}
+        self._next_iid = 0
+        self._rendering = False
+        # صف مرتب‌سازی در حال اجرا برای داده‌های صفحه‌بندی شده
+        self._sort_queue = None
+
+        self.tree.configure(yscrollcommand=self._on_tree_scroll)
+        self.scrollbar.configure(command=self._on_scrollbar)
+        self.tree.bind('<<TreeviewSelect>>', self._on_tree_select)
+        self.tree.bind('<Configure>', lambda event: self.render(self.top), add='+')
+
+    # ---------- داده‌ها ----------
+
+    def set_records(self, records):
+        """جایگزینی داده‌ها (لیست بدون کپی نگهداری می‌شود)"""
+        # نتیجه مرتب‌سازی در حال اجرای داده‌های قبلی نادیده گرفته می‌شود
+        self._sort_queue = None
+        self.records = records if records is not None else []
+        self.selected_keys = []
+        self.selected_records = {}
+        self.row_tags = {}
+        self.top = 0
+        self.refresh()
+
+    def clear(self):
+        """پاک کردن تمام داده‌ها"""
+        self.set_records([])
+
+    def refresh(self):
+        """ساخت مجدد ردیف‌های نمایش داده شده (پس از تغییر داده‌ها)"""
+        self._delete_items(list(self._iid_keys))
+        self.start = self.end = 0
+        self.render(self.top)
+
+    def sort(self, key_func, reverse=False):
+        """مرتب‌سازی درجای داده‌ها با حفظ انتخاب"""
+        self.records.sort(key=key_func, reverse=reverse)
+        self.refresh()
+
+    def sort_by_field(self, field, reverse=False, on_sorted=None):
+        """
+        مرتب‌سازی بر اساس یک فیلد رکورد (کلید دیکشنری یا اندیس تاپل)
+
+        داده‌های صفحه‌بندی شده (دارای متد sorted_by) با کوئری جدید در دیتابیس
+        مرتب می‌شوند؛ شمارش و ساخت ایندکس صفحات در نخ پس‌زمینه انجام می‌شود و
+        داده‌های فعلی تا آماده شدن نتیجه نمایش داده می‌شوند.
+
+        Args:
+            field: نام فیلد یا اندیس
+            reverse: مرتب‌سازی نزولی
+            on_sorted: تابع callback پس از جایگزینی داده‌ها (با داده‌های مرتب شده)
+        """
+        if hasattr(self.records, 'sorted_by'):
+            sort_queue = queue.Queue()
+            self._sort_queue = sort_queue
+            threading.Thread(
+                target=self._sort_in_background,
+                args=(self.records, field, reverse, sort_queue),
+                daemon=True
+            ).start()
+            self.tree.after(REPORT_POLL_INTERVAL_MS, self._poll_sort_queue, sort_queue, on_sorted)
+            return
+        self.sort(lambda record: sort_value(record.get(field) if isinstance(record, dict) else record[field]), reverse)
+        if on_sorted:
+            on_sorted(self.records)
+
+    def _sort_in_background(self, records, field, reverse, sort_queue):
+        """ساخت مجموعه نتایج مرتب شده و خواندن صفحه اول آن (در نخ پس‌زمینه)"""
+        try:
+            sorted_records = records.sorted_by(field, reverse)
+            sorted_records.prefetch(0)
+            sort_queue.put(('ready', sorted_records))
+        except Exception as e:
+            sort_queue.put(('error', str(e)))
+
+    def _poll_sort_queue(self, sort_queue, on_sorted):
+        """دریافت نتیجه مرتب‌سازی در نخ رابط کاربری"""
+        # مرتب‌سازی جایگزین شده یا داده‌های تغییر کرده نادیده گرفته می‌شوند
+        if sort_queue is not self._sort_queue:
+            return
+        try:
+            kind, payload = sort_queue.get_nowait()
+        except queue.Empty:
+            self.tree.after(REPORT_POLL_INTERVAL_MS, self._poll_sort_queue, sort_queue, on_sorted)
+            return
+        self._sort_queue = None
+        if kind == 'error':
+            self.logger.error(f"خطا در مرتب‌سازی داده‌ها: {payload}")
+            return
+        self.records = payload
+        self.top = 0
+        self.refresh()
+        if on_sorted:
+            on_sorted(self.records)
+
+    def index_of_key(self, key):
+        """اندیس رکورد دارای کلید مشخص (یا None)"""
+        # ردیف‌های ساخته شده بدون پیمایش داده‌ها پیدا می‌شوند
+        iid = self._key_iids.get(key)
+        if iid is not None:
+            return self.start + self.tree.index(iid)
+        for index, record in enumerate(self.records):
+            if self.key(record) == key:
+                return index
+        return None
+
+    # ---------- انتخاب و برجسته‌سازی ----------
+
+    def get_selected_keys(self):
+        return list(self.selected_keys)
+
+    def get_selected_records(self):
+        """رکوردهای انتخاب شده (بدون پیمایش کل داده‌ها)"""
+        return [self.selected_records[key] for key in self.selected_keys if key in self.selected_records]
+
+    def select_key(self, key, notify=True):
+        """انتخاب رکورد با کلید و اسکرول به آن"""
+        index = self.index_of_key(key)
+        if index is None:
+            return False
+        self.select_index(index, notify)
+        return True
+
+    def select_index(self, index, notify=True):
+        """انتخاب رکورد با اندیس و اسکرول به آن"""
+        if not self.records:
+            return
+        index = max(0, min(int(index), len(self.records) - 1))
+        record = self.records[index]
+        self.selected_keys = [self.key(record)]
+        self.selected_records = {self.selected_keys[0]: record}
+        self.see(index)
+        self._sync_selection()
+        if notify and self.on_select:
+            self.on_select(None)
+
+    def see(self, index):
+        """اسکرول به رکورد در صورت خارج بودن از پنجره نمایش"""
+        visible = self._visible_rows()
+        if not (self.top <= index < self.top + visible):
+            self.render(index - visible // 2)
+
+    def set_row_tags(self, key, tags=None):
+        """تنظیم تگ‌های یک ردیف (None برای بازگشت به رنگ‌بندی متناوب)"""
+        if tags:
+            self.row_tags[key] = tuple(tags)
+        else:
+            self.row_tags.pop(key, None)
+        iid = self._key_iids.get(key)
+        if iid is not None:
+            self.tree.item(iid, tags=self._tags_for(self.start + self.tree.index(iid), key))
+
+    def get_visible_records(self):
+        visible = self._visible_rows()
+        return self.records[self.top:self.top + visible]
+
+    # ---------- نمایش ----------
+
+    def render(self, top):
+        """نمایش پنجره‌ای از داده‌ها که ردیف top اولین ردیف قابل مشاهده آن است"""
+        if self._rendering:
+            return
+        self._rendering = True
+        try:
+            total = len(self.records)
+            visible = self._visible_rows()
+            top = max(0, min(int(top), max(0, total - visible)))
+            start = max(0, top - self.overscan)
+            end = min(total, top + visible + self.overscan)
+            if (start, end) != (self.start, self.end):
+                self._materialize(start, end)
+            self.top = top
+            self.tree.yview_moveto(0)
+            if top > start:
+                self.tree.yview_scroll(top - start, 'units')
+            self._update_scrollbar(top, visible)
+        except Exception as e:
+            self.logger.error(f"خطا در نمایش ردیف‌های جدول: {str(e)}")
+        finally:
+            self._rendering = False
+
+    def _materialize(self, start, end):
+        """ساخت ردیف‌های بازه [start, end) با استفاده مجدد از ردیف‌های موجود"""
+        records = self.records[start:end]
+        wanted = [(start + offset, self.key(record)) for offset, record in enumerate(records)]
+        wanted_keys = {key for _, key in wanted}
+        self._delete_items([iid for iid, key in self._iid_keys.items() if key not in wanted_keys])
+
+        for position, (index, key) in enumerate(wanted):
+            iid = self._key_iids.get(key)
+            tags = self._tags_for(index, key)
+            if iid is None:
+                iid = f"v{self._next_iid}"
+                self._next_iid += 1
+                record = records[index - start]
+                self.tree.insert('', position, iid=iid, values=self.formatter(record), tags=tags)
+                self._iid_keys[iid] = key
+                self._key_iids[key] = iid
+                self._key_records[key] = record
+            else:
+                self.tree.move(iid, '', position)
+                self.tree.item(iid, tags=tags)
+
+        self.start, self.end = start, end
+        self._sync_selection()
+
+    def _delete_items(self, iids):
+        if not iids:
+            return
+        self.tree.delete(*iids)
+        for iid in iids:
+            key = self._iid_keys.pop(iid, None)
+            self._key_iids.pop(key, None)
+            self._key_records.pop(key, None)
+
+    def _tags_for(self, index, key):
+        return self.row_tags.get(key) or (self.stripe_tags[index % 2],)
+
+    def _sync_selection(self):
+        """هماهنگ کردن انتخاب Treeview با کلیدهای انتخاب شده"""
+        wanted = [self._key_iids[key] for key in self.selected_keys if key in self._key_iids]
+        if set(self.tree.selection()) != set(wanted):
+            self.tree.selection_set(wanted)
+
+    def _visible_rows(self):
+        height = self.tree.winfo_height()
+        if height <= 1:
+            return int(self.tree.cget('height'))
+        try:
+            row_height = int(ttk.Style().lookup(self.tree.cget('style') or 'Treeview', 'rowheight') or 20)
+        except (ValueError, TypeError):
+            row_height = 20
+        return max(1, height // row_height)
+
+    def _update_scrollbar(self, top, visible):
+        total = len(self.records)
+        if total == 0:
+            self.scrollbar.set(0.0, 1.0)
+            return
+        self.scrollbar.set(top / total, min(1.0, (top + visible) / total))
+
+    # ---------- رویدادها ----------
+
+    def _on_scrollbar(self, *args):
+        """فرمان اسکرول‌بار (moveto یا scroll)"""
+        total = len(self.records)
+        if not total:
+            return
+        if args[0] == 'moveto':
+            self.render(float(args[1]) * total)
+        elif args[0] == 'scroll':
+            step = self._visible_rows() if args[2].startswith('page') else 1
+            self.render(self.top + int(args[1]) * step)
+
+    def _on_tree_scroll(self, first, last):
+        """اسکرول داخلی Treeview (چرخ ماوس یا کلیدهای جهت)"""
+        count = self.end - self.start
+        if self._rendering or count == 0:
+            if count == 0:
+                self.scrollbar.set(0.0, 1.0)
+            return
+        first, last = float(first), float(last)
+        top = self.start + int(round(first * count))
+        visible = max(1, int(round((last - first) * count)))
+        self.top = top
+        margin = self.overscan // 2
+        near_start = top - self.start < margin and self.start > 0
+        near_end = self.end - (top + visible) < margin and self.end < len(self.records)
+        if near_start or near_end:
+            self.render(top)
+        else:
+            self._update_scrollbar(top, visible)
+
+    def _on_tree_select(self, event):
+        """ثبت تغییر انتخاب کاربر؛ تغییرات ناشی از ساخت مجدد ردیف‌ها نادیده گرفته می‌شوند"""
+        current = [self._iid_keys[iid] for iid in self.tree.selection() if iid in self._iid_keys]
+        expected = [key for key in self.selected_keys if key in self._key_iids]
+        if set(current) == set(expected):
+            return
+        if str(self.tree.cget('selectmode')) == 'extended':
+            hidden = [key for key in self.selected_keys if key not in self._key_iids]
+            self.selected_keys = hidden + current
+        else:
+            self.selected_keys = current
+        self.selected_records = {
+            key: self.selected_records.get(key) or self._key_records[key]
+            for key in self.selected_keys
+            if key in self.selected_records or key in self._key_records
+        }
+        if self.on_select:
+            self.on_select(event)
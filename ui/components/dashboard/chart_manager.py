@@ -4,21 +4,65 @@ Chart Manager Module
 """
 import os
 import logging
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import arabic_reshaper
-from bidi.algorithm import get_display
 
 
 class ChartManager:
-    """کلاس مدیریت نمودارهای داشبورد"""
+    """
+    کلاس مدیریت نمودارهای داشبورد
+    
+    برای هر فریم فقط یک Figure و canvas ساخته می‌شود. در فراخوانی‌های بعدی اگر
+    داده‌ها تغییر نکرده باشند نمودار دوباره رسم نمی‌شود و در غیر این صورت
+    اجزای نمودار در جا به‌روزرسانی شده و با draw_idle رسم می‌شوند.
+    matplotlib و کتابخانه‌های متن فارسی هنگام ساخت اولین نمودار بارگذاری می‌شوند.
+    """
     
     def __init__(self, logger=None):
         self.logger = logger or logging.getLogger(__name__)
-        self._setup_persian_fonts()
+        # نمودارهای ساخته شده به ازای مسیر ویجت فریم
+        self._charts = {}
+        self._fonts_ready = False
+    
+    def _get_chart(self, chart_frame, kind):
+        """نمودار ذخیره شده فریم (در صورت از بین رفتن ویجت یا تفاوت نوع، None)"""
+        chart = self._charts.get(str(chart_frame))
+        if chart is None:
+            return None
+        if chart['kind'] != kind or not chart['canvas'].get_tk_widget().winfo_exists():
+            self._forget_chart(chart_frame)
+            return None
+        return chart
+    
+    def _create_chart(self, chart_frame, kind, figsize):
+        """ساخت Figure و canvas یک فریم (فقط یک بار برای هر فریم)"""
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        if not self._fonts_ready:
+            self._setup_persian_fonts()
+            self._fonts_ready = True
+        for widget in chart_frame.winfo_children():
+            widget.destroy()
+        fig = Figure(figsize=figsize)
+        canvas = FigureCanvasTkAgg(fig, master=chart_frame)
+        canvas.get_tk_widget().pack(fill="both", expand=True)
+        chart = {'kind': kind, 'figure': fig, 'canvas': canvas, 'signature': None}
+        self._charts[str(chart_frame)] = chart
+        return chart
+    
+    def _forget_chart(self, chart_frame):
+        chart = self._charts.pop(str(chart_frame), None)
+        if chart is not None:
+            chart['figure'].clear()
+    
+    @staticmethod
+    def _reshape(text):
+        import arabic_reshaper
+        from bidi.algorithm import get_display
+        return get_display(arabic_reshaper.reshape(text))
     
     def _setup_persian_fonts(self):
         """تنظیم فونت فارسی برای matplotlib"""
+        import matplotlib
         try:
             import matplotlib.font_manager as fm
             
@@ -30,20 +74,20 @@ class ChartManager:
             
             if os.path.exists(font_path):
                 fm.fontManager.addfont(font_path)
-                plt.rcParams['font.family'] = 'Vazir, Tahoma'
+                matplotlib.rcParams['font.family'] = 'Vazir, Tahoma'
                 self.logger.info(f"فونت فارسی از مسیر {font_path} تنظیم شد")
             else:
-                plt.rcParams['font.family'] = 'Tahoma'
+                matplotlib.rcParams['font.family'] = 'Tahoma'
                 self.logger.warning("فونت Vazir یافت نشد، از Tahoma استفاده می‌شود")
             
             # تنظیمات اضافی برای نمایش صحیح فارسی
-            plt.rcParams['axes.unicode_minus'] = False
-            plt.rcParams['axes.formatter.use_locale'] = True
-            plt.rcParams['text.color'] = 'black'
+            matplotlib.rcParams['axes.unicode_minus'] = False
+            matplotlib.rcParams['axes.formatter.use_locale'] = True
+            matplotlib.rcParams['text.color'] = 'black'
             
         except Exception as e:
             self.logger.error(f"خطا در تنظیم فونت فارسی: {str(e)}")
-            plt.rcParams['font.family'] = 'Tahoma'
+            matplotlib.rcParams['font.family'] = 'Tahoma'
     
     def create_reconciliation_chart(self, stats_data, chart_frame, chart_type="bank"):
         """
@@ -59,66 +103,77 @@ class ChartManager:
                 self.logger.warning(f"داده‌ای برای نمودار {chart_type} وجود ندارد")
                 return None
             
-            # پاک کردن نمودار قبلی
-            for widget in chart_frame.winfo_children():
-                widget.destroy()
-            
-            # ایجاد figure جدید
-            fig, ax = plt.subplots(figsize=(6, 4))
-            
-            # تبدیل نام‌های بانک به فرمت صحیح فارسی
             bank_names_original = [stat['bank_name'] for stat in stats_data]
-            bank_names = [get_display(arabic_reshaper.reshape(name)) for name in bank_names_original]
             reconciled = [stat['reconciled_records'] for stat in stats_data]
             unreconciled = [stat['unreconciled_records'] for stat in stats_data]
+            signature = (chart_type, tuple(zip(bank_names_original, reconciled, unreconciled)))
             
-            # ایجاد نمودار میله‌ای
-            x = range(len(bank_names))
-            width = 0.35
-            
-            # تبدیل برچسب‌ها به فرمت صحیح فارسی
-            reshaped_label1 = get_display(arabic_reshaper.reshape('مغایرت‌گیری شده'))
-            reshaped_label2 = get_display(arabic_reshaper.reshape('مغایرت‌گیری نشده'))
-            
-            ax.bar([i - width/2 for i in x], reconciled, width, 
-                   label=reshaped_label1, color='#4CAF50', alpha=0.8)
-            ax.bar([i + width/2 for i in x], unreconciled, width, 
-                   label=reshaped_label2, color='#F44336', alpha=0.8)
-            
-            # تنظیم عناوین و برچسب‌ها
-            reshaped_ylabel = get_display(arabic_reshaper.reshape('تعداد رکوردها'))
-            
-            chart_titles = {
-                'bank': 'وضعیت مغایرت‌گیری بانک‌ها',
-                'accounting': 'وضعیت مغایرت‌گیری حسابداری',
-                'pos': 'وضعیت مغایرت‌گیری پوز'
-            }
-            
-            reshaped_title = get_display(arabic_reshaper.reshape(chart_titles.get(chart_type, 'نمودار')))
+            chart = self._get_chart(chart_frame, 'reconciliation')
+            if chart is not None and chart['signature'] == signature:
+                # داده‌ها تغییر نکرده‌اند؛ رسم مجدد لازم نیست
+                return chart['canvas']
             
-            ax.set_ylabel(reshaped_ylabel)
-            ax.set_title(reshaped_title, fontsize=12, fontweight='bold')
-            ax.set_xticks(x)
-            ax.set_xticklabels(bank_names, rotation=45, ha='right')
-            ax.legend()
-            ax.grid(True, alpha=0.3)
-            
-            # اضافه کردن مقادیر روی میله‌ها
-            for i, (rec, unrec) in enumerate(zip(reconciled, unreconciled)):
-                if rec > 0:
-                    ax.text(i - width/2, rec + 0.5, str(rec), ha='center', va='bottom', fontsize=9)
-                if unrec > 0:
-                    ax.text(i + width/2, unrec + 0.5, str(unrec), ha='center', va='bottom', fontsize=9)
-            
-            plt.tight_layout()
+            width = 0.35
+            if chart is not None and chart['bank_names'] == bank_names_original:
+                # به‌روزرسانی در جای ارتفاع میله‌ها و مقادیر روی آن‌ها
+                for bars, texts, values in (
+                    (chart['reconciled_bars'], chart['reconciled_texts'], reconciled),
+                    (chart['unreconciled_bars'], chart['unreconciled_texts'], unreconciled)
+                ):
+                    for bar, text, value in zip(bars, texts, values):
+                        bar.set_height(value)
+                        text.set_y(value + 0.5)
+                        text.set_text(str(value))
+                        text.set_visible(value > 0)
+                chart['axes'].relim()
+                chart['axes'].autoscale_view()
+            else:
+                # اولین نمایش یا تغییر لیست بانک‌ها: رسم مجدد روی همان Figure
+                if chart is None:
+                    chart = self._create_chart(chart_frame, 'reconciliation', (6, 4))
+                    chart['axes'] = chart['figure'].add_subplot(111)
+                ax = chart['axes']
+                ax.clear()
+                
+                # تبدیل نام‌های بانک به فرمت صحیح فارسی
+                bank_names = [self._reshape(name) for name in bank_names_original]
+                x = range(len(bank_names))
+                
+                chart['reconciled_bars'] = ax.bar([i - width/2 for i in x], reconciled, width, 
+                                                  label=self._reshape('مغایرت‌گیری شده'), color='#4CAF50', alpha=0.8)
+                chart['unreconciled_bars'] = ax.bar([i + width/2 for i in x], unreconciled, width, 
+                                                    label=self._reshape('مغایرت‌گیری نشده'), color='#F44336', alpha=0.8)
+                
+                # تنظیم عناوین و برچسب‌ها
+                chart_titles = {
+                    'bank': 'وضعیت مغایرت‌گیری بانک‌ها',
+                    'accounting': 'وضعیت مغایرت‌گیری حسابداری',
+                    'pos': 'وضعیت مغایرت‌گیری پوز'
+                }
+                ax.set_ylabel(self._reshape('تعداد رکوردها'))
+                ax.set_title(self._reshape(chart_titles.get(chart_type, 'نمودار')), fontsize=12, fontweight='bold')
+                ax.set_xticks(list(x))
+                ax.set_xticklabels(bank_names, rotation=45, ha='right')
+                ax.legend()
+                ax.grid(True, alpha=0.3)
+                
+                # مقادیر روی میله‌ها (برای تمام میله‌ها ساخته و مقادیر صفر پنهان می‌شوند)
+                chart['reconciled_texts'] = [
+                    ax.text(i - width/2, rec + 0.5, str(rec), ha='center', va='bottom', fontsize=9, visible=rec > 0)
+                    for i, rec in enumerate(reconciled)
+                ]
+                chart['unreconciled_texts'] = [
+                    ax.text(i + width/2, unrec + 0.5, str(unrec), ha='center', va='bottom', fontsize=9, visible=unrec > 0)
+                    for i, unrec in enumerate(unreconciled)
+                ]
+                chart['bank_names'] = bank_names_original
+                chart['figure'].tight_layout()
             
-            # اضافه کردن نمودار به UI
-            canvas = FigureCanvasTkAgg(fig, master=chart_frame)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill="both", expand=True)
+            chart['signature'] = signature
+            chart['canvas'].draw_idle()
             
-            self.logger.info(f"نمودار {chart_type} با موفقیت ایجاد شد")
-            return canvas
+            self.logger.info(f"نمودار {chart_type} با موفقیت به‌روزرسانی شد")
+            return chart['canvas']
             
         except Exception as e:
             self.logger.error(f"خطا در ایجاد نمودار {chart_type}: {str(e)}")
@@ -137,17 +192,27 @@ class ChartManager:
                 self.logger.warning("داده‌ای برای نمودار خلاصه وجود ندارد")
                 return None
             
-            # پاک کردن نمودار قبلی
-            for widget in chart_frame.winfo_children():
-                widget.destroy()
+            sections_stats = tuple(
+                (overall_stats[key]['reconciled_records'], overall_stats[key]['unreconciled_records'])
+                for key in ('bank', 'accounting', 'pos')
+            )
+            chart = self._get_chart(chart_frame, 'summary_pie')
+            if chart is not None and chart['signature'] == sections_stats:
+                return chart['canvas']
+            if chart is None:
+                chart = self._create_chart(chart_frame, 'summary_pie', (12, 6))
             
-            fig, ax = plt.subplots(figsize=(8, 6))
+            # سهم بخش‌ها در نمودار دایره‌ای قابل به‌روزرسانی در جا نیست؛ محتوای
+            # همان Figure پاک و دوباره رسم می‌شود
+            fig = chart['figure']
+            fig.clear()
             
             # داده‌های نمودار دایره‌ای
             grand_total = overall_stats['grand_total']
             
             if grand_total['total_records'] == 0:
                 # نمایش پیام عدم وجود داده
+                ax = fig.add_subplot(111)
                 ax.text(0.5, 0.5, 'هیچ رکوردی یافت نشد', 
                        ha='center', va='center', transform=ax.transAxes, fontsize=14)
                 ax.axis('off')
@@ -179,20 +244,20 @@ class ChartManager:
                 
                 if valid_sections:
                     # ایجاد نمودار دایره‌ای دوگانه
-                    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 6))
+                    ax1, ax2 = fig.subplots(1, 2)
                     
                     # نمودار اول: توزیع کلی بر اساس بخش‌ها
                     total_by_section = [r + u for r, u in zip(valid_reconciled, valid_unreconciled)]
                     
                     # تبدیل برچسب‌ها به فارسی
-                    persian_sections = [get_display(arabic_reshaper.reshape(s)) for s in valid_sections]
+                    persian_sections = [self._reshape(s) for s in valid_sections]
                     
                     wedges1, texts1, autotexts1 = ax1.pie(
                         total_by_section, labels=persian_sections, autopct='%1.1f%%',
                         colors=['#2196F3', '#FF9800', '#4CAF50'], startangle=90
                     )
                     
-                    ax1.set_title(get_display(arabic_reshaper.reshape('توزیع کلی رکوردها')), 
+                    ax1.set_title(self._reshape('توزیع کلی رکوردها'), 
                                  fontsize=12, fontweight='bold')
                     
                     # نمودار دوم: مقایسه مغایرت‌گیری شده و نشده
@@ -201,7 +266,7 @@ class ChartManager:
                     
                     if reconciled_total > 0 or unreconciled_total > 0:
                         status_labels = ['مغایرت‌گیری شده', 'مغایرت‌گیری نشده']
-                        persian_status_labels = [get_display(arabic_reshaper.reshape(l)) for l in status_labels]
+                        persian_status_labels = [self._reshape(l) for l in status_labels]
                         status_values = [reconciled_total, unreconciled_total]
                         
                         # فیلتر کردن مقادیر صفر
@@ -222,18 +287,15 @@ class ChartManager:
                                 colors=filtered_colors, startangle=90
                             )
                             
-                            ax2.set_title(get_display(arabic_reshaper.reshape('وضعیت مغایرت‌گیری')), 
+                            ax2.set_title(self._reshape('وضعیت مغایرت‌گیری'), 
                                          fontsize=12, fontweight='bold')
                 
-            plt.tight_layout()
-            
-            # اضافه کردن نمودار به UI
-            canvas = FigureCanvasTkAgg(fig, master=chart_frame)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill="both", expand=True)
+            fig.tight_layout()
+            chart['signature'] = sections_stats
+            chart['canvas'].draw_idle()
             
             self.logger.info("نمودار خلاصه آمار با موفقیت ایجاد شد")
-            return canvas
+            return chart['canvas']
             
         except Exception as e:
             self.logger.error(f"خطا در ایجاد نمودار خلاصه: {str(e)}")
@@ -252,43 +314,55 @@ class ChartManager:
             if not stats_data:
                 return None
             
-            # پاک کردن نمودار قبلی
-            for widget in chart_frame.winfo_children():
-                widget.destroy()
-            
-            fig, ax = plt.subplots(figsize=(8, 6))
-            
             # آماده‌سازی داده‌ها
             bank_names = [stat['bank_name'] for stat in stats_data]
             percentages = [stat['reconciled_percentage'] for stat in stats_data]
+            signature = (chart_title, tuple(zip(bank_names, percentages)))
+            
+            chart = self._get_chart(chart_frame, 'progress')
+            if chart is not None and chart['signature'] == signature:
+                return chart['canvas']
+            
+            if chart is not None and chart['bank_names'] == bank_names and chart['title'] == chart_title:
+                # به‌روزرسانی در جای طول نوارها و درصدهای روی آن‌ها
+                for bar, text, percentage in zip(chart['bars'], chart['texts'], percentages):
+                    bar.set_width(percentage)
+                    text.set_x(percentage + 1)
+                    text.set_text(f'{percentage:.1f}%')
+            else:
+                if chart is None:
+                    chart = self._create_chart(chart_frame, 'progress', (8, 6))
+                    chart['axes'] = chart['figure'].add_subplot(111)
+                ax = chart['axes']
+                ax.clear()
+                
+                # تبدیل نام‌ها به فارسی
+                persian_names = [self._reshape(name) for name in bank_names]
+                
+                # ایجاد نمودار نوار افقی
+                chart['bars'] = ax.barh(persian_names, percentages, color='#2196F3', alpha=0.7)
+                
+                # اضافه کردن درصدها روی نوارها
+                chart['texts'] = [
+                    ax.text(bar.get_width() + 1, bar.get_y() + bar.get_height()/2, 
+                           f'{percentage:.1f}%', ha='left', va='center', fontweight='bold')
+                    for bar, percentage in zip(chart['bars'], percentages)
+                ]
+                
+                # تنظیمات نمودار
+                ax.set_xlabel(self._reshape('درصد مغایرت‌گیری شده'))
+                ax.set_title(self._reshape(chart_title), fontsize=12, fontweight='bold')
+                ax.set_xlim(0, 105)  # کمی فضای اضافی برای نمایش درصدها
+                ax.grid(True, alpha=0.3, axis='x')
+                chart['bank_names'] = bank_names
+                chart['title'] = chart_title
+                chart['figure'].tight_layout()
             
-            # تبدیل نام‌ها به فارسی
-            persian_names = [get_display(arabic_reshaper.reshape(name)) for name in bank_names]
-            
-            # ایجاد نمودار نوار افقی
-            bars = ax.barh(persian_names, percentages, color='#2196F3', alpha=0.7)
-            
-            # اضافه کردن درصدها روی نوارها
-            for i, (bar, percentage) in enumerate(zip(bars, percentages)):
-                width = bar.get_width()
-                ax.text(width + 1, bar.get_y() + bar.get_height()/2, 
-                       f'{percentage:.1f}%', ha='left', va='center', fontweight='bold')
-            
-            # تنظیمات نمودار
-            ax.set_xlabel(get_display(arabic_reshaper.reshape('درصد مغایرت‌گیری شده')))
-            ax.set_title(get_display(arabic_reshaper.reshape(chart_title)), fontsize=12, fontweight='bold')
-            ax.set_xlim(0, 105)  # کمی فضای اضافی برای نمایش درصدها
-            ax.grid(True, alpha=0.3, axis='x')
-            
-            plt.tight_layout()
-            
-            # اضافه کردن نمودار به UI
-            canvas = FigureCanvasTkAgg(fig, master=chart_frame)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill="both", expand=True)
+            chart['signature'] = signature
+            chart['canvas'].draw_idle()
             
-            self.logger.info(f"نمودار پیشرفت '{chart_title}' با موفقیت ایجاد شد")
-            return canvas
+            self.logger.info(f"نمودار پیشرفت '{chart_title}' با موفقیت به‌روزرسانی شد")
+            return chart['canvas']
             
         except Exception as e:
             self.logger.error(f"خطا در ایجاد نمودار پیشرفت: {str(e)}")
@@ -297,6 +371,7 @@ class ChartManager:
     def clear_chart(self, chart_frame):
         """پاک کردن نمودار از فریم"""
         try:
+            self._forget_chart(chart_frame)
             for widget in chart_frame.winfo_children():
                 widget.destroy()
         except Exception as e:
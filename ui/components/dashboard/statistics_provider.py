@@ -3,9 +3,7 @@ Statistics Provider Module
 ماژول ارائه‌دهنده آمار - جدا شده از dashboard_tab.py
 """
 import logging
-import sqlite3
-from config.settings import DB_PATH
-from database.banks_repository import get_all_banks
+from database.stats_repository import get_stats_by_bank, get_bank_stats_summary
 
 
 class StatisticsProvider:
@@ -14,6 +12,33 @@ class StatisticsProvider:
     def __init__(self, logger=None):
         self.logger = logger or logging.getLogger(__name__)
     
+    def _get_table_statistics(self, table_name):
+        """
+        آمار یک جدول به ازای هر بانک از شمارنده‌های جدول Stats
+        
+        شمارنده‌ها توسط تریگرهای دیتابیس به‌روز نگه داشته می‌شوند و جدول‌های
+        تراکنش در هر بار به‌روزرسانی داشبورد شمارش نمی‌شوند.
+        """
+        stats = []
+        for row in get_stats_by_bank(table_name):
+            total_records = row['total_records']
+            reconciled_records = row['reconciled_records']
+            
+            # محاسبه آمار
+            reconciled_percentage = 0
+            if total_records > 0:
+                reconciled_percentage = (reconciled_records / total_records) * 100
+            
+            stats.append({
+                "bank_id": row['bank_id'],
+                "bank_name": row['bank_name'],
+                "total_records": total_records,
+                "reconciled_records": reconciled_records,
+                "unreconciled_records": total_records - reconciled_records,
+                "reconciled_percentage": reconciled_percentage
+            })
+        return stats
+    
     def get_bank_statistics(self):
         """
         دریافت آمار بانک‌ها
@@ -22,44 +47,7 @@ class StatisticsProvider:
             list: لیست آمار بانک‌ها شامل تعداد رکوردها و درصد مغایرت‌گیری
         """
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            # دریافت لیست بانک‌ها
-            banks = get_all_banks()
-            
-            stats = []
-            for bank_id, bank_name in banks:
-                # تعداد کل رکوردها
-                cursor.execute(
-                    "SELECT COUNT(*) FROM BankTransactions WHERE bank_id = ?", 
-                    (bank_id,)
-                )
-                total_records = cursor.fetchone()[0]
-                
-                # تعداد رکوردهای مغایرت‌گیری شده
-                cursor.execute(
-                    "SELECT COUNT(*) FROM BankTransactions WHERE bank_id = ? AND is_reconciled = 1", 
-                    (bank_id,)
-                )
-                reconciled_records = cursor.fetchone()[0]
-                
-                # محاسبه آمار
-                unreconciled_records = total_records - reconciled_records
-                reconciled_percentage = 0
-                if total_records > 0:
-                    reconciled_percentage = (reconciled_records / total_records) * 100
-                
-                stats.append({
-                    "bank_id": bank_id,
-                    "bank_name": bank_name,
-                    "total_records": total_records,
-                    "reconciled_records": reconciled_records,
-                    "unreconciled_records": unreconciled_records,
-                    "reconciled_percentage": reconciled_percentage
-                })
-            
-            conn.close()
+            stats = self._get_table_statistics('BankTransactions')
             self.logger.info(f"آمار {len(stats)} بانک دریافت شد")
             return stats
             
@@ -75,44 +63,7 @@ class StatisticsProvider:
             list: لیست آمار حسابداری شامل تعداد رکوردها و درصد مغایرت‌گیری
         """
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            # دریافت لیست بانک‌ها
-            banks = get_all_banks()
-            
-            stats = []
-            for bank_id, bank_name in banks:
-                # تعداد کل رکوردها
-                cursor.execute(
-                    "SELECT COUNT(*) FROM AccountingTransactions WHERE bank_id = ?", 
-                    (bank_id,)
-                )
-                total_records = cursor.fetchone()[0]
-                
-                # تعداد رکوردهای مغایرت‌گیری شده
-                cursor.execute(
-                    "SELECT COUNT(*) FROM AccountingTransactions WHERE bank_id = ? AND is_reconciled = 1", 
-                    (bank_id,)
-                )
-                reconciled_records = cursor.fetchone()[0]
-                
-                # محاسبه آمار
-                unreconciled_records = total_records - reconciled_records
-                reconciled_percentage = 0
-                if total_records > 0:
-                    reconciled_percentage = (reconciled_records / total_records) * 100
-                
-                stats.append({
-                    "bank_id": bank_id,
-                    "bank_name": bank_name,
-                    "total_records": total_records,
-                    "reconciled_records": reconciled_records,
-                    "unreconciled_records": unreconciled_records,
-                    "reconciled_percentage": reconciled_percentage
-                })
-            
-            conn.close()
+            stats = self._get_table_statistics('AccountingTransactions')
             self.logger.info(f"آمار حسابداری {len(stats)} بانک دریافت شد")
             return stats
             
@@ -128,44 +79,7 @@ class StatisticsProvider:
             list: لیست آمار پوز شامل تعداد رکوردها و درصد مغایرت‌گیری
         """
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            # دریافت لیست بانک‌ها
-            banks = get_all_banks()
-            
-            stats = []
-            for bank_id, bank_name in banks:
-                # تعداد کل رکوردها
-                cursor.execute(
-                    "SELECT COUNT(*) FROM PosTransactions WHERE bank_id = ?", 
-                    (bank_id,)
-                )
-                total_records = cursor.fetchone()[0]
-                
-                # تعداد رکوردهای مغایرت‌گیری شده
-                cursor.execute(
-                    "SELECT COUNT(*) FROM PosTransactions WHERE bank_id = ? AND is_reconciled = 1", 
-                    (bank_id,)
-                )
-                reconciled_records = cursor.fetchone()[0]
-                
-                # محاسبه آمار
-                unreconciled_records = total_records - reconciled_records
-                reconciled_percentage = 0
-                if total_records > 0:
-                    reconciled_percentage = (reconciled_records / total_records) * 100
-                
-                stats.append({
-                    "bank_id": bank_id,
-                    "bank_name": bank_name,
-                    "total_records": total_records,
-                    "reconciled_records": reconciled_records,
-                    "unreconciled_records": unreconciled_records,
-                    "reconciled_percentage": reconciled_percentage
-                })
-            
-            conn.close()
+            stats = self._get_table_statistics('PosTransactions')
             self.logger.info(f"آمار پوز {len(stats)} بانک دریافت شد")
             return stats
             
@@ -260,66 +174,11 @@ class StatisticsProvider:
             dict: آمار تفصیلی بانک
         """
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            # آمار بانک
-            cursor.execute("""
-                SELECT 
-                    COUNT(*) as total,
-                    COUNT(CASE WHEN is_reconciled = 1 THEN 1 END) as reconciled,
-                    SUM(amount) as total_amount,
-                    SUM(CASE WHEN is_reconciled = 1 THEN amount ELSE 0 END) as reconciled_amount
-                FROM BankTransactions 
-                WHERE bank_id = ?
-            """, (bank_id,))
-            bank_stats = cursor.fetchone()
-            
-            # آمار حسابداری
-            cursor.execute("""
-                SELECT 
-                    COUNT(*) as total,
-                    COUNT(CASE WHEN is_reconciled = 1 THEN 1 END) as reconciled,
-                    SUM(transaction_amount) as total_amount,
-                    SUM(CASE WHEN is_reconciled = 1 THEN transaction_amount ELSE 0 END) as reconciled_amount
-                FROM AccountingTransactions 
-                WHERE bank_id = ?
-            """, (bank_id,))
-            accounting_stats = cursor.fetchone()
-            
-            # آمار پوز
-            cursor.execute("""
-                SELECT 
-                    COUNT(*) as total,
-                    COUNT(CASE WHEN is_reconciled = 1 THEN 1 END) as reconciled,
-                    SUM(amount) as total_amount,
-                    SUM(CASE WHEN is_reconciled = 1 THEN amount ELSE 0 END) as reconciled_amount
-                FROM PosTransactions 
-                WHERE bank_id = ?
-            """, (bank_id,))
-            pos_stats = cursor.fetchone()
-            
-            conn.close()
-            
+            summary = get_bank_stats_summary(bank_id)
             return {
-                'bank': {
-                    'total_records': bank_stats[0] or 0,
-                    'reconciled_records': bank_stats[1] or 0,
-                    'total_amount': bank_stats[2] or 0,
-                    'reconciled_amount': bank_stats[3] or 0
-                },
-                'accounting': {
-                    'total_records': accounting_stats[0] or 0,
-                    'reconciled_records': accounting_stats[1] or 0,
-                    'total_amount': accounting_stats[2] or 0,
-                    'reconciled_amount': accounting_stats[3] or 0
-                },
-                'pos': {
-                    'total_records': pos_stats[0] or 0,
-                    'reconciled_records': pos_stats[1] or 0,
-                    'total_amount': pos_stats[2] or 0,
-                    'reconciled_amount': pos_stats[3] or 0
-                }
+                'bank': summary['BankTransactions'],
+                'accounting': summary['AccountingTransactions'],
+                'pos': summary['PosTransactions']
             }
             
         except Exception as e:
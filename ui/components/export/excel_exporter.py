@@ -1,98 +1,178 @@
 """
 Excel Export Module
 جدا شده از report_tab.py برای ماژولار کردن کد
+
+ردیف‌ها به صورت جریانی (از cursor دیتابیس یا هر iterable) در یک کتاب کار
+write-only نوشته می‌شوند؛ بنابراین حافظه مصرفی مستقل از تعداد رکوردهاست.
+استایل‌ها یک بار به صورت استایل نام‌دار در کتاب کار ثبت می‌شوند و شیت
+کارمزدها از کوئری تجمیعی دیتابیس ساخته می‌شود.
 """
-import os
-import pandas as pd
+from itertools import chain, islice
 from tkinter import filedialog, messagebox
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
-from openpyxl.utils import get_column_letter
-import sqlite3
 import logging
-from config.settings import DB_PATH
+from config.settings import EXPORT_FETCH_SIZE, EXPORT_WIDTH_SAMPLE_ROWS
+from database.bank_fees_repository import get_daily_fee_totals
 from utils.helpers import gregorian_to_persian
 
+# نام استایل‌های نام‌دار کتاب کار
+HEADER_STYLE = 'ReportHeader'
+CELL_STYLE = 'ReportCell'
+
+# مقادیر نوع تراکنش کارمزد که از شیت اصلی حذف می‌شوند
+BANK_FEE_TYPES = ("bank_fee", "BANK_FEES", "کارمزد بانکی")
+TRANSACTION_TYPE_COLUMN_NAMES = ("نوع تراکنش بانک", "نوع تراکنش", "transaction_type")
+
+# ستون‌های شیت کارمزدها
+FEES_SHEET_COLUMNS = ["تاریخ", "بانک", "جمع کارمزد (ریال)", "تعداد تراکنش"]
+
+
+class StreamingExcelWriter:
+    """نوشتن شیت‌ها در کتاب کار write-only با حافظه ثابت"""
+
+    def __init__(self, width_sample_rows=EXPORT_WIDTH_SAMPLE_ROWS):
+        from openpyxl import Workbook
+        from openpyxl.styles import Font, Alignment, PatternFill, NamedStyle
+
+        self.width_sample_rows = width_sample_rows
+        self.workbook = Workbook(write_only=True)
+        # استایل‌ها فقط یک بار تعریف و با نام به سلول‌ها اختصاص داده می‌شوند
+        self.workbook.add_named_style(NamedStyle(
+            name=HEADER_STYLE,
+            font=Font(name='Tahoma', size=12, bold=True),
+            fill=PatternFill(start_color='E6E6E6', end_color='E6E6E6', fill_type='solid'),
+            alignment=Alignment(horizontal='center', vertical='center')
+        ))
+        self.workbook.add_named_style(NamedStyle(
+            name=CELL_STYLE,
+            font=Font(name='Tahoma', size=11),
+            alignment=Alignment(horizontal='right', vertical='center')
+        ))
+
+    def add_sheet(self, title, column_names, rows):
+        """
+        افزودن شیت و نوشتن جریانی ردیف‌ها
+
+        در حالت write-only عرض ستون‌ها باید پیش از نوشتن ردیف‌ها تعیین شود؛
+        بنابراین فقط چند ردیف ابتدایی برای محاسبه عرض نگه داشته می‌شوند.
+
+        Returns:
+            int: تعداد ردیف‌های داده نوشته شده
+        """
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.utils import get_column_letter
+
+        worksheet = self.workbook.create_sheet(title)
+        # تنظیم راست به چپ بودن کل شیت
+        worksheet.sheet_view.rightToLeft = True
+        worksheet.freeze_panes = 'A2'
+
+        rows = iter(rows)
+        sample = list(islice(rows, self.width_sample_rows))
+        for i, column_name in enumerate(column_names):
+            max_length = max([len(str(column_name))] + [len(str(row[i])) for row in sample if i < len(row) and row[i]])
+            # تنظیم عرض ستون با توجه به محتوا (حداقل عرض 15 کاراکتر)
+            worksheet.column_dimensions[get_column_letter(i + 1)].width = max(max_length + 4, 15)
+
+        def styled_row(values, style):
+            cells = []
+            for value in values:
+                cell = WriteOnlyCell(worksheet, value=value)
+                cell.style = style
+                cells.append(cell)
+            return cells
+
+        worksheet.append(styled_row(column_names, HEADER_STYLE))
+        count = 0
+        for row in chain(sample, rows):
+            worksheet.append(styled_row(row, CELL_STYLE))
+            count += 1
+        return count
+
+    def save(self, file_path):
+        self.workbook.save(file_path)
+
+
+def stream_query_rows(query, formatter, chunk_size=EXPORT_FETCH_SIZE):
+    """ردیف‌های فرمت شده یک KeysetQuery با خواندن دسته‌ای از cursor"""
+    for record in query.stream(chunk_size):
+        yield formatter(record)
+
 
 class ExcelExporter:
     """کلاس صدور اطلاعات به فایل اکسل"""
-    
+
     def __init__(self, logger=None):
         self.logger = logger or logging.getLogger(__name__)
-    
+
     def export_to_excel(self, data, columns, selected_table, table_data):
         """صدور داده‌ها به فایل اکسل"""
         try:
             if not data:
                 messagebox.showwarning("هشدار", "هیچ داده‌ای برای صدور وجود ندارد")
                 return False
-            
+
             # دریافت مسیر ذخیره فایل
             file_path = filedialog.asksaveasfilename(
                 defaultextension=".xlsx",
                 filetypes=[("Excel files", "*.xlsx")],
                 title="ذخیره فایل اکسل"
             )
-            
+
             if not file_path:
                 return False
-            
-            # فیلتر کردن داده‌ها برای حذف کارمزدها از شیت اصلی
-            filtered_data = self._filter_bank_fees(table_data, columns)
-            
-            # اضافه کردن ستون اضافی بر اساس نوع گزارش
-            column_names = [col["text"] for col in columns]
-            self._add_additional_column(filtered_data, column_names, selected_table)
-            
-            # تبدیل داده‌های فیلتر شده به دیتافریم پانداس
-            df = pd.DataFrame(filtered_data, columns=column_names)
-            
-            # ذخیره به فایل اکسل
-            with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='گزارش')
-                
-                # تنظیم استایل‌ها
-                self._apply_excel_styles(writer)
-                
-                # اضافه کردن شیت کارمزدها
-                self._add_bank_fees_sheet(writer)
-            
-            self.logger.info(f"داده‌ها با موفقیت به فایل {file_path} صادر شدند")
+
+            self.write_report(file_path, columns, selected_table, table_data)
             messagebox.showinfo("موفقیت", "داده‌ها با موفقیت به فایل اکسل صادر شدند")
             return True
-            
+
         except Exception as e:
             error_msg = f"خطا در صدور به اکسل: {str(e)}"
             self.logger.error(error_msg)
             messagebox.showerror("خطا", error_msg)
             return False
-    
-    def _filter_bank_fees(self, table_data, columns):
-        """فیلتر کردن کارمزدهای بانکی از داده‌ها"""
-        filtered_data = []
-        
-        for row in table_data:
-            # بررسی نوع تراکنش در ستون مربوطه
-            transaction_type_index = None
-            transaction_type_column_names = ["نوع تراکنش بانک", "نوع تراکنش", "transaction_type"]
-            
-            for i, col in enumerate(columns):
-                if col["text"] in transaction_type_column_names:
-                    transaction_type_index = i
-                    break
-            
-            # اگر ستون نوع تراکنش پیدا شد
+
+    def write_report(self, file_path, columns, selected_table, rows):
+        """
+        نوشتن گزارش و شیت کارمزدها در فایل اکسل (بدون رابط کاربری)
+
+        Args:
+            file_path: مسیر فایل خروجی
+            columns: ستون‌های گزارش (دیکشنری‌های دارای text)
+            selected_table: نوع گزارش
+            rows: iterable ردیف‌های فرمت شده (مثلاً خروجی stream_query_rows)
+
+        Returns:
+            int: تعداد ردیف‌های نوشته شده در شیت گزارش
+        """
+        column_names = [col["text"] for col in columns]
+        # حذف کارمزدها از شیت اصلی و اضافه کردن ستون اضافی بر اساس نوع گزارش
+        rows = self._filter_bank_fees(rows, columns)
+        rows = self._add_additional_column(rows, column_names, selected_table)
+
+        writer = StreamingExcelWriter()
+        count = writer.add_sheet('گزارش', column_names, rows)
+        self._add_bank_fees_sheet(writer)
+        writer.save(file_path)
+
+        self.logger.info(f"{count} رکورد با موفقیت به فایل {file_path} صادر شد")
+        return count
+
+    def _filter_bank_fees(self, rows, columns):
+        """فیلتر کردن کارمزدهای بانکی از ردیف‌ها (به صورت جریانی)"""
+        transaction_type_index = next(
+            (i for i, col in enumerate(columns) if col["text"] in TRANSACTION_TYPE_COLUMN_NAMES),
+            None
+        )
+
+        for row in rows:
+            # اگر ستون نوع تراکنش پیدا نشد، همه رکوردها اضافه می‌شوند
             if transaction_type_index is not None:
                 transaction_type = row[transaction_type_index] if transaction_type_index < len(row) else None
-                # اگر نوع تراکنش کارمزد نیست، به لیست فیلتر شده اضافه کن
-                if transaction_type not in ["bank_fee", "BANK_FEES", "کارمزد بانکی"]:
-                    filtered_data.append(list(row))  # تبدیل تاپل به لیست
-            else:  # اگر ستون نوع تراکنش پیدا نشد، همه رکوردها را اضافه کن
-                filtered_data.append(list(row))  # تبدیل تاپل به لیست
-        
-        return filtered_data
-    
-    def _add_additional_column(self, filtered_data, column_names, selected_table):
+                if transaction_type in BANK_FEE_TYPES:
+                    continue
+            yield list(row)
+
+    def _add_additional_column(self, rows, column_names, selected_table):
         """اضافه کردن ستون اضافی بر اساس نوع گزارش"""
         # تعیین نوع ستون اضافی بر اساس نوع گزارش
         if selected_table == "بانک":
@@ -101,205 +181,35 @@ class ExcelExporter:
             additional_column_name = "bank_rec_id"
         else:
             additional_column_name = None  # برای پوز و نتایج مغایرت گیری ستون اضافی نداریم
-        
-        # اضافه کردن نام ستون اضافی
-        if additional_column_name:
-            column_names.append(additional_column_name)
-            # اضافه کردن ستون خالی به داده‌های فیلتر شده
-            for row in filtered_data:
-                row.append("")  # ستون خالی
-    
-    def _apply_excel_styles(self, writer):
-        """اعمال استایل‌ها به فایل اکسل"""
-        workbook = writer.book
-        worksheet = writer.sheets['گزارش']
-        
-        # تنظیم راست به چپ بودن کل شیت
-        worksheet.sheet_view.rightToLeft = True
-        
-        # تنظیم استایل هدر
-        header_fill = PatternFill(start_color='E6E6E6', end_color='E6E6E6', fill_type='solid')
-        header_font = Font(name='Tahoma', size=12, bold=True)
-        
-        for cell in worksheet[1]:
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-        
-        # تنظیم فونت و راست به چپ بودن برای داده‌ها
-        for row in worksheet.iter_rows(min_row=2):
-            for cell in row:
-                cell.font = Font(name='Tahoma', size=11)
-                cell.alignment = Alignment(horizontal='right', vertical='center')
-        
-        # تنظیم عرض ستون‌ها
-        for i, column in enumerate(worksheet.columns):
-            max_length = 0
-            column_letter = get_column_letter(i+1)
-            
-            # بررسی طول محتوای سلول‌ها
-            for cell in column:
-                try:
-                    if cell.value:
-                        cell_length = len(str(cell.value))
-                        if cell_length > max_length:
-                            max_length = cell_length
-                except:
-                    pass
-            
-            # تنظیم عرض ستون با توجه به محتوا
-            adjusted_width = max(max_length + 4, 15)  # حداقل عرض 15 کاراکتر
-            worksheet.column_dimensions[column_letter].width = adjusted_width
-    
+
+        if not additional_column_name:
+            return rows
+
+        # اضافه کردن نام ستون اضافی و ستون خالی به ردیف‌ها
+        column_names.append(additional_column_name)
+        return (row + [""] for row in rows)
+
     def _add_bank_fees_sheet(self, writer):
-        """اضافه کردن شیت کارمزدهای بانکی به فایل اکسل"""
+        """اضافه کردن شیت جمع روزانه کارمزدهای بانکی (از کوئری تجمیعی)"""
         try:
-            conn = sqlite3.connect(DB_PATH)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            # دریافت کارمزدهای بانکی
-            query = """SELECT bt.*, b.bank_name 
-                       FROM BankTransactions bt 
-                       JOIN Banks b ON bt.bank_id = b.id 
-                       WHERE bt.transaction_type IN ('bank_fee', 'BANK_FEES')"""
-            
-            cursor.execute(query)
-            rows = cursor.fetchall()
-            
+            daily_fees = get_daily_fee_totals()
+
             # اگر کارمزدی وجود نداشت، شیت اضافه نشود
-            if not rows:
-                self.logger.info("هیچ کارمزد بانکی یافت نشد")
-                return
-            
-            # تبدیل نتایج به لیست دیکشنری
-            fees_data = [dict(row) for row in rows]
-            
-            # گروه‌بندی کارمزدها بر اساس تاریخ
-            daily_fees = self._group_fees_by_date(fees_data)
-            
             if not daily_fees:
-                self.logger.info("هیچ داده‌ای برای نمایش در شیت کارمزدها وجود ندارد")
+                self.logger.info("هیچ کارمزد بانکی یافت نشد")
                 return
-            
-            # ایجاد دیتافریم و اضافه به اکسل
-            self._create_fees_dataframe(writer, daily_fees)
-            
+
+            rows = (
+                [
+                    gregorian_to_persian(item['fee_date']),
+                    item['bank_name'] or "",
+                    f"{int(float(item['total_amount'])):,}" if item['total_amount'] is not None else "",
+                    str(item['transaction_count'])
+                ]
+                for item in daily_fees
+            )
+            writer.add_sheet('کارمزدها', FEES_SHEET_COLUMNS, rows)
             self.logger.info("شیت کارمزدها با موفقیت اضافه شد")
-            conn.close()
-            
+
         except Exception as e:
             self.logger.error(f"خطا در اضافه کردن شیت کارمزدها: {str(e)}")
-    
-    def _group_fees_by_date(self, fees_data):
-        """گروه‌بندی کارمزدها بر اساس تاریخ"""
-        daily_fees = {}
-        
-        for item in fees_data:
-            if 'transaction_date' in item and item['transaction_date']:
-                try:
-                    # تبدیل تاریخ به شمسی
-                    persian_date = gregorian_to_persian(str(item['transaction_date']))
-                    
-                    # اضافه کردن به دیکشنری گروه‌بندی شده
-                    if persian_date not in daily_fees:
-                        daily_fees[persian_date] = {
-                            'date': persian_date,
-                            'total_amount': 0,
-                            'bank_name': item['bank_name'],
-                            'count': 0
-                        }
-                    
-                    # جمع کردن مبلغ کارمزد
-                    if 'amount' in item and item['amount'] is not None:
-                        daily_fees[persian_date]['total_amount'] += float(item['amount'])
-                        daily_fees[persian_date]['count'] += 1
-                        
-                except Exception as e:
-                    self.logger.error(f"خطا در پردازش تاریخ: {str(e)}")
-        
-        return list(daily_fees.values())
-    
-    def _create_fees_dataframe(self, writer, daily_fees_list):
-        """ایجاد دیتافریم برای شیت کارمزدها"""
-        # ستون‌های مورد نیاز برای نمایش
-        columns = [
-            {"text": "تاریخ", "dataindex": "date"},
-            {"text": "بانک", "dataindex": "bank_name"}, 
-            {"text": "جمع کارمزد (ریال)", "dataindex": "total_amount"},
-            {"text": "تعداد تراکنش", "dataindex": "count"}
-        ]
-        
-        # آماده‌سازی داده‌ها برای دیتافریم
-        rows_data = []
-        for item in daily_fees_list:
-            row = []
-            for col in columns:
-                key = col["dataindex"]
-                if key in item:
-                    if key == "total_amount":
-                        try:
-                            if item[key] is not None:
-                                amount_value = float(item[key])
-                                row.append(f"{int(amount_value):,}")
-                            else:
-                                row.append("")
-                        except:
-                            row.append(str(item[key]) if item[key] is not None else "")
-                    else:
-                        row.append(str(item[key]) if item[key] is not None else "")
-            rows_data.append(row)
-        
-        # ایجاد دیتافریم
-        column_names = [col["text"] for col in columns]
-        df_fees = pd.DataFrame(rows_data, columns=column_names)
-        
-        # مرتب‌سازی بر اساس تاریخ
-        df_fees = df_fees.sort_values(by="تاریخ")
-        
-        # اضافه کردن به اکسل
-        df_fees.to_excel(writer, sheet_name='کارمزدها', index=False)
-        
-        # تنظیم استایل‌ها برای شیت کارمزدها
-        self._apply_fees_sheet_styles(writer)
-    
-    def _apply_fees_sheet_styles(self, writer):
-        """اعمال استایل‌ها به شیت کارمزدها"""
-        worksheet = writer.sheets['کارمزدها']
-        
-        # تنظیم راست به چپ بودن کل شیت
-        worksheet.sheet_view.rightToLeft = True
-        
-        # تنظیم استایل هدر
-        header_fill = PatternFill(start_color='E6E6E6', end_color='E6E6E6', fill_type='solid')
-        header_font = Font(name='Tahoma', size=12, bold=True)
-        
-        for cell in worksheet[1]:
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-        
-        # تنظیم فونت و راست به چپ بودن برای داده‌ها
-        for row in worksheet.iter_rows(min_row=2):
-            for cell in row:
-                cell.font = Font(name='Tahoma', size=11)
-                cell.alignment = Alignment(horizontal='right', vertical='center')
-        
-        # تنظیم عرض ستون‌ها
-        for i, column in enumerate(worksheet.columns):
-            max_length = 0
-            column_letter = get_column_letter(i+1)
-            
-            # بررسی طول محتوای سلول‌ها
-            for cell in column:
-                try:
-                    if cell.value:
-                        cell_length = len(str(cell.value))
-                        if cell_length > max_length:
-                            max_length = cell_length
-                except:
-                    pass
-            
-            # تنظیم عرض ستون با توجه به محتوا
-            adjusted_width = max(max_length + 4, 15)  # حداقل عرض 15 کاراکتر
-            worksheet.column_dimensions[column_letter].width = adjusted_width
@@ -1,21 +1,29 @@
 """
 PDF Export Module
 جدا شده از report_tab.py برای ماژولار کردن کد
+
+ردیف‌ها به صورت جریانی و در قطعه‌های هم‌اندازه یک صفحه مستقیماً روی canvas
+رسم می‌شوند؛ بنابراین حافظه و زمان ساخت فایل با تعداد صفحات رشد خطی دارد و
+کل جدول هیچ‌گاه در حافظه ساخته نمی‌شود. فونت‌ها یک بار در هر پردازه ثبت و
+شکل نمایشی متن‌های فارسی تکراری (reshape و bidi) در حافظه نگهداری می‌شود.
 """
 import os
+import re
 import logging
+import threading
+from functools import lru_cache
+from itertools import islice
 from tkinter import filedialog, messagebox
 from datetime import datetime
-import tempfile
+from config.settings import PDF_TABLE_ROW_HEIGHT, PDF_SHAPED_TEXT_CACHE_SIZE
 
 try:
     from reportlab.lib import colors
     from reportlab.lib.pagesizes import A4, landscape
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import Table, TableStyle
     from reportlab.pdfbase import pdfmetrics
     from reportlab.pdfbase.ttfonts import TTFont
-    from reportlab.lib.enums import TA_RIGHT, TA_CENTER
+    from reportlab.pdfgen import canvas
     REPORTLAB_AVAILABLE = True
 except ImportError:
     REPORTLAB_AVAILABLE = False
@@ -28,52 +36,106 @@ try:
 except ImportError:
     RTL_SUPPORT_AVAILABLE = False
 
+FONT_NAME = 'Vazir'
+FONT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))),
+    "assets", "fonts", "Vazir.ttf"
+)
+
+# اندازه‌های صفحه و جدول (پوینت)
+PAGE_MARGIN = 30
+HEADER_FONT_SIZE = 12
+CELL_FONT_SIZE = 10
+CELL_PADDING = 12
+
+_RTL_CHARACTERS = re.compile(r'[\u0590-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF]')
+
+# فونت‌های ثبت شده در reportlab در این پردازه
+_registered_fonts = set()
+_font_lock = threading.Lock()
+
+
+def register_font(font_name=FONT_NAME, font_path=FONT_PATH):
+    """ثبت فونت در reportlab فقط یک بار در هر پردازه"""
+    with _font_lock:
+        if font_name in _registered_fonts:
+            return
+        if not os.path.exists(font_path):
+            raise FileNotFoundError(f"فایل فونت در مسیر {font_path} یافت نشد")
+        pdfmetrics.registerFont(TTFont(font_name, font_path))
+        _registered_fonts.add(font_name)
+
+
+@lru_cache(maxsize=PDF_SHAPED_TEXT_CACHE_SIZE)
+def _shape_rtl_text(text):
+    if RTL_SUPPORT_AVAILABLE:
+        try:
+            # Reshape Arabic/Persian characters and apply bidirectional algorithm
+            return get_display(reshape(text))
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"خطا در تنظیم متن فارسی: {str(e)}")
+            return text
+    # Fallback: simple reversal for Persian text (not perfect but better than nothing)
+    return text[::-1]
+
+
+def shape_text(text):
+    """
+    تنظیم متن فارسی برای نمایش صحیح در PDF
+
+    متن‌های بدون حروف راست به چپ (اعداد، تاریخ‌ها، شناسه‌ها) بدون تغییر و بدون
+    ورود به کش برگردانده می‌شوند.
+    """
+    if text is None:
+        return ""
+    if not isinstance(text, str):
+        text = str(text)
+    if not text or not _RTL_CHARACTERS.search(text):
+        return text
+    return _shape_rtl_text(text)
+
 
 class PDFExporter:
     """کلاس صدور اطلاعات به فایل PDF"""
-    
+
     def __init__(self, logger=None):
         self.logger = logger or logging.getLogger(__name__)
-    
+
     def export_to_pdf(self, data, columns, selected_table, selected_bank, table_data):
-        """صدور گزارش به فایل PDF"""
+        """صدور گزارش به فایل PDF (ردیف اول table_data عنوان ستون‌هاست)"""
         try:
             if not data:
                 messagebox.showwarning("هشدار", "هیچ داده‌ای برای صدور وجود ندارد")
                 return False
-            
+
             # بررسی وجود کتابخانه‌های مورد نیاز
             if not REPORTLAB_AVAILABLE:
                 self._show_missing_libraries_error()
                 return False
-            
+
             # دریافت مسیر ذخیره فایل
             file_path = filedialog.asksaveasfilename(
                 defaultextension=".pdf",
                 filetypes=[("PDF files", "*.pdf")],
                 title="ذخیره فایل PDF"
             )
-            
+
             if not file_path:
                 return False
-            
-            # ثبت فونت فارسی
-            if not self._register_persian_font():
-                return False
-            
-            # ایجاد PDF
-            self._create_pdf(file_path, selected_table, selected_bank, table_data)
-            
-            self.logger.info(f"گزارش با موفقیت به فایل {file_path} صادر شد")
+
+            rows = iter(table_data)
+            header = next(rows, [])
+            self.write_report(file_path, self.get_report_title(selected_table, selected_bank), header, rows)
+
             messagebox.showinfo("موفقیت", "گزارش با موفقیت به PDF صادر شد")
             return True
-            
+
         except Exception as e:
             error_msg = f"خطا در صدور به PDF: {str(e)}"
             self.logger.error(error_msg)
             messagebox.showerror("خطا", error_msg)
             return False
-    
+
     def _show_missing_libraries_error(self):
         """نمایش خطای کتابخانه‌های گمشده"""
         error_msg = (
@@ -83,161 +145,133 @@ class PDFExporter:
             "pip install reportlab python-bidi arabic-reshaper jdatetime"
         )
         messagebox.showerror("خطا", error_msg)
-    
-    def _register_persian_font(self):
-        """ثبت فونت فارسی"""
-        try:
-            font_path = os.path.join(
-                os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
-                "assets", "fonts", "Vazir.ttf"
-            )
-            
-            if not os.path.exists(font_path):
-                self.logger.error(f"فایل فونت در مسیر {font_path} یافت نشد")
-                messagebox.showerror("خطا", f"فایل فونت در مسیر {font_path} یافت نشد")
-                return False
-            
-            self.logger.info(f"فایل فونت در مسیر {font_path} یافت شد")
-            pdfmetrics.registerFont(TTFont('Vazir', font_path))
-            return True
-            
-        except Exception as e:
-            self.logger.error(f"خطا در ثبت فونت: {str(e)}")
-            messagebox.showerror("خطا", f"خطا در ثبت فونت: {str(e)}")
-            return False
-    
-    def _create_pdf(self, file_path, selected_table, selected_bank, table_data):
-        """ایجاد فایل PDF"""
-        # ایجاد استایل‌های متن
-        styles = getSampleStyleSheet()
-        styles.add(ParagraphStyle(name='RTL', fontName='Vazir', alignment=TA_RIGHT))
-        
-        # ایجاد داکیومنت PDF
-        doc = SimpleDocTemplate(file_path, pagesize=landscape(A4))
-        elements = []
-        
-        # اضافه کردن عنوان و تاریخ
-        self._add_title_and_date(elements, styles, selected_table, selected_bank)
-        
-        # ایجاد جدول
-        self._add_data_table(elements, table_data)
-        
-        # اضافه کردن پاورقی
-        self._add_footer(elements, styles, len(table_data))
-        
-        # ساخت PDF
-        doc.build(elements)
-    
-    def _add_title_and_date(self, elements, styles, selected_table, selected_bank):
-        """اضافه کردن عنوان و تاریخ به PDF"""
-        # عنوان گزارش
-        title_style = ParagraphStyle(
-            'Title',
-            parent=styles['Title'],
-            fontName='Vazir',
-            alignment=TA_RIGHT,
-            fontSize=16
-        )
-        
+
+    @staticmethod
+    def get_report_title(selected_table, selected_bank):
+        """عنوان گزارش بر اساس نوع گزارش و بانک انتخاب شده"""
         report_title = f"گزارش {selected_table}"
         if selected_bank != "همه موارد":
             report_title += f" - بانک {selected_bank}"
-        
-        formatted_title = self._format_persian_text(report_title)
-        elements.append(Paragraph(formatted_title, title_style))
-        elements.append(Spacer(1, 20))
-        
-        # تاریخ گزارش
-        date_style = ParagraphStyle(
-            'Date',
-            parent=styles['Normal'],
-            fontName='Vazir',
-            alignment=TA_RIGHT,
-            fontSize=10
-        )
-        
-        report_date = self._get_jalali_date()
-        formatted_date_text = self._format_persian_text(f"تاریخ گزارش: {report_date}")
-        elements.append(Paragraph(formatted_date_text, date_style))
-        elements.append(Spacer(1, 20))
-    
-    def _add_data_table(self, elements, table_data):
-        """اضافه کردن جدول داده‌ها به PDF"""
-        if not table_data:
-            return
-        
-        # ایجاد داده‌های جدول
-        table_data_formatted = []
-        
-        # فرض می‌کنیم ردیف اول عنوان ستون‌هاست
-        if table_data:
-            # هدر جدول
-            header_row = [self._format_persian_text(str(cell)) for cell in table_data[0]]
-            table_data_formatted.append(header_row)
-            
-            # ردیف‌های داده
-            for row in table_data[1:]:
-                data_row = []
-                for cell in row:
-                    formatted_value = self._format_persian_text(str(cell) if cell is not None else "")
-                    data_row.append(formatted_value)
-                table_data_formatted.append(data_row)
-        
-        # ایجاد جدول
-        table = Table(table_data_formatted, repeatRows=1)
-        
-        # استایل جدول
-        table.setStyle(TableStyle([
+        return report_title
+
+    def write_report(self, file_path, title, column_names, rows, row_height=PDF_TABLE_ROW_HEIGHT):
+        """
+        نوشتن جریانی گزارش در فایل PDF (بدون رابط کاربری)
+
+        در هر صفحه فقط ردیف‌های همان صفحه خوانده و به صورت یک جدول مستقل با
+        سطر عنوان تکرار شده رسم می‌شوند. عرض ستون‌ها یک بار از روی صفحه اول
+        تعیین می‌شود تا در تمام صفحات یکسان باشد.
+
+        Args:
+            file_path: مسیر فایل خروجی
+            title: عنوان گزارش
+            column_names: عنوان ستون‌ها
+            rows: iterable ردیف‌های فرمت شده (مثلاً خروجی stream_query_rows)
+            row_height: ارتفاع ردیف‌های داده
+
+        Returns:
+            int: تعداد ردیف‌های نوشته شده
+        """
+        if not REPORTLAB_AVAILABLE:
+            raise ImportError("کتابخانه reportlab نصب نشده است")
+        register_font()
+
+        page_width, page_height = landscape(A4)
+        table_width = page_width - 2 * PAGE_MARGIN
+        header_height = row_height + CELL_PADDING / 2
+        footer_height = 2 * PAGE_MARGIN
+        header = [shape_text(name) for name in column_names]
+        rows = iter(rows)
+        table_style = TableStyle([
             ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
             ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
             ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Vazir'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('FONTNAME', (0, 0), (-1, -1), FONT_NAME),
+            ('FONTSIZE', (0, 0), (-1, 0), HEADER_FONT_SIZE),
+            ('FONTSIZE', (0, 1), (-1, -1), CELL_FONT_SIZE),
             ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ]))
-        
-        elements.append(table)
-    
-    def _add_footer(self, elements, styles, record_count):
-        """اضافه کردن پاورقی به PDF"""
-        elements.append(Spacer(1, 20))
-        footer_style = ParagraphStyle(
-            'Footer',
-            parent=styles['Normal'],
-            fontName='Vazir',
-            alignment=TA_RIGHT,
-            fontSize=10
-        )
-        formatted_footer_text = self._format_persian_text(f"تعداد رکوردها: {record_count}")
-        elements.append(Paragraph(formatted_footer_text, footer_style))
-    
+        ])
+
+        def take(available_height):
+            count = max(1, int((available_height - header_height) // row_height))
+            return [[shape_text(value) for value in row] for row in islice(rows, count)]
+
+        pdf = canvas.Canvas(file_path, pagesize=(page_width, page_height))
+        pdf.setTitle(title)
+        top = self._draw_title(pdf, title, page_width, page_height)
+        chunk = take(top - footer_height)
+        column_widths = self._column_widths(header, chunk, table_width)
+        page_number = 1
+        record_count = 0
+
+        while True:
+            table = Table(
+                [header] + chunk,
+                colWidths=column_widths,
+                rowHeights=[header_height] + [row_height] * len(chunk),
+                style=table_style
+            )
+            _, height = table.wrapOn(pdf, table_width, top - footer_height)
+            table.drawOn(pdf, PAGE_MARGIN, top - height)
+            record_count += len(chunk)
+            self._draw_page_number(pdf, page_number, page_width)
+
+            next_chunk = take(page_height - PAGE_MARGIN - footer_height)
+            if not next_chunk:
+                break
+            pdf.showPage()
+            page_number += 1
+            top = page_height - PAGE_MARGIN
+            chunk = next_chunk
+
+        # پاورقی تعداد رکوردها زیر آخرین جدول
+        footer_y = top - height - 20
+        if footer_y < footer_height:
+            pdf.showPage()
+            page_number += 1
+            self._draw_page_number(pdf, page_number, page_width)
+            footer_y = page_height - PAGE_MARGIN - 20
+        pdf.setFont(FONT_NAME, 10)
+        pdf.drawRightString(page_width - PAGE_MARGIN, footer_y, shape_text(f"تعداد رکوردها: {record_count}"))
+        pdf.save()
+
+        self.logger.info(f"{record_count} رکورد در {page_number} صفحه با موفقیت به فایل {file_path} صادر شد")
+        return record_count
+
+    def _draw_title(self, pdf, title, page_width, page_height):
+        """رسم عنوان و تاریخ گزارش در صفحه اول؛ موقعیت عمودی شروع جدول را برمی‌گرداند"""
+        right = page_width - PAGE_MARGIN
+        y = page_height - PAGE_MARGIN - 16
+        pdf.setFont(FONT_NAME, 16)
+        pdf.drawRightString(right, y, shape_text(title))
+        y -= 24
+        pdf.setFont(FONT_NAME, 10)
+        pdf.drawRightString(right, y, shape_text(f"تاریخ گزارش: {self._get_jalali_date()}"))
+        return y - 20
+
+    def _draw_page_number(self, pdf, page_number, page_width):
+        pdf.setFont(FONT_NAME, 9)
+        pdf.drawCentredString(page_width / 2, PAGE_MARGIN / 2, shape_text(f"صفحه {page_number}"))
+
+    def _column_widths(self, header, sample_rows, table_width):
+        """عرض ستون‌ها متناسب با طولانی‌ترین متن هر ستون در نمونه، هم‌اندازه با عرض جدول"""
+        if not header:
+            return None
+        widths = []
+        for i, name in enumerate(header):
+            width = pdfmetrics.stringWidth(name, FONT_NAME, HEADER_FONT_SIZE)
+            for row in sample_rows:
+                if i < len(row):
+                    width = max(width, pdfmetrics.stringWidth(row[i], FONT_NAME, CELL_FONT_SIZE))
+            widths.append(width + CELL_PADDING)
+        scale = table_width / sum(widths)
+        return [width * scale for width in widths]
+
     def _format_persian_text(self, text):
         """تنظیم متن فارسی برای نمایش صحیح در PDF"""
-        if not text or not isinstance(text, str):
-            return str(text) if text is not None else ""
-        
-        if RTL_SUPPORT_AVAILABLE:
-            try:
-                # Reshape Arabic/Persian characters
-                reshaped_text = reshape(text)
-                # Apply bidirectional algorithm
-                display_text = get_display(reshaped_text)
-                return display_text
-            except Exception as e:
-                self.logger.warning(f"خطا در تنظیم متن فارسی: {str(e)}")
-                return text
-        else:
-            # Fallback: at least reverse the string for basic RTL support
-            try:
-                # Simple reversal for Persian text (not perfect but better than nothing)
-                import re
-                if re.search(r'[\u0600-\u06FF]', text):
-                    return text[::-1]  # Simple reversal for Persian characters
-                return text
-            except:
-                return text
-    
+        return shape_text(text)
+
     def _get_jalali_date(self):
         """دریافت تاریخ جلالی فعلی"""
         if RTL_SUPPORT_AVAILABLE:
@@ -247,6 +281,6 @@ class PDFExporter:
                 return jalali_date.strftime("%Y/%m/%d %H:%M:%S")
             except Exception as e:
                 self.logger.warning(f"خطا در تبدیل تاریخ جلالی: {str(e)}")
-        
+
         # Fallback to Gregorian date
         return datetime.now().strftime("%Y/%m/%d %H:%M:%S")
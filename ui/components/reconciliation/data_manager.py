@@ -8,7 +8,8 @@ from tkinter import messagebox
 from utils.helpers import gregorian_to_persian
 from utils.constants import TransactionTypes
 from database.banks_repository import get_all_banks
-from database.bank_transaction_repository import get_unreconciled_transactions_by_bank as get_unreconciled_bank_records
+from database.bank_transaction_repository import get_unreconciled_transactions_query
+from database.Helper.pagination import PagedResultSet
 
 
 class DataManager:
@@ -60,7 +61,8 @@ class DataManager:
             show_fees: نمایش کارمزدها یا خیر
             
         Returns:
-            tuple: (list of records, str status message)
+            tuple: (records, str status message)؛ رکوردها یک PagedResultSet هستند که
+            صفحات را هنگام دسترسی با اندیس از دیتابیس می‌خواند
         """
         try:
             if not bank_name:
@@ -72,19 +74,14 @@ class DataManager:
             if not bank_id:
                 return [], "بانک انتخاب شده یافت نشد"
             
-            # دریافت رکوردهای مغایرت‌گیری نشده بانک
-            self.bank_records = get_unreconciled_bank_records(bank_id)
-            
-            # فیلتر کردن رکوردهای کارمزد اگر چک باکس فعال نباشد
-            filtered_records = []
+            # دریافت صفحه‌بندی شده رکوردهای مغایرت‌گیری نشده بانک؛ رکوردهای کارمزد
+            # در صورت عدم نمایش کارمزدها در خود کوئری حذف می‌شوند
+            excluded_type = None if show_fees else TransactionTypes.BANK_FEES
+            filtered_records = PagedResultSet(get_unreconciled_transactions_query(bank_id, excluded_type))
+            self.bank_records = filtered_records
             hidden_fee_count = 0
-            
-            for record in self.bank_records:
-                # اگر رکورد کارمزد است و چک باکس فعال نیست، آن را نمایش نده
-                if not show_fees and self._is_fee_transaction(record):
-                    hidden_fee_count += 1
-                    continue
-                filtered_records.append(record)
+            if not show_fees:
+                hidden_fee_count = get_unreconciled_transactions_query(bank_id).count() - len(filtered_records)
             
             # تولید پیام وضعیت
             status_message = self._generate_status_message(
@@ -100,18 +97,10 @@ class DataManager:
             messagebox.showerror("خطا", error_message)
             return [], error_message
     
-    def _is_fee_transaction(self, record):
-        """بررسی اینکه آیا رکورد مربوط به کارمزد است یا خیر"""
-        try:
-            transaction_type = record.get('transaction_type', '')
-            return transaction_type == TransactionTypes.BANK_FEES
-        except:
-            return False
-    
     def _generate_status_message(self, bank_name, filtered_records, hidden_fee_count):
         """تولید پیام وضعیت برای نمایش تعداد رکوردها"""
         if not filtered_records:
-            if not self.bank_records:
+            if not hidden_fee_count:
                 return f"هیچ رکورد مغایرت‌گیری نشده‌ای برای بانک {bank_name} یافت نشد"
             else:
                 return "هیچ رکورد مغایرت‌گیری نشده‌ای برای نمایش وجود ندارد (کارمزدها پنهان شده‌اند)"
@@ -7,10 +7,6 @@ import tempfile
 import subprocess
 from datetime import datetime
 from tkinter import messagebox
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 from utils.helpers import gregorian_to_persian
 
 
@@ -25,6 +21,9 @@ class ReportGenerator:
     def _setup_fonts(self):
         """تنظیم فونت‌های فارسی برای PDF"""
         try:
+            from reportlab.pdfbase import pdfmetrics
+            from reportlab.pdfbase.ttfonts import TTFont
+
             # تلاش برای ثبت فونت‌های مختلف فارسی
             font_paths = [
                 'fonts/BNazanin.ttf',
@@ -76,6 +75,8 @@ class ReportGenerator:
                 pdf_path = temp_file.name
             
             # ایجاد PDF
+            from reportlab.lib.pagesizes import A4
+            from reportlab.pdfgen import canvas
             c = canvas.Canvas(pdf_path, pagesize=A4)
             
             if not self.font_registered:
@@ -315,6 +316,8 @@ class ReportGenerator:
             with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
                 pdf_path = temp_file.name
             
+            from reportlab.lib.pagesizes import A4
+            from reportlab.pdfgen import canvas
             c = canvas.Canvas(pdf_path, pagesize=A4)
             c.setFont(self.font_name, 12)
             
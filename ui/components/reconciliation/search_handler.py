@@ -3,22 +3,191 @@ Search Handler Module
 ماژول مدیریت جستجو - جدا شده از manual_reconciliation_tab.py
 """
 import logging
+import queue
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from tkinter import messagebox
 from utils.helpers import persian_to_gregorian
-from utils.constants import TransactionTypes
-from database.repositories.accounting import get_transactions_advanced_search
+from utils.constants import MELLAT_TRANSACTION_TYPES, KESHAVARZI_TRANSACTION_TYPES, TransactionTypes
+from database.repositories.accounting import (
     get_transactions_by_date_and_type as get_unreconciled_accounting_records_by_date,
-    get_transactions_advanced_search
+    get_transactions_advanced_search,
+    search_unreconciled_transactions_by_text
 )
+from config.settings import CANDIDATE_CACHE_SIZE, MANUAL_SEARCH_RESULT_LIMIT
 
 
 class SearchHandler:
     """کلاس مدیریت جستجوی رکوردها"""
     
-    def __init__(self, banks_dict, logger=None):
+    def __init__(self, banks_dict, logger=None, cache_size=CANDIDATE_CACHE_SIZE):
         self.banks_dict = banks_dict
         self.logger = logger or logging.getLogger(__name__)
+        
+        # کش LRU کاندیداهای حسابداری به ازای شناسه رکورد بانک
+        self.cache_size = cache_size
+        self._candidate_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # با هر بی‌اعتبارسازی کش افزایش می‌یابد تا نتایج پیش‌خوانی قدیمی ذخیره نشوند
+        self._cache_generation = 0
+        self._prefetch_queue = queue.Queue()
+        self._pending_prefetch = set()
+        self._prefetch_thread = None
+    
+    # ---------- کاندیداهای رکورد بانک (با کش و پیش‌خوانی) ----------
+    
+    def get_candidate_transaction_type(self, bank_record):
+        """تبدیل نوع تراکنش رکورد بانک به نوع تراکنش حسابداری"""
+        bank_transaction_type = bank_record.get('transaction_type', '')
+        if bank_transaction_type in (MELLAT_TRANSACTION_TYPES['RECEIVED_POS'], KESHAVARZI_TRANSACTION_TYPES['RECEIVED_POS'], 'received_pos'):
+            return TransactionTypes.POS
+        if bank_transaction_type in (MELLAT_TRANSACTION_TYPES['PAID_TRANSFER'], KESHAVARZI_TRANSACTION_TYPES['PAID_TRANSFER'], 'paid_transfer'):
+            return TransactionTypes.PAID_TRANSFER
+        if bank_transaction_type in (MELLAT_TRANSACTION_TYPES['RECEIVED_TRANSFER'], KESHAVARZI_TRANSACTION_TYPES['RECEIVED_TRANSFER'], 'received_transfer'):
+            return TransactionTypes.RECEIVED_TRANSFER
+        if bank_transaction_type in (KESHAVARZI_TRANSACTION_TYPES['RECEIVED_CHECK'], 'received_check'):
+            return TransactionTypes.RECEIVED_CHECK
+        if bank_transaction_type in (KESHAVARZI_TRANSACTION_TYPES['PAID_CHECK'], 'paid_check'):
+            return TransactionTypes.PAID_CHECK
+        if bank_transaction_type in (MELLAT_TRANSACTION_TYPES['BANK_FEES'], KESHAVARZI_TRANSACTION_TYPES['BANK_FEES'], 'bank_fee'):
+            return TransactionTypes.BANK_FEES
+        return TransactionTypes.UNKNOWN
+    
+    def is_paid_candidate_search(self, bank_record):
+        """آیا کاندیداهای رکورد بانک بدون فیلتر مبلغ جستجو می‌شوند (تراکنش‌های پرداختی دارای کارمزد)"""
+        return self.get_candidate_transaction_type(bank_record) in [TransactionTypes.PAID_TRANSFER, TransactionTypes.PAID_CHECK]
+    
+    def find_candidates(self, bank_record):
+        """
+        جستجوی رکوردهای حسابداری مغایرت‌گیری نشده کاندید برای یک رکورد بانک (بدون کش)
+        
+        رکوردهای هم تاریخ و هم نوع در تمام بانک‌ها جستجو می‌شوند؛ برای تراکنش‌های
+        POS تاریخ یک روز قبل است و برای تراکنش‌های پرداختی فیلتر مبلغ اعمال نمی‌شود
+        و نتایج بر اساس نزدیکی مبلغ مرتب می‌شوند.
+        """
+        bank_date = bank_record['transaction_date']
+        bank_amount = bank_record['amount']
+        transaction_type = self.get_candidate_transaction_type(bank_record)
+        
+        # اگر نوع تراکنش POS است، تاریخ را یک روز کاهش می‌دهیم
+        search_date = bank_date
+        if transaction_type == TransactionTypes.POS:
+            search_date = (datetime.strptime(bank_date, '%Y-%m-%d') - timedelta(days=1)).strftime('%Y-%m-%d')
+        
+        if self.is_paid_candidate_search(bank_record):
+            records = get_transactions_advanced_search(
+                bank_id=None,
+                start_date=search_date,
+                end_date=search_date,
+                transaction_type=transaction_type,
+                is_reconciled=False
+            )
+            records.sort(key=lambda r: abs(float(r.get('transaction_amount', 0)) - float(bank_amount)))
+        else:
+            records = get_transactions_advanced_search(
+                bank_id=None,
+                start_date=search_date,
+                end_date=search_date,
+                transaction_type=transaction_type,
+                min_amount=bank_amount,
+                max_amount=bank_amount,
+                is_reconciled=False
+            )
+        self.logger.info(f"تعداد {len(records)} رکورد حسابداری کاندید برای رکورد بانک {bank_record.get('id')} یافت شد")
+        return records
+    
+    def get_candidates(self, bank_record):
+        """کاندیداهای رکورد بانک از کش (در صورت نبود، جستجو و ذخیره در کش)"""
+        record_id = bank_record['id']
+        with self._cache_lock:
+            records = self._candidate_cache.get(record_id)
+            if records is not None:
+                self._candidate_cache.move_to_end(record_id)
+                self.logger.info(f"کاندیداهای رکورد بانک {record_id} از کش خوانده شد")
+                return list(records)
+            generation = self._cache_generation
+        records = self.find_candidates(bank_record)
+        self._store_candidates(record_id, records, generation)
+        return list(records)
+    
+    def _store_candidates(self, record_id, records, generation):
+        with self._cache_lock:
+            if generation != self._cache_generation:
+                return
+            self._candidate_cache[record_id] = records
+            self._candidate_cache.move_to_end(record_id)
+            while len(self._candidate_cache) > self.cache_size:
+                self._candidate_cache.popitem(last=False)
+    
+    def prefetch_candidates(self, bank_records):
+        """جستجوی کاندیداهای رکوردهای بانک در نخ پس‌زمینه و ذخیره در کش"""
+        with self._cache_lock:
+            for record in bank_records:
+                record_id = record['id']
+                if record_id in self._candidate_cache or record_id in self._pending_prefetch:
+                    continue
+                self._pending_prefetch.add(record_id)
+                self._prefetch_queue.put((record, self._cache_generation))
+            if self._pending_prefetch and (self._prefetch_thread is None or not self._prefetch_thread.is_alive()):
+                self._prefetch_thread = threading.Thread(target=self._prefetch_worker, daemon=True)
+                self._prefetch_thread.start()
+    
+    def _prefetch_worker(self):
+        """پردازش صف پیش‌خوانی تا خالی شدن آن"""
+        while True:
+            with self._cache_lock:
+                try:
+                    record, generation = self._prefetch_queue.get_nowait()
+                except queue.Empty:
+                    # پایان نخ در همان قفلی که prefetch_candidates برای شروع نخ جدید می‌گیرد
+                    self._prefetch_thread = None
+                    return
+                if generation != self._cache_generation or record['id'] in self._candidate_cache:
+                    self._pending_prefetch.discard(record['id'])
+                    continue
+            try:
+                self._store_candidates(record['id'], self.find_candidates(record), generation)
+            except Exception as e:
+                self.logger.warning(f"خطا در پیش‌خوانی کاندیداهای رکورد بانک {record.get('id')}: {str(e)}")
+            finally:
+                with self._cache_lock:
+                    self._pending_prefetch.discard(record['id'])
+    
+    def invalidate_candidates(self):
+        """
+        پاک کردن کش کاندیداها و صف پیش‌خوانی
+        
+        پس از هر مغایرت‌گیری یا ویرایش فراخوانی می‌شود، چون یک رکورد حسابداری
+        ممکن است کاندید چند رکورد بانک باشد.
+        """
+        with self._cache_lock:
+            self._cache_generation += 1
+            self._candidate_cache.clear()
+            self._pending_prefetch.clear()
+            while True:
+                try:
+                    self._prefetch_queue.get_nowait()
+                except queue.Empty:
+                    break
+    
+    # ---------- جستجوی آزاد ----------
+    
+    def search_text(self, text, cancel_event=None, bank_id=None):
+        """
+        جستجوی متنی آزاد در رکوردهای حسابداری مغایرت‌گیری نشده
+        
+        Args:
+            text: متن جستجو
+            cancel_event: threading.Event برای لغو کوئری در حال اجرا
+            bank_id: شناسه بانک (اختیاری)
+        """
+        text = text.strip()
+        if not text:
+            return []
+        return search_unreconciled_transactions_by_text(
+            text, bank_id=bank_id, limit=MANUAL_SEARCH_RESULT_LIMIT, cancel_event=cancel_event
+        )
     
     def search_accounting_records(self, selected_bank_record=None, advanced_search_params=None):
         """
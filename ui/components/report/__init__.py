@@ -3,9 +3,16 @@ Report Components Package
 ماژول‌های مربوط به گزارش‌گیری
 """
 
-from .chart_visualizer import ChartVisualizer
 from .data_filter import DataFilter
 
 __all__ = ['ChartVisualizer', 'DataFilter']
 
+
+def __getattr__(name):
+    # ChartVisualizer به matplotlib، seaborn و pandas وابسته است و فقط هنگام نیاز بارگذاری می‌شود
+    if name == 'ChartVisualizer':
+        from .chart_visualizer import ChartVisualizer
+        return ChartVisualizer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 """Report components package"""
@@ -3,7 +3,7 @@ Data Filter Module
 جدا شده از report_tab.py برای ماژولار کردن کد
 """
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 import jdatetime
 from tkinter import messagebox
 import re
@@ -77,6 +77,133 @@ class DataFilter:
             self.logger.error(f"خطا در فیلتر کردن داده‌ها: {str(e)}")
             return data
     
+    # نگاشت نام فیلتر به فیلد رکورد برای ساخت کوئری (قابل جایگزینی با field_columns)
+    QUERY_FILTER_FIELDS = {
+        'bank': 'bank_name',
+        'date': 'transaction_date',
+        'amount': 'amount',
+        'transaction_type': 'transaction_type',
+        'status': 'status'
+    }
+    
+    # فیلدهای پیش‌فرض جستجوی متنی (مشابه _filter_by_text_search)
+    SEARCH_FIELDS = [
+        'transaction_id', 'description', 'reference_number',
+        'account_number', 'bank_name', 'transaction_type'
+    ]
+    
+    def build_query(self, query, filters, field_columns=None, search_fields=None,
+                    sort_column=None, ascending=True, date_fields=(), amount_fields=(),
+                    value_labels=None):
+        """
+        افزودن همان فیلترهای filter_data به صورت شرط‌های پارامتری به یک KeysetQuery
+        
+        به جای خواندن تمام رکوردها و فیلتر آن‌ها در پایتون، شرط‌ها در کوئری
+        اعمال می‌شوند تا از ایندکس‌های دیتابیس استفاده شود و فقط صفحات مورد
+        نیاز خوانده شوند.
+        
+        Args:
+            query: نمونه KeysetQuery پایه
+            filters: دیکشنری فیلترها با کلیدهای filter_data
+            field_columns: نگاشت نام فیلتر (bank, date, amount, transaction_type,
+                status) به فیلد رکورد در صورت تفاوت با QUERY_FILTER_FIELDS
+            search_fields: فیلدهای جستجوی متنی (پیش‌فرض SEARCH_FIELDS)
+            sort_column: فیلد مرتب‌سازی (اختیاری)
+            ascending: مرتب‌سازی صعودی
+            date_fields: فیلدهای تاریخ که به صورت شمسی نمایش داده می‌شوند
+            amount_fields: فیلدهای مبلغ که با جداکننده هزارگان نمایش داده می‌شوند
+            value_labels: نگاشت فیلد به {متن نمایشی: مقدار ذخیره شده} (مثلاً بله/خیر)
+        
+        Returns:
+            KeysetQuery: کوئری جدید با شرط‌ها و مرتب‌سازی درخواستی
+        """
+        fields = dict(self.QUERY_FILTER_FIELDS)
+        fields.update(field_columns or {})
+        conditions = []
+        params = []
+        
+        # فیلتر بانک
+        if filters.get('bank') and filters['bank'] != 'همه موارد':
+            conditions.append(f"{query.column_for(fields['bank'])} = ?")
+            params.append(filters['bank'])
+        
+        # فیلتر تاریخ (تاریخ‌ها در دیتابیس به صورت میلادی YYYY-MM-DD ذخیره می‌شوند)
+        date_column = query.column_for(fields['date'])
+        start_date = self._parse_date(filters['date_from']) if filters.get('date_from') else None
+        end_date = self._parse_date(filters['date_to']) if filters.get('date_to') else None
+        if start_date:
+            conditions.append(f"{date_column} >= ?")
+            params.append(start_date.strftime('%Y-%m-%d'))
+        if end_date:
+            # مقایسه با ابتدای روز بعد تا مقادیر دارای زمان نیز شامل شوند
+            conditions.append(f"{date_column} < ?")
+            params.append((end_date + timedelta(days=1)).strftime('%Y-%m-%d'))
+        
+        # فیلتر مبلغ
+        amount_column = query.column_for(fields['amount'])
+        if filters.get('amount_from') is not None:
+            conditions.append(f"{amount_column} >= ?")
+            params.append(filters['amount_from'])
+        if filters.get('amount_to') is not None:
+            conditions.append(f"{amount_column} <= ?")
+            params.append(filters['amount_to'])
+        
+        # فیلتر نوع تراکنش و وضعیت
+        for name in ('transaction_type', 'status'):
+            value = filters.get(name)
+            if value and value != 'همه موارد':
+                conditions.append(f"{query.column_for(fields[name])} = ?")
+                params.append(value)
+        
+        # فیلتر متنی (LIKE در SQLite برای حروف لاتین به بزرگی و کوچکی حساس نیست)
+        search_text = (filters.get('search_text') or '').strip()
+        if search_text:
+            search_conditions = []
+            for field in (search_fields or self.SEARCH_FIELDS):
+                column = query.column_for(field)
+                labels = (value_labels or {}).get(field)
+                if labels and search_text in labels:
+                    # متن نمایشی وضعیت با مقدار ذخیره شده مقایسه می‌شود
+                    search_conditions.append(f"{column} = ?")
+                    params.append(labels[search_text])
+                    continue
+                pattern = self._search_pattern(search_text, field in date_fields, field in amount_fields)
+                search_conditions.append(f"IFNULL({column}, '') LIKE ? ESCAPE '\\'")
+                params.append(pattern)
+            conditions.append("(" + " OR ".join(search_conditions) + ")")
+        
+        filtered_query = query.with_conditions(conditions, params)
+        if sort_column:
+            filtered_query = filtered_query.with_sort(sort_column, descending=not ascending)
+        self.logger.info(f"تعداد {len(conditions)} شرط فیلتر به کوئری اضافه شد")
+        return filtered_query
+    
+    def _search_pattern(self, search_text, is_date=False, is_amount=False):
+        """
+        الگوی LIKE متن جستجو برای مقدار ذخیره شده یک فیلد
+        
+        تاریخ شمسی کامل (مانند 1403/05/01) به تاریخ میلادی ذخیره شده و مبلغ دارای
+        جداکننده هزارگان به عدد بدون جداکننده تبدیل می‌شود تا متن نمایش داده شده
+        در جدول قابل جستجو باشد.
+        """
+        if is_date:
+            try:
+                gregorian = jdatetime.datetime.strptime(search_text, '%Y/%m/%d').togregorian()
+                # تاریخ‌های دارای زمان نیز با این پیشوند مطابقت دارند
+                return self._escape_like(gregorian.strftime('%Y-%m-%d')) + '%'
+            except ValueError:
+                pass
+        if is_amount:
+            digits = search_text.replace(',', '').replace('٬', '')
+            if digits.isdigit():
+                search_text = digits
+        return f"%{self._escape_like(search_text)}%"
+    
+    @staticmethod
+    def _escape_like(text):
+        """نویسه‌های خاص LIKE (با ESCAPE '\\') به صورت متن ساده"""
+        return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    
     def _filter_by_bank(self, data, bank_name):
         """فیلتر بر اساس نام بانک"""
         return [item for item in data if item.get('bank_name', '') == bank_name]
@@ -1,13 +1,16 @@
-import os
+import queue
 import logging
 import threading
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from tkinter import StringVar, BooleanVar, messagebox
 from ttkbootstrap.scrolled import ScrolledText
+from ui.components.common.log_handler import BatchedTextHandler
+from utils.logger_config import add_file_logging
 from config.settings import (
-    DATA_DIR, DEFAULT_FONT, DEFAULT_FONT_SIZE,
-    HEADER_FONT_SIZE, BUTTON_FONT_SIZE
+    DEFAULT_FONT, DEFAULT_FONT_SIZE,
+    HEADER_FONT_SIZE, BUTTON_FONT_SIZE,
+    REPORT_POLL_INTERVAL_MS
 )
 from ui.components.dashboard import (
     StatisticsProvider,
@@ -15,18 +18,6 @@ from ui.components.dashboard import (
     DashboardOperations
 )
 
-# کلاس برای نمایش لاگ‌ها در UI
-class UIHandler(logging.Handler):
-    def __init__(self, text_widget):
-        super().__init__()
-        self.text_widget = text_widget
-        
-    def emit(self, record):
-        msg = self.format(record) + '\n'
-        # ScrolledText در ttkbootstrap از state پشتیبانی نمی‌کند
-        self.text_widget.insert('end', msg)
-        self.text_widget.see('end')
-
 class DashboardTab(ttk.Frame):
     def __init__(self, parent):
         super().__init__(parent)
@@ -35,6 +26,11 @@ class DashboardTab(ttk.Frame):
         # متغیرهای مورد نیاز
         self.status_var = StringVar(value="آماده...")
         
+        # آخرین آمار نمایش داده شده و برچسب‌های هر بخش (برای به‌روزرسانی فقط در صورت تغییر)
+        self.displayed_stats = {}
+        self.stat_labels = {}
+        self.statistics_queue = None
+        
         # ایجاد کامپوننت‌های مدولار
         self.statistics_provider = StatisticsProvider(self.logger)
         self.chart_manager = ChartManager(self.logger)
@@ -54,31 +50,12 @@ class DashboardTab(ttk.Frame):
         
     def setup_logging(self):
         """راه‌اندازی سیستم لاگینگ"""
-        os.makedirs(DATA_DIR, exist_ok=True)
-        
         # تنظیمات کلی لاگر
         self.logger = logging.getLogger('dashboard.tab')
         self.logger.setLevel(logging.INFO)
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        
-        # لاگر برای فایل خطاها
-        error_handler = logging.FileHandler(os.path.join(DATA_DIR, 'dashboard_error.txt'), encoding='utf-8')
-        error_handler.setLevel(logging.ERROR)
-        error_handler.setFormatter(formatter)
-        
-        # لاگر برای فایل لاگ عمومی
-        file_handler = logging.FileHandler(os.path.join(DATA_DIR, 'dashboard_log.txt'), encoding='utf-8')
-        file_handler.setLevel(logging.INFO)
-        file_handler.setFormatter(formatter)
-        
-        # لاگر برای کنسول با پشتیبانی از UTF-8
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
-        console_handler.setFormatter(formatter)
-        
-        self.logger.addHandler(error_handler)
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
+        
+        # فایل‌های لاگ و خطا (با چرخش بر اساس حجم) در نخ جداگانه از طریق صف نوشته می‌شوند
+        add_file_logging(self.logger, 'dashboard_log.txt', 'dashboard_error.txt')
         # UI handler will be added after creating log_text widget
 
     def create_widgets(self):
@@ -184,7 +161,7 @@ class DashboardTab(ttk.Frame):
         self.log_text.pack(fill="both", expand=True, padx=PADX, pady=PADY)
         
         # اضافه کردن UI handler به لاگر
-        ui_handler = UIHandler(self.log_text)
+        ui_handler = BatchedTextHandler(self.log_text)
         ui_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
         ui_handler.setLevel(logging.INFO)
         self.logger.addHandler(ui_handler)
@@ -205,151 +182,109 @@ class DashboardTab(ttk.Frame):
             self.logger.info("در حال بارگذاری آمار...")
             self.status_var.set("در حال بارگذاری آمار...")
             
-            # اجرای در یک ترد جداگانه برای جلوگیری از انسداد UI
-            threading.Thread(target=self._load_statistics_thread, daemon=True).start()
+            # اجرای در یک ترد جداگانه برای جلوگیری از انسداد UI؛ نتایج از طریق صف
+            # در حلقه اصلی دریافت می‌شوند
+            self.statistics_queue = queue.Queue()
+            threading.Thread(target=self._load_statistics_thread, args=(self.statistics_queue,), daemon=True).start()
+            self.after(REPORT_POLL_INTERVAL_MS, self._poll_statistics_queue, self.statistics_queue)
         except Exception as e:
             self.logger.error(f"خطا در بارگذاری آمار: {str(e)}")
             self.status_var.set(f"خطا در بارگذاری آمار: {str(e)}")
     
-    def _load_statistics_thread(self):
+    def _load_statistics_thread(self, statistics_queue):
         """بارگذاری آمار در یک ترد جداگانه"""
         try:
-            # دریافت آمار بانک‌ها
-            bank_stats = self.statistics_provider.get_bank_statistics()
-            # استفاده از after برای اجرای به‌روزرسانی UI در حلقه اصلی
-            self.after(100, lambda: self._update_bank_statistics_ui(bank_stats))
-            
-            # دریافت آمار حسابداری
-            accounting_stats = self.statistics_provider.get_accounting_statistics()
-            self.after(200, lambda: self._update_accounting_statistics_ui(accounting_stats))
-            
-            # دریافت آمار پوز
-            pos_stats = self.statistics_provider.get_pos_statistics()
-            self.after(300, lambda: self._update_pos_statistics_ui(pos_stats))
-            
-            self.after(400, lambda: self.status_var.set("آمار با موفقیت بارگذاری شد"))
-            self.logger.info("آمار با موفقیت بارگذاری شد")
+            statistics_queue.put(('ready', {
+                'bank': self.statistics_provider.get_bank_statistics(),
+                'accounting': self.statistics_provider.get_accounting_statistics(),
+                'pos': self.statistics_provider.get_pos_statistics()
+            }))
         except Exception as e:
-            self.logger.error(f"خطا در بارگذاری آمار: {str(e)}")
-            self.after(0, lambda e=e: self.status_var.set(f"خطا در بارگذاری آمار: {str(e)}"))
+            statistics_queue.put(('error', str(e)))
+    
+    def _poll_statistics_queue(self, statistics_queue):
+        """دریافت نتیجه بارگذاری آمار در نخ رابط کاربری"""
+        # صف متعلق به بارگذاری قبلی نادیده گرفته می‌شود
+        if statistics_queue is not self.statistics_queue:
+            return
+        try:
+            kind, payload = statistics_queue.get_nowait()
+        except queue.Empty:
+            self.after(REPORT_POLL_INTERVAL_MS, self._poll_statistics_queue, statistics_queue)
+            return
+        
+        if kind == 'error':
+            self.logger.error(f"خطا در بارگذاری آمار: {payload}")
+            self.status_var.set(f"خطا در بارگذاری آمار: {payload}")
+            return
+        
+        self._update_bank_statistics_ui(payload['bank'])
+        self._update_accounting_statistics_ui(payload['accounting'])
+        self._update_pos_statistics_ui(payload['pos'])
+        self.status_var.set("آمار با موفقیت بارگذاری شد")
+        self.logger.info("آمار با موفقیت بارگذاری شد")
     
+    def _update_statistics_section(self, section, stats, text_frame, chart_frame):
+        """
+        به‌روزرسانی آمار متنی و نمودار یک بخش
+        
+        اگر آمار نسبت به آخرین نمایش تغییر نکرده باشد کاری انجام نمی‌شود؛ در غیر
+        این صورت برچسب‌ها و نمودار موجود در جا به‌روزرسانی می‌شوند.
+        """
+        if self.displayed_stats.get(section) == stats:
+            return
+        
+        # ساخت مجدد برچسب‌ها فقط در صورت تغییر تعداد بانک‌ها
+        labels = self.stat_labels.get(section)
+        if labels is None or len(labels) != len(stats):
+            for widget in text_frame.winfo_children():
+                widget.destroy()
+            labels = []
+            for _ in stats:
+                stat_frame = ttk.Frame(text_frame)
+                stat_frame.pack(fill="x", pady=5)
+                name_label = ttk.Label(stat_frame, style='Default.TLabel')
+                name_label.pack(anchor="w")
+                detail_label = ttk.Label(stat_frame, style='Default.TLabel')
+                detail_label.pack(anchor="w")
+                labels.append((name_label, detail_label))
+            self.stat_labels[section] = labels
+        
+        # نمایش آمار متنی
+        for (name_label, detail_label), stat in zip(labels, stats):
+            name_label.configure(text=f"بانک {stat['bank_name']}:")
+            detail_label.configure(
+                text=f"تعداد کل: {stat['total_records']} | مغایرت‌گیری شده: {stat['reconciled_records']} | مغایرت‌گیری نشده: {stat['unreconciled_records']}"
+            )
+        
+        # به‌روزرسانی نمودار (Figure موجود در جا به‌روزرسانی می‌شود)
+        if stats:
+            self.chart_manager.create_reconciliation_chart(stats, chart_frame, section)
+        else:
+            self.chart_manager.clear_chart(chart_frame)
+        self.displayed_stats[section] = stats
     
     def _update_bank_statistics_ui(self, bank_stats):
         """به‌روزرسانی UI با آمار بانک‌ها"""
         try:
-            # پاک کردن محتوای قبلی
-            for widget in self.bank_text_frame.winfo_children():
-                widget.destroy()
-            
-            for widget in self.bank_chart_frame.winfo_children():
-                widget.destroy()
-            
-            # نمایش آمار متنی
-            for i, stat in enumerate(bank_stats):
-                bank_frame = ttk.Frame(self.bank_text_frame)
-                bank_frame.pack(fill="x", pady=5)
-                
-                ttk.Label(
-                    bank_frame, 
-                    text=f"بانک {stat['bank_name']}:", 
-                    style='Default.TLabel'
-                ).pack(anchor="w")
-                
-                ttk.Label(
-                    bank_frame, 
-                    text=f"تعداد کل: {stat['total_records']} | مغایرت‌گیری شده: {stat['reconciled_records']} | مغایرت‌گیری نشده: {stat['unreconciled_records']}", 
-                    style='Default.TLabel'
-                ).pack(anchor="w")
-            
-            # ایجاد نمودار
-            if bank_stats:
-                # استفاده از chart manager برای ایجاد نمودار
-                self.chart_manager.create_reconciliation_chart(
-                    bank_stats, self.bank_chart_frame, "bank"
-                )
+            self._update_statistics_section('bank', bank_stats, self.bank_text_frame, self.bank_chart_frame)
         except Exception as e:
             self.logger.error(f"خطا در به‌روزرسانی UI آمار بانک‌ها: {str(e)}")
-            
-    
     
     def _update_accounting_statistics_ui(self, accounting_stats):
         """به‌روزرسانی UI با آمار حسابداری"""
         try:
-            # پاک کردن محتوای قبلی
-            for widget in self.accounting_text_frame.winfo_children():
-                widget.destroy()
-            
-            for widget in self.accounting_chart_frame.winfo_children():
-                widget.destroy()
-            
-            # نمایش آمار متنی
-            for i, stat in enumerate(accounting_stats):
-                accounting_frame = ttk.Frame(self.accounting_text_frame)
-                accounting_frame.pack(fill="x", pady=5)
-                
-                ttk.Label(
-                    accounting_frame, 
-                    text=f"بانک {stat['bank_name']}:", 
-                    style='Default.TLabel'
-                ).pack(anchor="w")
-                
-                ttk.Label(
-                    accounting_frame, 
-                    text=f"تعداد کل: {stat['total_records']} | مغایرت‌گیری شده: {stat['reconciled_records']} | مغایرت‌گیری نشده: {stat['unreconciled_records']}", 
-                    style='Default.TLabel'
-                ).pack(anchor="w")
-            
-            # ایجاد نمودار
-            if accounting_stats:
-                # استفاده از chart manager برای ایجاد نمودار
-                self.chart_manager.create_reconciliation_chart(
-                    accounting_stats, self.accounting_chart_frame, "accounting"
-                )
+            self._update_statistics_section('accounting', accounting_stats, self.accounting_text_frame, self.accounting_chart_frame)
         except Exception as e:
             self.logger.error(f"خطا در به‌روزرسانی UI آمار حسابداری: {str(e)}")
-            
-    
     
     def _update_pos_statistics_ui(self, pos_stats):
         """به‌روزرسانی UI با آمار پوز"""
         try:
-            # پاک کردن محتوای قبلی
-            for widget in self.pos_text_frame.winfo_children():
-                widget.destroy()
-            
-            for widget in self.pos_chart_frame.winfo_children():
-                widget.destroy()
-            
-            # نمایش آمار متنی
-            for i, stat in enumerate(pos_stats):
-                pos_frame = ttk.Frame(self.pos_text_frame)
-                pos_frame.pack(fill="x", pady=5)
-                
-                ttk.Label(
-                    pos_frame, 
-                    text=f"بانک {stat['bank_name']}:", 
-                    style='Default.TLabel'
-                ).pack(anchor="w")
-                
-                ttk.Label(
-                    pos_frame, 
-                    text=f"تعداد کل: {stat['total_records']} | مغایرت‌گیری شده: {stat['reconciled_records']} | مغایرت‌گیری نشده: {stat['unreconciled_records']}", 
-                    style='Default.TLabel'
-                ).pack(anchor="w")
-            
-            # ایجاد نمودار
-            if pos_stats:
-                # استفاده از chart manager برای ایجاد نمودار
-                self.chart_manager.create_reconciliation_chart(
-                    pos_stats, self.pos_chart_frame, "pos"
-                )
+            self._update_statistics_section('pos', pos_stats, self.pos_text_frame, self.pos_chart_frame)
         except Exception as e:
             self.logger.error(f"خطا در به‌روزرسانی UI آمار پوز: {str(e)}")
     
-    
-    
-    
-    
     def print_report(self):
         """چاپ گزارش آماری"""
         try:
@@ -1,4 +1,3 @@
-import os
 import logging
 import threading
 import ttkbootstrap as ttk
@@ -11,23 +10,14 @@ from utils.keshavarzi_bank_processor import process_keshavarzi_bank_file
 from utils.mellat_bank_processor import process_mellat_bank_file
 from utils.pos_excel_importer import process_pos_files
 from utils.accounting_excel_importer import import_accounting_excel
+from ui.components.common.log_handler import BatchedTextHandler
+from utils.logger_config import add_file_logging
 from config.settings import (
-    DATA_DIR, DEFAULT_FONT, DEFAULT_FONT_SIZE,
+    DEFAULT_FONT, DEFAULT_FONT_SIZE,
     HEADER_FONT_SIZE, BUTTON_FONT_SIZE
 )
 
 
-# کلاس برای نمایش لاگ‌ها در UI
-class UIHandler(logging.Handler):
-    def __init__(self, text_widget):
-        super().__init__()
-        self.text_widget = text_widget
-        
-    def emit(self, record):
-        msg = self.format(record) + '\n'
-        self.text_widget.insert('end', msg)
-        self.text_widget.see('end')
-
 class DataEntryTab(ttk.Frame):
     def __init__(self, parent):
         super().__init__(parent)
@@ -45,31 +35,12 @@ class DataEntryTab(ttk.Frame):
         
     def setup_logging(self):
         """راه‌اندازی سیستم لاگینگ"""
-        os.makedirs(DATA_DIR, exist_ok=True)
-        
         # تنظیمات کلی لاگر
         self.logger = logging.getLogger('reconciliation')
         self.logger.setLevel(logging.INFO)
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        
-        # لاگر برای فایل خطاها
-        error_handler = logging.FileHandler(os.path.join(DATA_DIR, 'error.txt'), encoding='utf-8')
-        error_handler.setLevel(logging.ERROR)
-        error_handler.setFormatter(formatter)
-        
-        # لاگر برای فایل لاگ عمومی
-        file_handler = logging.FileHandler(os.path.join(DATA_DIR, 'Log.txt'), encoding='utf-8')
-        file_handler.setLevel(logging.INFO)
-        file_handler.setFormatter(formatter)
-        
-        # لاگر برای کنسول با پشتیبانی از UTF-8
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
-        console_handler.setFormatter(formatter)
         
-        self.logger.addHandler(error_handler)
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
+        # فایل‌های لاگ و خطا (با چرخش بر اساس حجم) در نخ جداگانه از طریق صف نوشته می‌شوند
+        add_file_logging(self.logger)
         # UI handler will be added after creating log_text widget
 
     def create_widgets(self):
@@ -184,7 +155,7 @@ class DataEntryTab(ttk.Frame):
         self.log_text.pack(fill="both", expand=True, padx=10, pady=10)
         
         # اضافه کردن UI handler به logger
-        ui_handler = UIHandler(self.log_text)
+        ui_handler = BatchedTextHandler(self.log_text)
         ui_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
         self.logger.addHandler(ui_handler)
 
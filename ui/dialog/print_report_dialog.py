@@ -3,10 +3,6 @@ from tkinter import ttk, messagebox, filedialog
 import os
 import tempfile
 from datetime import datetime
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 from utils.helpers import gregorian_to_persian
 
 class PrintReportDialog(tk.Toplevel):
@@ -106,6 +102,11 @@ class PrintReportDialog(tk.Toplevel):
             if not file_path:  # اگر کاربر انصراف داد
                 return
             
+            from reportlab.pdfgen import canvas
+            from reportlab.lib.pagesizes import A4
+            from reportlab.pdfbase import pdfmetrics
+            from reportlab.pdfbase.ttfonts import TTFont
+
             # ثبت فونت فارسی
             font_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "assets", "fonts", "BNazanin.ttf")
             pdfmetrics.registerFont(TTFont('BNazanin', font_path))
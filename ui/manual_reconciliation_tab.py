@@ -3,7 +3,7 @@ import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from tkinter import StringVar, messagebox
 from tkinter.ttk import Combobox
-from datetime import datetime, timedelta
+from datetime import datetime
 import logging
 import os
 import queue
@@ -13,21 +13,21 @@ import tempfile
 import subprocess
 import traceback
 from utils.helpers import gregorian_to_persian, persian_to_gregorian
-from utils.constants import MELLAT_TRANSACTION_TYPES, KESHAVARZI_TRANSACTION_TYPES, TransactionTypes
+from utils.constants import KESHAVARZI_TRANSACTION_TYPES, TransactionTypes
 from database.banks_repository import get_all_banks
-from database.bank_transaction_repository import get_unreconciled_transactions_by_bank as get_unreconciled_bank_records
+from database.bank_transaction_repository import get_unreconciled_transactions_query
+from database.Helper.pagination import PagedResultSet
 from database.repositories.accounting import get_transactions_by_date_and_type as get_unreconciled_accounting_records_by_date
 from database.reconciliation_results_repository import create_reconciliation_result as save_reconciliation_result
 from ui.dialog.manual_reconciliation_dialog import ManualReconciliationDialog
 from ui.dialog.edit_bank_record_dialog import EditBankRecordDialog
 from ui.dialog.edit_accounting_record_dialog import EditAccountingRecordDialog
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+from ui.components.common.virtual_tree import VirtualTreeController
+from ui.components.reconciliation.search_handler import SearchHandler
 from config.settings import (
     DEFAULT_FONT, DEFAULT_FONT_SIZE,
-    HEADER_FONT_SIZE, BUTTON_FONT_SIZE
+    HEADER_FONT_SIZE, BUTTON_FONT_SIZE,
+    MANUAL_SEARCH_DEBOUNCE_MS, CANDIDATE_PREFETCH_COUNT, REPORT_POLL_INTERVAL_MS
 )
 
 class ManualReconciliationTab(ttk.Frame):
@@ -48,6 +48,13 @@ class ManualReconciliationTab(ttk.Frame):
         # ایجاد متغیرهای مورد نیاز
         self.selected_bank_var = StringVar()
         self.show_fees_var = tk.BooleanVar(value=False)
+        self.free_search_var = StringVar()
+        
+        # جستجوی کاندیداها (با کش و پیش‌خوانی) و وضعیت جستجوی آزاد
+        self.search_handler = SearchHandler({})
+        self.free_search_after_id = None
+        self.free_search_queue = None
+        self.free_search_cancel_event = None
         
         # ایجاد ویجت‌ها
         self.create_widgets()
@@ -173,14 +180,14 @@ class ManualReconciliationTab(ttk.Frame):
         bank_scrollbar_y.config(command=self.bank_tree.yview)
         bank_scrollbar_x.config(command=self.bank_tree.xview)
         
-        # تنظیم عناوین ستون‌ها
-        self.bank_tree.heading("id", text="شناسه")
-        self.bank_tree.heading("tracking_number", text="شماره پیگیری")
-        self.bank_tree.heading("date", text="تاریخ")
-        self.bank_tree.heading("amount", text="مبلغ")
-        self.bank_tree.heading("description", text="توضیحات")
-        self.bank_tree.heading("type", text="نوع تراکنش")
-        self.bank_tree.heading("depositor", text="واریز کننده")
+        # تنظیم عناوین ستون‌ها (کلیک روی عنوان، رکوردها را بر اساس فیلد متناظر مرتب می‌کند)
+        self.bank_tree.heading("id", text="شناسه", command=lambda: self.sort_bank_records("id"))
+        self.bank_tree.heading("tracking_number", text="شماره پیگیری", command=lambda: self.sort_bank_records("extracted_tracking_number"))
+        self.bank_tree.heading("date", text="تاریخ", command=lambda: self.sort_bank_records("transaction_date"))
+        self.bank_tree.heading("amount", text="مبلغ", command=lambda: self.sort_bank_records("amount"))
+        self.bank_tree.heading("description", text="توضیحات", command=lambda: self.sort_bank_records("description"))
+        self.bank_tree.heading("type", text="نوع تراکنش", command=lambda: self.sort_bank_records("transaction_type"))
+        self.bank_tree.heading("depositor", text="واریز کننده", command=lambda: self.sort_bank_records("depositor_name"))
         self.bank_tree.heading("status", text="وضعیت")
         
         # تنظیم عرض ستون‌ها
@@ -195,8 +202,16 @@ class ManualReconciliationTab(ttk.Frame):
         
         self.bank_tree.pack(fill=tk.BOTH, expand=True)
         
-        # رویداد انتخاب آیتم در Treeview بانک
-        self.bank_tree.bind("<<TreeviewSelect>>", self.on_bank_record_selected)
+        # نمایش مجازی رکوردهای بانک: فقط ردیف‌های قابل مشاهده ساخته می‌شوند و
+        # رویداد انتخاب آیتم از طریق کنترلر به on_bank_record_selected می‌رسد
+        self.bank_tree.tag_configure('oddrow', background='#F9F9F9')
+        self.bank_tree.tag_configure('evenrow', background='white')
+        self.bank_view = VirtualTreeController(
+            self.bank_tree, bank_scrollbar_y, self.format_bank_row,
+            on_select=self.on_bank_record_selected
+        )
+        self.bank_sort_field = None
+        self.bank_sort_reverse = False
         
         # دکمه ویرایش رکورد بانک
         bank_buttons_frame = ttk.Frame(bank_frame)
@@ -213,6 +228,13 @@ class ManualReconciliationTab(ttk.Frame):
         self.search_button = ttk.Button(search_frame, text="جستجوی رکوردهای حسابداری", style='Operation.TButton', command=self.search_accounting_records)
         self.search_button.pack(side=tk.LEFT, padx=5)
         
+        # جستجوی آزاد (با تأخیر پس از آخرین تایپ اجرا می‌شود)
+        ttk.Label(search_frame, text="جستجوی آزاد:", style='Default.TLabel').pack(side=tk.RIGHT, padx=5)
+        self.free_search_entry = ttk.Entry(search_frame, textvariable=self.free_search_var, font=self.default_font, width=30)
+        self.free_search_entry.pack(side=tk.RIGHT, padx=5)
+        self.free_search_entry.bind("<KeyRelease>", self.on_free_search_changed)
+        self.free_search_entry.bind("<Return>", lambda event: self.run_free_search())
+        
         # === بخش پایینی - لیست رکوردهای حسابداری ===
         accounting_frame = ttk.LabelFrame(main_frame, text="رکوردهای حسابداری")
         accounting_frame.pack(fill=tk.BOTH, expand=True, pady=5)
@@ -312,6 +334,7 @@ class ManualReconciliationTab(ttk.Frame):
                 self.banks_dict[bank_name] = bank_id
             
             self.bank_combobox['values'] = bank_names
+            self.search_handler.banks_dict = self.banks_dict
             
             # اگر انتخاب قبلی وجود داشته و هنوز در لیست هست، آن را حفظ کن
             if current_selection and current_selection in self.banks_dict:
@@ -340,8 +363,9 @@ class ManualReconciliationTab(ttk.Frame):
                 messagebox.showwarning("هشدار", "لطفاً یک بانک را انتخاب کنید")
                 return
             
-            # پاک کردن داده‌های قبلی
+            # پاک کردن داده‌های قبلی و کاندیداهای ذخیره شده (ممکن است مغایرت‌گیری شده باشند)
             self.clear_trees()
+            self.search_handler.invalidate_candidates()
             
             # دریافت شناسه بانک از دیکشنری بانک‌ها
             bank_id = self.banks_dict.get(selected_bank)
@@ -350,53 +374,27 @@ class ManualReconciliationTab(ttk.Frame):
                 messagebox.showwarning("هشدار", "بانک انتخاب شده یافت نشد")
                 return
             
-            # دریافت رکوردهای مغایرت‌گیری نشده بانک
-            self.bank_records = get_unreconciled_bank_records(bank_id)
-            
-            # فیلتر کردن رکوردهای کارمزد اگر چک باکس فعال نباشد
+            # دریافت صفحه‌بندی شده رکوردهای مغایرت‌گیری نشده بانک؛ رکوردهای کارمزد
+            # در صورت فعال نبودن چک باکس در خود کوئری حذف می‌شوند
             show_fees = self.show_fees_var.get()
-            filtered_records = []
+            excluded_type = None if show_fees else KESHAVARZI_TRANSACTION_TYPES['BANK_FEES']
+            self.bank_records = PagedResultSet(get_unreconciled_transactions_query(bank_id, excluded_type))
             hidden_fee_count = 0
-            for record in self.bank_records:
-                # اگر رکورد کارمزد است و چک باکس فعال نیست، آن را نمایش نده
-                if not show_fees and record.get('transaction_type') == KESHAVARZI_TRANSACTION_TYPES['BANK_FEES']:
-                    hidden_fee_count += 1
-                    continue
-                filtered_records.append(record)
-            
-            # نمایش رکوردها در Treeview
-            for record in filtered_records:
-                # تبدیل تاریخ میلادی به شمسی
-                shamsi_date = gregorian_to_persian(record['transaction_date'])
-                
-                # فرمت‌بندی مبلغ
-                amount = f"{record['amount']:,}"
-                
-                # وضعیت
-                status = "مغایرت‌گیری نشده"
-                
-                # نوع تراکنش
-                transaction_type = record.get('transaction_type', '')
-                
-                self.bank_tree.insert("", tk.END, values=(
-                    record['id'],
-                    record.get('extracted_tracking_number', ''),
-                    shamsi_date,
-                    amount,
-                    record.get('description', ''),
-                    transaction_type,
-                    record.get('depositor_name', ''),
-                    status
-                ))
+            if not show_fees:
+                hidden_fee_count = get_unreconciled_transactions_query(bank_id).count() - len(self.bank_records)
+            filtered_records = self.bank_records
+            
+            # نمایش رکوردها در Treeview (صفحات و ردیف‌ها هنگام اسکرول خوانده و ساخته می‌شوند)
+            self.bank_view.set_records(filtered_records)
+            self.search_handler.prefetch_candidates(self.bank_view.get_visible_records()[:CANDIDATE_PREFETCH_COUNT])
             
             # نمایش تعداد رکوردها در لیبل به جای پیام پاپ‌آپ
             if not filtered_records:
-                if not self.bank_records:
+                if not hidden_fee_count:
                     self.records_count_var.set(f"هیچ رکورد مغایرت‌گیری نشده‌ای برای بانک {selected_bank} یافت نشد")
                 else:
                     self.records_count_var.set(f"هیچ رکورد مغایرت‌گیری نشده‌ای برای نمایش وجود ندارد (کارمزدها پنهان شده‌اند)")
             else:
-                total_records = len(self.bank_records)
                 filtered_count = len(filtered_records)
                 
                 if hidden_fee_count > 0:
@@ -413,20 +411,53 @@ class ManualReconciliationTab(ttk.Frame):
             logging.error(f"{error_message}\n{traceback.format_exc()}")
             messagebox.showerror("خطا", error_message)
     
+    def format_bank_row(self, record):
+        """مقادیر ستون‌های Treeview برای یک رکورد بانک"""
+        return (
+            record['id'],
+            record.get('extracted_tracking_number', ''),
+            gregorian_to_persian(record['transaction_date']),
+            f"{record['amount']:,}",
+            record.get('description', ''),
+            record.get('transaction_type', ''),
+            record.get('depositor_name', ''),
+            "مغایرت‌گیری نشده"
+        )
+    
+    def sort_bank_records(self, field):
+        """مرتب‌سازی رکوردهای بانک نمایش داده شده بر اساس یک فیلد"""
+        if self.bank_sort_field == field:
+            self.bank_sort_reverse = not self.bank_sort_reverse
+        else:
+            self.bank_sort_field = field
+            self.bank_sort_reverse = False
+        self.bank_view.sort_by_field(field, self.bank_sort_reverse, on_sorted=self.on_bank_records_sorted)
+    
+    def on_bank_records_sorted(self, records):
+        """جایگزینی رکوردهای بانک با نتیجه مرتب‌سازی (داده‌های صفحه‌بندی شده در پس‌زمینه مرتب می‌شوند)"""
+        self.bank_records = records
+    
+    def get_selected_bank_record(self):
+        """رکورد بانک انتخاب شده در جدول"""
+        selected_records = self.bank_view.get_selected_records()
+        return selected_records[0] if selected_records else None
+    
+    def get_selected_bank_id(self):
+        """شناسه رکورد بانک انتخاب شده (حتی اگر ردیف آن خارج از پنجره نمایش باشد)"""
+        selected_keys = self.bank_view.get_selected_keys()
+        return selected_keys[0] if selected_keys else None
+    
     def on_bank_record_selected(self, event):
         """رویداد انتخاب رکورد بانک"""
-        selected_items = self.bank_tree.selection()
-        if not selected_items:
+        record_id = self.get_selected_bank_id()
+        if record_id is None:
             self.disable_operation_buttons()
             self.selected_bank_record = None
             return
         
-        # دریافت آیتم انتخاب شده
-        item = self.bank_tree.item(selected_items[0])
-        record_id = item['values'][0]
-        
         # یافتن رکورد بانک مربوطه
-        self.selected_bank_record = next((r for r in self.bank_records if r['id'] == record_id), None)
+        self.selected_bank_record = self.get_selected_bank_record()
+        self.prefetch_next_candidates(record_id)
         
         # فعال کردن دکمه‌های مربوطه
         self.edit_bank_button.config(state=tk.NORMAL)
@@ -437,6 +468,17 @@ class ManualReconciliationTab(ttk.Frame):
         
         logging.info(f"رکورد بانک با شناسه {record_id} انتخاب شد")
     
+    def prefetch_next_candidates(self, record_id):
+        """پیش‌خوانی کاندیداهای رکورد انتخاب شده و چند ردیف بعدی آن در پس‌زمینه"""
+        try:
+            index = self.bank_view.index_of_key(record_id)
+            if index is None:
+                return
+            records = self.bank_view.records[index:index + 1 + CANDIDATE_PREFETCH_COUNT]
+            self.search_handler.prefetch_candidates(records)
+        except Exception as e:
+            logging.warning(f"خطا در پیش‌خوانی کاندیداهای حسابداری: {str(e)}")
+    
     def on_accounting_record_selected(self, event):
         """رویداد انتخاب رکورد حسابداری"""
         selected_items = self.accounting_tree.selection()
@@ -473,128 +515,17 @@ class ManualReconciliationTab(ttk.Frame):
             # پاک کردن لیست قبلی
             self.clear_accounting_tree()
             
-            # دریافت تاریخ و مبلغ رکورد بانک
-            bank_date = self.selected_bank_record['transaction_date']
-            bank_amount = self.selected_bank_record['amount']
+            # لغو جستجوی آزاد در حال اجرا تا نتیجه آن جایگزین کاندیداها نشود
+            self.cancel_free_search()
             
-            # دریافت نوع تراکنش بانک بر اساس نوع تراکنش موجود در رکورد بانک
-            bank_transaction_type = self.selected_bank_record.get('transaction_type', '')
-            
-            # تبدیل نوع تراکنش بانک به نوع تراکنش حسابداری (با استفاده از ثابت‌ها)
-            if bank_transaction_type == MELLAT_TRANSACTION_TYPES['RECEIVED_POS'] or bank_transaction_type == KESHAVARZI_TRANSACTION_TYPES['RECEIVED_POS'] or bank_transaction_type == 'received_pos':
-                transaction_type = TransactionTypes.POS
-            elif bank_transaction_type == MELLAT_TRANSACTION_TYPES['PAID_TRANSFER'] or bank_transaction_type == KESHAVARZI_TRANSACTION_TYPES['PAID_TRANSFER'] or bank_transaction_type == 'paid_transfer':
-                transaction_type = TransactionTypes.PAID_TRANSFER
-            elif bank_transaction_type == MELLAT_TRANSACTION_TYPES['RECEIVED_TRANSFER'] or bank_transaction_type == KESHAVARZI_TRANSACTION_TYPES['RECEIVED_TRANSFER'] or bank_transaction_type == 'received_transfer':
-                transaction_type = TransactionTypes.RECEIVED_TRANSFER
-            elif bank_transaction_type == KESHAVARZI_TRANSACTION_TYPES['RECEIVED_CHECK'] or bank_transaction_type == 'received_check':
-                transaction_type = TransactionTypes.RECEIVED_CHECK
-            elif bank_transaction_type == KESHAVARZI_TRANSACTION_TYPES['PAID_CHECK'] or bank_transaction_type == 'paid_check':
-                transaction_type = TransactionTypes.PAID_CHECK
-            elif bank_transaction_type == MELLAT_TRANSACTION_TYPES['BANK_FEES'] or bank_transaction_type == KESHAVARZI_TRANSACTION_TYPES['BANK_FEES'] or bank_transaction_type == 'bank_fee':
-                transaction_type = TransactionTypes.BANK_FEES
-            else:
-                # اگر نوع تراکنش مشخص نبود، از مقدار استفاده می‌کنیم
-                transaction_type = TransactionTypes.UNKNOWN
-            
-            # اگر نوع تراکنش POS است، تاریخ را یک روز کاهش می‌دهیم
-            search_date = bank_date
-            if transaction_type == 'Pos':
-                # تبدیل تاریخ به شیء datetime
-                date_obj = datetime.strptime(bank_date, '%Y-%m-%d')
-                # کاهش یک روز
-                prev_date_obj = date_obj - timedelta(days=1)
-                # تبدیل مجدد به رشته
-                search_date = prev_date_obj.strftime('%Y-%m-%d')
-                logging.info(f"تاریخ جستجو برای تراکنش POS از {bank_date} به {search_date} تغییر کرد")
-            
-            # جستجوی تمام رکوردهای حسابداری با is_reconciled=0 و با تاریخ، مبلغ و نوع تراکنش مطابق
-            from database.repositories.accounting import get_transactions_advanced_search
-            
-            # لاگ پارامترهای جستجو برای دیباگ
-            logging.info(f"پارامترهای جستجو: تاریخ={search_date}, مبلغ={bank_amount}, نوع={transaction_type}")
-            logging.info(f"رکورد بانک انتخاب شده: تاریخ={bank_date}, نوع تراکنش بانک={bank_transaction_type}")
-            
-            # برای تراکنش‌های پرداختی، بدون فیلتر مبلغ جستجو می‌کنیم (چون کارمزد دارند)
-            is_paid_transaction = transaction_type in [TransactionTypes.PAID_TRANSFER, TransactionTypes.PAID_CHECK]
-            
-            if is_paid_transaction:
-                # برای تراکنش‌های پرداختی: تمام تراکنش‌های هم تاریخ و هم نوع
-                logging.info("تراکنش پرداختی: جستجو بدون فیلتر مبلغ (به دلیل کارمزد)")
-                self.accounting_records = get_transactions_advanced_search(
-                    bank_id=None,  # جستجو در تمام بانک‌ها
-                    start_date=search_date,
-                    end_date=search_date,
-                    transaction_type=transaction_type,
-                    # بدون فیلتر مبلغ برای تراکنش‌های پرداختی
-                    is_reconciled=False
-                )
-            else:
-                # برای سایر تراکنش‌ها: جستجو با مبلغ دقیق
-                self.accounting_records = get_transactions_advanced_search(
-                    bank_id=None,  # جستجو در تمام بانک‌ها
-                    start_date=search_date,
-                    end_date=search_date,
-                    transaction_type=transaction_type,
-                    min_amount=bank_amount,
-                    max_amount=bank_amount,
-                    is_reconciled=False
-                )
+            # دریافت کاندیداها از کش (در صورت پیش‌خوانی) یا دیتابیس
+            bank_amount = self.selected_bank_record['amount']
+            is_paid_transaction = self.search_handler.is_paid_candidate_search(self.selected_bank_record)
+            self.accounting_records = self.search_handler.get_candidates(self.selected_bank_record)
             
             logging.info(f"تعداد رکوردهای یافت شده: {len(self.accounting_records)}")
             
-            # برای تراکنش‌های پرداختی، مرتب سازی بر اساس نزدیکی مبلغ
-            if is_paid_transaction and self.accounting_records:
-                # مرتب سازی بر اساس نزدیک‌ترین مبلغ به مبلغ بانک
-                self.accounting_records.sort(
-                    key=lambda r: abs(float(r.get('transaction_amount', 0)) - float(bank_amount))
-                )
-                logging.info("رکوردها بر اساس نزدیکی مبلغ مرتب شدند")
-            
-            # نمایش رکوردها در Treeview (به جز رکوردهای کارمزد)
-            for record in self.accounting_records:
-                # فیلتر کردن رکوردهای کارمزد
-                record_type = record.get('transaction_type', '')
-                if record_type == TransactionTypes.BANK_FEES or 'کارمزد' in record.get('description', ''):
-                    continue  # پرش از نمایش رکوردهای کارمزد
-                
-                # تبدیل تاریخ میلادی به شمسی
-                shamsi_date = gregorian_to_persian(record.get('due_date', record.get('transaction_date', '')))
-                
-                # فرمت‌بندی مبلغ
-                record_amount = float(record.get('transaction_amount', 0))
-                amount = f"{record_amount:,.0f}"
-                
-                # محاسبه اختلاف مبلغ (کارمزد احتمالی) برای تراکنش‌های پرداختی
-                difference_text = ""
-                if is_paid_transaction:
-                    difference = float(bank_amount) - record_amount
-                    if abs(difference) > 0.01:  # فقط اگر اختلاف معنادار باشد
-                        difference_text = f"{difference:,.0f}"
-                    else:
-                        difference_text = "0"
-                
-                # نوع تراکنش
-                type_text = record.get('transaction_type', '')
-                
-                # نام بانک
-                bank_id = record.get('bank_id')
-                bank_name = next((name for name, bid in self.banks_dict.items() if bid == bank_id), "نامشخص")
-                
-                # تبدیل مقدار is_new_system به متن
-                system_text = "سیستم جدید" if record.get('is_new_system', 0) == 1 else "سیستم قدیم"
-                
-                self.accounting_tree.insert("", tk.END, values=(
-                    record['id'],
-                    record.get('transaction_number', ''),
-                    shamsi_date,
-                    amount,
-                    difference_text,
-                    record.get('description', ''),
-                    type_text,
-                    bank_name,
-                    system_text
-                ))
+            self.display_accounting_records(self.accounting_records, bank_amount, is_paid_transaction)
             
             # فعال کردن دکمه‌های عملیات
             if self.accounting_records:
@@ -608,22 +539,130 @@ class ManualReconciliationTab(ttk.Frame):
             logging.error(f"{error_message}\n{traceback.format_exc()}")
             messagebox.showerror("خطا", error_message)
     
+    def display_accounting_records(self, records, bank_amount=None, is_paid_transaction=False):
+        """نمایش رکوردهای حسابداری در Treeview (به جز رکوردهای کارمزد)"""
+        for record in records:
+            # فیلتر کردن رکوردهای کارمزد
+            record_type = record.get('transaction_type', '')
+            if record_type == TransactionTypes.BANK_FEES or 'کارمزد' in (record.get('description') or ''):
+                continue  # پرش از نمایش رکوردهای کارمزد
+            
+            # تبدیل تاریخ میلادی به شمسی
+            shamsi_date = gregorian_to_persian(record.get('due_date', record.get('transaction_date', '')))
+            
+            # فرمت‌بندی مبلغ
+            record_amount = float(record.get('transaction_amount', 0))
+            amount = f"{record_amount:,.0f}"
+            
+            # محاسبه اختلاف مبلغ (کارمزد احتمالی) برای تراکنش‌های پرداختی
+            difference_text = ""
+            if is_paid_transaction and bank_amount is not None:
+                difference = float(bank_amount) - record_amount
+                if abs(difference) > 0.01:  # فقط اگر اختلاف معنادار باشد
+                    difference_text = f"{difference:,.0f}"
+                else:
+                    difference_text = "0"
+            
+            # نوع تراکنش
+            type_text = record.get('transaction_type', '')
+            
+            # نام بانک
+            bank_id = record.get('bank_id')
+            bank_name = next((name for name, bid in self.banks_dict.items() if bid == bank_id), "نامشخص")
+            
+            # تبدیل مقدار is_new_system به متن
+            system_text = "سیستم جدید" if record.get('is_new_system', 0) == 1 else "سیستم قدیم"
+            
+            self.accounting_tree.insert("", tk.END, values=(
+                record['id'],
+                record.get('transaction_number', ''),
+                shamsi_date,
+                amount,
+                difference_text,
+                record.get('description', ''),
+                type_text,
+                bank_name,
+                system_text
+            ))
+    
+    def on_free_search_changed(self, event=None):
+        """زمان‌بندی جستجوی آزاد پس از توقف تایپ کاربر"""
+        if self.free_search_after_id is not None:
+            self.after_cancel(self.free_search_after_id)
+        self.free_search_after_id = self.after(MANUAL_SEARCH_DEBOUNCE_MS, self.run_free_search)
+    
+    def run_free_search(self):
+        """اجرای جستجوی آزاد در نخ پس‌زمینه (جستجوی قبلی لغو می‌شود)"""
+        if self.free_search_after_id is not None:
+            self.after_cancel(self.free_search_after_id)
+            self.free_search_after_id = None
+        self.cancel_free_search()
+        
+        search_text = self.free_search_var.get().strip()
+        if not search_text:
+            return
+        
+        self.free_search_queue = queue.Queue()
+        self.free_search_cancel_event = threading.Event()
+        threading.Thread(
+            target=self.fetch_free_search_results,
+            args=(search_text, self.free_search_queue, self.free_search_cancel_event),
+            daemon=True
+        ).start()
+        self.after(REPORT_POLL_INTERVAL_MS, self.poll_free_search_queue, self.free_search_queue)
+    
+    def fetch_free_search_results(self, search_text, result_queue, cancel_event):
+        """اجرای کوئری جستجوی آزاد (در نخ پس‌زمینه)"""
+        try:
+            records = self.search_handler.search_text(search_text, cancel_event)
+            result_queue.put(('ready', (search_text, records)))
+        except Exception as e:
+            result_queue.put(('error', str(e)))
+    
+    def poll_free_search_queue(self, result_queue):
+        """دریافت نتیجه جستجوی آزاد در نخ رابط کاربری"""
+        # نتیجه جستجوی لغو یا جایگزین شده نادیده گرفته می‌شود
+        if result_queue is not self.free_search_queue:
+            return
+        try:
+            kind, payload = result_queue.get_nowait()
+        except queue.Empty:
+            self.after(REPORT_POLL_INTERVAL_MS, self.poll_free_search_queue, result_queue)
+            return
+        
+        self.free_search_queue = None
+        if kind == 'error':
+            logging.error(f"خطا در جستجوی آزاد: {payload}")
+            return
+        search_text, records = payload
+        self.clear_accounting_tree()
+        self.accounting_records = records
+        self.display_accounting_records(records)
+        if records:
+            self.edit_accounting_button.config(state=tk.NORMAL)
+        logging.info(f"جستجوی آزاد '{search_text}': تعداد {len(records)} رکورد حسابداری یافت شد")
+    
+    def cancel_free_search(self):
+        """لغو جستجوی آزاد در حال اجرا"""
+        if self.free_search_cancel_event is not None:
+            self.free_search_cancel_event.set()
+        self.free_search_queue = None
+        self.free_search_cancel_event = None
+    
     def quick_reconcile(self):
         # TODO: این متد باید بهبود یابد
         """مغایرت‌گیری سریع بین رکورد بانک و رکورد حسابداری انتخاب شده"""
         try:
-            selected_bank_item = self.bank_tree.selection()
+            bank_id = self.get_selected_bank_id()
             selected_accounting_item = self.accounting_tree.selection()
             
-            if not selected_bank_item or not selected_accounting_item:
+            if bank_id is None or not selected_accounting_item:
                 messagebox.showwarning("هشدار", "لطفاً یک رکورد بانک و یک رکورد حسابداری را انتخاب کنید")
                 return
             
             # دریافت رکوردهای انتخاب شده
-            bank_item = self.bank_tree.item(selected_bank_item[0])
             accounting_item = self.accounting_tree.item(selected_accounting_item[0])
             
-            bank_id = bank_item['values'][0]
             accounting_id = accounting_item['values'][0]
             
             # تأیید از کاربر
@@ -671,21 +710,19 @@ class ManualReconciliationTab(ttk.Frame):
     def deduct_fee(self):
         """کسر کارمزد از مبلغ رکورد بانک"""
         try:
-            selected_bank_item = self.bank_tree.selection()
+            bank_id = self.get_selected_bank_id()
             selected_accounting_item = self.accounting_tree.selection()
             
-            if not selected_bank_item or not selected_accounting_item:
+            if bank_id is None or not selected_accounting_item:
                 messagebox.showwarning("هشدار", "لطفاً یک رکورد بانک و یک رکورد حسابداری را انتخاب کنید")
                 return
             
             # دریافت رکوردهای انتخاب شده
-            bank_item = self.bank_tree.item(selected_bank_item[0])
             accounting_item = self.accounting_tree.item(selected_accounting_item[0])
             
-            bank_id = bank_item['values'][0]
             accounting_id = accounting_item['values'][0]
             
-            bank_record = next((r for r in self.bank_records if r['id'] == bank_id), None)
+            bank_record = self.get_selected_bank_record()
             accounting_record = next((r for r in self.accounting_records if r['id'] == accounting_id), None)
             
             if not bank_record or not accounting_record:
@@ -758,21 +795,24 @@ class ManualReconciliationTab(ttk.Frame):
     def print_report(self):
         """چاپ گزارش به صورت PDF"""
         try:
-            selected_bank_item = self.bank_tree.selection()
+            bank_id = self.get_selected_bank_id()
             
-            if not selected_bank_item:
+            if bank_id is None:
                 messagebox.showwarning("هشدار", "لطفاً یک رکورد بانک را انتخاب کنید")
                 return
             
             # دریافت رکورد بانک انتخاب شده
-            bank_item = self.bank_tree.item(selected_bank_item[0])
-            bank_id = bank_item['values'][0]
-            bank_record = next((r for r in self.bank_records if r['id'] == bank_id), None)
+            bank_record = self.get_selected_bank_record()
             
             if not bank_record:
                 messagebox.showwarning("هشدار", "رکورد بانک انتخاب شده یافت نشد")
                 return
             
+            from reportlab.lib.pagesizes import A4
+            from reportlab.pdfgen import canvas
+            from reportlab.pdfbase import pdfmetrics
+            from reportlab.pdfbase.ttfonts import TTFont
+
             # ایجاد فایل PDF موقت
             with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
                 pdf_path = temp_file.name
@@ -847,17 +887,13 @@ class ManualReconciliationTab(ttk.Frame):
     def edit_bank_record(self):
         """ویرایش رکورد بانک انتخاب شده"""
         try:
-            selected_item = self.bank_tree.selection()
-            if not selected_item:
+            record_id = self.get_selected_bank_id()
+            if record_id is None:
                 messagebox.showwarning("هشدار", "لطفاً یک رکورد بانک را انتخاب کنید")
                 return
             
-            # دریافت آیتم انتخاب شده
-            item = self.bank_tree.item(selected_item[0])
-            record_id = item['values'][0]
-            
             # یافتن رکورد بانک مربوطه
-            bank_record = next((r for r in self.bank_records if r['id'] == record_id), None)
+            bank_record = self.get_selected_bank_record()
             
             if bank_record:
                 # نمایش دیالوگ ویرایش
@@ -894,6 +930,7 @@ class ManualReconciliationTab(ttk.Frame):
                 # اگر رکورد ویرایش شد، به‌روزرسانی لیست
                 if dialog.result:
                     logging.info(f"رکورد حسابداری با شناسه {record_id} ویرایش شد")
+                    self.search_handler.invalidate_candidates()
                     self.search_accounting_records()
         except Exception as e:
             error_message = f"خطا در ویرایش رکورد حسابداری: {str(e)}"
@@ -908,8 +945,7 @@ class ManualReconciliationTab(ttk.Frame):
     
     def clear_bank_tree(self):
         """پاک کردن Treeview بانک"""
-        for item in self.bank_tree.get_children():
-            self.bank_tree.delete(item)
+        self.bank_view.clear()
         self.bank_records = []
         self.selected_bank_record = None
     
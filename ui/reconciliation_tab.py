@@ -1,4 +1,3 @@
-import os
 import logging
 import threading
 import queue
@@ -11,61 +10,49 @@ from database.banks_repository import get_all_banks
 from database.reconciliation.reconciliation_repository import has_unreconciled_transactions, get_unknown_transactions_by_bank as get_unknown_transactions, has_unknown_transactions
 from reconciliation.reconciliation_logic import ReconciliationProcess
 from reconciliation.unknown_transactions_dialog import UnknownTransactionsDialog
+from ui.components.common.progress_channel import ProgressChannel
+from utils.logger_config import add_file_logging
 from config.settings import (
-    DATA_DIR, DEFAULT_FONT, DEFAULT_FONT_SIZE,
-    HEADER_FONT_SIZE, BUTTON_FONT_SIZE
+    DEFAULT_FONT, DEFAULT_FONT_SIZE,
+    HEADER_FONT_SIZE, BUTTON_FONT_SIZE,
+    PROGRESS_POLL_INTERVAL_MS, PROGRESS_LOG_LINES_PER_TICK
 )
 
 # کلاس برای نمایش لاگ‌ها در UI
 class UIHandler(logging.Handler):
-    def __init__(self, text_widget):
+    """ارسال لاگ‌ها به کانال پیشرفت؛ خطوط در تیک بعدی رابط کاربری یکجا نمایش داده می‌شوند"""
+    def __init__(self, progress_channel):
         super().__init__()
-        self.text_widget = text_widget
+        self.progress_channel = progress_channel
         
     def emit(self, record):
-        msg = self.format(record) + '\n'
-        # ScrolledText در ttkbootstrap از state پشتیبانی نمی‌کند
-        self.text_widget.insert('end', msg)
-        self.text_widget.see('end')
+        try:
+            # این متد از نخ‌های کاری هم فراخوانی می‌شود و نباید مستقیماً به ویجت دسترسی داشته باشد
+            self.progress_channel.append_line(self.format(record) + '\n')
+        except Exception:
+            self.handleError(record)
 
 class ReconciliationTab(ttk.Frame):
     def __init__(self, parent):
         super().__init__(parent)
+        self.progress_channel = ProgressChannel()
         self.setup_logging()
         self.selected_bank_var = StringVar()
         self.status_var = StringVar(value="منتظر شروع فرآیند مغایرت‌گیری...")
         self.detailed_status_var = StringVar(value="")
         self.create_widgets()
         self.load_banks_to_combobox()
+        self.after(PROGRESS_POLL_INTERVAL_MS, self.poll_progress)
         
         
     def setup_logging(self):
         """راه‌اندازی سیستم لاگینگ"""
-        os.makedirs(DATA_DIR, exist_ok=True)
-        
         # تنظیمات کلی لاگر
         self.logger = logging.getLogger('reconciliation.tab')
         self.logger.setLevel(logging.INFO)
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        
-        # لاگر برای فایل خطاها
-        error_handler = logging.FileHandler(os.path.join(DATA_DIR, 'reconciliation_error.txt'), encoding='utf-8')
-        error_handler.setLevel(logging.ERROR)
-        error_handler.setFormatter(formatter)
-        
-        # لاگر برای فایل لاگ عمومی
-        file_handler = logging.FileHandler(os.path.join(DATA_DIR, 'reconciliation_log.txt'), encoding='utf-8')
-        file_handler.setLevel(logging.INFO)
-        file_handler.setFormatter(formatter)
         
-        # لاگر برای کنسول با پشتیبانی از UTF-8
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
-        console_handler.setFormatter(formatter)
-        
-        self.logger.addHandler(error_handler)
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
+        # فایل‌های لاگ و خطا (با چرخش بر اساس حجم) در نخ جداگانه از طریق صف نوشته می‌شوند
+        add_file_logging(self.logger, 'reconciliation_log.txt', 'reconciliation_error.txt')
         # UI handler will be added after creating log_text widget
 
     def create_widgets(self):
@@ -159,7 +146,7 @@ class ReconciliationTab(ttk.Frame):
         self.log_text.pack(fill="both", expand=True, padx=10, pady=10)
         
         # اضافه کردن UI handler به logger
-        ui_handler = UIHandler(self.log_text)
+        ui_handler = UIHandler(self.progress_channel)
         ui_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
         self.logger.addHandler(ui_handler)
 
@@ -182,76 +169,90 @@ class ReconciliationTab(ttk.Frame):
         except Exception as e:
             self.logger.error(f"خطا در بارگذاری لیست بانک‌ها: {str(e)}")
 
+    def poll_progress(self):
+        """نمایش آخرین وضعیت کانال پیشرفت و خطوط لاگ جمع شده (با نرخ ثابت در نخ رابط کاربری)"""
+        try:
+            changes, lines = self.progress_channel.drain(PROGRESS_LOG_LINES_PER_TICK)
+            if 'status' in changes:
+                self.status_var.set(self._render_message(changes['status']))
+            if 'detailed_status' in changes:
+                self.detailed_status_var.set(self._render_message(changes['detailed_status']))
+            if 'progress' in changes:
+                self.overall_progressbar['value'] = min(100, max(0, changes['progress']))
+            if 'detailed_progress' in changes:
+                self.detailed_progressbar['value'] = min(100, max(0, changes['detailed_progress']))
+            if lines:
+                # ScrolledText در ttkbootstrap از state پشتیبانی نمی‌کند
+                self.log_text.insert('end', ''.join(lines))
+                self.log_text.see('end')
+        except Exception as e:
+            self.logger.warning(f"UI update failed: {e}")
+        self.after(PROGRESS_POLL_INTERVAL_MS, self.poll_progress)
+    
+    @staticmethod
+    def _render_message(message):
+        # شمارنده‌ها به صورت (قالب، انجام شده، کل) ثبت و فقط هنگام نمایش فرمت می‌شوند
+        if isinstance(message, tuple):
+            template, done, total = message
+            return template.format(done=done, total=total)
+        return message
+    
     # کلاس مدیریت رابط کاربری برای فرآیند مغایرت‌گیری
     class ReconciliationUIHandler:
+        """
+        رابط نخ‌های کاری با رابط کاربری
+        
+        تمام متدها thread-safe هستند و فقط آخرین مقادیر را در کانال پیشرفت
+        می‌نویسند؛ ویجت‌ها در poll_progress تب به‌روز می‌شوند.
+        """
         def __init__(self, parent):
             self.parent = parent
             self.logger = parent.logger
-        
-        def _safe_ui_update(self, update_func):
-            """Thread-safe UI update wrapper"""
-            try:
-                if hasattr(self.parent, 'after_idle'):
-                    self.parent.after_idle(update_func)
-                else:
-                    update_func()
-            except Exception as e:
-                self.logger.warning(f"UI update failed: {e}")
+            self.channel = parent.progress_channel
         
         def update_status(self, message):
             """بروزرسانی وضعیت کلی"""
-            def _update():
-                try:
-                    self.parent.status_var.set(message)
-                    self.parent.update_idletasks()
-                except Exception as e:
-                    self.logger.warning(f"Status update failed: {e}")
-            self._safe_ui_update(_update)
+            self.channel.publish(status=message)
         
         def update_detailed_status(self, message):
             """بروزرسانی وضعیت جزئی"""
-            def _update():
-                try:
-                    self.parent.detailed_status_var.set(message)
-                    self.parent.update_idletasks()
-                except Exception as e:
-                    self.logger.warning(f"Detailed status update failed: {e}")
-            self._safe_ui_update(_update)
+            self.channel.publish(detailed_status=message)
         
         def update_progress(self, value):
             """بروزرسانی نوار پیشرفت کلی"""
-            def _update():
-                try:
-                    self.parent.overall_progressbar['value'] = min(100, max(0, value))
-                    self.parent.update_idletasks()
-                except Exception as e:
-                    self.logger.warning(f"Progress update failed: {e}")
-            self._safe_ui_update(_update)
+            self.channel.publish(progress=value)
         
         def update_detailed_progress(self, value):
             """بروزرسانی نوار پیشرفت جزئی"""
-            def _update():
-                try:
-                    self.parent.detailed_progressbar['value'] = min(100, max(0, value))
-                    self.parent.update_idletasks()
-                except Exception as e:
-                    self.logger.warning(f"Detailed progress update failed: {e}")
-            self._safe_ui_update(_update)
+            self.channel.publish(detailed_progress=value)
+        
+        def update_counter(self, done, total, template, overall=False):
+            """
+            ثبت پیشرفت حلقه‌های پردازش رکورد
+            
+            Args:
+                done: تعداد رکوردهای پردازش شده
+                total: تعداد کل رکوردها
+                template: قالب وضعیت جزئی با {done} و {total}
+                overall: به‌روزرسانی نوار پیشرفت کلی به جای نوار جزئی
+            """
+            progress = done / total * 100 if total else 100
+            if overall:
+                self.channel.publish(progress=progress, detailed_status=(template, done, total))
+            else:
+                self.channel.publish(detailed_progress=progress, detailed_status=(template, done, total))
         
         def log_info(self, message):
             """ثبت پیام اطلاعاتی در لاگ"""
             self.logger.info(message)
-            self.parent.log_text.see('end')
         
         def log_warning(self, message):
             """ثبت پیام هشدار در لاگ"""
             self.logger.warning(message)
-            self.parent.log_text.see('end')
         
         def log_error(self, message):
             """ثبت پیام خطا در لاگ"""
             self.logger.error(message)
-            self.parent.log_text.see('end')
     
     def start_reconciliation(self):
         """شروع فرآیند مغایرت‌گیری"""
@@ -272,7 +273,8 @@ class ReconciliationTab(ttk.Frame):
             self.overall_progressbar['value'] = 0
             self.detailed_progressbar['value'] = 0
             
-            # پاک کردن محتوای ویجت لاگ
+            # پاک کردن محتوای ویجت لاگ و مقادیر نمایش داده نشده اجرای قبل
+            self.progress_channel.reset()
             self.log_text.delete('1.0', 'end')
             # ScrolledText در ttkbootstrap نیازی به تغییر state ندارد
             
@@ -1,35 +1,30 @@
 import os
+import queue
+import sqlite3
 import logging
 import threading
-import pandas as pd
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from tkinter import StringVar, filedialog, messagebox, ttk as tk_ttk
 from tkinter.ttk import Combobox
 from ttkbootstrap.scrolled import ScrolledText
-from ttkbootstrap.tableview import Tableview
+from ui.components.common.table_view import TableView
+from ui.components.common.virtual_tree import LazyRowSequence
+from ui.components.report import DataFilter
 from database.banks_repository import get_all_banks
 from database.bank_transaction_repository import get_transactions_by_bank
 from database.pos_transactions_repository import get_transactions_by_bank as get_pos_transactions_by_bank
 from database.repositories.accounting import get_transactions_by_bank
 from database.reconciliation_results_repository import get_reconciliation_results
+from database.Helper.pagination import KeysetQuery, PagedResultSet
+from ui.components.common.log_handler import BatchedTextHandler
+from utils.logger_config import add_file_logging
 from config.settings import (
-    DATA_DIR, DEFAULT_FONT, DEFAULT_FONT_SIZE,
-    HEADER_FONT_SIZE, BUTTON_FONT_SIZE
+    DB_PATH, DEFAULT_FONT, DEFAULT_FONT_SIZE,
+    HEADER_FONT_SIZE, BUTTON_FONT_SIZE,
+    REPORT_POLL_INTERVAL_MS
 )
 
-# کلاس برای نمایش لاگ‌ها در UI
-class UIHandler(logging.Handler):
-    def __init__(self, text_widget):
-        super().__init__()
-        self.text_widget = text_widget
-        
-    def emit(self, record):
-        msg = self.format(record) + '\n'
-        # ScrolledText در ttkbootstrap از state پشتیبانی نمی‌کند
-        self.text_widget.insert('end', msg)
-        self.text_widget.see('end')
-
 class ReportTab(ttk.Frame):
     def __init__(self, parent):
         super().__init__(parent)
@@ -42,6 +37,16 @@ class ReportTab(ttk.Frame):
         self.selected_reconciliation_status_var = StringVar(value="همه موارد")
         self.status_var = StringVar(value="آماده برای ساخت گزارش...")
         
+        # وضعیت بارگذاری گزارش در پس‌زمینه
+        self.report_queue = None
+        self.report_cancel_event = None
+        self.report_connection = None
+        self.is_loading_report = False
+        self.report_query = None
+        self.data_filter = DataFilter(self.logger)
+        # صف نتیجه صدور به اکسل در حال اجرا (None یعنی عدم وجود صدور در حال اجرا)
+        self.export_queue = None
+        
         # ایجاد ویجت‌ها
         self.create_widgets()
         self.load_banks_to_combobox()
@@ -52,31 +57,12 @@ class ReportTab(ttk.Frame):
         
     def setup_logging(self):
         """راه‌اندازی سیستم لاگینگ"""
-        os.makedirs(DATA_DIR, exist_ok=True)
-        
         # تنظیمات کلی لاگر
         self.logger = logging.getLogger('report.tab')
         self.logger.setLevel(logging.INFO)
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        
-        # لاگر برای فایل خطاها
-        error_handler = logging.FileHandler(os.path.join(DATA_DIR, 'report_error.txt'), encoding='utf-8')
-        error_handler.setLevel(logging.ERROR)
-        error_handler.setFormatter(formatter)
-        
-        # لاگر برای فایل لاگ عمومی
-        file_handler = logging.FileHandler(os.path.join(DATA_DIR, 'report_log.txt'), encoding='utf-8')
-        file_handler.setLevel(logging.INFO)
-        file_handler.setFormatter(formatter)
         
-        # لاگر برای کنسول با پشتیبانی از UTF-8
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
-        console_handler.setFormatter(formatter)
-        
-        self.logger.addHandler(error_handler)
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
+        # فایل‌های لاگ و خطا (با چرخش بر اساس حجم) در نخ جداگانه از طریق صف نوشته می‌شوند
+        add_file_logging(self.logger, 'report_log.txt', 'report_error.txt')
         # UI handler will be added after creating log_text widget
 
     def create_widgets(self):
@@ -145,6 +131,12 @@ class ReportTab(ttk.Frame):
         )
         generate_report_button.pack(side="left", padx=PADX)
         
+        self.cancel_report_button = ttk.Button(
+            button_frame, text="لغو بارگذاری", style='Bold.TButton',
+            command=self.cancel_report, state="disabled"
+        )
+        self.cancel_report_button.pack(side="left", padx=PADX)
+        
         # === بخش نمایش داده‌ها ===
         data_frame = ttk.Frame(main_frame)
         data_frame.pack(fill="both", expand=True, pady=5)  # اجازه گسترش برای فضای کافی برای جدول
@@ -189,7 +181,7 @@ class ReportTab(ttk.Frame):
         self.log_text.pack(fill="both", expand=True, padx=PADX, pady=PADY)
         
         # اضافه کردن UI handler به لاگر
-        ui_handler = UIHandler(self.log_text)
+        ui_handler = BatchedTextHandler(self.log_text)
         ui_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
         ui_handler.setLevel(logging.INFO)
         self.logger.addHandler(ui_handler)
@@ -217,8 +209,11 @@ class ReportTab(ttk.Frame):
             self.logger.error(f"خطا در بارگذاری لیست بانک‌ها: {str(e)}")
     
     def generate_report(self):
-        """ساخت گزارش بر اساس تنظیمات انتخاب شده"""
+        """ساخت گزارش بر اساس تنظیمات انتخاب شده (خواندن داده‌ها در پس‌زمینه)"""
         try:
+            # لغو بارگذاری قبلی در صورت وجود
+            self.cancel_report()
+            
             self.logger.info("در حال ساخت گزارش...")
             self.status_var.set("در حال ساخت گزارش...")
             
@@ -249,61 +244,149 @@ class ReportTab(ttk.Frame):
                         bank_id = bank[0]  # bank[0] is bank_id
                         break
             
-            # دریافت داده‌ها بر اساس جدول انتخاب شده
-            self.data = []
+            # ساخت کوئری بر اساس جدول انتخاب شده
             if selected_table == "بانک":
-                self.get_bank_transactions(bank_id, selected_transaction_type, is_reconciled)
+                query = self.build_bank_transactions_query(bank_id, selected_transaction_type, is_reconciled)
             elif selected_table == "حسابداری":
-                self.get_accounting_transactions(bank_id, selected_transaction_type, is_reconciled)
+                query = self.build_accounting_transactions_query(bank_id, selected_transaction_type, is_reconciled)
             elif selected_table == "پوز":
-                self.get_pos_transactions(bank_id, is_reconciled)
+                query = self.build_pos_transactions_query(bank_id, is_reconciled)
             elif selected_table == "نتایج مغایرت گیری":
-                self.get_reconciliation_results_data(bank_id)
-            
-            # نمایش داده‌ها در جدول
-            if self.data:
-                self.display_data_in_table()
-                self.status_var.set(f"تعداد {len(self.data)} رکورد یافت شد")
-                self.logger.info(f"تعداد {len(self.data)} رکورد یافت شد")
+                query = self.build_reconciliation_results_query(bank_id)
             else:
-                self.status_var.set("هیچ رکوردی یافت نشد")
-                self.logger.info("هیچ رکوردی یافت نشد")
+                return
+            
+            # جدول خالی ساخته شده و پس از شمارش رکوردها، صفحات در صورت نیاز خوانده می‌شوند
+            self.report_query = query
+            self.data = []
+            self.display_data_in_table()
+            self.start_report_query(query)
         except Exception as e:
             self.logger.error(f"خطا در ساخت گزارش: {str(e)}")
             self.status_var.set(f"خطا در ساخت گزارش: {str(e)}")
             messagebox.showerror("خطا", f"خطا در ساخت گزارش: {str(e)}")
     
-    def get_bank_transactions(self, bank_id, transaction_type, is_reconciled):
-        """دریافت تراکنش‌های بانکی با فیلترهای مشخص شده"""
+    def start_report_query(self, query):
+        """اجرای کوئری گزارش (یا کوئری فیلتر شده آن) در نخ پس‌زمینه"""
+        self.report_queue = queue.Queue()
+        self.report_cancel_event = threading.Event()
+        self.is_loading_report = True
+        self.cancel_report_button.configure(state="normal")
+        
+        threading.Thread(
+            target=self.fetch_report_rows,
+            args=(query, self.report_queue, self.report_cancel_event),
+            daemon=True
+        ).start()
+        self.after(REPORT_POLL_INTERVAL_MS, self.poll_report_queue, self.report_queue)
+    
+    def fetch_report_rows(self, query, report_queue, cancel_event):
+        """
+        شمارش رکوردها، ساخت ایندکس صفحات و خواندن صفحه اول گزارش در نخ پس‌زمینه
+        
+        سایر صفحات هنگام اسکرول جدول با کوئری keyset خوانده می‌شوند. پیام‌های
+        صف: ('ready', PagedResultSet)، ('cancelled', None) و ('error', متن خطا)
+        """
+        conn = None
         try:
-            # ایجاد کوئری برای دریافت تراکنش‌های بانکی
-            import sqlite3
-            from config.settings import DB_PATH
-            
             conn = sqlite3.connect(DB_PATH)
             conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+            self.report_connection = conn
             
-            query = "SELECT bt.*, b.bank_name FROM BankTransactions bt JOIN Banks b ON bt.bank_id = b.id WHERE 1=1"
+            result_set = PagedResultSet(query, conn=conn)
+            if not cancel_event.is_set():
+                # صفحه اول پیش از نمایش جدول در کش قرار می‌گیرد
+                result_set.prefetch(0, conn)
+            
+            report_queue.put(('cancelled', None) if cancel_event.is_set() else ('ready', result_set))
+        except Exception as e:
+            # sqlite3.OperationalError: interrupted در صورت لغو حین اجرای کوئری
+            if cancel_event.is_set():
+                report_queue.put(('cancelled', None))
+            else:
+                report_queue.put(('error', str(e)))
+        finally:
+            if self.report_connection is conn:
+                self.report_connection = None
+            if conn:
+                conn.close()
+    
+    def poll_report_queue(self, report_queue):
+        """دریافت نتیجه آماده‌سازی گزارش از صف در نخ رابط کاربری"""
+        # صف متعلق به گزارش قبلی (لغو یا جایگزین شده) نادیده گرفته می‌شود
+        if report_queue is not self.report_queue:
+            return
+        
+        try:
+            kind, payload = report_queue.get_nowait()
+        except queue.Empty:
+            self.after(REPORT_POLL_INTERVAL_MS, self.poll_report_queue, report_queue)
+            return
+        
+        self.is_loading_report = False
+        self.cancel_report_button.configure(state="disabled")
+        if kind == 'error':
+            self.logger.error(f"خطا در ساخت گزارش: {payload}")
+            self.status_var.set(f"خطا در ساخت گزارش: {payload}")
+            messagebox.showerror("خطا", f"خطا در ساخت گزارش: {payload}")
+        elif kind == 'cancelled':
+            self.status_var.set("ساخت گزارش لغو شد")
+            self.logger.info("ساخت گزارش لغو شد")
+        elif payload.query is not self.report_query:
+            # نتیجه جستجو فقط در جدول نمایش داده می‌شود و داده‌های گزارش تغییر نمی‌کنند
+            self.report_table.load_data(payload)
+            self.status_var.set(f"تعداد {len(payload)} رکورد از {len(self.data)} رکورد با جستجو مطابقت دارد")
+        elif payload:
+            self.data = payload
+            self.table_data = LazyRowSequence(self.data, self.format_report_row)
+            self.report_table.load_data(self.data)
+            self.status_var.set(f"تعداد {len(self.data)} رکورد یافت شد")
+            self.logger.info(f"تعداد {len(self.data)} رکورد یافت شد")
+        else:
+            self.status_var.set("هیچ رکوردی یافت نشد")
+            self.logger.info("هیچ رکوردی یافت نشد")
+    
+    def cancel_report(self):
+        """لغو بارگذاری گزارش در حال اجرا"""
+        if not self.is_loading_report:
+            return
+        self.report_cancel_event.set()
+        conn = self.report_connection
+        if conn is not None:
+            try:
+                # قطع کوئری طولانی در حال اجرا (ایمن از نخ دیگر)
+                conn.interrupt()
+            except Exception:
+                pass
+        self.is_loading_report = False
+        self.cancel_report_button.configure(state="disabled")
+    
+    def ensure_report_loaded(self):
+        """بررسی پایان بارگذاری گزارش پیش از صدور یا چاپ"""
+        if self.is_loading_report:
+            messagebox.showwarning("هشدار", "بارگذاری گزارش هنوز به پایان نرسیده است")
+            return False
+        return True
+    
+    def build_bank_transactions_query(self, bank_id, transaction_type, is_reconciled):
+        """ساخت کوئری تراکنش‌های بانکی با فیلترهای مشخص شده و تنظیم ستون‌های گزارش"""
+        try:
+            # ایجاد کوئری برای دریافت تراکنش‌های بانکی
+            conditions = ["1=1"]
             params = []
             
             if bank_id:
-                query += " AND bt.bank_id = ?"
+                conditions.append("bt.bank_id = ?")
                 params.append(bank_id)
             
             if transaction_type is not None:
-                query += " AND bt.transaction_type = ?"
+                conditions.append("bt.transaction_type = ?")
                 params.append(transaction_type)
             
             if is_reconciled is not None:
-                query += " AND bt.is_reconciled = ?"
+                conditions.append("bt.is_reconciled = ?")
                 params.append(is_reconciled)
             
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
-            
-            # تبدیل نتایج به لیست دیکشنری
-            self.data = [dict(row) for row in rows]
             self.columns = [
                 {"text": "شناسه", "dataindex": "id"},
                 {"text": "بانک", "dataindex": "bank_name"},
@@ -318,43 +401,36 @@ class ReportTab(ttk.Frame):
                 {"text": "شماره کارت", "dataindex": "source_card_number"},
                 {"text": "مغایرت گیری شده", "dataindex": "is_reconciled"}
             ]
-            
-            conn.close()
+            return KeysetQuery(
+                "bt.*, b.bank_name",
+                "BankTransactions bt JOIN Banks b ON bt.bank_id = b.id",
+                " AND ".join(conditions), params,
+                sort_column="bt.id", id_column="bt.id",
+                column_prefix="bt", sort_columns={"bank_name": "b.bank_name"}
+            )
         except Exception as e:
             self.logger.error(f"خطا در دریافت تراکنش‌های بانکی: {str(e)}")
             raise
     
-    def get_accounting_transactions(self, bank_id, transaction_type, is_reconciled):
-        """دریافت تراکنش‌های حسابداری با فیلترهای مشخص شده"""
+    def build_accounting_transactions_query(self, bank_id, transaction_type, is_reconciled):
+        """ساخت کوئری تراکنش‌های حسابداری با فیلترهای مشخص شده و تنظیم ستون‌های گزارش"""
         try:
             # ایجاد کوئری برای دریافت تراکنش‌های حسابداری
-            import sqlite3
-            from config.settings import DB_PATH
-            
-            conn = sqlite3.connect(DB_PATH)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            query = "SELECT at.*, b.bank_name FROM AccountingTransactions at JOIN Banks b ON at.bank_id = b.id WHERE 1=1"
+            conditions = ["1=1"]
             params = []
             
             if bank_id:
-                query += " AND at.bank_id = ?"
+                conditions.append("at.bank_id = ?")
                 params.append(bank_id)
             
             if transaction_type is not None:
-                query += " AND at.transaction_type = ?"
+                conditions.append("at.transaction_type = ?")
                 params.append(transaction_type)
             
             if is_reconciled is not None:
-                query += " AND at.is_reconciled = ?"
+                conditions.append("at.is_reconciled = ?")
                 params.append(is_reconciled)
             
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
-            
-            # تبدیل نتایج به لیست دیکشنری
-            self.data = [dict(row) for row in rows]
             self.columns = [
                 {"text": "شناسه", "dataindex": "id"},
                 {"text": "بانک", "dataindex": "bank_name"},
@@ -368,39 +444,32 @@ class ReportTab(ttk.Frame):
                 {"text": "مغایرت گیری شده", "dataindex": "is_reconciled"},
                 {"text": "سیستم", "dataindex": "is_new_system"}
             ]
-            
-            conn.close()
+            return KeysetQuery(
+                "at.*, b.bank_name",
+                "AccountingTransactions at JOIN Banks b ON at.bank_id = b.id",
+                " AND ".join(conditions), params,
+                sort_column="at.id", id_column="at.id",
+                column_prefix="at", sort_columns={"bank_name": "b.bank_name"}
+            )
         except Exception as e:
             self.logger.error(f"خطا در دریافت تراکنش‌های حسابداری: {str(e)}")
             raise
     
-    def get_pos_transactions(self, bank_id, is_reconciled):
-        """دریافت تراکنش‌های پوز با فیلترهای مشخص شده"""
+    def build_pos_transactions_query(self, bank_id, is_reconciled):
+        """ساخت کوئری تراکنش‌های پوز با فیلترهای مشخص شده و تنظیم ستون‌های گزارش"""
         try:
             # ایجاد کوئری برای دریافت تراکنش‌های پوز
-            import sqlite3
-            from config.settings import DB_PATH
-            
-            conn = sqlite3.connect(DB_PATH)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            query = "SELECT pt.*, b.bank_name FROM PosTransactions pt JOIN Banks b ON pt.bank_id = b.id WHERE 1=1"
+            conditions = ["1=1"]
             params = []
             
             if bank_id:
-                query += " AND pt.bank_id = ?"
+                conditions.append("pt.bank_id = ?")
                 params.append(bank_id)
             
             if is_reconciled is not None:
-                query += " AND pt.is_reconciled = ?"
+                conditions.append("pt.is_reconciled = ?")
                 params.append(is_reconciled)
             
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
-            
-            # تبدیل نتایج به لیست دیکشنری
-            self.data = [dict(row) for row in rows]
             self.columns = [
                 {"text": "شناسه", "dataindex": "id"},
                 {"text": "بانک", "dataindex": "bank_name"},
@@ -412,52 +481,50 @@ class ReportTab(ttk.Frame):
                 {"text": "شماره پیگیری", "dataindex": "tracking_number"},
                 {"text": "مغایرت گیری شده", "dataindex": "is_reconciled"}
             ]
-            
-            conn.close()
+            return KeysetQuery(
+                "pt.*, b.bank_name",
+                "PosTransactions pt JOIN Banks b ON pt.bank_id = b.id",
+                " AND ".join(conditions), params,
+                sort_column="pt.id", id_column="pt.id",
+                column_prefix="pt", sort_columns={"bank_name": "b.bank_name"}
+            )
         except Exception as e:
             self.logger.error(f"خطا در دریافت تراکنش‌های پوز: {str(e)}")
             raise
     
-    def get_reconciliation_results_data(self, bank_id):
-        """دریافت نتایج مغایرت‌گیری با فیلترهای مشخص شده"""
+    def build_reconciliation_results_query(self, bank_id):
+        """ساخت کوئری نتایج مغایرت‌گیری با فیلترهای مشخص شده و تنظیم ستون‌های گزارش"""
         try:
             # ایجاد کوئری برای دریافت نتایج مغایرت‌گیری
-            import sqlite3
-            from config.settings import DB_PATH
-            
-            conn = sqlite3.connect(DB_PATH)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            query = """
-                SELECT r.*, 
-                       b1.bank_name as bank_name,
-                       bt.amount as bank_amount,
-                       bt.transaction_date as bank_date,
-                       bt.transaction_type as bank_transaction_type,
-                       at.transaction_amount as accounting_amount,
-                       at.due_date as accounting_date,
-                       at.transaction_type as accounting_transaction_type,
-                       pt.transaction_amount as pos_amount,
-                       pt.transaction_date as pos_date
-                FROM ReconciliationResults r
+            # نگاشت ستون‌های خروجی join به ستون جدول مبدأ برای مرتب‌سازی
+            sort_columns = {
+                "bank_name": "b1.bank_name",
+                "bank_amount": "bt.amount",
+                "bank_date": "bt.transaction_date",
+                "bank_transaction_type": "bt.transaction_type",
+                "accounting_amount": "at.transaction_amount",
+                "accounting_date": "at.due_date",
+                "accounting_transaction_type": "at.transaction_type",
+                "pos_amount": "pt.transaction_amount",
+                "pos_date": "pt.transaction_date"
+            }
+            select_clause = "r.*, " + ", ".join(
+                f"{column} as {field}" for field, column in sort_columns.items()
+            )
+            from_clause = """
+                ReconciliationResults r
                 LEFT JOIN BankTransactions bt ON r.bank_record_id = bt.id
                 LEFT JOIN AccountingTransactions at ON r.acc_id = at.id
                 LEFT JOIN PosTransactions pt ON r.pos_id = pt.id
                 LEFT JOIN Banks b1 ON bt.bank_id = b1.id
-                WHERE 1=1
             """
+            conditions = ["1=1"]
             params = []
             
             if bank_id:
-                query += " AND (bt.bank_id = ? OR at.bank_id = ? OR pt.bank_id = ?)"
+                conditions.append("(bt.bank_id = ? OR at.bank_id = ? OR pt.bank_id = ?)")
                 params.extend([bank_id, bank_id, bank_id])
             
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
-            
-            # تبدیل نتایج به لیست دیکشنری
-            self.data = [dict(row) for row in rows]
             self.columns = [
                 {"text": "شناسه", "dataindex": "id"},
                 {"text": "بانک", "dataindex": "bank_name"},
@@ -476,92 +543,105 @@ class ReportTab(ttk.Frame):
                 {"text": "نوع تطبیق", "dataindex": "type_matched"},
                 {"text": "تاریخ و زمان", "dataindex": "date_time"}
             ]
-            
-            conn.close()
+            return KeysetQuery(
+                select_clause, from_clause, " AND ".join(conditions), params,
+                sort_column="r.id", id_column="r.id", column_prefix="r",
+                sort_columns=sort_columns
+            )
         except Exception as e:
             self.logger.error(f"خطا در دریافت نتایج مغایرت‌گیری: {str(e)}")
             raise
     
+    # ستون‌های نیازمند تبدیل هنگام نمایش
+    DATE_COLUMNS = ["transaction_date", "due_date", "collection_date", "date_time", "bank_date", "accounting_date", "pos_date"]
+    AMOUNT_COLUMNS = ["amount", "transaction_amount", "bank_amount", "accounting_amount", "pos_amount"]
+    # متن نمایشی ستون‌های وضعیت و مقدار ذخیره شده آن‌ها (برای جستجو)
+    VALUE_LABELS = {
+        "is_reconciled": {"بله": 1, "خیر": 0},
+        "is_new_system": {"سیستم جدید": 1, "سیستم قدیم": 0}
+    }
+
+    def format_report_row(self, item, columns=None):
+        """
+        تبدیل یک رکورد به تاپل مقادیر نمایشی (فقط هنگام نمایش یا صدور فراخوانی می‌شود)
+        
+        Args:
+            item: رکورد
+            columns: ستون‌های خروجی (پیش‌فرض: ستون‌های گزارش فعلی)
+        """
+        from utils.helpers import gregorian_to_persian
+
+        row = []
+        for col in (columns if columns is not None else self.columns):
+            key = col["dataindex"]
+            value = item.get(key)
+            if key not in item:
+                row.append("")
+            # تبدیل مقادیر بولین به متن
+            elif key == "is_reconciled":
+                row.append("بله" if value == 1 else "خیر")
+            # تبدیل مقادیر is_new_system به متن
+            elif key == "is_new_system":
+                row.append("سیستم جدید" if value == 1 else "سیستم قدیم")
+            # تبدیل تاریخ میلادی به شمسی
+            elif key in self.DATE_COLUMNS and value:
+                try:
+                    row.append(gregorian_to_persian(str(value)))
+                except Exception as e:
+                    self.logger.error(f"خطا در تبدیل تاریخ {value}: {str(e)}")
+                    row.append(str(value))
+            # فرمت کردن مبالغ با جداکننده هزارگان
+            elif key in self.AMOUNT_COLUMNS:
+                try:
+                    row.append(f"{int(float(value)):,}" if value is not None else "")
+                except (ValueError, TypeError):
+                    row.append(str(value))
+            else:
+                # اطمینان از تبدیل صحیح به رشته و حذف مقادیر None
+                row.append(str(value) if value is not None else "")
+        return tuple(row)
+
     def display_data_in_table(self):
-        """نمایش داده‌ها در جدول"""
+        """نمایش داده‌ها در جدول مجازی (فقط ردیف‌های قابل مشاهده ساخته و فرمت می‌شوند)"""
         try:
             # پاک کردن جدول قبلی
             for widget in self.table_frame.winfo_children():
                 widget.destroy()
                 
-            # تبدیل ستون‌ها به فرمت صحیح برای Tableview
-            coldata = []
-            dataindex_to_colindex = {}
-            
-            for i, col in enumerate(self.columns):
-                # تنظیم عرض مناسب برای هر ستون با در نظر گرفتن متن فارسی
+            # تنظیم ستون‌ها با عرض مناسب برای متن فارسی
+            columns = []
+            for col in self.columns:
                 width = 150  # عرض پیش‌فرض مناسب
                 if col["dataindex"] in ["description", "customer_name"]:
                     width = 250  # عرض بیشتر برای ستون‌های توضیحات و نام مشتری
-                elif col["dataindex"] in ["amount", "transaction_amount", "bank_amount", "accounting_amount", "pos_amount"]:
+                elif col["dataindex"] in self.AMOUNT_COLUMNS:
                     width = 140  # عرض مناسب برای ستون‌های مبلغ
                 elif col["dataindex"] in ["id", "is_reconciled", "is_new_system"]:
                     width = 100  # عرض کمتر برای ستون‌های کوتاه
-                elif col["dataindex"] in ["transaction_date", "due_date", "collection_date", "date_time", "bank_date", "accounting_date", "pos_date"]:
+                elif col["dataindex"] in self.DATE_COLUMNS:
                     width = 120  # عرض مناسب برای تاریخ‌ها
-                
-                coldata.append({"text": col["text"], "stretch": True, "width": width})
-                dataindex_to_colindex[col["dataindex"]] = i
-            
-            # تبدیل داده‌ها به فرمت مناسب برای Tableview (لیست تاپل‌ها)
-            rowdata = []
-            from utils.helpers import gregorian_to_persian
-            
-            for item in self.data:
-                row = ["" for _ in range(len(self.columns))]
-                for col in self.columns:
-                    key = col["dataindex"]
-                    col_index = dataindex_to_colindex[key]
-                    if key in item:
-                        # تبدیل مقادیر بولین به متن
-                        if key == "is_reconciled":
-                            row[col_index] = "بله" if item[key] == 1 else "خیر"
-                        # تبدیل مقادیر is_new_system به متن
-                        elif key == "is_new_system":
-                            row[col_index] = "سیستم جدید" if item[key] == 1 else "سیستم قدیم"
-                        # تبدیل تاریخ میلادی به شمسی
-                        elif key in ["transaction_date", "due_date", "collection_date", "date_time", "bank_date", "accounting_date", "pos_date"] and item[key]:
-                            try:
-                                row[col_index] = gregorian_to_persian(str(item[key]))
-                            except Exception as e:
-                                self.logger.error(f"خطا در تبدیل تاریخ {item[key]}: {str(e)}")
-                                row[col_index] = str(item[key])
-                        # فرمت کردن مبالغ
-                        elif key in ["amount", "transaction_amount", "bank_amount", "accounting_amount", "pos_amount"]:
-                            try:
-                                if item[key] is not None:
-                                    # تبدیل به عدد و سپس فرمت‌بندی با جداکننده هزارگان
-                                    amount_value = float(item[key])
-                                    row[col_index] = f"{int(amount_value):,}"
-                                else:
-                                    row[col_index] = ""
-                            except (ValueError, TypeError):
-                                row[col_index] = str(item[key]) if item[key] is not None else ""
-                        else:
-                            # اطمینان از تبدیل صحیح به رشته و حذف مقادیر None
-                            row[col_index] = str(item[key]) if item[key] is not None else ""
-                rowdata.append(tuple(row))
-            
-            # ایجاد جدول با تنظیمات بهتر برای متن فارسی
-            table = Tableview(
-                master=self.table_frame,
-                coldata=coldata,
-                rowdata=rowdata,
-                paginated=True,
-                searchable=True,
-                bootstyle="primary",
-                stripecolor=("#f8f9fa", "#ffffff"),  # رنگ‌های بهتر برای خوانایی
-                autofit=False,
-                pagesize=12,  # تعداد مناسب برای نمایش بهتر
-                height=18  # ارتفاع مناسب برای خوانایی
+                columns.append({"id": col["dataindex"], "text": col["text"], "width": width})
+            
+            # جستجو در داده‌های گزارش
+            search_frame = ttk.Frame(self.table_frame)
+            search_frame.pack(fill="x", padx=5, pady=(5, 0))
+            ttk.Label(search_frame, text="جستجو:", style='Default.TLabel').pack(side="right", padx=5)
+            self.table_search_var = StringVar()
+            search_entry = ttk.Entry(search_frame, textvariable=self.table_search_var, font=self.default_font, width=30)
+            search_entry.pack(side="right", padx=5)
+            search_entry.bind("<Return>", lambda event: self.filter_table())
+            
+            self.report_table = TableView(
+                self.table_frame,
+                columns=columns,
+                data=self.data,
+                height=18,
+                select_mode="extended",
+                virtual=True,
+                formatter=self.format_report_row,
+                sort_handler=self.sort_report_table
             )
-            # تنظیم پکینگ جدول
-            table.pack(fill="both", expand=True, padx=5, pady=5)
+            self.report_table.pack(fill="both", expand=True, padx=5, pady=5)
             
             # تنظیم فونت فارسی برای جدول با استفاده از روش غیرمستقیم
             try:
@@ -587,18 +667,79 @@ class ReportTab(ttk.Frame):
                 self.logger.warning(f"تنظیم فونت فارسی با خطا مواجه شد: {str(e)}")
                 # ادامه اجرا بدون توقف
             
-            # ذخیره داده‌ها برای استفاده در صدور
-            self.table_data = rowdata
+            # داده‌های صدور به صورت تنبل فرمت می‌شوند
+            self.table_data = LazyRowSequence(self.data, self.format_report_row)
         except Exception as e:
             self.logger.error(f"خطا در نمایش داده‌ها در جدول: {str(e)}")
             raise
     
+    def filter_table(self):
+        """
+        فیلتر ردیف‌های نمایش داده شده بر اساس متن جستجو
+        
+        جستجو با کوئری جدید روی مقادیر ذخیره شده ستون‌ها در دیتابیس انجام می‌شود
+        و نتیجه مانند گزارش صفحه‌بندی می‌شود. متن نمایشی جدول به مقدار ذخیره شده
+        تبدیل می‌شود: تاریخ شمسی کامل (1403/05/01) به تاریخ میلادی، مبلغ با
+        جداکننده هزارگان به عدد و بله/خیر به وضعیت مغایرت‌گیری.
+        """
+        if self.report_query is None or not self.ensure_report_loaded():
+            return
+        search_text = self.table_search_var.get().strip()
+        if not search_text:
+            self.report_table.load_data(self.data)
+            self.status_var.set(f"تعداد {len(self.data)} رکورد یافت شد")
+            return
+        try:
+            query = self.data_filter.build_query(
+                self.report_query,
+                {'search_text': search_text},
+                search_fields=[col["dataindex"] for col in self.columns],
+                date_fields=self.DATE_COLUMNS,
+                amount_fields=self.AMOUNT_COLUMNS,
+                value_labels=self.VALUE_LABELS
+            )
+        except ValueError as e:
+            self.logger.error(f"خطا در ساخت کوئری جستجو: {str(e)}")
+            return
+        self.status_var.set("در حال جستجو...")
+        self.start_report_query(query)
+    
+    def sort_report_table(self, field, descending):
+        """
+        مرتب‌سازی گزارش (یا نتیجه جستجوی نمایش داده شده) بر اساس یک ستون
+        
+        کوئری مرتب شده مانند ساخت گزارش در نخ پس‌زمینه شمارش و صفحه‌بندی می‌شود.
+        """
+        if not self.ensure_report_loaded():
+            return
+        current = self.report_table.data
+        try:
+            query = current.query.with_sort(field, descending)
+        except ValueError as e:
+            self.logger.error(f"خطا در ساخت کوئری مرتب‌سازی: {str(e)}")
+            return
+        if current is self.data:
+            # مرتب‌سازی کل گزارش؛ جستجوهای بعدی نیز با همین ترتیب انجام می‌شوند
+            self.report_query = query
+        self.status_var.set("در حال مرتب‌سازی...")
+        self.start_report_query(query)
+    
     def export_to_excel(self):
-        """صدور داده‌ها به فایل اکسل"""
+        """
+        صدور داده‌های گزارش به فایل اکسل
+
+        رکوردها با یک کوئری به صورت دسته‌ای از دیتابیس خوانده و در نخ پس‌زمینه
+        به صورت جریانی در فایل نوشته می‌شوند؛ حافظه مصرفی به حجم گزارش وابسته نیست.
+        """
         try:
+            if not self.ensure_report_loaded():
+                return
             if not self.data:
                 messagebox.showwarning("هشدار", "هیچ داده‌ای برای صدور وجود ندارد")
                 return
+            if self.export_queue is not None:
+                messagebox.showwarning("هشدار", "صدور قبلی هنوز به پایان نرسیده است")
+                return
             
             # دریافت مسیر ذخیره فایل
             file_path = filedialog.asksaveasfilename(
@@ -610,263 +751,61 @@ class ReportTab(ttk.Frame):
             if not file_path:
                 return
             
-            # فیلتر کردن داده‌ها برای حذف کارمزدها از شیت اصلی
-            filtered_data = []
-            for row in self.table_data:
-                # بررسی نوع تراکنش در ستون مربوطه
-                transaction_type_index = None
-                transaction_type_column_names = ["نوع تراکنش بانک", "نوع تراکنش", "transaction_type"]
-                
-                for i, col in enumerate(self.columns):
-                    if col["text"] in transaction_type_column_names:
-                        transaction_type_index = i
-                        break
-                
-                # اگر ستون نوع تراکنش پیدا شد
-                if transaction_type_index is not None:
-                    transaction_type = row[transaction_type_index] if transaction_type_index < len(row) else None
-                    # اگر نوع تراکنش کارمزد نیست، به لیست فیلتر شده اضافه کن
-                    if transaction_type not in ["bank_fee", "BANK_FEES", "کارمزد بانکی"]:
-                        filtered_data.append(list(row))  # تبدیل تاپل به لیست
-                else:  # اگر ستون نوع تراکنش پیدا نشد، همه رکوردها را اضافه کن
-                    filtered_data.append(list(row))  # تبدیل تاپل به لیست
-                    
-                # لاگ کردن برای اشکال‌زدایی
-                self.logger.debug(f"نوع تراکنش: {row[transaction_type_index] if transaction_type_index is not None and transaction_type_index < len(row) else 'نامشخص'}, اضافه شده به لیست: {transaction_type_index is None or row[transaction_type_index] not in ['bank_fee', 'BANK_FEES', 'کارمزد بانکی']}")
+            from ui.components.export.excel_exporter import ExcelExporter, stream_query_rows
             
-            # اضافه کردن ستون اضافی بر اساس نوع گزارش
-            column_names = [col["text"] for col in self.columns]
-            
-            # تعیین نوع ستون اضافی بر اساس نوع گزارش
+            # ستون‌ها ثابت نگه داشته می‌شوند تا ساخت گزارش جدید حین صدور بر فایل اثر نگذارد
+            columns = list(self.columns)
+            rows = stream_query_rows(self.data.query, lambda item: self.format_report_row(item, columns))
             selected_table = self.selected_table_var.get()
-            if selected_table == "بانک":
-                additional_column_name = "acc_id"
-            elif selected_table == "حسابداری":
-                additional_column_name = "bank_rec_id"
-            else:
-                additional_column_name = None  # برای پوز و نتایج مغایرت گیری ستون اضافی نداریم
-            
-            # اضافه کردن نام ستون اضافی
-            if additional_column_name:
-                column_names.append(additional_column_name)
-                # اضافه کردن ستون خالی به داده‌های فیلتر شده
-                for row in filtered_data:
-                    row.append("")  # ستون خالی
-            
-            df = pd.DataFrame(filtered_data, columns=column_names)
-            
-            # تنظیم فونت و استایل برای فایل اکسل
-            from openpyxl import Workbook
-            from openpyxl.styles import Font, Alignment, PatternFill
-            from openpyxl.utils import get_column_letter
-            
-            # ذخیره به فایل اکسل
-            with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='گزارش')
-                
-                # تنظیم استایل‌ها
-                workbook = writer.book
-                worksheet = writer.sheets['گزارش']
-                
-                # تنظیم راست به چپ بودن کل شیت
-                worksheet.sheet_view.rightToLeft = True
-                
-                # تنظیم استایل هدر
-                header_fill = PatternFill(start_color='E6E6E6', end_color='E6E6E6', fill_type='solid')
-                header_font = Font(name='Tahoma', size=12, bold=True)
-                
-                for cell in worksheet[1]:
-                    cell.fill = header_fill
-                    cell.font = header_font
-                    cell.alignment = Alignment(horizontal='center', vertical='center')
-                
-                # تنظیم فونت و راست به چپ بودن برای داده‌ها
-                for row in worksheet.iter_rows(min_row=2):
-                    for cell in row:
-                        cell.font = Font(name='Tahoma', size=11)
-                        cell.alignment = Alignment(horizontal='right', vertical='center')
-                
-                # تنظیم عرض ستون‌ها
-                for i, column in enumerate(worksheet.columns):
-                    max_length = 0
-                    column_letter = get_column_letter(i+1)
-                    
-                    # بررسی طول محتوای سلول‌ها
-                    for cell in column:
-                        try:
-                            if cell.value:
-                                cell_length = len(str(cell.value))
-                                if cell_length > max_length:
-                                    max_length = cell_length
-                        except:
-                            pass
-                    
-                    # تنظیم عرض ستون با توجه به محتوا
-                    adjusted_width = max(max_length + 4, 15)  # حداقل عرض 15 کاراکتر
-                    worksheet.column_dimensions[column_letter].width = adjusted_width
-                
-                # اضافه کردن شیت کارمزدها
-                self.add_bank_fees_sheet(writer)
-            
-            self.logger.info(f"داده‌ها با موفقیت به فایل {file_path} صادر شدند")
-            self.status_var.set(f"داده‌ها با موفقیت به فایل اکسل صادر شدند")
-            messagebox.showinfo("موفقیت", f"داده‌ها با موفقیت به فایل اکسل صادر شدند")
+            exporter = ExcelExporter(self.logger)
+            self.start_export("اکسل", lambda: exporter.write_report(file_path, columns, selected_table, rows))
         except Exception as e:
             self.logger.error(f"خطا در صدور به اکسل: {str(e)}")
             self.status_var.set(f"خطا در صدور به اکسل: {str(e)}")
             messagebox.showerror("خطا", f"خطا در صدور به اکسل: {str(e)}")
     
-    def add_bank_fees_sheet(self, writer):
-        """اضافه کردن شیت کارمزدهای بانکی به فایل اکسل با جمع‌بندی روزانه"""
+    def start_export(self, target_name, write):
+        """
+        اجرای صدور در نخ پس‌زمینه و بررسی نتیجه آن با after
+        
+        Args:
+            target_name: نام قالب خروجی برای پیام‌ها (اکسل یا PDF)
+            write: تابع نوشتن فایل که تعداد رکوردهای صادر شده را برمی‌گرداند
+        """
+        self.export_queue = queue.Queue()
+        threading.Thread(target=self.run_export, args=(write, self.export_queue), daemon=True).start()
+        self.status_var.set(f"در حال صدور به {target_name}...")
+        self.after(REPORT_POLL_INTERVAL_MS, self.poll_export_queue, self.export_queue, target_name)
+    
+    def run_export(self, write, export_queue):
+        """نوشتن فایل در نخ پس‌زمینه؛ پیام‌های صف: ('done', تعداد) و ('error', متن خطا)"""
         try:
-            import sqlite3
-            from config.settings import DB_PATH
-            
-            conn = sqlite3.connect(DB_PATH)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            # دریافت کارمزدهای بانکی
-            query = """SELECT bt.*, b.bank_name 
-                       FROM BankTransactions bt 
-                       JOIN Banks b ON bt.bank_id = b.id 
-                       WHERE bt.transaction_type IN ('bank_fee', 'BANK_FEES')"""
-            
-            cursor.execute(query)
-            rows = cursor.fetchall()
-            
-            # اگر کارمزدی وجود نداشت، شیت اضافه نشود
-            if not rows:
-                self.logger.info("هیچ کارمزد بانکی یافت نشد")
-                return
-            
-            # تبدیل نتایج به لیست دیکشنری
-            fees_data = [dict(row) for row in rows]
-            
-            # تبدیل تاریخ‌ها به شمسی و گروه‌بندی بر اساس تاریخ
-            from utils.helpers import gregorian_to_persian
-            
-            # گروه‌بندی کارمزدها بر اساس تاریخ
-            daily_fees = {}
-            for item in fees_data:
-                if 'transaction_date' in item and item['transaction_date']:
-                    try:
-                        # تبدیل تاریخ به شمسی
-                        persian_date = gregorian_to_persian(str(item['transaction_date']))
-                        
-                        # اضافه کردن به دیکشنری گروه‌بندی شده
-                        if persian_date not in daily_fees:
-                            daily_fees[persian_date] = {
-                                'date': persian_date,
-                                'total_amount': 0,
-                                'bank_name': item['bank_name'],
-                                'count': 0
-                            }
-                        
-                        # جمع کردن مبلغ کارمزد
-                        if 'amount' in item and item['amount'] is not None:
-                            daily_fees[persian_date]['total_amount'] += float(item['amount'])
-                            daily_fees[persian_date]['count'] += 1
-                    except Exception as e:
-                        self.logger.error(f"خطا در پردازش تاریخ: {str(e)}")
-            
-            # تبدیل دیکشنری به لیست برای ایجاد دیتافریم
-            daily_fees_list = list(daily_fees.values())
-            
-            # اگر داده‌ای برای نمایش وجود نداشت
-            if not daily_fees_list:
-                self.logger.info("هیچ داده‌ای برای نمایش در شیت کارمزدها وجود ندارد")
-                return
-            
-            # ستون‌های مورد نیاز برای نمایش
-            columns = [
-                {"text": "تاریخ", "dataindex": "date"},
-                {"text": "بانک", "dataindex": "bank_name"},
-                {"text": "جمع کارمزد (ریال)", "dataindex": "total_amount"},
-                {"text": "تعداد تراکنش", "dataindex": "count"}
-            ]
-            
-            # آماده‌سازی داده‌ها برای دیتافریم
-            rows_data = []
-            for item in daily_fees_list:
-                row = []
-                for col in columns:
-                    key = col["dataindex"]
-                    if key in item:
-                        if key == "total_amount":
-                            try:
-                                if item[key] is not None:
-                                    amount_value = float(item[key])
-                                    row.append(f"{int(amount_value):,}")
-                                else:
-                                    row.append("")
-                            except:
-                                row.append(str(item[key]) if item[key] is not None else "")
-                        else:
-                            row.append(str(item[key]) if item[key] is not None else "")
-                rows_data.append(row)
-            
-            # ایجاد دیتافریم
-            column_names = [col["text"] for col in columns]
-            df_fees = pd.DataFrame(rows_data, columns=column_names)
-            
-            # مرتب‌سازی بر اساس تاریخ
-            df_fees = df_fees.sort_values(by="تاریخ")
-            
-            # اضافه کردن به اکسل
-            df_fees.to_excel(writer, sheet_name='کارمزدها', index=False)
-            
-            # تنظیم استایل‌ها
-            worksheet = writer.sheets['کارمزدها']
-            
-            # تنظیم راست به چپ بودن کل شیت
-            worksheet.sheet_view.rightToLeft = True
-            
-            # تنظیم استایل هدر
-            from openpyxl.styles import Font, Alignment, PatternFill
-            from openpyxl.utils import get_column_letter
-            
-            header_fill = PatternFill(start_color='E6E6E6', end_color='E6E6E6', fill_type='solid')
-            header_font = Font(name='Tahoma', size=12, bold=True)
-            
-            for cell in worksheet[1]:
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-            
-            # تنظیم فونت و راست به چپ بودن برای داده‌ها
-            for row in worksheet.iter_rows(min_row=2):
-                for cell in row:
-                    cell.font = Font(name='Tahoma', size=11)
-                    cell.alignment = Alignment(horizontal='right', vertical='center')
-            
-            # تنظیم عرض ستون‌ها
-            for i, column in enumerate(worksheet.columns):
-                max_length = 0
-                column_letter = get_column_letter(i+1)
-                
-                # بررسی طول محتوای سلول‌ها
-                for cell in column:
-                    try:
-                        if cell.value:
-                            cell_length = len(str(cell.value))
-                            if cell_length > max_length:
-                                max_length = cell_length
-                    except:
-                        pass
-                
-                # تنظیم عرض ستون با توجه به محتوا
-                adjusted_width = max(max_length + 4, 15)  # حداقل عرض 15 کاراکتر
-                worksheet.column_dimensions[column_letter].width = adjusted_width
-                
-            self.logger.info("شیت کارمزدها با موفقیت اضافه شد")
-            conn.close()
+            export_queue.put(('done', write()))
         except Exception as e:
-            self.logger.error(f"خطا در اضافه کردن شیت کارمزدها: {str(e)}")
+            export_queue.put(('error', str(e)))
+    
+    def poll_export_queue(self, export_queue, target_name):
+        """دریافت نتیجه صدور از صف در نخ رابط کاربری"""
+        try:
+            kind, payload = export_queue.get_nowait()
+        except queue.Empty:
+            self.after(REPORT_POLL_INTERVAL_MS, self.poll_export_queue, export_queue, target_name)
+            return
+        
+        self.export_queue = None
+        if kind == 'error':
+            self.logger.error(f"خطا در صدور به {target_name}: {payload}")
+            self.status_var.set(f"خطا در صدور به {target_name}: {payload}")
+            messagebox.showerror("خطا", f"خطا در صدور به {target_name}: {payload}")
+        else:
+            self.status_var.set(f"{payload} رکورد با موفقیت به {target_name} صادر شد")
+            messagebox.showinfo("موفقیت", f"گزارش با موفقیت به {target_name} صادر شد")
     
     def print_report(self):
         """چاپ گزارش"""
         try:
+            if not self.ensure_report_loaded():
+                return
             if not self.data:
                 messagebox.showwarning("هشدار", "هیچ داده‌ای برای چاپ وجود ندارد")
                 return
@@ -979,11 +918,32 @@ class ReportTab(ttk.Frame):
             messagebox.showerror("خطا", f"خطا در چاپ گزارش: {str(e)}")
     
     def export_to_pdf(self):
-        """صدور گزارش به فایل PDF"""
+        """
+        صدور گزارش به فایل PDF
+        
+        رکوردها مانند صدور اکسل به صورت دسته‌ای از دیتابیس خوانده و صفحه به صفحه
+        در نخ پس‌زمینه رسم می‌شوند.
+        """
         try:
+            if not self.ensure_report_loaded():
+                return
             if not self.data:
                 messagebox.showwarning("هشدار", "هیچ داده‌ای برای صدور وجود ندارد")
                 return
+            if self.export_queue is not None:
+                messagebox.showwarning("هشدار", "صدور قبلی هنوز به پایان نرسیده است")
+                return
+            
+            from ui.components.export.pdf_exporter import PDFExporter, REPORTLAB_AVAILABLE
+            from ui.components.export.excel_exporter import stream_query_rows
+            
+            exporter = PDFExporter(self.logger)
+            if not REPORTLAB_AVAILABLE:
+                # اگر کتابخانه reportlab نصب نشده باشد
+                self.logger.error("کتابخانه‌های مورد نیاز برای PDF نصب نشده است")
+                self.status_var.set("خطا: کتابخانه‌های مورد نیاز PDF نصب نشده است")
+                exporter._show_missing_libraries_error()
+                return
             
             # دریافت مسیر ذخیره فایل
             file_path = filedialog.asksaveasfilename(
@@ -995,165 +955,12 @@ class ReportTab(ttk.Frame):
             if not file_path:
                 return
             
-            # استفاده از کتابخانه reportlab برای ایجاد PDF
-            try:
-                from reportlab.lib import colors
-                from reportlab.lib.pagesizes import A4, landscape
-                from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-                from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-                from reportlab.pdfbase import pdfmetrics
-                from reportlab.pdfbase.ttfonts import TTFont
-                from reportlab.lib.enums import TA_RIGHT, TA_CENTER
-                from reportlab.pdfgen import canvas
-                import os
-                
-                # Import for RTL text handling
-                try:
-                    from bidi.algorithm import get_display
-                    from arabic_reshaper import reshape
-                    bidi_available = True
-                except ImportError:
-                    bidi_available = False
-                    self.logger.warning("کتابخانه‌های bidi و arabic-reshaper یافت نشد. متن فارسی ممکن است به درستی نمایش داده نشود")
-                
-                def format_persian_text(text):
-                    """تنظیم متن فارسی برای نمایش صحیح در PDF"""
-                    if not text or not isinstance(text, str):
-                        return str(text) if text is not None else ""
-                    
-                    if bidi_available:
-                        try:
-                            # Reshape Arabic/Persian characters
-                            reshaped_text = reshape(text)
-                            # Apply bidirectional algorithm
-                            display_text = get_display(reshaped_text)
-                            return display_text
-                        except Exception as e:
-                            self.logger.warning(f"خطا در تنظیم متن فارسی: {str(e)}")
-                            return text
-                    else:
-                        # Fallback: at least reverse the string for basic RTL support
-                        try:
-                            # Simple reversal for Persian text (not perfect but better than nothing)
-                            import re
-                            if re.search(r'[\u0600-\u06FF]', text):
-                                return text[::-1]  # Simple reversal for Persian characters
-                            return text
-                        except:
-                            return text
-                
-                # ثبت فونت فارسی
-                font_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "fonts", "Vazir.ttf")
-                # اطمینان از وجود فایل فونت
-                if not os.path.exists(font_path):
-                    self.logger.error(f"فایل فونت در مسیر {font_path} یافت نشد")
-                    messagebox.showerror("خطا", f"فایل فونت در مسیر {font_path} یافت نشد")
-                    return
-                self.logger.info(f"فایل فونت در مسیر {font_path} یافت شد")
-                pdfmetrics.registerFont(TTFont('Vazir', font_path))
-                
-                # ایجاد استایل‌های متن
-                styles = getSampleStyleSheet()
-                styles.add(ParagraphStyle(name='RTL', fontName='Vazir', alignment=TA_RIGHT))
-                
-                # ایجاد داکیومنت PDF
-                doc = SimpleDocTemplate(file_path, pagesize=landscape(A4))
-                elements = []
-                
-                # عنوان گزارش
-                title_style = ParagraphStyle(
-                    'Title',
-                    parent=styles['Title'],
-                    fontName='Vazir',
-                    alignment=TA_RIGHT,
-                    fontSize=16
-                )
-                
-                report_title = f"گزارش {self.selected_table_var.get()}"
-                if self.selected_bank_var.get() != "همه موارد":
-                    report_title += f" - بانک {self.selected_bank_var.get()}"
-                
-                formatted_title = format_persian_text(report_title)
-                elements.append(Paragraph(formatted_title, title_style))
-                elements.append(Spacer(1, 20))
-                
-                # تاریخ گزارش
-                from datetime import datetime
-                import jdatetime
-                date_style = ParagraphStyle(
-                    'Date',
-                    parent=styles['Normal'],
-                    fontName='Vazir',
-                    alignment=TA_RIGHT,
-                    fontSize=10
-                )
-                gregorian_date = datetime.now()
-                jalali_date = jdatetime.datetime.fromgregorian(datetime=gregorian_date)
-                report_date = jalali_date.strftime("%Y/%m/%d %H:%M:%S")
-                formatted_date_text = format_persian_text(f"تاریخ گزارش: {report_date}")
-                elements.append(Paragraph(formatted_date_text, date_style))
-                elements.append(Spacer(1, 20))
-                
-                # ایجاد داده‌های جدول
-                table_data = []
-                
-                # هدر جدول
-                header_row = [format_persian_text(col['text']) for col in self.columns]
-                table_data.append(header_row)
-                
-                # ردیف‌های جدول
-                for row in self.table_data:
-                    data_row = []
-                    # چون self.table_data یک لیست از تاپل‌هاست، مستقیماً از عناصر آن استفاده می‌کنیم
-                    for value in row:
-                        formatted_value = format_persian_text(str(value) if value is not None else "")
-                        data_row.append(formatted_value)
-                    table_data.append(data_row)
-                
-                # ایجاد جدول
-                table = Table(table_data, repeatRows=1)
-                
-                # استایل جدول
-                table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-                    ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
-                    ('FONTNAME', (0, 0), (-1, -1), 'Vazir'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 12),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ]))
-                
-                elements.append(table)
-                
-                # پاورقی
-                elements.append(Spacer(1, 20))
-                footer_style = ParagraphStyle(
-                    'Footer',
-                    parent=styles['Normal'],
-                    fontName='Vazir',
-                    alignment=TA_RIGHT,
-                    fontSize=10
-                )
-                formatted_footer_text = format_persian_text(f"تعداد رکوردها: {len(self.table_data)}")
-                elements.append(Paragraph(formatted_footer_text, footer_style))
-                
-                # ساخت PDF
-                doc.build(elements)
-                
-                self.logger.info(f"گزارش با موفقیت به فایل {file_path} صادر شد")
-                self.status_var.set("گزارش با موفقیت به PDF صادر شد")
-                messagebox.showinfo("موفقیت", "گزارش با موفقیت به PDF صادر شد")
-            except ImportError:
-                # اگر کتابخانه reportlab نصب نشده باشد
-                self.logger.error("کتابخانه‌های مورد نیاز برای PDF نصب نشده است")
-                self.status_var.set("خطا: کتابخانه‌های مورد نیاز PDF نصب نشده است")
-                error_msg = ("برای صدور به PDF با پشتیبانی فارسی نیاز به نصب کتابخانه‌های زیر دارید:\n\n"
-                             "pip install -r requirements_pdf_persian.txt\n\n"
-                             "یا:\n\n"
-                             "pip install reportlab python-bidi arabic-reshaper jdatetime")
-                messagebox.showerror("خطا", error_msg)
+            columns = list(self.columns)
+            rows = stream_query_rows(self.data.query, lambda item: self.format_report_row(item, columns))
+            title = exporter.get_report_title(self.selected_table_var.get(), self.selected_bank_var.get())
+            column_names = [col['text'] for col in columns]
+            self.start_export("PDF", lambda: exporter.write_report(file_path, title, column_names, rows))
         except Exception as e:
             self.logger.error(f"خطا در صدور به PDF: {str(e)}")
             self.status_var.set(f"خطا در صدور به PDF: {str(e)}")
-            messagebox.showerror("خطا", f"خطا در صدور به PDF: {str(e)}")
\ No newline at end of file
+            messagebox.showerror("خطا", f"خطا در صدور به PDF: {str(e)}")
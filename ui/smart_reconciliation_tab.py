@@ -1,4 +1,4 @@
-import os
+import queue
 import logging
 import threading
 import ttkbootstrap as ttk
@@ -6,64 +6,50 @@ from ttkbootstrap.constants import *
 from tkinter import StringVar, messagebox
 from tkinter.ttk import Combobox, Treeview, Scrollbar
 from ttkbootstrap.scrolled import ScrolledText
+from ui.components.common.log_handler import BatchedTextHandler
 from config.settings import (
-    DATA_DIR, DEFAULT_FONT, DEFAULT_FONT_SIZE,
-    HEADER_FONT_SIZE, BUTTON_FONT_SIZE
+    DEFAULT_FONT, DEFAULT_FONT_SIZE,
+    HEADER_FONT_SIZE, BUTTON_FONT_SIZE,
+    AI_MATCHER_BACKEND, REPORT_POLL_INTERVAL_MS
 )
 from database.banks_repository import get_all_banks
-from database.pos_transactions_repository import get_unreconciled_transactions_by_bank
-from database.bank_transaction_repository import (
-    get_unreconciled_by_type as get_bank_unreconciled_by_type
+from database.smart_reconciliation_jobs_repository import (
+    get_resumable_smart_jobs,
+    get_smart_job_item_results
 )
 from reconciliation.ai_matcher import AIMatcher
-from utils.logger_config import setup_logger
+from reconciliation.smart_reconciliation_job import SmartReconciliationJob
+from utils.logger_config import setup_logger, add_file_logging
 
 logger = setup_logger('ui.smart_reconciliation_tab')
 
-class UIHandler(logging.Handler):
-    def __init__(self, text_widget):
-        super().__init__()
-        self.text_widget = text_widget
-
-    def emit(self, record):
-        msg = self.format(record) + '\n'
-        self.text_widget.insert('end', msg)
-        self.text_widget.see('end')
-
 class SmartReconciliationTab(ttk.Frame):
     def __init__(self, parent):
         super().__init__(parent)
         self.setup_logging()
         self.selected_bank_var = StringVar()
         self.n8n_webhook_url = "http://localhost:5678/webhook/reconcile"
-        self.ai_matcher = AIMatcher(self.n8n_webhook_url)
+        # مدل محلی ممکن است نیاز به آموزش داشته باشد؛ بنابراین در پس‌زمینه بارگذاری می‌شود
+        self.ai_matcher = AIMatcher(self.n8n_webhook_url, backend='webhook')
+        self.backend_var = StringVar(value=self.ai_matcher.backend)
         self.is_processing = False
+        self.current_job = None
         self.results = []
         self.create_widgets()
         self.load_banks_to_combobox()
+        if AI_MATCHER_BACKEND == 'local':
+            self.backend_var.set('local')
+            self.on_backend_selected()
 
     def setup_logging(self):
         """راه‌اندازی سیستم لاگینگ"""
-        os.makedirs(DATA_DIR, exist_ok=True)
-
+        # تنظیمات کلی لاگر
         self.logger = logging.getLogger('smart_reconciliation.tab')
         self.logger.setLevel(logging.INFO)
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 
-        error_handler = logging.FileHandler(
-            os.path.join(DATA_DIR, 'smart_reconciliation_error.txt'), encoding='utf-8'
-        )
-        error_handler.setLevel(logging.ERROR)
-        error_handler.setFormatter(formatter)
-
-        file_handler = logging.FileHandler(
-            os.path.join(DATA_DIR, 'smart_reconciliation_log.txt'), encoding='utf-8'
-        )
-        file_handler.setLevel(logging.INFO)
-        file_handler.setFormatter(formatter)
-
-        self.logger.addHandler(error_handler)
-        self.logger.addHandler(file_handler)
+        # فایل‌های لاگ و خطا (با چرخش بر اساس حجم) در نخ جداگانه از طریق صف نوشته می‌شوند
+        add_file_logging(self.logger, 'smart_reconciliation_log.txt', 'smart_reconciliation_error.txt')
+        # UI handler will be added after creating log_text widget
 
     def create_widgets(self):
         PADX = 8
@@ -108,6 +94,33 @@ class SmartReconciliationTab(ttk.Frame):
             style='Bold.TButton'
         ).pack(side="left", padx=5)
 
+        ttk.Button(
+            btn_frame,
+            text="ادامه کار ناتمام",
+            command=self.resume_smart_reconciliation,
+            bootstyle=INFO,
+            width=14,
+            style='Bold.TButton'
+        ).pack(side="left", padx=5)
+
+        ttk.Button(
+            btn_frame,
+            text="توقف موقت",
+            command=self.pause_smart_reconciliation,
+            bootstyle=WARNING,
+            width=10,
+            style='Bold.TButton'
+        ).pack(side="left", padx=5)
+
+        ttk.Button(
+            btn_frame,
+            text="لغو",
+            command=self.cancel_smart_reconciliation,
+            bootstyle=DANGER,
+            width=8,
+            style='Bold.TButton'
+        ).pack(side="left", padx=5)
+
         ttk.Button(
             btn_frame,
             text="تنظیم Webhook",
@@ -116,6 +129,23 @@ class SmartReconciliationTab(ttk.Frame):
             style='Bold.TButton'
         ).pack(side="left", padx=5)
 
+        ttk.Label(btn_frame, text="موتور تطبیق:", style='Default.TLabel').pack(side="left", padx=5)
+        self.backend_combobox = Combobox(
+            btn_frame, textvariable=self.backend_var, state="readonly", width=10,
+            values=('webhook', 'local')
+        )
+        self.backend_combobox.configure(font=self.default_font)
+        self.backend_combobox.pack(side="left", padx=5)
+        self.backend_combobox.bind('<<ComboboxSelected>>', self.on_backend_selected)
+
+        ttk.Button(
+            btn_frame,
+            text="آموزش مدل محلی",
+            command=self.train_local_model,
+            width=14,
+            style='Bold.TButton'
+        ).pack(side="left", padx=5)
+
         progress_frame = ttk.LabelFrame(self, text="وضعیت مغایرت‌یابی هوشمند", style='Header.TLabelframe')
         progress_frame.pack(fill="x", pady=5, padx=10)
 
@@ -150,7 +180,7 @@ class SmartReconciliationTab(ttk.Frame):
         self.log_text = ScrolledText(log_frame, height=10, font=self.log_font)
         self.log_text.pack(fill="both", expand=True, padx=10, pady=10)
 
-        ui_handler = UIHandler(self.log_text)
+        ui_handler = BatchedTextHandler(self.log_text)
         ui_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
         self.logger.addHandler(ui_handler)
 
@@ -200,8 +230,107 @@ class SmartReconciliationTab(ttk.Frame):
             self.logger.info(f"Webhook تنظیم شد: {url}")
             messagebox.showinfo("موفق", "Webhook با موفقیت تنظیم شد")
 
-    def start_smart_reconciliation(self):
-        """شروع فرآیند مغایرت‌یابی هوشمند"""
+    def run_in_background(self, work, on_success, on_error):
+        """
+        اجرای کار طولانی در نخ پس‌زمینه و فراخوانی نتیجه در نخ رابط کاربری
+
+        Args:
+            work: تابع بدون آرگومان که در نخ پس‌زمینه اجرا می‌شود
+            on_success: تابع دریافت خروجی work (در نخ رابط کاربری)
+            on_error: تابع دریافت استثنای work (در نخ رابط کاربری)
+        """
+        result_queue = queue.Queue()
+
+        def worker():
+            try:
+                result_queue.put((True, work()))
+            except Exception as e:
+                result_queue.put((False, e))
+
+        def poll():
+            try:
+                succeeded, payload = result_queue.get_nowait()
+            except queue.Empty:
+                self.after(REPORT_POLL_INTERVAL_MS, poll)
+                return
+            (on_success if succeeded else on_error)(payload)
+
+        threading.Thread(target=worker, daemon=True).start()
+        self.after(REPORT_POLL_INTERVAL_MS, poll)
+
+    def on_backend_selected(self, event=None):
+        """تغییر موتور تطبیق (مدل محلی در صورت نیاز در پس‌زمینه بارگذاری یا آموزش داده می‌شود)"""
+        backend = self.backend_var.get()
+        if backend != 'local' or self.ai_matcher.local_matcher is not None:
+            self.apply_backend(backend)
+            return
+
+        if self.is_processing:
+            messagebox.showwarning("هشدار", "فرآیند درحال اجرا است")
+            self.backend_var.set(self.ai_matcher.backend)
+            return
+
+        def load_local_matcher():
+            from reconciliation.local_matcher import LocalMatcher
+            return LocalMatcher()
+
+        def on_success(local_matcher):
+            self.is_processing = False
+            self.ai_matcher.local_matcher = local_matcher
+            self.status_var.set("مدل محلی آماده است")
+            self.apply_backend(backend)
+
+        def on_error(error):
+            self.is_processing = False
+            self.status_var.set("خطا در بارگذاری مدل محلی")
+            self.logger.error(f"خطا در تنظیم موتور تطبیق: {str(error)}")
+            messagebox.showerror("خطا", f"امکان استفاده از موتور {backend} وجود ندارد:\n{str(error)}")
+            self.backend_var.set(self.ai_matcher.backend)
+
+        self.is_processing = True
+        self.status_var.set("در حال بارگذاری مدل محلی...")
+        self.run_in_background(load_local_matcher, on_success, on_error)
+
+    def apply_backend(self, backend):
+        """تنظیم موتور تطبیق AIMatcher (مدل محلی باید از قبل بارگذاری شده باشد)"""
+        try:
+            self.ai_matcher.set_backend(backend)
+            self.logger.info(f"موتور تطبیق: {backend}")
+        except Exception as e:
+            self.logger.error(f"خطا در تنظیم موتور تطبیق: {str(e)}")
+            messagebox.showerror("خطا", f"امکان استفاده از موتور {backend} وجود ندارد:\n{str(e)}")
+            self.backend_var.set(self.ai_matcher.backend)
+
+    def train_local_model(self):
+        """آموزش مدل محلی از نتایج مغایرت‌گیری گذشته (در نخ پس‌زمینه)"""
+        if self.is_processing:
+            messagebox.showwarning("هشدار", "فرآیند درحال اجرا است")
+            return
+
+        def train():
+            from reconciliation.local_matcher import LocalMatcher, train_local_model
+            return LocalMatcher(model=train_local_model())
+
+        def on_success(local_matcher):
+            self.is_processing = False
+            self.ai_matcher.local_matcher = local_matcher
+            self.status_var.set("مدل محلی آموزش داده شد")
+            self.logger.info("مدل محلی با موفقیت آموزش داده شد")
+            messagebox.showinfo("موفق", "مدل محلی با موفقیت آموزش داده شد")
+
+        def on_error(error):
+            self.is_processing = False
+            self.status_var.set("خطا در آموزش مدل محلی")
+            self.logger.error(f"خطا در آموزش مدل محلی: {str(error)}")
+            messagebox.showerror("خطا", f"خطا در آموزش مدل محلی:\n{str(error)}")
+
+        self.is_processing = True
+        self.status_var.set("در حال آموزش مدل محلی...")
+        self.logger.info("آموزش مدل محلی آغاز شد")
+        self.run_in_background(train, on_success, on_error)
+
+    def start_smart_reconciliation(self, resume_job_id=None):
+        """شروع فرآیند مغایرت‌یابی هوشمند (یا ادامه یک کار ناتمام)"""
         try:
             if not self.selected_bank_var.get():
                 messagebox.showerror("خطا", "لطفاً یک بانک انتخاب کنید")
@@ -219,11 +348,14 @@ class SmartReconciliationTab(ttk.Frame):
             bank_name = self.selected_bank_var.get()
             bank_id = self.banks_dict[bank_name]
 
-            self.logger.info(f"شروع فرآیند مغایرت‌یابی هوشمند برای {bank_name}")
+            if resume_job_id:
+                self.logger.info(f"ادامه کار مغایرت‌یابی هوشمند {resume_job_id} برای {bank_name}")
+            else:
+                self.logger.info(f"شروع فرآیند مغایرت‌یابی هوشمند برای {bank_name}")
 
             threading.Thread(
                 target=self.run_smart_reconciliation,
-                args=(bank_id, bank_name),
+                args=(bank_id, bank_name, resume_job_id),
                 daemon=True
             ).start()
 
@@ -231,102 +363,99 @@ class SmartReconciliationTab(ttk.Frame):
             self.logger.error(f"خطا در شروع فرآیند: {str(e)}")
             self.is_processing = False
 
-    def run_smart_reconciliation(self, bank_id, bank_name):
-        """اجرای فرآیند مغایرت‌یابی هوشمند"""
+    def resume_smart_reconciliation(self):
+        """ادامه آخرین کار ناتمام بانک انتخاب شده"""
         try:
-            self.update_status("در حال بارگذاری تراکنش‌های POS...")
-            pos_transactions = get_unreconciled_transactions_by_bank(bank_id)
-            self.logger.info(f"تعداد {len(pos_transactions)} تراکنش POS مغایرت‌نشده یافت شد")
-
-            self.update_status("در حال بارگذاری تراکنش‌های بانک...")
-            bank_transfers_received = get_bank_unreconciled_by_type('Received_Transfer')
-            bank_transfers_paid = get_bank_unreconciled_by_type('Paid_Transfer')
-            checks_received = get_bank_unreconciled_by_type('Received_Check')
-            checks_paid = get_bank_unreconciled_by_type('Paid_Check')
-
-            total_records = (
-                len(pos_transactions) + len(bank_transfers_received) +
-                len(bank_transfers_paid) + len(checks_received) + len(checks_paid)
-            )
-
-            if total_records == 0:
-                self.update_status("هیچ تراکنش مغایرت‌نشده‌ای یافت نشد")
-                self.logger.warning("هیچ تراکنشی برای پردازش یافت نشد")
-                self.is_processing = False
+            if not self.selected_bank_var.get():
+                messagebox.showerror("خطا", "لطفاً یک بانک انتخاب کنید")
                 return
-
-            processed = 0
-
-            for idx, pos in enumerate(pos_transactions):
-                if not self.is_processing:
-                    break
-                self.update_status(f"در حال پردازش POS... ({idx + 1}/{len(pos_transactions)})")
-                self.update_progress((processed / total_records) * 100)
-
-                success, result = self.ai_matcher.process_pos_transaction(pos)
-                self.results.append(result)
-                self.add_result_to_table(result)
-                processed += 1
-
-            for idx, transfer in enumerate(bank_transfers_received):
-                if not self.is_processing:
-                    break
-                self.update_status(f"در حال پردازش انتقال دریافتی... ({idx + 1}/{len(bank_transfers_received)})")
-                self.update_progress((processed / total_records) * 100)
-
-                success, result = self.ai_matcher.process_bank_transaction(
-                    transfer, 'Received_Transfer'
-                )
-                self.results.append(result)
-                self.add_result_to_table(result)
-                processed += 1
-
-            for idx, transfer in enumerate(bank_transfers_paid):
-                if not self.is_processing:
-                    break
-                self.update_status(f"در حال پردازش انتقال پرداختی... ({idx + 1}/{len(bank_transfers_paid)})")
-                self.update_progress((processed / total_records) * 100)
-
-                success, result = self.ai_matcher.process_bank_transaction(
-                    transfer, 'Paid_Transfer'
-                )
-                self.results.append(result)
-                self.add_result_to_table(result)
-                processed += 1
-
-            for idx, check in enumerate(checks_received):
-                if not self.is_processing:
-                    break
-                self.update_status(f"در حال پردازش چک دریافتی... ({idx + 1}/{len(checks_received)})")
-                self.update_progress((processed / total_records) * 100)
-
-                success, result = self.ai_matcher.process_bank_transaction(
-                    check, 'Received_Check'
+            bank_id = self.banks_dict[self.selected_bank_var.get()]
+            jobs = get_resumable_smart_jobs(bank_id)
+            if not jobs:
+                messagebox.showinfo("اطلاع", "کار ناتمامی برای این بانک وجود ندارد")
+                return
+            job_backend = jobs[0]['backend']
+            if job_backend and job_backend != self.ai_matcher.backend:
+                # نتایج قبلی کار با موتور دیگری به دست آمده‌اند
+                messagebox.showerror(
+                    "خطا",
+                    f"کار ناتمام با موتور {job_backend} ایجاد شده است؛ برای ادامه آن ابتدا موتور {job_backend} را انتخاب کنید"
                 )
-                self.results.append(result)
-                self.add_result_to_table(result)
-                processed += 1
-
-            for idx, check in enumerate(checks_paid):
-                if not self.is_processing:
-                    break
-                self.update_status(f"در حال پردازش چک پرداختی... ({idx + 1}/{len(checks_paid)})")
-                self.update_progress((processed / total_records) * 100)
+                return
+            self.start_smart_reconciliation(resume_job_id=jobs[0]['id'])
+        except Exception as e:
+            self.logger.error(f"خطا در ادامه کار ناتمام: {str(e)}")
+
+    def pause_smart_reconciliation(self):
+        """توقف موقت کار جاری (قابل ادامه)"""
+        if self.current_job is not None and self.is_processing:
+            self.current_job.pause()
+            self.update_status("در حال توقف موقت...")
+
+    def cancel_smart_reconciliation(self):
+        """لغو کار جاری"""
+        if self.current_job is not None and self.is_processing:
+            if messagebox.askyesno("تأیید", "کار جاری لغو شود؟ رکوردهای باقی‌مانده پردازش نخواهند شد."):
+                self.current_job.cancel()
+                self.update_status("در حال لغو...")
+
+    def run_smart_reconciliation(self, bank_id, bank_name, resume_job_id=None):
+        """اجرای فرآیند مغایرت‌یابی هوشمند به صورت یک کار ذخیره شده در دیتابیس"""
+        try:
+            type_labels = {
+                'POS': 'POS',
+                'Received_Transfer': 'انتقال دریافتی',
+                'Paid_Transfer': 'انتقال پرداختی',
+                'Received_Check': 'چک دریافتی',
+                'Paid_Check': 'چک پرداختی'
+            }
 
-                success, result = self.ai_matcher.process_bank_transaction(
-                    check, 'Paid_Check'
-                )
+            def on_result(finished_count, total_items, success, result):
                 self.results.append(result)
                 self.add_result_to_table(result)
-                processed += 1
+                label = type_labels.get(result.get('type'), result.get('type'))
+                self.update_status(f"در حال پردازش {label}... ({finished_count}/{total_items})")
+                self.update_progress((finished_count / total_items) * 100)
+
+            if resume_job_id:
+                self.current_job = SmartReconciliationJob.resume(resume_job_id, self.ai_matcher, on_result)
+                # نمایش نتایج ثبت شده در اجراهای قبلی همین کار
+                for item in get_smart_job_item_results(resume_job_id):
+                    self.add_result_to_table({
+                        'type': item['record_type'],
+                        'source_id': item['record_id'],
+                        'matched_id': item['matched_id'] or '-',
+                        'confidence': item['confidence'] or 0,
+                        'reason': item['reason'] or '',
+                        'status': 'auto_matched' if item['state'] == 'matched' else item['state']
+                    })
+            else:
+                self.update_status("در حال بارگذاری تراکنش‌های مغایرت‌نشده...")
+                self.current_job = SmartReconciliationJob.create(bank_id, self.ai_matcher, on_result)
+
+            self.logger.info(f"کار مغایرت‌یابی هوشمند شماره {self.current_job.job_id}")
+            self.current_job.run()
 
             auto_matched = sum(1 for r in self.results if r.get('status') == 'auto_matched')
             needs_review = sum(1 for r in self.results if r.get('status') == 'needs_review')
             errors = sum(1 for r in self.results if r.get('status') == 'error')
-
-            summary = f"فرآیند به پایان رسید: {auto_matched} ذخیره خودکار، {needs_review} نیاز به بررسی، {errors} خطا"
+            resolved_locally = self.ai_matcher.last_run_stats.get('resolved_locally', 0)
+            cached = self.ai_matcher.last_run_stats.get('cached', 0)
+
+            status_messages = {
+                'completed': "فرآیند به پایان رسید",
+                'paused': "فرآیند متوقف شد (قابل ادامه)",
+                'cancelled': "فرآیند لغو شد",
+                'failed': "فرآیند با خطا متوقف شد (قابل ادامه)"
+            }
+            summary = (
+                f"{status_messages.get(self.current_job.status, 'فرآیند پایان یافت')}: "
+                f"{auto_matched} ذخیره خودکار، {needs_review} نیاز به بررسی، {errors} خطا"
+                f" ({resolved_locally} رکورد بدون نیاز به AI و {cached} رکورد از کش تطبیق داده شد)"
+            )
             self.update_status(summary)
-            self.update_progress(100)
+            if self.current_job.status == 'completed':
+                self.update_progress(100)
             self.logger.info(summary)
 
         except Exception as e:
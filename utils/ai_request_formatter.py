@@ -3,6 +3,29 @@ from utils.logger_config import setup_logger
 
 logger = setup_logger('utils.ai_request_formatter')
 
+# قوانین تطبیق هر نوع درخواست (در درخواست دسته‌ای فقط یک بار ارسال می‌شوند)
+POS_MATCHING_RULES = {
+    "amount": "must match exactly",
+    "card": "last 4 digits should match if available in description",
+    "tracking": "last 6 digits of POS tracking should match accounting transaction_number",
+    "date": "accounting date usually equal to POS date, but can vary ±15 days",
+    "terminal": "terminal_id might appear in accounting description for sum of day"
+}
+
+TRANSFER_MATCHING_RULES = {
+    "amount": "bank amount might include fee (1000-50000 Rials more)",
+    "tracking": "extracted_tracking_number should match transaction_number (last digits)",
+    "card": "source_card_number (last 4) should appear in description",
+    "date": "dates can differ by 1-2 days due to registration delays",
+    "name": "depositor_name should match customer_name if available"
+}
+
+CHECK_MATCHING_RULES = {
+    "amount": "must match exactly",
+    "check_number": "extracted_tracking_number must match transaction_number",
+    "date": "bank transaction_date should match collection_date (not due_date!)"
+}
+
 def format_pos_request(pos_record, accounting_candidates):
     """فرمت کردن درخواست POS برای n8n"""
     try:
@@ -28,13 +51,7 @@ def format_pos_request(pos_record, accounting_candidates):
                 }
                 for candidate in accounting_candidates
             ],
-            "matching_rules": {
-                "amount": "must match exactly",
-                "card": "last 4 digits should match if available in description",
-                "tracking": "last 6 digits of POS tracking should match accounting transaction_number",
-                "date": "accounting date usually equal to POS date, but can vary ±15 days",
-                "terminal": "terminal_id might appear in accounting description for sum of day"
-            }
+            "matching_rules": POS_MATCHING_RULES
         }
         logger.info(f"درخواست POS فرمت شد برای ترمینال {pos_record.get('terminal_number')}")
         return request_data
@@ -69,13 +86,7 @@ def format_bank_transfer_request(bank_record, accounting_candidates, transaction
                 }
                 for candidate in accounting_candidates
             ],
-            "matching_rules": {
-                "amount": "bank amount might include fee (1000-50000 Rials more)",
-                "tracking": "extracted_tracking_number should match transaction_number (last digits)",
-                "card": "source_card_number (last 4) should appear in description",
-                "date": "dates can differ by 1-2 days due to registration delays",
-                "name": "depositor_name should match customer_name if available"
-            }
+            "matching_rules": TRANSFER_MATCHING_RULES
         }
         logger.info(f"درخواست انتقال بانکی فرمت شد برای مبلغ {bank_record.get('amount')}")
         return request_data
@@ -107,14 +118,44 @@ def format_check_request(bank_record, accounting_candidates, transaction_type):
                 }
                 for candidate in accounting_candidates
             ],
-            "matching_rules": {
-                "amount": "must match exactly",
-                "check_number": "extracted_tracking_number must match transaction_number",
-                "date": "bank transaction_date should match collection_date (not due_date!)"
-            }
+            "matching_rules": CHECK_MATCHING_RULES
         }
         logger.info(f"درخواست چک فرمت شد برای مبلغ {bank_record.get('amount')}")
         return request_data
     except Exception as e:
         logger.error(f"خطا در فرمت کردن درخواست چک: {str(e)}")
         raise
+
+def format_batch_request(record_requests):
+    """
+    فرمت کردن درخواست دسته‌ای برای n8n
+
+    هر رکورد با کاندیداهای خودش و یک شناسه درخواست (request_id) ارسال می‌شود
+    و قوانین تطبیق هر نوع تراکنش فقط یک بار در matching_rules قرار می‌گیرد.
+    پاسخ مورد انتظار: {"results": [{"request_id": ..., "matched": ..., ...}]}
+
+    Args:
+        record_requests: لیست درخواست‌های تکی (خروجی توابع format_*_request)
+
+    Returns:
+        dict: درخواست دسته‌ای
+    """
+    try:
+        records = []
+        matching_rules = {}
+        for position, record_request in enumerate(record_requests):
+            record_data = {key: value for key, value in record_request.items() if key != "matching_rules"}
+            record_data["request_id"] = str(position)
+            records.append(record_data)
+            matching_rules.setdefault(record_request.get("transaction_type"), record_request.get("matching_rules", {}))
+
+        request_data = {
+            "batch": True,
+            "records": records,
+            "matching_rules": matching_rules
+        }
+        logger.info(f"درخواست دسته‌ای با {len(records)} رکورد فرمت شد")
+        return request_data
+    except Exception as e:
+        logger.error(f"خطا در فرمت کردن درخواست دسته‌ای: {str(e)}")
+        raise
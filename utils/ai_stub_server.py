@@ -0,0 +1,246 @@
+"""
+سرور webhook شبیه‌سازی شده برای آزمایش و سنجش AIMatcher بدون n8n
+
+اجرا:
+    python -m utils.ai_stub_server --port 5678 --latency 0.2 --jitter 0.1 --error-rate 0.05
+
+سپس آدرس http://localhost:5678/webhook/reconcile را در تب مغایرت‌یابی هوشمند
+به عنوان Webhook تنظیم کنید. هر دو قالب تکی و دسته‌ای پشتیبانی می‌شوند.
+
+سنجش توان عملیاتی AIMatcher در برابر همین سرور (بدون دیتابیس):
+    python -m utils.ai_stub_server --benchmark 2000 --latency 0.2 --concurrency 8 --rps 0
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.compare_tracking_numbers import compare_tracking_numbers
+
+
+def build_stub_response(record_request):
+    """
+    پاسخ شبیه‌سازی شده برای یک درخواست تکی
+
+    کاندیدای دارای شماره پیگیری منطبق با اطمینان بالا انتخاب می‌شود؛ در غیر
+    این صورت اولین کاندیدا با اطمینان کم (نیاز به بررسی دستی) پیشنهاد می‌شود.
+    """
+    record = record_request.get('pos_record') or record_request.get('bank_record') or {}
+    tracking = str(record.get('tracking_number') or record.get('extracted_tracking_number') or '')
+    candidates = record_request.get('accounting_candidates', [])
+    if not candidates:
+        return {"matched": False, "confidence": 0, "reason": "stub: no candidates"}
+
+    tracking_matches = [
+        candidate for candidate in candidates
+        if tracking and candidate.get('transaction_number')
+        and compare_tracking_numbers(tracking, str(candidate.get('transaction_number')))
+    ]
+    if len(tracking_matches) == 1:
+        return {
+            "matched": True,
+            "confidence": 0.95,
+            "matched_accounting_id": tracking_matches[0].get('id'),
+            "reason": "stub: tracking number match"
+        }
+    return {
+        "matched": False,
+        "confidence": 0.5,
+        "matched_accounting_id": candidates[0].get('id'),
+        "reason": "stub: ambiguous",
+        "suggestions": [candidate.get('id') for candidate in candidates[:3]]
+    }
+
+
+class StubWebhookHandler(BaseHTTPRequestHandler):
+    """پاسخ‌دهنده درخواست‌های webhook با تأخیر و نرخ خطای قابل تنظیم"""
+
+    latency = 0.0
+    jitter = 0.0
+    error_rate = 0.0
+    request_count = 0
+    _count_lock = threading.Lock()
+
+    def do_POST(self):
+        with self._count_lock:
+            StubWebhookHandler.request_count += 1
+
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send(400, {"error": "invalid json"})
+            return
+
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+        if random.random() < self.error_rate:
+            self._send(500, {"error": "stub: simulated failure"})
+            return
+
+        if payload.get('batch'):
+            results = []
+            for record_request in payload.get('records', []):
+                response = build_stub_response(record_request)
+                response["request_id"] = record_request.get('request_id')
+                results.append(response)
+            self._send(200, {"results": results})
+        else:
+            self._send(200, build_stub_response(payload))
+
+    def _send(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # جلوگیری از چاپ هر درخواست در خروجی
+        pass
+
+
+def create_stub_server(host='127.0.0.1', port=5678, latency=0.0, jitter=0.0, error_rate=0.0):
+    """
+    ساخت سرور شبیه‌سازی شده (بدون شروع)
+
+    Returns:
+        ThreadingHTTPServer: سرور؛ با serve_forever اجرا و با shutdown متوقف می‌شود
+    """
+    handler = type('ConfiguredStubWebhookHandler', (StubWebhookHandler,), {
+        'latency': latency,
+        'jitter': jitter,
+        'error_rate': error_rate
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def build_benchmark_requests(record_count, candidates_per_record=5):
+    """
+    درخواست‌های POS مصنوعی برای سنجش
+
+    در نیمی از رکوردها یکی از کاندیداها شماره پیگیری منطبق دارد تا هر دو
+    مسیر پاسخ سرور (تطبیق و نیاز به بررسی) پوشش داده شوند.
+    """
+    from utils.ai_request_formatter import format_pos_request
+
+    record_requests = []
+    for index in range(record_count):
+        tracking_number = f"{100000 + index}"
+        pos_record = {
+            'id': index + 1,
+            'terminal_number': '1000',
+            'transaction_date': '2024-01-01',
+            'transaction_amount': 1000 + index,
+            'tracking_number': tracking_number
+        }
+        candidates = [
+            {
+                'id': index * candidates_per_record + offset + 1,
+                'transaction_number': tracking_number if index % 2 == 0 and offset == 0 else f"9{index}{offset}",
+                'transaction_amount': 1000 + index,
+                'due_date': '2024-01-01'
+            }
+            for offset in range(candidates_per_record)
+        ]
+        record_requests.append(format_pos_request(pos_record, candidates))
+    return record_requests
+
+
+def run_benchmark(webhook_url, record_count=1000, max_concurrency=None, requests_per_second=None, batch_size=None):
+    """
+    ارسال درخواست‌های مصنوعی با AIMatcher و سنجش توان عملیاتی و تأخیر
+
+    مسیر ارسال matcher (دسته‌بندی، هم‌زمانی، محدودیت نرخ، تلاش مجدد و مدار)
+    مانند process_concurrently با max_concurrency نخ اجرا می‌شود؛ خواندن
+    کاندیداها و ثبت نتایج در دیتابیس در این سنجش وجود ندارد.
+
+    Returns:
+        dict: records، requests (فراخوانی‌های webhook)، elapsed، throughput،
+        errors و latency (خلاصه هیستوگرام)
+    """
+    from reconciliation.ai_matcher import AIMatcher
+
+    matcher = AIMatcher(webhook_url, max_concurrency, requests_per_second, batch_size, backend='webhook')
+    record_requests = build_benchmark_requests(record_count)
+    batches = [
+        record_requests[start:start + matcher.batch_size]
+        for start in range(0, len(record_requests), matcher.batch_size)
+    ]
+    try:
+        started_at = time.monotonic()
+        with ThreadPoolExecutor(max_workers=matcher.max_concurrency) as executor:
+            responses = [response for batch in executor.map(matcher.send_batch_to_ai, batches) for response in batch]
+        elapsed = time.monotonic() - started_at
+    finally:
+        matcher.close()
+
+    latency = matcher.latency_histogram.summary()
+    return {
+        "records": len(responses),
+        "requests": latency["count"],
+        "elapsed": elapsed,
+        "throughput": len(responses) / elapsed if elapsed else 0.0,
+        "errors": sum(1 for response in responses if response.get('error')),
+        "latency": latency
+    }
+
+
+def print_benchmark_report(report):
+    """چاپ نتیجه run_benchmark"""
+    latency = report["latency"]
+    print(
+        f"{report['records']} records in {report['elapsed']:.2f}s "
+        f"({report['throughput']:.1f} records/s, {report['requests']} webhook calls, {report['errors']} errors)"
+    )
+    print(
+        f"latency: mean {latency['mean']:.3f}s, p50<={latency['p50']}s, "
+        f"p95<={latency['p95']}s, p99<={latency['p99']}s, max {latency['max']:.3f}s"
+    )
+    for bucket, count in latency["buckets"].items():
+        print(f"  {bucket:>8}s  {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='سرور webhook شبیه‌سازی شده برای مغایرت‌یابی هوشمند')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5678)
+    parser.add_argument('--latency', type=float, default=0.2, help='تأخیر پاسخ (ثانیه)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='تغییرات تصادفی تأخیر (± ثانیه)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='نرخ پاسخ خطای 500 (بین 0 و 1)')
+    parser.add_argument('--benchmark', type=int, metavar='N',
+                        help='ارسال N رکورد مصنوعی با AIMatcher و گزارش توان عملیاتی (سپس خروج)')
+    parser.add_argument('--concurrency', type=int, help='تعداد نخ‌های matcher در سنجش (پیش‌فرض: تنظیمات)')
+    parser.add_argument('--rps', type=float, help='محدودیت نرخ matcher در سنجش؛ 0 یعنی بدون محدودیت (پیش‌فرض: تنظیمات)')
+    parser.add_argument('--batch-size', type=int, help='اندازه دسته matcher در سنجش (پیش‌فرض: تنظیمات)')
+    args = parser.parse_args()
+
+    server = create_stub_server(args.host, args.port, args.latency, args.jitter, args.error_rate)
+    if args.benchmark:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            report = run_benchmark(
+                f"http://{args.host}:{server.server_port}/webhook/reconcile",
+                args.benchmark, args.concurrency, args.rps, args.batch_size
+            )
+            print_benchmark_report(report)
+        finally:
+            server.shutdown()
+            server.server_close()
+        return
+
+    print(f"Stub webhook listening on http://{args.host}:{args.port}/webhook/reconcile")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import random
+import threading
+import time
+
+
+class CircuitBreaker:
+    """
+    قطع‌کننده مدار برای فراخوانی سرویس‌های خارجی (امن برای چند نخ)
+
+    پس از failure_threshold خطای متوالی مدار باز می‌شود و تمام درخواست‌ها تا
+    reset_timeout ثانیه بلافاصله رد می‌شوند. پس از آن یک درخواست آزمایشی
+    (حالت نیمه‌باز) اجازه داده می‌شود؛ موفقیت آن مدار را می‌بندد و خطای آن
+    مدار را دوباره باز می‌کند.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = float(reset_timeout)
+        self._state = self.CLOSED
+        self._failure_count = 0
+        self._opened_at = 0.0
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow_request(self):
+        """آیا درخواست جدید مجاز است؟"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._trial_in_progress = False
+            # حالت نیمه‌باز: فقط یک درخواست آزمایشی هم‌زمان
+            if self._trial_in_progress:
+                return False
+            self._trial_in_progress = True
+            return True
+
+    def record_success(self):
+        """ثبت موفقیت و بستن مدار"""
+        with self._lock:
+            self._state = self.CLOSED
+            self._failure_count = 0
+            self._trial_in_progress = False
+
+    def record_failure(self):
+        """ثبت خطا و باز کردن مدار در صورت رسیدن به آستانه"""
+        with self._lock:
+            self._failure_count += 1
+            self._trial_in_progress = False
+            if self._state == self.HALF_OPEN or self._failure_count >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def is_open(self):
+        """آیا مدار باز است (درخواست‌ها رد می‌شوند)؟"""
+        return self.state == self.OPEN
+
+
+def backoff_delay(attempt, base_delay=0.5, max_delay=8.0):
+    """
+    تأخیر نمایی با jitter کامل برای تلاش مجدد
+
+    Args:
+        attempt: شماره تلاش (از صفر)
+        base_delay: تأخیر پایه (ثانیه)
+        max_delay: حداکثر تأخیر (ثانیه)
+
+    Returns:
+        float: تأخیر تصادفی بین صفر و min(max_delay, base_delay * 2^attempt)
+    """
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
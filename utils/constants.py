@@ -124,6 +124,16 @@ class ReconciliationStatus:
 # برای سازگاری با کد قدیمی
 RECONCILIATION_STATUS = ReconciliationStatus.STATUS_MAP
 
+# =============================================================================
+# کلمات کلیدی شناسایی کارمزد بانکی در توضیحات تراکنش
+# =============================================================================
+BANK_FEE_KEYWORDS = [
+    'کارمزد', 'کارمزد انتقال', 'کارمزد خدمات', 'کارمزد پایا', 'کارمزد ساتنا',
+    'کارمزد کارت', 'کارمزد برداشت', 'کارمزد تراکنش', 'کارمزد سرویس',
+    'هزینه خدمات', 'هزینه تراکنش', 'هزینه کارمزد', 'هزینه سرویس',
+    'fee', 'service fee', 'transaction fee', 'bank fee'
+]
+
 # =============================================================================
 # توابع کمکی برای کار با انواع تراکنش
 # =============================================================================
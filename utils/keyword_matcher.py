@@ -0,0 +1,90 @@
+# file: utils/keyword_matcher.py
+
+from collections import deque
+
+
+class KeywordMatcher:
+    """
+    Multi-keyword substring matcher (Aho-Corasick automaton).
+
+    All keywords are compiled once into a single automaton, so checking a text
+    costs one pass over its characters regardless of how many keywords exist.
+    Matching is case-insensitive, like SQLite's LIKE for ASCII text.
+    """
+
+    def __init__(self, keywords):
+        """
+        Args:
+            keywords (iterable): Keywords to search for; empty values are ignored.
+        """
+        self.keywords = [k.lower() for k in dict.fromkeys(keywords) if k]
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for keyword in self.keywords:
+            self._add(keyword)
+        self._build_failure_links()
+
+    def _add(self, keyword):
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(keyword)
+
+    def _build_failure_links(self):
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, next_state in self._goto[state].items():
+                pending.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def _step(self, state, char):
+        while state and char not in self._goto[state]:
+            state = self._fail[state]
+        return self._goto[state].get(char, 0)
+
+    def find_all(self, text):
+        """
+        Returns every keyword occurring in the text, in order of appearance.
+
+        Args:
+            text (str): Text to scan.
+
+        Returns:
+            list: Matched keywords (a keyword may appear more than once).
+        """
+        found = []
+        state = 0
+        for char in str(text or '').lower():
+            state = self._step(state, char)
+            found.extend(self._output[state])
+        return found
+
+    def contains_any(self, text):
+        """
+        Returns True as soon as any keyword is found in the text.
+
+        Args:
+            text (str): Text to scan.
+
+        Returns:
+            bool: True if at least one keyword occurs in the text.
+        """
+        state = 0
+        for char in str(text or '').lower():
+            state = self._step(state, char)
+            if self._output[state]:
+                return True
+        return False
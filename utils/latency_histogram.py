@@ -0,0 +1,62 @@
+import bisect
+import threading
+
+# مرزهای پیش‌فرض سطل‌ها (ثانیه)
+DEFAULT_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class LatencyHistogram:
+    """هیستوگرام تأخیر فراخوانی‌ها با سطل‌های ثابت (امن برای چند نخ)"""
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """پاک کردن تمام مقادیر ثبت شده"""
+        with self._lock:
+            # سطل آخر برای مقادیر بیشتر از بزرگ‌ترین مرز است
+            self._counts = [0] * (len(self.buckets) + 1)
+            self._count = 0
+            self._total = 0.0
+            self._max = 0.0
+
+    def record(self, seconds):
+        """ثبت تأخیر یک فراخوانی"""
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self._count += 1
+            self._total += seconds
+            self._max = max(self._max, seconds)
+
+    def percentile(self, fraction):
+        """تخمین صدک (مرز بالای سطل شامل صدک)"""
+        with self._lock:
+            if not self._count:
+                return 0.0
+            target = fraction * self._count
+            cumulative = 0
+            for index, count in enumerate(self._counts):
+                cumulative += count
+                if cumulative >= target:
+                    return self.buckets[index] if index < len(self.buckets) else self._max
+            return self._max
+
+    def summary(self):
+        """خلاصه آماری هیستوگرام"""
+        with self._lock:
+            count, total, maximum = self._count, self._total, self._max
+            buckets = {
+                (f"<={bound}" if index < len(self.buckets) else f">{self.buckets[-1]}"): self._counts[index]
+                for index, bound in enumerate(self.buckets + (None,))
+            }
+        return {
+            "count": count,
+            "mean": total / count if count else 0.0,
+            "max": maximum,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "buckets": buckets
+        }
@@ -1,71 +1,206 @@
 import os
+import queue
+import atexit
 import logging
-import locale
-import codecs
-from config.settings import DATA_DIR
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from config.settings import DATA_DIR, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_RATE_LIMIT_PER_SECOND
 
-def setup_logger(name):
-    """تنظیمات مرکزی لاگر با پشتیبانی از زبان فارسی و thread-safe handling"""
-    # تنظیم locale برای پشتیبانی از زبان فارسی
-    try:
-        locale.setlocale(locale.LC_ALL, 'fa_IR.UTF-8')
-    except locale.Error:
-        try:
-            locale.setlocale(locale.LC_ALL, 'Persian_Iran.1256')
-        except locale.Error:
-            pass
+# فرمتر فایل‌ها و کنسول با thread ID برای debug بهتر
+LOG_FORMAT = '%(asctime)s - [%(thread)d] - %(name)s - %(levelname)s - %(message)s'
+LOG_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
 
-    logger = logging.getLogger(name)
-    
-    # جلوگیری از اضافه کردن هندلر تکراری
-    if logger.handlers:
-        return logger
-        
-    logger.setLevel(logging.INFO)
-    
-    # اطمینان از وجود دایرکتوری
+# یک QueueListener برای هر زوج (فایل لاگ، فایل خطا)
+_listeners = {}
+_listeners_lock = threading.Lock()
+# زوج‌های (لاگر، RateLimitFilter) برای گزارش پیام‌های حذف شده در خروج برنامه
+_rate_limited_loggers = []
+
+
+class BomRotatingFileHandler(RotatingFileHandler):
+    """هندلر فایل چرخشی که در ابتدای هر فایل خالی (از جمله پس از چرخش) BOM می‌نویسد"""
+
+    def _open(self):
+        stream = super()._open()
+        if stream.tell() == 0:
+            stream.write('\ufeff')
+        return stream
+
+
+class SharedQueueHandler(QueueHandler):
+    """
+    QueueHandler که هر رکورد را حداکثر یک بار در هر صف قرار می‌دهد
+
+    وقتی لاگر والد (مثلاً 'reconciliation') و لاگرهای فرزند به یک زوج فایل
+    متصل باشند، رکوردهای propagate شده دوباره در فایل نوشته نمی‌شوند.
+    """
+
+    def handle(self, record):
+        queued = record.__dict__.setdefault('_log_queues', set())
+        if id(self.queue) in queued:
+            return False
+        queued.add(id(self.queue))
+        return super().handle(record)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    محدودیت تعداد پیام‌های هر محل فراخوانی در هر بازه
+
+    برای پیام‌هایی که در حلقه‌های پردازش رکورد ثبت می‌شوند؛ حداکثر rate پیام
+    از هر خط کد در هر period ثانیه عبور می‌کند و تعداد پیام‌های حذف شده به
+    اولین پیام عبوری بازه بعد اضافه می‌شود. هشدارها و خطاها محدود نمی‌شوند.
+    تعداد حذف شده‌هایی که پیام بعدی ندارند (مثلاً پایان حلقه) با pop_suppressed
+    در flush_suppressed_logs گزارش می‌شود.
+    """
+
+    def __init__(self, rate=LOG_RATE_LIMIT_PER_SECOND, period=1.0):
+        super().__init__()
+        self.rate = rate
+        self.period = period
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.rate <= 0 or record.levelno >= logging.WARNING:
+            return True
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or record.created - window[0] >= self.period:
+                # [شروع بازه، تعداد عبوری، تعداد حذف شده، آخرین رکورد حذف شده]
+                suppressed = window[2] if window else 0
+                self._windows[key] = [record.created, 1, 0, None]
+            elif window[1] >= self.rate:
+                window[2] += 1
+                window[3] = record
+                return False
+            else:
+                window[1] += 1
+                suppressed = 0
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} پیام مشابه حذف شد)"
+        return True
+
+    def pop_suppressed(self):
+        """آخرین رکورد حذف شده هر محل فراخوانی که تعداد حذف‌های آن هنوز گزارش نشده است"""
+        records = []
+        with self._lock:
+            for window in self._windows.values():
+                if window[2]:
+                    record = window[3]
+                    record.msg = f"{record.msg} (آخرین پیام از {window[2]} پیام حذف شده)"
+                    records.append(record)
+                    window[2] = 0
+                    window[3] = None
+        return records
+
+
+def _create_handlers(log_file, error_file):
     os.makedirs(DATA_DIR, exist_ok=True)
-    
-    # فرمتر برای لاگ‌ها با thread ID برای debug بهتر
-    formatter = logging.Formatter('%(asctime)s - [%(thread)d] - %(name)s - %(levelname)s - %(message)s', 
-                                datefmt='%Y-%m-%d %H:%M:%S')
-    
-    # هندلر برای فایل خطا با پشتیبانی از UTF-8
-    error_path = os.path.join(DATA_DIR, 'error.txt')
-    try:
-        error_handler = logging.FileHandler(error_path, 'a', 'utf-8')
-        error_handler.setLevel(logging.ERROR)
-        error_handler.setFormatter(formatter)
-        logger.addHandler(error_handler)
-    except Exception as e:
-        print(f"Warning: Could not create error log handler: {e}")
-    
-    # هندلر برای لاگ عمومی با پشتیبانی از UTF-8
-    log_path = os.path.join(DATA_DIR, 'Log.txt')
-    try:
-        file_handler = logging.FileHandler(log_path, 'a', 'utf-8')
-        file_handler.setLevel(logging.INFO)
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
-    except Exception as e:
-        print(f"Warning: Could not create log file handler: {e}")
-    
+    formatter = logging.Formatter(LOG_FORMAT, datefmt=LOG_DATE_FORMAT)
+    handlers = []
+
+    for file_name, level in ((error_file, logging.ERROR), (log_file, logging.INFO)):
+        try:
+            handler = BomRotatingFileHandler(
+                os.path.join(DATA_DIR, file_name), 'a',
+                maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8'
+            )
+            handler.setLevel(level)
+            handler.setFormatter(formatter)
+            handlers.append(handler)
+        except Exception as e:
+            print(f"Warning: Could not create log file handler for {file_name}: {e}")
+
     # هندلر کنسول برای debug
     try:
         console_handler = logging.StreamHandler()
         console_handler.setLevel(logging.WARNING)  # فقط warning و بالاتر در کنسول
         console_handler.setFormatter(formatter)
-        logger.addHandler(console_handler)
+        handlers.append(console_handler)
     except Exception as e:
         print(f"Warning: Could not create console handler: {e}")
-    
-    # اضافه کردن BOM به فایل‌های لاگ در صورت نیاز
-    for path in [error_path, log_path]:
-        try:
-            if not os.path.exists(path) or os.path.getsize(path) == 0:
-                with open(path, 'wb') as f:
-                    f.write(codecs.BOM_UTF8)
-        except Exception as e:
-            print(f"Warning: Could not add BOM to {path}: {e}")
-    
+
+    return handlers
+
+
+def _get_log_queue(log_file, error_file):
+    """صف listener زوج فایل (در اولین درخواست ساخته و اجرا می‌شود)"""
+    key = (log_file, error_file)
+    with _listeners_lock:
+        listener = _listeners.get(key)
+        if listener is None:
+            listener = QueueListener(queue.Queue(-1), *_create_handlers(log_file, error_file), respect_handler_level=True)
+            listener.start()
+            _listeners[key] = listener
+        return listener.queue
+
+
+def add_file_logging(logger, log_file='Log.txt', error_file='error.txt'):
+    """
+    اتصال لاگر به فایل‌های لاگ و خطا از طریق صف
+
+    نخ فراخوانی کننده فقط رکورد را در صف قرار می‌دهد و نوشتن فایل‌ها (با
+    چرخش بر اساس حجم) در نخ QueueListener انجام می‌شود. محدودیت نرخ پیام‌ها
+    برای هر لاگر جداگانه اعمال می‌شود.
+
+    Args:
+        logger: لاگر
+        log_file: نام فایل لاگ عمومی در DATA_DIR
+        error_file: نام فایل خطاها در DATA_DIR
+    """
+    # جلوگیری از اضافه کردن هندلر تکراری
+    if any(isinstance(handler, SharedQueueHandler) for handler in logger.handlers):
+        return logger
+    logger.addHandler(SharedQueueHandler(_get_log_queue(log_file, error_file)))
+    rate_filter = RateLimitFilter()
+    logger.addFilter(rate_filter)
+    with _listeners_lock:
+        _rate_limited_loggers.append((logger, rate_filter))
     return logger
+
+
+def flush_suppressed_logs():
+    """
+    ثبت آخرین پیام‌های حذف شده با تعداد آن‌ها
+
+    تعداد حذف شده‌ها معمولاً به پیام بعدی همان خط اضافه می‌شود؛ پیام‌های پایان
+    یک حلقه پیام بعدی ندارند و در اینجا (و در خروج برنامه) گزارش می‌شوند.
+    رکوردها مستقیماً به هندلرهای لاگر داده می‌شوند تا دوباره محدود نشوند.
+    """
+    with _listeners_lock:
+        rate_limited_loggers = list(_rate_limited_loggers)
+    for logger, rate_filter in rate_limited_loggers:
+        for record in rate_filter.pop_suppressed():
+            for handler in logger.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+
+
+def shutdown_logging():
+    """توقف listenerها پس از نوشتن پیام‌های باقیمانده صف (در خروج برنامه)"""
+    flush_suppressed_logs()
+    with _listeners_lock:
+        for listener in _listeners.values():
+            listener.stop()
+        _listeners.clear()
+
+
+atexit.register(shutdown_logging)
+
+
+def setup_logger(name):
+    """
+    تنظیمات مرکزی لاگر با پشتیبانی از زبان فارسی و thread-safe handling
+
+    تنظیم locale یک بار در شروع برنامه (main.py) انجام می‌شود.
+    """
+    logger = logging.getLogger(name)
+
+    # جلوگیری از اضافه کردن هندلر تکراری
+    if logger.handlers:
+        return logger
+
+    logger.setLevel(logging.INFO)
+    return add_file_logging(logger)
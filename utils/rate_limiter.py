@@ -0,0 +1,52 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    محدودکننده نرخ به روش سطل توکن (امن برای استفاده هم‌زمان چند نخ)
+
+    توکن‌ها با نرخ ثابت rate در ثانیه پر می‌شوند و حداکثر capacity توکن
+    ذخیره می‌شود؛ هر درخواست یک توکن مصرف می‌کند و در نبود توکن منتظر می‌ماند.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        Args:
+            rate: تعداد توکن اضافه شده در هر ثانیه (صفر یا منفی یعنی بدون محدودیت)
+            capacity: حداکثر توکن ذخیره شده (پیش‌فرض: یک ثانیه نرخ)
+        """
+        self.rate = float(rate or 0)
+        self.capacity = float(capacity or max(1.0, self.rate))
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def try_acquire(self, tokens=1):
+        """مصرف توکن در صورت موجود بودن؛ بدون انتظار"""
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        """انتظار تا موجود شدن توکن و مصرف آن"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait_time = (tokens - self._tokens) / self.rate
+            time.sleep(wait_time)
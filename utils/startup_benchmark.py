@@ -0,0 +1,149 @@
+"""
+سنجش زمان راه‌اندازی سرد برنامه با python -X importtime
+
+اجرا:
+    python -m utils.startup_benchmark --runs 5
+    python -m utils.startup_benchmark --save-baseline startup_baseline.json
+    python -m utils.startup_benchmark --baseline startup_baseline.json
+
+هر اجرا در یک مفسر جدید انجام می‌شود و زمان import ماژول (پیش‌فرض main) از
+خروجی importtime خوانده می‌شود. میانه اجراها با بودجه STARTUP_IMPORT_BUDGET_MS و
+در صورت وجود با خط مبنای ذخیره شده مقایسه می‌شود. بارگذاری کتابخانه‌های سنگین
+(pandas، matplotlib، reportlab و ...) در زمان import نیز پسرفت محسوب می‌شود؛ این
+کتابخانه‌ها باید در مسیر کدی که از آن‌ها استفاده می‌کند import شوند.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+from config.settings import STARTUP_IMPORT_BUDGET_MS, STARTUP_REGRESSION_TOLERANCE_PERCENT
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# کتابخانه‌هایی که نباید در زمان راه‌اندازی بارگذاری شوند
+HEAVY_MODULES = (
+    'pandas', 'numpy', 'matplotlib', 'seaborn', 'reportlab', 'openpyxl',
+    'arabic_reshaper', 'bidi', 'requests'
+)
+
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( +)(\S+)\s*$')
+
+
+def parse_importtime(output):
+    """
+    تبدیل خروجی -X importtime به لیست رکوردها
+
+    Returns:
+        list: دیکشنری‌های (module، self_us، cumulative_us، depth) به ترتیب خروجی
+    """
+    records = []
+    for line in output.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            records.append({
+                'module': module,
+                'self_us': int(self_us),
+                'cumulative_us': int(cumulative_us),
+                'depth': (len(indent) - 1) // 2
+            })
+    return records
+
+
+def run_once(module='main', python=sys.executable):
+    """import ماژول در یک مفسر جدید و بازگرداندن رکوردهای importtime"""
+    completed = subprocess.run(
+        [python, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=PROJECT_ROOT, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} ناموفق بود:\n{completed.stderr[-2000:]}")
+    return parse_importtime(completed.stderr)
+
+
+def measure(module='main', runs=5, python=sys.executable):
+    """
+    سنجش زمان import ماژول در چند اجرا
+
+    Returns:
+        dict: زمان میانه (میلی‌ثانیه)، زمان هر اجرا، کتابخانه‌های سنگین بارگذاری
+        شده و رکوردهای اجرای میانه
+    """
+    samples = []
+    for _ in range(max(1, runs)):
+        records = run_once(module, python)
+        target = next((r for r in reversed(records) if r['module'] == module), None)
+        if target is None:
+            raise RuntimeError(f"زمان import {module} در خروجی importtime یافت نشد")
+        samples.append((target['cumulative_us'] / 1000.0, records))
+    samples.sort(key=lambda sample: sample[0])
+    median_ms, median_records = samples[len(samples) // 2]
+    loaded = {record['module'] for record in median_records}
+    return {
+        'module': module,
+        'median_ms': statistics.median(sample[0] for sample in samples),
+        'runs_ms': [round(sample[0], 1) for sample in samples],
+        'heavy_modules': sorted(name for name in HEAVY_MODULES if name in loaded),
+        'records': median_records
+    }
+
+
+def slowest_imports(records, count=15):
+    """ماژول‌های دارای بیشترین زمان import (زمان خود ماژول)"""
+    return sorted(records, key=lambda record: record['self_us'], reverse=True)[:count]
+
+
+def check_regression(result, budget_ms, baseline=None, tolerance_percent=STARTUP_REGRESSION_TOLERANCE_PERCENT):
+    """لیست پیام‌های پسرفت (لیست خالی یعنی عدم پسرفت)"""
+    problems = []
+    if budget_ms and result['median_ms'] > budget_ms:
+        problems.append(f"زمان import {result['median_ms']:.1f}ms بیشتر از بودجه {budget_ms}ms است")
+    if result['heavy_modules']:
+        problems.append(f"کتابخانه‌های سنگین در زمان import بارگذاری شده‌اند: {', '.join(result['heavy_modules'])}")
+    if baseline:
+        limit = baseline['median_ms'] * (1 + tolerance_percent / 100.0)
+        if result['median_ms'] > limit:
+            problems.append(
+                f"زمان import {result['median_ms']:.1f}ms بیشتر از خط مبنای "
+                f"{baseline['median_ms']:.1f}ms (+{tolerance_percent}%) است"
+            )
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='سنجش زمان راه‌اندازی سرد برنامه (python -X importtime)')
+    parser.add_argument('--module', default='main', help='ماژول مورد سنجش')
+    parser.add_argument('--runs', type=int, default=5, help='تعداد اجرا (میانه گزارش می‌شود)')
+    parser.add_argument('--top', type=int, default=15, help='تعداد کندترین ماژول‌های نمایش داده شده')
+    parser.add_argument('--budget-ms', type=float, default=STARTUP_IMPORT_BUDGET_MS, help='بودجه زمان import (میلی‌ثانیه)')
+    parser.add_argument('--baseline', help='فایل JSON خط مبنا برای مقایسه')
+    parser.add_argument('--save-baseline', help='ذخیره نتیجه به عنوان خط مبنا در فایل JSON')
+    args = parser.parse_args()
+
+    result = measure(args.module, args.runs)
+    print(f"import {result['module']}: median {result['median_ms']:.1f}ms over {len(result['runs_ms'])} runs {result['runs_ms']}")
+    for record in slowest_imports(result['records'], args.top):
+        print(f"  {record['self_us'] / 1000.0:8.1f}ms self {record['cumulative_us'] / 1000.0:8.1f}ms cumulative  {record['module']}")
+
+    baseline = None
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as baseline_file:
+            json.dump({key: result[key] for key in ('module', 'median_ms', 'runs_ms', 'heavy_modules')}, baseline_file, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    problems = check_regression(result, args.budget_ms, baseline)
+    for problem in problems:
+        print(f"REGRESSION: {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()